@@ -1,93 +1,42 @@
 """
 File: repair_portal/api/client_portal.py
-Updated: 2025-07-13
-Version: 1.4
-Purpose: Secure API endpoints for client portal UI dashboard
+Updated: 2026-10-19
+Version: 1.5
+Purpose: Secure API endpoints for client portal UI dashboard. All three endpoints read the
+         per-customer bundle materialized by customer.services.portal_home.
 """
 
 import frappe
 
+from repair_portal.customer.services import portal_home
 
-@frappe.whitelist(allow_guest=False)
-def get_my_instruments():
-    """Return instrument list where the linked player belongs to the logged-in user."""
-    client = frappe.db.get_value("Customer", {"linked_user": frappe.session.user}, "name")
-    if not client:
-        return []
 
-    player_names = frappe.get_all("Player Profile", {"customer": client}, pluck="name")
-    return frappe.get_all(
-        "Instrument Profile",
-        filters={"player_profile": ["in", player_names]},
-        fields=["name", "instrument_type", "serial_no"],
-    )
+def _my_bundle():
+    customer = portal_home.customer_for_user(frappe.session.user)
+    return portal_home.get_bundle(customer) if customer else None
 
 
 @frappe.whitelist(allow_guest=False)
-def get_my_repairs():
-    """Return recent Repair Orders linked to instruments owned by this client."""
-    client = frappe.db.get_value("Customer", {"linked_user": frappe.session.user}, "name")
-    if not client:
-        return []
-
-    # Get the user's instruments first to ensure we only query relevant repairs.
-    # This preserves the original business logic of showing repairs for owned instruments.
-    player_names = frappe.get_all("Player Profile", {"customer": client}, pluck="name")
-    if not player_names:
-        return []
-
-    instrument_names = frappe.get_all(
-        "Instrument Profile", {"player_profile": ["in", player_names]}, pluck="name"
-    )
-    if not instrument_names:
-        return []
-
-    # Fetch the 10 most recent repairs associated with the client and their instruments.
-    repairs = frappe.get_all(
-        "Repair Order",
-        filters={
-            "customer": client,
-            "instrument_profile": ["in", instrument_names],
-        },
-        fields=[
-            "name",
-            "workflow_state",
-            "instrument_profile",
-            "priority",
-            "target_delivery",
-            "modified",
-        ],
-        order_by="modified desc",
-        limit=10,
-    )
+def get_portal_home():
+    """Instruments, recent repairs, open estimates and service plans for the logged-in customer."""
+    return _my_bundle() or {
+        "customer": None,
+        "instruments": [],
+        "repairs": [],
+        "estimates": [],
+        "service_plans": [],
+    }
 
-    if not repairs:
-        return []
-
-    # From the limited list of repairs, get the unique instrument profile IDs.
-    # This avoids fetching metadata for all of a user's instruments.
-    instrument_profiles_in_repairs = list(set(r.instrument_profile for r in repairs if r.instrument_profile))
-
-    # Pre-fetch instrument metadata for only the instruments in the recent repairs.
-    # This is a performance optimization that avoids a potential N+1 query pattern
-    # and reduces the amount of data fetched if a user has many instruments but few recent repairs.
-    instrument_meta = {
-        doc.name: doc
-        for doc in frappe.get_all(
-            "Instrument Profile",
-            filters={"name": ["in", instrument_profiles_in_repairs]},
-            fields=["name", "headline", "instrument_category", "serial_no"],
-        )
-    } if instrument_profiles_in_repairs else {}
 
+@frappe.whitelist(allow_guest=False)
+def get_my_instruments():
+    """Return instrument list where the linked player belongs to the logged-in user."""
+    bundle = _my_bundle()
+    return bundle["instruments"] if bundle else []
 
-    # Attach the descriptive instrument label to each repair entry.
-    for entry in repairs:
-        instrument = instrument_meta.get(entry.instrument_profile)
-        if instrument:
-            parts = [instrument.headline, instrument.instrument_category, instrument.serial_no]
-            entry["instrument_label"] = " • ".join(filter(None, parts)) or instrument.name
-        else:
-            entry["instrument_label"] = entry.instrument_profile or ""
 
-    return repairs
+@frappe.whitelist(allow_guest=False)
+def get_my_repairs():
+    """Return the 10 most recent Repair Orders for instruments owned by this client."""
+    bundle = _my_bundle()
+    return bundle["repairs"] if bundle else []
@@ -1,16 +1,19 @@
 # Path: repair_portal/api/frontend/instrument_profile.py
-# Last Updated: 2025-08-14
-# Version: v1.2
+# Last Updated: 2026-10-19
+# Version: v1.3.1
 # Purpose: Frontend APIs for Instrument and the aggregated Instrument Profile snapshot.
 from __future__ import annotations
 
 import frappe
 from frappe import _
 
-from repair_portal.instrument_profile.services.profile_sync import (
+from repair_portal.instrument_profile.services.profile_snapshot import (
+    get_collection_page as _get_collection_page,
+)
+from repair_portal.instrument_profile.services.profile_snapshot import (
     get_snapshot as _get_snapshot,
 )
-from repair_portal.instrument_profile.services.profile_sync import sync_now as _sync_now
+from repair_portal.instrument_profile.services.profile_sync import schedule_sync as _schedule_sync
 
 
 @frappe.whitelist(allow_guest=False)
@@ -77,26 +80,39 @@ def list_for_user():
 @frappe.whitelist(allow_guest=False)
 def get_profile(instrument=None, profile=None):
     """
-    Return the fully-synced Instrument Profile document (scalar snapshot only).
-    For an aggregated "everything" snapshot, call get_profile_snapshot.
+    Return the Instrument Profile document (scalar snapshot only). Profiles are kept in
+    sync by linked-doc events, so this is a plain read; a legacy instrument that has no
+    profile yet gets one created by a queued sync and ``{"pending": 1}`` is returned
+    meanwhile. For the aggregated view, call get_profile_snapshot.
     """
     if not instrument and not profile:
         frappe.throw(_('Provide instrument or profile'))
-    if not profile and instrument:
-        res = _sync_now(instrument=instrument)
-        profile = res.get('profile')
-    else:
-        _sync_now(profile=profile)
-
+    if not profile:
+        frappe.has_permission('Instrument', 'read', instrument, throw=True)
+        profile = frappe.db.get_value('Instrument Profile', {'instrument': instrument}, 'name')
+        if not profile:
+            _schedule_sync(instrument)
+            return {'instrument': instrument, 'profile': None, 'pending': 1}
+
+    if not frappe.has_permission('Instrument Profile', 'read', profile):
+        frappe.throw(_('Insufficient permissions to read profile'), frappe.PermissionError)
     return frappe.get_doc('Instrument Profile', profile).as_dict()  # type: ignore
 
 
 @frappe.whitelist(allow_guest=False)
 def get_profile_snapshot(instrument=None, profile=None):
     """
-    Return the aggregated snapshot for UI: instrument + owner + serial record +
-    accessories, media, condition history, interactions (if doctypes exist).
+    Return the cached, read-only snapshot for UI: instrument + owner + serial record +
+    the newest page of accessories, media, condition history and interactions.
     """
     if not instrument and not profile:
         frappe.throw(_('Provide instrument or profile'))
     return _get_snapshot(instrument=instrument, profile=profile)
+
+
+@frappe.whitelist(allow_guest=False)
+def get_profile_collection(collection, instrument=None, profile=None, cursor=None, limit=20):
+    """Older rows of one snapshot collection, continuing from its ``next_cursor``."""
+    return _get_collection_page(
+        collection, instrument=instrument, profile=profile, cursor=cursor, limit=limit
+    )
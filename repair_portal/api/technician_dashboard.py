@@ -1,11 +1,12 @@
 # repair_portal/api/technician_dashboard.py
-# Date: 2025-07-14
-# Version: 2.0 - Refactored for unified Repair Order
+# Date: 2026-10-19
+# Version: 2.1 - KPIs and activity served from materialized Redis state
 # Purpose: API endpoint to fetch all data for the technician dashboard (now only Repair Order)
 
 import frappe
 from frappe import _
-from frappe.utils import nowdate
+
+from repair_portal.repair.services import technician_kpis
 
 
 @frappe.whitelist(allow_guest=False)
@@ -26,24 +27,8 @@ def get_dashboard_data(technician=None):
     if "Technician" not in frappe.get_roles(technician):
         frappe.throw(_("User does not have the Technician role."), frappe.PermissionError)
 
-    # 1. Get KPIs from Repair Order
-    kpis_result = frappe.db.sql(
-        """
-        SELECT
-            IFNULL(SUM(CASE WHEN workflow_state IN ('Draft', 'In Progress') THEN 1 ELSE 0 END), 0) AS open_repairs,
-            IFNULL(SUM(CASE WHEN workflow_state = 'In Progress' THEN 1 ELSE 0 END), 0) AS in_progress_repairs,
-            IFNULL(SUM(CASE WHEN target_delivery IS NOT NULL AND target_delivery < %(today)s AND workflow_state NOT IN ('Delivered', 'Closed') THEN 1 ELSE 0 END), 0) AS overdue_repairs
-        FROM `tabRepair Order`
-        WHERE assigned_technician = %(technician)s
-        """,
-        {"technician": technician, "today": nowdate()},
-        as_dict=True,
-    )
-    kpis = (
-        list(kpis_result)[0]
-        if kpis_result
-        else {"open_repairs": 0, "in_progress_repairs": 0, "overdue_repairs": 0}
-    )
+    # 1. KPIs: Redis counters kept current by Repair Order events (repair.services.technician_kpis)
+    kpis = technician_kpis.get_kpis(technician)
 
     # 2. Get list of currently assigned repairs (not closed/resolved/cancelled)
     assigned_repairs = frappe.get_list(
@@ -83,26 +68,13 @@ def get_dashboard_data(technician=None):
             else:
                 row["instrument_label"] = row.instrument_profile
 
-    # 3. Get recent activity feed (last 5 pulse updates for this tech's repairs)
-    recent_activity = frappe.db.sql(
-        """
-        SELECT
-            pu.repair_order,
-            pu.status,
-            pu.note,
-            pu.timestamp
-        FROM `tabPulse Update` pu
-        JOIN `tabRepair Order` ro ON pu.repair_order = ro.name
-        WHERE ro.assigned_technician = %(technician)s
-        ORDER BY pu.timestamp DESC
-        LIMIT 5
-        """,
-        {"technician": technician},
-        as_dict=True,
-    )
+    # 3. Recent activity: capped Redis feed fed by Pulse Update inserts
+    recent_activity = technician_kpis.get_activity(technician)
 
     return {
         "kpis": kpis,
         "assigned_repairs": assigned_repairs,
         "recent_activity": recent_activity,
+        # Later KPI / activity changes are pushed on this event as deltas
+        "realtime_event": technician_kpis.REALTIME_EVENT,
     }
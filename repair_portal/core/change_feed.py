@@ -0,0 +1,156 @@
+"""Per-doctype change counters in Redis for cheap list/dashboard refresh polling.
+
+Every committed change to a feed doctype increments a monotonic counter and
+records the document name against that version in a capped sorted set. Pollers
+keep the last version they saw and ask :func:`changes_since`, which answers
+from Redis in one round-trip without touching the database (names are filtered
+through ``frappe.get_list`` only when requested and something changed).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Iterable
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+FEED_DOCTYPES = frozenset({"Instrument Profile", "Repair Order", "Clarinet Intake", "Pulse Update"})
+MAX_LOGGED_CHANGES = 1000
+MAX_RETURNED_NAMES = 200
+
+# INCR the counter, log name@version (a re-changed name just moves up), trim the
+# log and remember the highest version trimmed away. Returns the new version.
+_BUMP_LUA = """
+local v = redis.call('INCR', KEYS[1])
+redis.call('ZADD', KEYS[2], v, ARGV[1])
+local excess = redis.call('ZCARD', KEYS[2]) - tonumber(ARGV[2])
+if excess > 0 then
+    local dropped = redis.call('ZRANGE', KEYS[2], excess - 1, excess - 1, 'WITHSCORES')
+    redis.call('ZREMRANGEBYRANK', KEYS[2], 0, excess - 1)
+    redis.call('SET', KEYS[3], dropped[2])
+end
+return v
+"""
+
+# Returns {version, floor, names newer than ARGV[1] (only when ARGV[2] == '1')}.
+_READ_LUA = """
+local v = tonumber(redis.call('GET', KEYS[1]) or '0')
+local floor = tonumber(redis.call('GET', KEYS[3]) or '0')
+local since = tonumber(ARGV[1])
+if ARGV[2] == '1' and v > since and since >= floor then
+    return {v, floor, redis.call('ZRANGEBYSCORE', KEYS[2], '(' .. since, '+inf')}
+end
+return {v, floor, {}}
+"""
+
+
+def feed_keys(doctype: str) -> tuple[str, str, str]:
+    slug = doctype.lower().replace(" ", "_")
+    base = f"repair_portal:change_feed:{slug}"
+    return f"{base}:version", f"{base}:log", f"{base}:floor"
+
+
+def summarize(version: int, floor: int, since: int | None, names: Iterable[Any] = ()) -> dict[str, Any]:
+    """
+    Poll response for a client that last saw ``since``.
+
+    ``changed`` is true whenever the counter moved (including a reset below
+    ``since`` after a Redis flush). ``names`` is None when the log no longer
+    reaches back to ``since`` and the client should simply reload.
+    """
+    if since is None:
+        return {"version": version, "changed": False, "names": [], "truncated": False}
+    changed = version != since
+    truncated = changed and (since < floor or since > version)
+    decoded = [n.decode() if isinstance(n, bytes) else str(n) for n in names]
+    return {
+        "version": version,
+        "changed": changed,
+        "names": None if truncated else decoded,
+        "truncated": truncated,
+    }
+
+
+class ChangeFeed:
+    """Lua-backed counters; scripts are registered once per Redis client."""
+
+    def __init__(self) -> None:
+        self._client = None
+        self._bump = None
+        self._read = None
+
+    def _redis(self):
+        cache = frappe.cache()
+        if self._client is not cache:
+            self._bump = cache.register_script(_BUMP_LUA)
+            self._read = cache.register_script(_READ_LUA)
+            self._client = cache
+        return cache
+
+    def _keys(self, doctype: str) -> list[str]:
+        cache = self._redis()
+        return [cache.make_key(k) for k in feed_keys(doctype)]
+
+    def bump(self, doctype: str, name: str) -> int:
+        keys = self._keys(doctype)
+        return int(self._bump(keys=keys, args=[name, MAX_LOGGED_CHANGES]))
+
+    def read(self, doctype: str, since: int | None, with_names: bool) -> dict[str, Any]:
+        keys = self._keys(doctype)
+        version, floor, names = self._read(
+            keys=keys, args=[-1 if since is None else since, "1" if with_names else "0"]
+        )
+        return summarize(int(version), int(floor), since, names)
+
+
+_FEED = ChangeFeed()
+
+
+def record_change(doc, method: str | None = None) -> None:
+    """Doc-event target: bump the doctype's counter once the transaction commits."""
+    if doc.doctype not in FEED_DOCTYPES:
+        return
+    doctype, name = doc.doctype, doc.name
+
+    def _bump() -> None:
+        try:
+            _FEED.bump(doctype, name)
+        except Exception:
+            frappe.logger("repair_portal.change_feed").warning("change feed bump failed for %s", doctype)
+
+    # Bumping before commit would let a poller reload and still read the old row.
+    frappe.db.after_commit.add(_bump)
+
+
+def current_version(doctype: str) -> int:
+    return _FEED.read(doctype, None, False)["version"]
+
+
+def changes_since(
+    doctype: str, version: int | str | None = None, with_names: int | bool = 0
+) -> dict[str, Any]:
+    """
+    Poll for changes to ``doctype`` since ``version``.
+
+    Call without ``version`` to get a baseline. With ``with_names`` the response
+    lists the changed documents the caller can read (capped at MAX_RETURNED_NAMES).
+    """
+    if doctype not in FEED_DOCTYPES:
+        frappe.throw(f"No change feed for {doctype}")
+    if not frappe.has_permission(doctype, "read"):
+        frappe.throw("Not permitted", frappe.PermissionError)
+
+    since = None if version in (None, "") else int(version)
+    result = _FEED.read(doctype, since, bool(int(with_names or 0)))
+    names = result["names"]
+    if names and with_names:
+        recent = names[-MAX_RETURNED_NAMES:]
+        readable = set(frappe.get_list(doctype, filters={"name": ["in", recent]}, pluck="name"))
+        result["names"] = [n for n in recent if n in readable]
+    return result
+
+
+if frappe is not None:
+    changes_since = frappe.whitelist()(changes_since)
@@ -0,0 +1,398 @@
+"""Hot-path timing for doc_events and scheduler_events hook targets.
+
+``hooks.py`` passes its ``doc_events`` / ``scheduler_events`` through
+:func:`instrument_hooks`, which rewrites only the opted-in ``repair_portal.*``
+targets to an attribute of this module. Frappe resolves those with
+``frappe.get_attr`` and the module-level ``__getattr__`` below hands back a
+cached wrapper that calls the real target. Targets that are not listed keep
+their method path, so Scheduled Job Types and tracebacks are unchanged.
+
+Both switches live in the site config::
+
+    "repair_portal_instrumented_hooks": ["repair_portal.repair.utils.on_child_validate"],
+    "repair_portal_hook_sample_rate": 0.1   # 0 disables (default), 1 samples every call
+
+``hooks.py`` is imported once per process, so the hook list is read when hooks
+load; set it in ``common_site_config.json`` on multi-site benches.
+
+When off, a wrapped call costs one config lookup on top of the original call.
+When sampled, we record wall time, SQL query count and rows touched into a
+per-process batch that is flushed to Redis in small batches; the
+``flush_hook_metrics`` job folds Redis samples into *Hook Timing Summary*
+rows and :func:`get_hook_percentiles` serves p50/p95/p99 per hook.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+import random
+import threading
+import time
+from collections import defaultdict
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+SAMPLE_RATE_KEY = "repair_portal_hook_sample_rate"
+INSTRUMENTED_HOOKS_KEY = "repair_portal_instrumented_hooks"
+SAMPLES_KEY = "repair_portal:hook_samples"
+SUMMARY_DOCTYPE = "Hook Timing Summary"
+
+_FLUSH_EVERY_SAMPLES = 200
+_FLUSH_EVERY_SECONDS = 30.0
+_REDIS_MAX_SAMPLES = 50000
+
+_TARGET_SEP = ":"  # dotted target path encoded as an attribute name ("a.b.c" → "a:b:c")
+_MODULE_PATH = __name__
+
+
+@dataclass
+class Sample:
+    hook: str
+    kind: str
+    ts: float
+    wall_ms: float
+    queries: int
+    rows: int
+    ok: bool
+
+
+# --------------------------------------------------------------------------- #
+#  Hook rewriting
+# --------------------------------------------------------------------------- #
+
+
+def _timed_path(target: str, kind: str) -> str:
+    return f"{_MODULE_PATH}.{kind}{_TARGET_SEP}{target.replace('.', _TARGET_SEP)}"
+
+
+def _rewrite(value: Any, kind: str, targets: frozenset[str]) -> Any:
+    if isinstance(value, str):
+        return _timed_path(value, kind) if value in targets and value.startswith("repair_portal.") else value
+    if isinstance(value, (list, tuple)):
+        return [_rewrite(v, kind, targets) for v in value]
+    if isinstance(value, dict):
+        return {k: _rewrite(v, kind, targets) for k, v in value.items()}
+    return value
+
+
+def instrumented_targets() -> frozenset[str]:
+    """Hook targets opted into timing via ``repair_portal_instrumented_hooks`` (empty by default)."""
+    if frappe is None:
+        return frozenset()
+    conf = getattr(frappe.local, "conf", None)
+    if not conf:
+        try:
+            conf = frappe.get_site_config()
+        except Exception:
+            return frozenset()
+    value = conf.get(INSTRUMENTED_HOOKS_KEY) or ()
+    if isinstance(value, str):
+        value = value.split(",")
+    return frozenset(v.strip() for v in value if v and v.strip())
+
+
+def instrument_hooks(
+    events: dict[str, Any], kind: str, targets: frozenset[str] | None = None
+) -> dict[str, Any]:
+    """Return a copy of a doc_events/scheduler_events mapping with the opted-in targets wrapped."""
+    targets = instrumented_targets() if targets is None else targets
+    if not targets:
+        return events
+    return _rewrite(events, kind, targets)
+
+
+_WRAPPERS: dict[str, Callable[..., Any]] = {}
+_WRAPPERS_LOCK = threading.Lock()
+
+
+def __getattr__(name: str) -> Callable[..., Any]:
+    """Resolve ``<kind>:<encoded target>`` attributes into cached timing wrappers."""
+    if _TARGET_SEP not in name or name.startswith("__"):
+        raise AttributeError(name)
+    wrapper = _WRAPPERS.get(name)
+    if wrapper is None:
+        kind, _, encoded = name.partition(_TARGET_SEP)
+        with _WRAPPERS_LOCK:
+            wrapper = _WRAPPERS.setdefault(name, _make_wrapper(encoded.replace(_TARGET_SEP, "."), kind))
+    return wrapper
+
+
+def _make_wrapper(target: str, kind: str) -> Callable[..., Any]:
+    resolved: list[Callable[..., Any]] = []
+
+    def _target() -> Callable[..., Any]:
+        if not resolved:
+            resolved.append(frappe.get_attr(target))
+        return resolved[0]
+
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        fn = _target()
+        rate = _sample_rate()
+        if not rate or (rate < 1 and random.random() >= rate):
+            return fn(*args, **kwargs)
+        return _timed_call(fn, _hook_label(target, kind, args), kind, args, kwargs)
+
+    wrapper.__name__ = target.rsplit(".", 1)[-1]
+    wrapper.__qualname__ = wrapper.__name__
+    wrapper.instrumented_target = target  # type: ignore[attr-defined]
+    return wrapper
+
+
+def _hook_label(target: str, kind: str, args: tuple[Any, ...]) -> str:
+    if kind == "doc_event" and len(args) >= 2:
+        doctype = getattr(args[0], "doctype", None)
+        if doctype:
+            return f"{doctype}.{args[1]} → {target}"
+    return target
+
+
+def _sample_rate() -> float:
+    conf = getattr(frappe.local, "conf", None) if frappe is not None else None
+    if not conf:
+        return 0.0
+    try:
+        return float(conf.get(SAMPLE_RATE_KEY) or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# --------------------------------------------------------------------------- #
+#  SQL counting (installed on the current db connection for one sampled call)
+# --------------------------------------------------------------------------- #
+
+
+class _SqlCounter:
+    __slots__ = ("queries", "rows")
+
+    def __init__(self) -> None:
+        self.queries = 0
+        self.rows = 0
+
+
+@contextmanager
+def _sql_counter() -> Iterator[_SqlCounter]:
+    """Count queries on ``frappe.db`` while the block runs; nested sampled hooks share the counter."""
+    db = frappe.db
+    counter = getattr(db, "_rp_sql_counter", None)
+    if counter is not None:
+        yield counter
+        return
+
+    counter = _SqlCounter()
+    shadowed = "sql" in vars(db)
+    original = db.sql
+
+    def counting_sql(*args: Any, **kwargs: Any) -> Any:
+        result = original(*args, **kwargs)
+        counter.queries += 1
+        rowcount = getattr(getattr(db, "_cursor", None), "rowcount", -1)
+        if rowcount is None or rowcount < 0:
+            rowcount = len(result) if isinstance(result, (list, tuple)) else 0
+        counter.rows += rowcount
+        return result
+
+    db.sql = counting_sql
+    db._rp_sql_counter = counter
+    try:
+        yield counter
+    finally:
+        # Put the connection back exactly as it was so wrappers never stack across requests
+        if shadowed:
+            db.sql = original
+        else:
+            del db.sql
+        del db._rp_sql_counter
+
+
+def _timed_call(
+    fn: Callable[..., Any], label: str, kind: str, args: tuple[Any, ...], kwargs: dict[str, Any]
+) -> Any:
+    with _sql_counter() as counter:
+        q0, r0 = counter.queries, counter.rows
+        started = time.perf_counter()
+        ok = False
+        try:
+            result = fn(*args, **kwargs)
+            ok = True
+            return result
+        finally:
+            record(
+                Sample(
+                    hook=label,
+                    kind=kind,
+                    ts=time.time(),
+                    wall_ms=(time.perf_counter() - started) * 1000.0,
+                    queries=counter.queries - q0,
+                    rows=counter.rows - r0,
+                    ok=ok,
+                )
+            )
+
+
+# --------------------------------------------------------------------------- #
+#  Local batch + Redis flush
+# --------------------------------------------------------------------------- #
+
+
+class _Ring:
+    def __init__(self) -> None:
+        self.pending: list[Sample] = []
+        self.last_flush = time.monotonic()
+        self.lock = threading.Lock()
+
+
+_RING = _Ring()
+
+
+def record(sample: Sample) -> None:
+    """Queue a sample locally; push the batch to Redis when due."""
+    with _RING.lock:
+        _RING.pending.append(sample)
+        due = (
+            len(_RING.pending) >= _FLUSH_EVERY_SAMPLES
+            or time.monotonic() - _RING.last_flush >= _FLUSH_EVERY_SECONDS
+        )
+        if not due:
+            return
+        batch, _RING.pending = _RING.pending, []
+        _RING.last_flush = time.monotonic()
+    _push(batch)
+
+
+def _push(batch: list[Sample]) -> None:
+    if not batch or frappe is None:
+        return
+    try:
+        cache = frappe.cache()
+        key = cache.make_key(SAMPLES_KEY)
+        pipe = cache.pipeline()
+        pipe.rpush(key, *[json.dumps(asdict(s)) for s in batch])
+        pipe.ltrim(key, -_REDIS_MAX_SAMPLES, -1)
+        pipe.execute()
+    except Exception:
+        # Metrics must never break the request; a lost batch only thins the sample.
+        pass
+
+
+def flush_local() -> None:
+    """Push any not-yet-flushed local samples to Redis."""
+    with _RING.lock:
+        batch, _RING.pending = _RING.pending, []
+        _RING.last_flush = time.monotonic()
+    _push(batch)
+
+
+# --------------------------------------------------------------------------- #
+#  Aggregation
+# --------------------------------------------------------------------------- #
+
+
+def percentile(sorted_values: list[float], pct: float) -> float:
+    """Nearest-rank percentile over an already-sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Per-hook call count, p50/p95/p99/max wall time and mean queries/rows."""
+    grouped: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for s in samples:
+        grouped[s["hook"]].append(s)
+
+    out: list[dict[str, Any]] = []
+    for hook, rows in grouped.items():
+        walls = sorted(float(r["wall_ms"]) for r in rows)
+        n = len(rows)
+        out.append(
+            {
+                "hook": hook,
+                "kind": rows[0].get("kind"),
+                "calls": n,
+                "errors": sum(1 for r in rows if not r.get("ok", True)),
+                "total_ms": round(sum(walls), 3),
+                "p50_ms": round(percentile(walls, 50), 3),
+                "p95_ms": round(percentile(walls, 95), 3),
+                "p99_ms": round(percentile(walls, 99), 3),
+                "max_ms": round(walls[-1], 3),
+                "avg_queries": round(sum(int(r["queries"]) for r in rows) / n, 2),
+                "avg_rows": round(sum(int(r["rows"]) for r in rows) / n, 2),
+            }
+        )
+    out.sort(key=lambda r: r["total_ms"], reverse=True)
+    return out
+
+
+def _redis_samples() -> list[dict[str, Any]]:
+    raw = frappe.cache().lrange(frappe.cache().make_key(SAMPLES_KEY), 0, -1) or []
+    return [json.loads(r) for r in raw]
+
+
+def get_hook_percentiles(window_minutes: int = 60, include_history: int = 0) -> dict[str, Any]:
+    """p50/p95/p99 per hook over recent samples (site-wide, via Redis)."""
+    frappe.only_for("System Manager")
+    flush_local()
+    cutoff = time.time() - int(window_minutes) * 60
+    samples = [s for s in _redis_samples() if float(s["ts"]) >= cutoff]
+    result: dict[str, Any] = {
+        "sample_rate": _sample_rate(),
+        "window_minutes": int(window_minutes),
+        "samples": len(samples),
+        "hooks": summarize(samples),
+    }
+    if int(include_history):
+        result["history"] = frappe.get_all(
+            SUMMARY_DOCTYPE,
+            fields=["hook", "kind", "period_start", "period_end", "calls", "p50_ms", "p95_ms", "p99_ms"],
+            order_by="period_start desc",
+            limit_page_length=500,
+        )
+    return result
+
+
+if frappe is not None:
+    get_hook_percentiles = frappe.whitelist()(get_hook_percentiles)
+
+
+def flush_hook_metrics() -> int:
+    """Scheduler job: fold Redis samples into Hook Timing Summary rows. Returns rows written."""
+    flush_local()
+    cache = frappe.cache()
+    key = cache.make_key(SAMPLES_KEY)
+    count = cache.llen(key)
+    if not count:
+        return 0
+
+    raw = cache.lrange(key, 0, count - 1) or []
+    # Drop exactly what we read; samples pushed meanwhile stay for the next run.
+    cache.ltrim(key, count, -1)
+    samples = [json.loads(r) for r in raw]
+    if not samples:
+        return 0
+
+    period_start = datetime.fromtimestamp(min(float(s["ts"]) for s in samples))
+    period_end = datetime.fromtimestamp(max(float(s["ts"]) for s in samples))
+
+    written = 0
+    for row in summarize(samples):
+        frappe.get_doc(
+            {
+                "doctype": SUMMARY_DOCTYPE,
+                "period_start": period_start,
+                "period_end": period_end,
+                **row,
+            }
+        ).insert(ignore_permissions=True)
+        written += 1
+    frappe.db.commit()
+    return written
@@ -0,0 +1,265 @@
+"""Batch PDF rendering for print formats (setup certificates, intake receipts, QA sheets...).
+
+:func:`start_batch` takes a list of ``(doctype, name, print_format)`` items and
+splits them into chunks, each rendered by its own RQ job so a month-end run of
+hundreds of certificates spreads over every ``long`` worker. A document's PDF
+is stored once per *fingerprint* (doctype, name, print format, the document's
+``modified`` and the print format's ``modified``) as a private File attached
+to the document; an unchanged document reuses that File instead of rendering
+again. :func:`ensure_pdf` is the same path for single documents.
+
+When the last chunk finishes, the PDFs are packed into one zip or merged into
+one PDF, stored as a private File owned by the requesting user, and announced
+on the ``repair_portal_print_batch`` realtime event.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+import uuid
+import zipfile
+from collections.abc import Iterable
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+REALTIME_EVENT = "repair_portal_print_batch"
+OUTPUTS = ("zip", "pdf")
+DEFAULT_CHUNK_SIZE = 25
+MAX_ITEMS = 2000
+STATE_TTL = 24 * 60 * 60
+_STATE_PREFIX = "repair_portal:print_batch"
+
+Item = tuple[str, str, str]
+
+
+# --------------------------------------------------------------------------- #
+#  Pure helpers
+# --------------------------------------------------------------------------- #
+
+
+def normalize_items(items: Iterable[Any]) -> list[Item]:
+    """Accept dicts or 3-sequences; drop duplicates while keeping the caller's order."""
+    out: dict[Item, None] = {}
+    for item in items or []:
+        if isinstance(item, dict):
+            key = (item.get("doctype"), item.get("name"), item.get("print_format"))
+        else:
+            key = tuple(item)  # type: ignore[assignment]
+        if len(key) != 3 or not all(isinstance(v, str) and v for v in key):
+            raise ValueError(f"Invalid print item: {item!r}")
+        out[key] = None  # type: ignore[index]
+    return list(out)
+
+
+def chunked(items: list[Item], size: int) -> list[list[Item]]:
+    size = max(1, int(size))
+    return [items[i : i + size] for i in range(0, len(items), size)]
+
+
+def render_fingerprint(
+    doctype: str, name: str, print_format: str, modified: Any, format_modified: Any
+) -> str:
+    payload = "\x1f".join((doctype, name, print_format, str(modified), str(format_modified)))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def pdf_file_name(name: str, label: str, fingerprint: str) -> str:
+    safe = "".join(c if c.isalnum() or c in " -_." else "-" for c in f"{name} - {label}")
+    return f"{safe} ({fingerprint[:10]}).pdf"
+
+
+def zip_pdfs(entries: Iterable[tuple[str, bytes]]) -> bytes:
+    """Zip ``(file_name, content)`` pairs; repeated names get a numeric suffix."""
+    buffer = io.BytesIO()
+    seen: dict[str, int] = {}
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as archive:
+        for file_name, content in entries:
+            count = seen.get(file_name, 0)
+            seen[file_name] = count + 1
+            if count:
+                stem, dot, ext = file_name.rpartition(".")
+                file_name = f"{stem} {count + 1}.{ext}" if dot else f"{file_name} {count + 1}"
+            archive.writestr(file_name, content)
+    return buffer.getvalue()
+
+
+def merge_pdfs(contents: Iterable[bytes]) -> bytes:
+    """Concatenate PDFs page by page with pypdf (a frappe dependency)."""
+    from pypdf import PdfReader, PdfWriter
+
+    writer = PdfWriter()
+    for content in contents:
+        for page in PdfReader(io.BytesIO(content)).pages:
+            writer.add_page(page)
+    buffer = io.BytesIO()
+    writer.write(buffer)
+    return buffer.getvalue()
+
+
+# --------------------------------------------------------------------------- #
+#  Single document
+# --------------------------------------------------------------------------- #
+
+
+def _format_modified(print_format: str, doctype: str) -> Any:
+    row = frappe.db.get_value("Print Format", print_format, ["doc_type", "modified"], as_dict=True)
+    if not row or row.doc_type != doctype:
+        frappe.throw(
+            frappe._("Print Format '{0}' is missing or not linked to {1}.").format(print_format, doctype)
+        )
+    return row.modified
+
+
+def ensure_pdf(doctype: str, name: str, print_format: str, label: str | None = None):
+    """
+    Private File holding the PDF of ``name`` in ``print_format``.
+
+    Rendered (and attached to the document) only when no File exists for the
+    current fingerprint, so repeated calls on an unchanged document reuse it.
+    """
+    from frappe.utils.file_manager import save_file
+    from frappe.utils.pdf import get_pdf
+
+    fingerprint = render_fingerprint(
+        doctype,
+        name,
+        print_format,
+        frappe.db.get_value(doctype, name, "modified"),
+        _format_modified(print_format, doctype),
+    )
+    file_name = pdf_file_name(name, label or print_format, fingerprint)
+    existing = frappe.db.get_value(
+        "File",
+        {"attached_to_doctype": doctype, "attached_to_name": name, "file_name": file_name},
+        "name",
+    )
+    if existing:
+        return frappe.get_doc("File", existing)
+
+    pdf = get_pdf(frappe.get_print(doctype, name, print_format))
+    return save_file(file_name, pdf, doctype, name, is_private=1)
+
+
+# --------------------------------------------------------------------------- #
+#  Batch jobs
+# --------------------------------------------------------------------------- #
+
+
+def _state_key(batch_id: str, suffix: str = "state") -> str:
+    return f"{_STATE_PREFIX}:{batch_id}:{suffix}"
+
+
+def _publish(user: str, payload: dict[str, Any]) -> None:
+    frappe.publish_realtime(REALTIME_EVENT, payload, user=user, after_commit=False)
+
+
+def render_chunk(batch_id: str, index: int, items: list[Item], user: str) -> None:
+    """RQ job: make sure every item of one chunk has its PDF, then maybe assemble."""
+    frappe.set_user(user)
+    cache = frappe.cache()
+    files: list[str | None] = []
+    for doctype, name, print_format in items:
+        try:
+            files.append(ensure_pdf(doctype, name, print_format).name)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(frappe.get_traceback(), f"Print batch: {doctype} {name} failed")
+            files.append(None)
+    cache.set_value(_state_key(batch_id, f"chunk:{index}"), files, expires_in_sec=STATE_TTL)
+
+    done_key = cache.make_key(_state_key(batch_id, "done"))
+    done = cache.incr(done_key)
+    cache.expire(done_key, STATE_TTL)
+    state = cache.get_value(_state_key(batch_id))
+    _publish(
+        user, {"batch_id": batch_id, "status": "running", "chunks_done": done, "chunks": state["chunks"]}
+    )
+    if done == state["chunks"]:  # exactly one chunk job sees the final count
+        assemble(batch_id, user)
+
+
+def assemble(batch_id: str, user: str) -> str:
+    """Pack the chunk results (in request order) into the batch's zip or merged PDF."""
+    from frappe.utils.file_manager import save_file
+
+    cache = frappe.cache()
+    state = cache.get_value(_state_key(batch_id))
+    names: list[str | None] = []
+    for index in range(state["chunks"]):
+        names.extend(cache.get_value(_state_key(batch_id, f"chunk:{index}")) or [])
+    files = [frappe.get_doc("File", n) for n in names if n]
+    failed = len(names) - len(files)
+
+    if state["output"] == "pdf":
+        content, ext = merge_pdfs(f.get_content() for f in files), "pdf"
+    else:
+        content, ext = zip_pdfs((f.file_name, f.get_content()) for f in files), "zip"
+    filedoc = save_file(f"print-batch-{batch_id[:8]}.{ext}", content, None, None, is_private=1)
+    frappe.db.commit()
+
+    state.update(status="done", file_url=filedoc.file_url, failed=failed)
+    cache.set_value(_state_key(batch_id), state, expires_in_sec=STATE_TTL)
+    _publish(user, {"batch_id": batch_id, "status": "done", "file_url": filedoc.file_url, "failed": failed})
+    return filedoc.file_url
+
+
+def start_batch(
+    items: str | list, output: str = "zip", chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> dict[str, Any]:
+    """Queue PDF rendering for ``items``; the result arrives on the ``repair_portal_print_batch`` event."""
+    if output not in OUTPUTS:
+        frappe.throw(f"Unsupported output: {output}")
+    try:
+        items = normalize_items(frappe.parse_json(items) if isinstance(items, str) else items)
+    except ValueError as exc:
+        frappe.throw(str(exc))
+    if not items:
+        frappe.throw("Nothing to print")
+    if len(items) > MAX_ITEMS:
+        frappe.throw(f"A print batch holds at most {MAX_ITEMS} documents")
+    for doctype, name, print_format in items:
+        if not frappe.has_permission(doctype, "print", name):
+            frappe.throw(f"Not permitted to print {doctype} {name}", frappe.PermissionError)
+        _format_modified(print_format, doctype)
+
+    batch_id = uuid.uuid4().hex
+    chunks = chunked(items, chunk_size)
+    user = frappe.session.user
+    frappe.cache().set_value(
+        _state_key(batch_id),
+        {"status": "queued", "chunks": len(chunks), "items": len(items), "output": output, "user": user},
+        expires_in_sec=STATE_TTL,
+    )
+    for index, chunk in enumerate(chunks):
+        frappe.enqueue(
+            "repair_portal.core.print_batch.render_chunk",
+            queue="long",
+            timeout=30 * 60,
+            enqueue_after_commit=True,
+            batch_id=batch_id,
+            index=index,
+            items=chunk,
+            user=user,
+        )
+    return {"batch_id": batch_id, "chunks": len(chunks), "event": REALTIME_EVENT}
+
+
+def batch_status(batch_id: str) -> dict[str, Any]:
+    """Polling fallback for clients that missed the realtime event."""
+    cache = frappe.cache()
+    state = cache.get_value(_state_key(batch_id))
+    if not state or state.get("user") != frappe.session.user:
+        frappe.throw("Unknown print batch", frappe.DoesNotExistError)
+    done = int(cache.get(cache.make_key(_state_key(batch_id, "done"))) or 0)
+    return {**state, "chunks_done": done}
+
+
+if frappe is not None:
+    start_batch = frappe.whitelist()(start_batch)
+    batch_status = frappe.whitelist()(batch_status)
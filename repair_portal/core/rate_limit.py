@@ -0,0 +1,189 @@
+"""Atomic sliding-window rate limiting backed by Redis with a local fallback."""
+
+from __future__ import annotations
+
+import threading
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass, field
+from enum import Enum
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+THROTTLE_COUNTER_KEY = "rl::throttled"
+
+# One round-trip: trim the window, count, admit-or-reject, refresh TTL.
+# Returns {allowed (0/1), hits_in_window}.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+local limit = tonumber(ARGV[3])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+local count = redis.call('ZCARD', key)
+if count >= limit then
+    return {0, count}
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return {1, count + 1}
+"""
+
+
+class Scope(str, Enum):
+    """Identity a policy counts against."""
+
+    USER = "user"  # session user; Guests fall back to request IP
+    IP = "ip"  # client IP regardless of login
+    SHARED = "shared"  # one bucket for every caller
+
+
+@dataclass(frozen=True)
+class RateLimitPolicy:
+    """Limit ``limit`` calls per ``window_seconds`` for one guarded key."""
+
+    key: str
+    limit: int
+    window_seconds: int = 60
+    scope: Scope = Scope.USER
+    # Service accounts that share a single bucket instead of one per user.
+    shared_users: frozenset[str] = field(default_factory=frozenset)
+
+    def __post_init__(self) -> None:
+        if self.limit <= 0:
+            raise ValueError("limit must be positive")
+        if self.window_seconds <= 0:
+            raise ValueError("window_seconds must be positive")
+
+    def identity(self, user: str | None, ip: str | None) -> str:
+        if self.scope is Scope.SHARED:
+            return "*"
+        if self.scope is Scope.IP:
+            return f"ip:{ip or '-'}"
+        if user and user in self.shared_users:
+            return "service"
+        if (not user or user == "Guest") and ip:
+            return f"ip:{ip}"
+        return user or "Guest"
+
+    def bucket_key(self, identity: str) -> str:
+        return f"rl::{self.key}::{identity}"
+
+
+class LocalTokenBucket:
+    """In-process token bucket used when Redis is unreachable.
+
+    Per-worker only, so the effective limit is ``limit × workers``; it exists
+    to keep the guard meaningful during a Redis outage, not to be exact.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def allow(self, bucket_key: str, limit: int, window_seconds: int, now: float | None = None) -> bool:
+        now = time.monotonic() if now is None else now
+        rate = limit / float(window_seconds)
+        with self._lock:
+            tokens, last = self._buckets.get(bucket_key, (float(limit), now))
+            tokens = min(float(limit), tokens + (now - last) * rate)
+            if tokens < 1.0:
+                self._buckets[bucket_key] = (tokens, now)
+                return False
+            self._buckets[bucket_key] = (tokens - 1.0, now)
+            return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+
+
+class RateLimiter:
+    """Evaluate policies against Redis, degrading to :class:`LocalTokenBucket`."""
+
+    def __init__(self) -> None:
+        self.local = LocalTokenBucket()
+        self.throttled: Counter[str] = Counter()
+        self.fallbacks = 0
+        self._script = None
+        self._script_client = None
+
+    def _redis(self):
+        cache = frappe.cache()
+        if self._script is None or self._script_client is not cache:
+            self._script = cache.register_script(_SLIDING_WINDOW_LUA)
+            self._script_client = cache
+        return cache
+
+    def hit(self, policy: RateLimitPolicy, identity: str) -> bool:
+        """Record one call; return True when it is allowed."""
+        bucket = policy.bucket_key(identity)
+        try:
+            cache = self._redis()
+            now_ms = int(time.time() * 1000)
+            allowed, _count = self._script(
+                keys=[cache.make_key(bucket)],
+                args=[now_ms, policy.window_seconds * 1000, policy.limit, f"{now_ms}-{uuid.uuid4().hex[:8]}"],
+            )
+            allowed = bool(int(allowed))
+        except Exception:
+            self.fallbacks += 1
+            allowed = self.local.allow(bucket, policy.limit, policy.window_seconds)
+
+        if not allowed:
+            self._record_throttle(policy.key)
+        return allowed
+
+    # The counter hash holds plain ints under the made (site-prefixed) key, so both sides go
+    # through raw pipelines: RedisWrapper.hgetall would re-prefix the name and unpickle values.
+    def _record_throttle(self, key: str) -> None:
+        self.throttled[key] += 1
+        try:
+            cache = frappe.cache()
+            cache.pipeline().hincrby(cache.make_key(THROTTLE_COUNTER_KEY), key, 1).execute()
+        except Exception:
+            pass
+
+    def stats(self) -> dict[str, object]:
+        shared: dict[str, int] = {}
+        try:
+            cache = frappe.cache()
+            (raw,) = cache.pipeline().hgetall(cache.make_key(THROTTLE_COUNTER_KEY)).execute()
+            shared = {
+                (k.decode() if isinstance(k, bytes) else str(k)): int(v) for k, v in (raw or {}).items()
+            }
+        except Exception:
+            pass
+        return {"local": dict(self.throttled), "site": shared, "fallbacks": self.fallbacks}
+
+
+_LIMITER = RateLimiter()
+
+
+def get_limiter() -> RateLimiter:
+    return _LIMITER
+
+
+def check(policy: RateLimitPolicy) -> None:
+    """Count one call against ``policy`` for the current caller; throw when over the limit."""
+    if frappe is None:
+        return
+    user = getattr(getattr(frappe, "session", None), "user", None)
+    ip = getattr(frappe.local, "request_ip", None)
+    if not _LIMITER.hit(policy, policy.identity(user, ip)):
+        frappe.throw("Too many requests. Slow down.", frappe.TooManyRequestsError)
+
+
+def throttle_stats() -> dict[str, object]:
+    """Throttled-call counters: this worker, the whole site, and Redis fallbacks."""
+    if frappe is not None:
+        frappe.only_for("System Manager")
+    return _LIMITER.stats()
+
+
+if frappe is not None:
+    throttle_stats = frappe.whitelist()(throttle_stats)
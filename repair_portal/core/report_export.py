@@ -0,0 +1,276 @@
+"""Streaming CSV/XLSX export for large Script Reports.
+
+A report opts in by defining, next to ``execute``::
+
+    def stream(filters) -> tuple[list[dict], Iterable[dict]]:
+        ...  # columns, plus a generator of row dicts
+
+:func:`start_export` queues :func:`run_export`, which pulls rows from that
+generator and writes them straight into a private File, so memory stays flat
+regardless of the date range. Reports without ``stream`` fall back to
+``execute`` (whole result in memory, still written off the request).
+
+Rows are usually produced with :func:`iter_chunks`, which walks a doctype by
+primary key (``name > last``) in fixed-size pages. Keyset pages rather than
+one unbuffered cursor let a report's row transform run its own lookups per
+chunk (e.g. resolving customer names) on the same DB connection. Reports whose
+export must keep their own sort use :func:`iter_ordered_chunks`, which
+snapshots the ordered names once and fetches full rows page by page.
+
+Progress and the final download link are pushed to the requesting user on
+the ``repair_portal_report_export`` realtime event.
+"""
+
+from __future__ import annotations
+
+import csv
+import os
+import uuid
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+REALTIME_EVENT = "repair_portal_report_export"
+FORMATS = ("csv", "xlsx")
+DEFAULT_CHUNK_SIZE = 2000
+_PROGRESS_EVERY_ROWS = 5000
+
+
+# --------------------------------------------------------------------------- #
+#  Row sources
+# --------------------------------------------------------------------------- #
+
+
+def _filter_list(filters: dict[str, Any] | list | None) -> list:
+    if not isinstance(filters, dict):
+        return list(filters or [])
+    out = []
+    for field, value in filters.items():
+        if isinstance(value, (list, tuple)) and len(value) == 2 and isinstance(value[0], str):
+            out.append([field, value[0], value[1]])
+        else:
+            out.append([field, "=", value])
+    return out
+
+
+def iter_chunks(
+    doctype: str,
+    filters: dict[str, Any] | list | None,
+    fields: list[str],
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield pages of ``frappe.get_all`` rows ordered by ``name`` (keyset pagination)."""
+    fields = list(fields) if "name" in fields else ["name", *fields]
+    base = _filter_list(filters)
+    last: str | None = None
+    while True:
+        page_filters = [*base, ["name", ">", last]] if last is not None else base
+        rows = frappe.get_all(
+            doctype,
+            filters=page_filters,
+            fields=fields,
+            order_by="name asc",
+            limit_page_length=chunk_size,
+        )
+        if not rows:
+            return
+        yield rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]["name"]
+
+
+def iter_ordered_chunks(
+    doctype: str,
+    filters: dict[str, Any] | list | None,
+    fields: list[str],
+    order_by: str,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+) -> Iterator[list[dict[str, Any]]]:
+    """Yield pages of rows in ``order_by`` order (``name`` breaks ties, so the order is total).
+
+    Only the names are read up front; each page then loads its full rows, so
+    memory stays bounded while the rows match the report's on-screen order.
+    """
+    fields = list(fields) if "name" in fields else ["name", *fields]
+    names = frappe.get_all(
+        doctype, filters=_filter_list(filters), order_by=stable_order(order_by), pluck="name"
+    )
+    for i in range(0, len(names), chunk_size):
+        page = names[i : i + chunk_size]
+        rows = {r["name"]: r for r in frappe.get_all(doctype, filters={"name": ["in", page]}, fields=fields)}
+        # Rows deleted since the snapshot are skipped
+        yield [rows[n] for n in page if n in rows]
+
+
+def stable_order(order_by: str) -> str:
+    """Append ``name asc`` as the final sort key unless ``name`` already orders the rows."""
+    keys = [k.strip().split()[0].strip("`") for k in order_by.split(",") if k.strip()]
+    return order_by if "name" in keys else f"{order_by}, name asc"
+
+
+def stream_rows(
+    chunks: Iterable[list[dict[str, Any]]],
+    transform: Callable[[list[dict[str, Any]]], Iterable[dict[str, Any]]] | None = None,
+) -> Iterator[dict[str, Any]]:
+    """Flatten chunks, passing each through ``transform`` (a per-chunk generator) when given."""
+    for chunk in chunks:
+        yield from (transform(chunk) if transform else chunk)
+
+
+# --------------------------------------------------------------------------- #
+#  Writers (plain files; no frappe needed)
+# --------------------------------------------------------------------------- #
+
+
+def _header(columns: list[dict[str, Any]]) -> tuple[list[str], list[str]]:
+    keys = [c.get("fieldname") for c in columns]
+    labels = [str(c.get("label") or c.get("fieldname")) for c in columns]
+    return keys, labels
+
+
+def _cell(value: Any) -> Any:
+    if value is None:
+        return ""
+    return value
+
+
+def write_csv(
+    path: str,
+    columns: list[dict[str, Any]],
+    rows: Iterable[dict[str, Any]],
+    on_progress: Callable[[int], None] | None = None,
+) -> int:
+    """Write rows to ``path`` as they arrive; returns the row count."""
+    keys, labels = _header(columns)
+    count = 0
+    with open(path, "w", newline="", encoding="utf-8") as fh:
+        writer = csv.writer(fh)
+        writer.writerow(labels)
+        for row in rows:
+            writer.writerow([_cell(row.get(k)) for k in keys])
+            count += 1
+            if on_progress and count % _PROGRESS_EVERY_ROWS == 0:
+                on_progress(count)
+    return count
+
+
+def write_xlsx(
+    path: str,
+    columns: list[dict[str, Any]],
+    rows: Iterable[dict[str, Any]],
+    on_progress: Callable[[int], None] | None = None,
+) -> int:
+    """Write rows with openpyxl's write-only workbook (constant memory)."""
+    from openpyxl import Workbook
+
+    keys, labels = _header(columns)
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Report")
+    ws.append(labels)
+    count = 0
+    for row in rows:
+        ws.append([row.get(k) for k in keys])
+        count += 1
+        if on_progress and count % _PROGRESS_EVERY_ROWS == 0:
+            on_progress(count)
+    wb.save(path)
+    return count
+
+
+_WRITERS = {"csv": write_csv, "xlsx": write_xlsx}
+
+
+# --------------------------------------------------------------------------- #
+#  Background job
+# --------------------------------------------------------------------------- #
+
+
+def _report_module(report_name: str):
+    from frappe.modules.utils import get_report_module_dotted_path
+
+    report = frappe.get_doc("Report", report_name)
+    if report.report_type != "Script Report" or report.is_standard != "Yes":
+        frappe.throw(f"{report_name} is not a standard Script Report")
+    return frappe.get_module(get_report_module_dotted_path(report.module, report.name))
+
+
+def _columns_and_rows(report_name: str, filters: dict[str, Any]):
+    module = _report_module(report_name)
+    stream = getattr(module, "stream", None)
+    if stream is not None:
+        return stream(filters)
+    columns, data = module.execute(filters)[:2]
+    return columns, iter(data)
+
+
+def _publish(user: str, payload: dict[str, Any]) -> None:
+    frappe.publish_realtime(REALTIME_EVENT, payload, user=user, after_commit=False)
+
+
+def run_export(report_name: str, filters: dict[str, Any], file_format: str, export_id: str, user: str) -> str:
+    """RQ job: stream the report into a private File and announce the link."""
+    frappe.set_user(user)
+    columns, rows = _columns_and_rows(report_name, filters)
+
+    file_name = f"{frappe.scrub(report_name)}-{export_id[:8]}.{file_format}"
+    path = frappe.get_site_path("private", "files", file_name)
+    _publish(user, {"export_id": export_id, "status": "running", "rows": 0})
+    try:
+        count = _WRITERS[file_format](
+            path,
+            columns,
+            rows,
+            on_progress=lambda n: _publish(user, {"export_id": export_id, "status": "running", "rows": n}),
+        )
+        filedoc = frappe.get_doc(
+            {
+                "doctype": "File",
+                "file_name": file_name,
+                "file_url": f"/private/files/{file_name}",
+                "is_private": 1,
+                "file_size": os.path.getsize(path),
+            }
+        ).insert(ignore_permissions=True)
+        frappe.db.commit()
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        _publish(user, {"export_id": export_id, "status": "failed"})
+        raise
+
+    _publish(
+        user,
+        {"export_id": export_id, "status": "done", "rows": count, "file_url": filedoc.file_url},
+    )
+    return filedoc.file_url
+
+
+def start_export(report_name: str, filters: str | dict | None = None, file_format: str = "csv") -> dict[str, str]:
+    """Queue a streaming export; progress arrives on the ``repair_portal_report_export`` event."""
+    if file_format not in FORMATS:
+        frappe.throw(f"Unsupported export format: {file_format}")
+    if not frappe.get_doc("Report", report_name).is_permitted():
+        frappe.throw("Not permitted", frappe.PermissionError)
+    filters = frappe.parse_json(filters) if filters else {}
+
+    export_id = uuid.uuid4().hex
+    frappe.enqueue(
+        "repair_portal.core.report_export.run_export",
+        queue="long",
+        timeout=60 * 60,
+        report_name=report_name,
+        filters=filters,
+        file_format=file_format,
+        export_id=export_id,
+        user=frappe.session.user,
+    )
+    return {"export_id": export_id, "event": REALTIME_EVENT}
+
+
+if frappe is not None:
+    start_export = frappe.whitelist()(start_export)
@@ -2,11 +2,12 @@
 
 from __future__ import annotations
 
-import time
 from collections.abc import Callable, Iterable
 from functools import wraps
 from typing import Any
 
+from . import rate_limit
+from .rate_limit import RateLimitPolicy, Scope
 from .registry import Role
 
 try:
@@ -47,13 +48,28 @@ def require_roles(*allowed_roles: Role | str, any_one: bool = True) -> Callable[
     return decorator
 
 
-def rate_limited(key: str, limit: int, window_seconds: int = 60) -> Callable[[F], F]:
-    """Rate limit invocations per user per *window_seconds* interval."""
-
-    if limit <= 0:
-        raise ValueError("limit must be positive")
-    if window_seconds <= 0:
-        raise ValueError("window_seconds must be positive")
+def rate_limited(
+    key: str,
+    limit: int,
+    window_seconds: int = 60,
+    *,
+    scope: Scope | str = Scope.USER,
+    shared_users: Iterable[str] = (),
+) -> Callable[[F], F]:
+    """Rate limit invocations per caller over a sliding *window_seconds* interval.
+
+    ``scope`` selects the identity counted: the session user (Guests by IP),
+    the client IP, or one shared bucket. Users in ``shared_users`` (service
+    accounts) draw from a single bucket for the key. See :mod:`.rate_limit`.
+    """
+
+    policy = RateLimitPolicy(
+        key=key,
+        limit=limit,
+        window_seconds=window_seconds,
+        scope=Scope(scope),
+        shared_users=frozenset(shared_users),
+    )
 
     def decorator(func: F) -> F:
         @wraps(func)
@@ -61,20 +77,10 @@ def rate_limited(key: str, limit: int, window_seconds: int = 60) -> Callable[[F]
             if frappe is None:
                 return func(*args, **kwargs)
 
-            user = frappe.session.user
-            if user == "Guest" and hasattr(frappe.local, "request_ip"):
-                user = frappe.local.request_ip
-            cache = frappe.cache()
-            bucket = int(time.time() // window_seconds)
-            cache_key = f"rl::{key}::{user}::{bucket}"
-            current = cache.get_value(cache_key) or 0
-            if not isinstance(current, int):
-                current = int(current)
-            if current >= limit:
-                frappe.throw("Too many requests. Slow down.", frappe.TooManyRequestsError)
-            cache.set_value(cache_key, current + 1, expires_in_sec=window_seconds)
+            rate_limit.check(policy)
             return func(*args, **kwargs)
 
+        wrapper.rate_limit_policy = policy  # type: ignore[attr-defined]
         return wrapper  # type: ignore[return-value]
 
     return decorator
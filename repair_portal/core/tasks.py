@@ -23,28 +23,46 @@ def _iter_open_orders() -> list[str]:
 
 
 def sla_breach_scan() -> None:
-    """Compute SLA ticks for all open orders and escalate breaches."""
+    """Compute SLA ticks for all open orders and notify customers of new breaches (once per order)."""
 
     if frappe is None:
         return
+    from repair_portal.repair.services import escalation
+
     now = datetime.now(timezone.utc)
+    payloads = []
     for order in _iter_open_orders():
         tick = sla_service.compute_tick(order)
         status = tick.status.lower()
-        if status == "breached":
-            frappe.enqueue(
-                notify_service.send_customer_message,
-                queue=QueueName.REPAIR_NOTIFY.value,
-                payload={
+        if status == "breached" and escalation.claim(order, "customer:breached", subject="Repair SLA Breached"):
+            payloads.append(
+                {
                     "repair_order": order,
                     "recipient": frappe.db.get_value("Repair Order", order, "customer_email"),
                     "subject": "Repair SLA Breached",
                     "body": f"Your repair order {order} exceeded the SLA.",
                     "sent_at": now,
                     "via": "email",
-                },
+                }
             )
         frappe.db.set_value("Repair Order", order, {"sla_status": tick.status, "sla_last_transition": now})
+    if payloads:
+        frappe.enqueue(
+            "repair_portal.core.tasks.send_customer_messages",
+            queue=QueueName.REPAIR_NOTIFY.value,
+            payloads=payloads,
+            enqueue_after_commit=True,
+        )
+
+
+def send_customer_messages(payloads: list[dict]) -> None:
+    """Background batch for sla_breach_scan: one job per scan instead of one per order."""
+
+    for payload in payloads:
+        try:
+            notify_service.send_customer_message(payload)
+        except Exception:
+            frappe.log_error(frappe.get_traceback(), "sla_breach_scan customer message")
 
 
 def finalize_billing_packets() -> None:
@@ -1,8 +1,8 @@
 # Path: repair_portal/customer/doctype/consent_form/consent_form.py
-# Date: 2025-09-30
-# Version: 3.0.0
+# Date: 2026-10-19
+# Version: 3.1.0
 # Description: Consent Form controller - Jinja rendering, auto-fill, workflow integration, audit logging
-# Dependencies: frappe, frappe.model.document, frappe.utils
+# Dependencies: frappe, frappe.model.document, frappe.utils, repair_portal.customer.services.consent_render
 
 from __future__ import annotations
 
@@ -13,15 +13,12 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import now_datetime, nowdate
 
+from repair_portal.customer.services import consent_render
+
 
 def _get_settings() -> Document | None:
-    """Get Consent Settings singleton safely."""
-    if frappe.db.exists("DocType", "Consent Settings"):
-        try:
-            return frappe.get_single("Consent Settings")
-        except Exception:
-            return None
-    return None
+    """Get Consent Settings singleton safely (document cache)."""
+    return consent_render.get_settings()
 
 
 def _log_consent_action(consent_form: Document, action: str, details: str = "") -> None:
@@ -45,7 +42,7 @@ class ConsentForm(Document):
     def before_insert(self):
         """Initialize form before creation."""
         self._ensure_required_fields()
-        self._apply_auto_values()
+        self._apply_auto_values(self._resolve_auto_values())
         _log_consent_action(self, "Created", f"Created from template: {self.consent_template}")
 
     def validate(self):
@@ -57,11 +54,14 @@ class ConsentForm(Document):
         # Keep child table in sync with template
         self._ensure_required_fields()
 
+        # Resolve settings mappings once; shared by auto-fill and rendering
+        auto_values = self._resolve_auto_values()
+
         # Apply auto-fill to any blank values
-        self._apply_auto_values()
+        self._apply_auto_values(auto_values)
 
         # Render into HTML every time (Jinja)
-        self.rendered_content = self._render_content()  # type: ignore
+        self.rendered_content = self._render_content(auto_values)  # type: ignore
 
         # Maintain human-readable status
         self._sync_status()
@@ -159,7 +159,12 @@ class ConsentForm(Document):
     def _get_template(self) -> Document:
         if not self.consent_template:
             frappe.throw("Consent Template is required.")
-        return frappe.get_doc("Consent Template", self.consent_template)  # type: ignore
+        # Read-only use: the document cache is cleared whenever the template is saved
+        return frappe.get_cached_doc("Consent Template", self.consent_template)  # type: ignore
+
+    def _resolve_auto_values(self) -> dict[str, Any]:
+        """Settings mapping values by variable_name (one query per linked source document)."""
+        return consent_render.auto_fill_values(self)
 
     def _ensure_required_fields(self) -> None:
         """Ensure each template required field exists in child table."""
@@ -178,7 +183,7 @@ class ConsentForm(Document):
             # child append marks the doc dirty automatically
             ...
 
-    def _apply_auto_values(self) -> None:
+    def _apply_auto_values(self, var_values: dict[str, Any] | None = None) -> None:
         """
         Fill blank child values using:
         1) Template defaults
@@ -201,26 +206,8 @@ class ConsentForm(Document):
                 t_defaults[lbl] = req.default_value or ""
 
         # 2) Settings-driven fetches (by variable_name)
-        settings = _get_settings()
-        var_values: dict[str, Any] = {}
-        if settings and getattr(settings, "enable_auto_fill", 0):
-            for m in settings.mappings or []:
-                if not getattr(m, "enabled", 0):
-                    continue
-                var = (m.variable_name or "").strip()
-                if not var:
-                    continue
-                fetched = None
-                # Prefer source_doctype via link field, if configured
-                if m.source_doctype and m.form_link_field and m.source_fieldname:
-                    link_name = getattr(self, m.form_link_field, None)
-                    if link_name:
-                        fetched = frappe.db.get_value(m.source_doctype, link_name, m.source_fieldname)
-                # Fallback to mapping default_value
-                if fetched is None and m.default_value:
-                    fetched = m.default_value
-                if fetched is not None:
-                    var_values[var] = fetched
+        if var_values is None:
+            var_values = self._resolve_auto_values()
 
         # Apply to child table rows if blank
         for row in self.consent_field_values or []:  # type: ignore
@@ -235,7 +222,7 @@ class ConsentForm(Document):
             if (row.field_label or "") in t_defaults and t_defaults[row.field_label]:
                 row.field_value = t_defaults[row.field_label]
 
-    def _jinja_context(self) -> dict[str, Any]:
+    def _jinja_context(self, auto_values: dict[str, Any] | None = None) -> dict[str, Any]:
         """
         Build Jinja context:
         - date (YYYY-MM-DD)
@@ -255,36 +242,19 @@ class ConsentForm(Document):
                 ctx[key] = row.field_value or ""
 
         # Settings variables (variable_name) override or extend
-        settings = _get_settings()
-        if settings and getattr(settings, "enable_auto_fill", 0):
-            for m in settings.mappings or []:
-                if not getattr(m, "enabled", 0):
-                    continue
-                var = (m.variable_name or "").strip()
-                if not var:
-                    continue
-                # Resolve value in the same fashion as _apply_auto_values
-                value = None
-                if m.source_doctype and m.form_link_field and m.source_fieldname:
-                    link_name = getattr(self, m.form_link_field, None)
-                    if link_name:
-                        value = frappe.db.get_value(m.source_doctype, link_name, m.source_fieldname)
-                if value is None and m.default_value:
-                    value = m.default_value
-                if value is not None:
-                    ctx[var] = value
+        if auto_values is None:
+            auto_values = self._resolve_auto_values()
+        ctx.update(auto_values)
 
         return ctx
 
-    def _render_content(self) -> str:
+    def _render_content(self, auto_values: dict[str, Any] | None = None) -> str:
         """Render template content using Frappe Jinja environment."""
         tmpl = self._get_template()
-        raw = tmpl.content or ""  # type: ignore
-        # Use Frappe's pre-configured Jinja environment (respects filters & sandbox)
-        jenv = frappe.get_jenv()
+        # Code compiled once per template content, bound to this request's Jinja environment
         try:
-            template = jenv.from_string(raw)
-            html = template.render(self._jinja_context())
+            template = consent_render.compiled_template(tmpl)
+            html = template.render(self._jinja_context(auto_values))
         except Exception as e:
             frappe.throw(f"Template rendering failed: {frappe.as_unicode(e)}")
         return html
@@ -1,6 +1,6 @@
 # Path: repair_portal/customer/doctype/consent_template/consent_template.py
-# Date: 2025-01-05
-# Version: 3.0.0
+# Date: 2026-10-19
+# Version: 3.1.0
 # Description: Consent Template controller with Jinja validation, field management, and automation
 # Dependencies: frappe, jinja2, frappe.utils
 
@@ -14,6 +14,8 @@ from frappe.model.document import Document
 from frappe.utils import now_datetime, nowdate
 from jinja2 import Environment, TemplateSyntaxError, select_autoescape
 
+from repair_portal.customer.services import consent_fanout
+
 
 def _create_validation_environment() -> Environment:
     """Return a Jinja environment configured with HTML autoescaping."""
@@ -75,8 +77,8 @@ class ConsentTemplate(Document):
 
     def on_update(self):
         """Post-update operations."""
-        # Update related consent forms if template structure changed
-        self._update_related_forms()
+        # Refresh draft consent forms in the background if the required fields changed
+        consent_fanout.schedule_refresh(self)
 
     def before_cancel(self):
         """Prevent cancellation if template is in use."""
@@ -317,27 +319,6 @@ class ConsentTemplate(Document):
 
         return context
 
-    def _update_related_forms(self) -> None:
-        """Update related consent forms when template changes."""
-        if not frappe.db.exists("DocType", "Consent Form"):
-            return
-
-        # Find forms using this template
-        forms = frappe.db.get_all(
-            "Consent Form",
-            {"consent_template": self.name, "docstatus": 0},  # Only update draft forms
-            ["name"],
-        )
-
-        for form in forms:
-            try:
-                form_doc = frappe.get_doc("Consent Form", form.name)
-                form_doc._ensure_required_fields()  # Sync new required fields
-                form_doc.save(ignore_permissions=True)
-            except Exception:
-                # Don't fail the template save if form update fails
-                frappe.log_error(f"Failed to update consent form: {form.name}")
-
 
 # Public API ---------------------------------------------------------------
 
@@ -7,10 +7,24 @@ from typing import List, Sequence
 import frappe
 from frappe import _
 
+from repair_portal.repair_portal.permissions import principal as permission_principal
 
-def customers_for_user(user: str) -> Sequence[str]:
-    """Return the customer records linked to the given user."""
+# Redis hash: user → JSON list of linked customers. Request-local copy lives on
+# ``frappe.local`` so repeated checks inside one request never leave the process.
+_CACHE_KEY = "repair_portal:customers_for_user"
+_LOCAL_ATTR = "repair_portal_customers_for_user"
+_CACHE_TTL_SECONDS = 6 * 60 * 60
+
+
+def _local_map() -> dict[str, frozenset[str]]:
+    cached = getattr(frappe.local, _LOCAL_ATTR, None)
+    if cached is None:
+        cached = {}
+        setattr(frappe.local, _LOCAL_ATTR, cached)
+    return cached
 
+
+def _query_customers_for_user(user: str) -> List[str]:
     links: List[str] = []
     contacts = frappe.get_all("Contact", filters={"user": user}, pluck="name")
     if contacts:
@@ -28,7 +42,81 @@ def customers_for_user(user: str) -> Sequence[str]:
     direct_customer = frappe.db.get_value("Customer", {"portal_user": user}, "name")
     if direct_customer:
         links.append(direct_customer)
-    return list({link for link in links if link})
+    return sorted({link for link in links if link})
+
+
+def customer_set_for_user(user: str) -> frozenset[str]:
+    """Return the customers linked to ``user`` as a frozenset (request-local + Redis cached)."""
+
+    if not user or user == "Guest":
+        return frozenset()
+
+    local = _local_map()
+    if user in local:
+        return local[user]
+
+    cache = frappe.cache()
+    cached = cache.hget(_CACHE_KEY, user)
+    if cached is None:
+        cached = _query_customers_for_user(user)
+        cache.hset(_CACHE_KEY, user, cached)
+        cache.expire(cache.make_key(_CACHE_KEY), _CACHE_TTL_SECONDS)
+
+    customers = frozenset(cached)
+    local[user] = customers
+    return customers
+
+
+def customers_for_user(user: str) -> Sequence[str]:
+    """Return the customer records linked to the given user."""
+
+    return sorted(customer_set_for_user(user))
+
+
+def user_linked_to_customer(user: str, customer: str | None) -> bool:
+    """True when ``customer`` is one of the customers linked to ``user``."""
+
+    return bool(customer) and customer in customer_set_for_user(user)
+
+
+def invalidate_customers_for_user(*users: str | None) -> None:
+    """Drop cached mappings for specific users (all users when none are given)."""
+
+    # Principals built earlier in this request captured the old customer set.
+    permission_principal.reset()
+    cache = frappe.cache()
+    local = _local_map()
+    targets = [u for u in users if u]
+    if not users:
+        cache.delete_key(_CACHE_KEY)
+        local.clear()
+        return
+    for user in targets:
+        cache.hdel(_CACHE_KEY, user)
+        local.pop(user, None)
+
+
+def _before_value(doc, fieldname: str):
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    return before.get(fieldname) if before else None
+
+
+def on_contact_change(doc, method: str | None = None) -> None:
+    """Doc event: Contact (and its Dynamic Link rows) changed."""
+
+    invalidate_customers_for_user(doc.get("user"), _before_value(doc, "user"))
+
+
+def on_customer_change(doc, method: str | None = None, *args, **kwargs) -> None:
+    """Doc event: Customer changed; renames/deletes can affect any linked user.
+
+    ``after_rename`` handlers also receive ``(old, new, merge)``; they are accepted and ignored.
+    """
+
+    if method in {"on_trash", "after_rename"}:
+        invalidate_customers_for_user()
+        return
+    invalidate_customers_for_user(doc.get("portal_user"), _before_value(doc, "portal_user"))
 
 
 def ensure_customer_access(customer: str | None, user: str) -> None:
@@ -36,6 +124,5 @@ def ensure_customer_access(customer: str | None, user: str) -> None:
 
     if not customer:
         frappe.throw(_("Missing customer association"), frappe.PermissionError)
-    allowed = customers_for_user(user)
-    if customer not in allowed:
+    if not user_linked_to_customer(user, customer):
         frappe.throw(_("Not permitted"), frappe.PermissionError)
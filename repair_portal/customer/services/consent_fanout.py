@@ -0,0 +1,274 @@
+# Path: repair_portal/customer/services/consent_fanout.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Background refresh of draft Consent Forms after a Consent Template's required fields
+#              change. Forms are processed in keyset chunks; missing field rows are bulk-inserted and
+#              blank rows for removed fields bulk-deleted, progress is published over realtime and the
+#              persisted cursor lets an interrupted run resume (hourly sweep).
+# Dependencies: frappe (optional for the pure planner)
+
+from __future__ import annotations
+
+import json
+from collections.abc import Iterable
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+FORM_DOCTYPE = "Consent Form"
+ROW_DOCTYPE = "Consent Field Value"
+ROW_PARENTFIELD = "consent_field_values"
+STATE_KEY_PREFIX = "consent_fanout::"
+REALTIME_EVENT = "consent_template_fanout"
+DEFAULT_CHUNK_SIZE = 500
+_ROW_FIELDS = [
+    "name",
+    "parent",
+    "parenttype",
+    "parentfield",
+    "idx",
+    "docstatus",
+    "field_label",
+    "field_type",
+    "field_value",
+    "owner",
+    "modified_by",
+    "creation",
+    "modified",
+]
+
+
+# ---------------------------------------------------------------------------
+# Pure planning
+# ---------------------------------------------------------------------------
+def scrub_label(label: str | None) -> str:
+    """Same key as frappe.scrub, which the Consent Form controller matches rows by."""
+    return (label or "").replace(" ", "_").replace("-", "_").lower()
+
+
+def fields_signature(required_fields: Iterable[Any]) -> list[tuple[str, str, str]]:
+    return [
+        (r.get("field_label") or "", r.get("field_type") or "", r.get("default_value") or "")
+        for r in required_fields or []
+    ]
+
+
+def plan_form_changes(
+    required_fields: Iterable[Any], rows_by_form: dict[str, list[dict[str, Any]]]
+) -> tuple[list[dict[str, Any]], list[str]]:
+    """
+    Child-row changes that bring each form in line with the template.
+
+    Missing required fields are appended after the form's last row with the
+    template default (as ConsentForm._ensure_required_fields does). Rows whose
+    label is no longer on the template are deleted only when they hold no value.
+    Returns ``(inserts, delete_names)``.
+    """
+    template = [r for r in required_fields or [] if scrub_label(r.get("field_label"))]
+    wanted = {scrub_label(r.get("field_label")) for r in template}
+    inserts: list[dict[str, Any]] = []
+    deletes: list[str] = []
+    for form, rows in rows_by_form.items():
+        existing = {scrub_label(r.get("field_label")) for r in rows}
+        idx = max((r.get("idx") or 0 for r in rows), default=0)
+        for req in template:
+            key = scrub_label(req.get("field_label"))
+            if key in existing:
+                continue
+            existing.add(key)
+            idx += 1
+            inserts.append(
+                {
+                    "parent": form,
+                    "idx": idx,
+                    "field_label": req.get("field_label"),
+                    "field_type": req.get("field_type"),
+                    "field_value": req.get("default_value") or "",
+                }
+            )
+        deletes.extend(
+            r["name"]
+            for r in rows
+            if scrub_label(r.get("field_label")) not in wanted and not r.get("field_value")
+        )
+    return inserts, deletes
+
+
+# ---------------------------------------------------------------------------
+# Persisted run state (cursor + generation) in DefaultValue
+# ---------------------------------------------------------------------------
+def _state_key(template: str) -> str:
+    return f"{STATE_KEY_PREFIX}{template}"
+
+
+def _load_state(template: str) -> dict[str, Any] | None:
+    raw = frappe.db.get_default(_state_key(template))
+    return json.loads(raw) if raw else None
+
+
+def _save_state(template: str, state: dict[str, Any]) -> None:
+    frappe.db.set_default(_state_key(template), json.dumps(state))
+
+
+def _clear_state(template: str) -> None:
+    frappe.defaults.clear_default(_state_key(template))
+
+
+def _job_id(template: str) -> str:
+    return f"repair_portal::consent_fanout::{template}"
+
+
+def _enqueue(template: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> None:
+    frappe.enqueue(
+        "repair_portal.customer.services.consent_fanout.refresh_forms",
+        queue="long",
+        timeout=60 * 60,
+        job_id=_job_id(template),
+        deduplicate=True,
+        enqueue_after_commit=True,
+        template=template,
+        chunk_size=chunk_size,
+    )
+
+
+def schedule_refresh(template_doc) -> bool:
+    """Called from Consent Template.on_update: queue a refresh when required fields changed."""
+    before = template_doc.get_doc_before_save()
+    if before is None or fields_signature(before.required_fields) == fields_signature(
+        template_doc.required_fields
+    ):
+        return False
+    if not frappe.db.exists(FORM_DOCTYPE, {"consent_template": template_doc.name, "docstatus": 0}):
+        return False
+    # A new generation restarts a run that is already in progress for an older version.
+    _save_state(
+        template_doc.name,
+        {"generation": str(template_doc.modified), "cursor": None, "user": frappe.session.user},
+    )
+    _enqueue(template_doc.name)
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Job
+# ---------------------------------------------------------------------------
+def _apply_chunk(template_doc, forms: list[str]) -> tuple[int, int]:
+    rows = frappe.get_all(
+        ROW_DOCTYPE,
+        filters={"parenttype": FORM_DOCTYPE, "parentfield": ROW_PARENTFIELD, "parent": ["in", forms]},
+        fields=["name", "parent", "idx", "field_label", "field_value"],
+    )
+    rows_by_form: dict[str, list[dict[str, Any]]] = {form: [] for form in forms}
+    for row in rows:
+        rows_by_form[row.parent].append(row)
+
+    inserts, deletes = plan_form_changes(template_doc.required_fields, rows_by_form)
+    if inserts:
+        now, user = frappe.utils.now(), frappe.session.user
+        frappe.db.bulk_insert(
+            ROW_DOCTYPE,
+            fields=_ROW_FIELDS,
+            values=[
+                (
+                    frappe.generate_hash(length=10),
+                    r["parent"],
+                    FORM_DOCTYPE,
+                    ROW_PARENTFIELD,
+                    r["idx"],
+                    0,
+                    r["field_label"],
+                    r["field_type"],
+                    r["field_value"],
+                    user,
+                    user,
+                    now,
+                    now,
+                )
+                for r in inserts
+            ],
+        )
+    if deletes:
+        frappe.db.delete(ROW_DOCTYPE, {"name": ["in", deletes]})
+    return len(inserts), len(deletes)
+
+
+def _publish(state: dict[str, Any], payload: dict[str, Any]) -> None:
+    frappe.publish_realtime(REALTIME_EVENT, payload, user=state.get("user"), after_commit=True)
+
+
+def refresh_forms(template: str, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict[str, Any]:
+    """
+    Background job: add missing field rows to every draft form of ``template``.
+
+    Each chunk is committed together with the cursor, so a rerun (see
+    :func:`resume_pending`) continues after the last finished chunk. The
+    state is re-read per chunk; if the template changed again meanwhile the
+    run restarts from the first form with the new field list.
+    """
+    chunk_size = int(chunk_size)
+    state = _load_state(template)
+    if state is None:
+        return {"template": template, "skipped": True}
+
+    filters: dict[str, Any] = {"consent_template": template, "docstatus": 0}
+    total = frappe.db.count(FORM_DOCTYPE, filters)
+    generation = state["generation"]
+    template_doc = frappe.get_doc("Consent Template", template)
+    processed = inserted = deleted = 0
+    while True:
+        state = _load_state(template) or state
+        if state["generation"] != generation:
+            generation = state["generation"]
+            template_doc = frappe.get_doc("Consent Template", template)
+            processed = 0
+        cursor = state.get("cursor")
+        page_filters = {**filters, "name": [">", cursor]} if cursor else filters
+        forms = frappe.get_all(
+            FORM_DOCTYPE,
+            filters=page_filters,
+            order_by="name asc",
+            limit_page_length=chunk_size,
+            pluck="name",
+        )
+        if not forms:
+            break
+        added, removed = _apply_chunk(template_doc, forms)
+        inserted += added
+        deleted += removed
+        processed += len(forms)
+        state["cursor"] = forms[-1]
+        latest = _load_state(template)
+        if latest and latest["generation"] != generation:
+            # Template edited mid-chunk: keep the newer state so the next loop restarts
+            frappe.db.commit()
+            continue
+        _save_state(template, state)
+        frappe.db.commit()
+        _publish(state, {"template": template, "processed": processed, "total": total, "done": False})
+        if len(forms) < chunk_size:
+            break
+
+    latest = _load_state(template)
+    if latest and latest["generation"] != generation:
+        # Edited after the last chunk: run again for the new field list
+        return refresh_forms(template, chunk_size)
+    _clear_state(template)
+    frappe.db.commit()
+    result = {"template": template, "processed": processed, "inserted": inserted, "deleted": deleted}
+    _publish(state, {**result, "total": total, "done": True})
+    return result
+
+
+def resume_pending() -> int:
+    """Hourly: re-queue runs whose worker died before clearing their state."""
+    keys = frappe.get_all(
+        "DefaultValue",
+        filters={"parent": "__default", "defkey": ["like", f"{STATE_KEY_PREFIX}%"]},
+        pluck="defkey",
+    )
+    for key in keys:
+        _enqueue(key[len(STATE_KEY_PREFIX) :])
+    return len(keys)
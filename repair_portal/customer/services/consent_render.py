@@ -0,0 +1,134 @@
+# Path: repair_portal/customer/services/consent_render.py
+# Date: 2026-10-19
+# Version: 1.0.1
+# Description: Consent Form rendering support - per-process cache of compiled Jinja code keyed by a
+#              hash of the template content (bound to the request's environment on use) and a
+#              batched Consent Settings auto-fill resolver that reads every mapped field of a
+#              source document in one query.
+# Dependencies: frappe (optional for the pure cache/resolver)
+
+from __future__ import annotations
+
+import hashlib
+from collections import OrderedDict, defaultdict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+SETTINGS_DOCTYPE = "Consent Settings"
+TEMPLATE_DOCTYPE = "Consent Template"
+_MAX_COMPILED = 256
+
+Fetch = Callable[[str, str, list[str]], dict[str, Any] | None]
+
+
+# ---------------------------------------------------------------------------
+# Compiled templates
+# ---------------------------------------------------------------------------
+class CompiledTemplateCache:
+    """LRU of compiled template code keyed by a hash of the source; edited content compiles anew."""
+
+    def __init__(self, compile_fn: Callable[[str], Any], maxsize: int = _MAX_COMPILED):
+        self.compile_fn = compile_fn
+        self.maxsize = maxsize
+        self.compiles = 0
+        self._entries: OrderedDict[str, Any] = OrderedDict()
+
+    def get(self, source: str) -> Any:
+        key = hashlib.sha256(source.encode()).hexdigest()
+        code = self._entries.get(key)
+        if code is not None:
+            self._entries.move_to_end(key)
+            return code
+        code = self.compile_fn(source)
+        self.compiles += 1
+        self._entries[key] = code
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+        return code
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def bind(env, code) -> Any:
+    """Template for cached ``code`` on ``env``, with that environment's globals."""
+    return env.template_class.from_code(env, code, env.make_globals(None))
+
+
+# Only code objects are shared: Template objects would keep the request that built them
+# (session user, db handle) in their globals.
+_CODE = CompiledTemplateCache(lambda source: frappe.get_jenv().compile(source))
+
+
+def compiled_template(template) -> Any:
+    """Jinja template for a Consent Template doc on this request's environment (sandbox + app filters)."""
+    return bind(frappe.get_jenv(), _CODE.get(template.content or ""))
+
+
+# ---------------------------------------------------------------------------
+# Auto-fill resolution
+# ---------------------------------------------------------------------------
+def active_mappings(mappings: Iterable[Any]) -> list[Any]:
+    return [m for m in mappings or [] if m.get("enabled") and (m.get("variable_name") or "").strip()]
+
+
+def resolve_values(form: Any, mappings: Iterable[Any], fetch: Fetch) -> dict[str, Any]:
+    """
+    Resolve mapping ``variable_name`` → value for ``form``.
+
+    Mappings pointing at the same source document (same source_doctype and the
+    same linked name on the form) are answered by one ``fetch`` call for all of
+    their fields. A mapping falls back to its default_value when the source
+    value is None; later mappings for the same variable win.
+    """
+    mappings = active_mappings(mappings)
+    wanted: dict[tuple[str, str], set[str]] = defaultdict(set)
+    for m in mappings:
+        if m.get("source_doctype") and m.get("form_link_field") and m.get("source_fieldname"):
+            link_name = form.get(m.get("form_link_field"))
+            if link_name:
+                wanted[(m.get("source_doctype"), link_name)].add(m.get("source_fieldname"))
+
+    rows: dict[tuple[str, str], dict[str, Any]] = {}
+    for (doctype, link_name), fields in wanted.items():
+        rows[(doctype, link_name)] = fetch(doctype, link_name, sorted(fields)) or {}
+
+    values: dict[str, Any] = {}
+    for m in mappings:
+        value = None
+        link_name = form.get(m.get("form_link_field")) if m.get("form_link_field") else None
+        row = rows.get((m.get("source_doctype"), link_name))
+        if row is not None and m.get("source_fieldname"):
+            value = row.get(m.get("source_fieldname"))
+        if value is None and m.get("default_value"):
+            value = m.get("default_value")
+        if value is not None:
+            values[m.get("variable_name").strip()] = value
+    return values
+
+
+def _fetch(doctype: str, name: str, fields: list[str]) -> dict[str, Any] | None:
+    return frappe.db.get_value(doctype, name, fields, as_dict=True)
+
+
+def get_settings():
+    """Consent Settings from the document cache (cleared by Frappe when the single is saved)."""
+    if not frappe.db.exists("DocType", SETTINGS_DOCTYPE):
+        return None
+    try:
+        return frappe.get_cached_doc(SETTINGS_DOCTYPE)
+    except Exception:
+        return None
+
+
+def auto_fill_values(form: Any, settings=None) -> dict[str, Any]:
+    """Settings-driven values for ``form``; empty when auto-fill is disabled."""
+    settings = settings or get_settings()
+    if not settings or not settings.get("enable_auto_fill"):
+        return {}
+    return resolve_values(form, settings.get("mappings") or [], _fetch)
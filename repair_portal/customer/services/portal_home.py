@@ -0,0 +1,200 @@
+# Path: repair_portal/customer/services/portal_home.py
+# Date: 2026-10-19
+# Version: 1.0.1
+# Description: Per-customer portal home bundle (instruments, recent repairs with instrument labels, open
+#              estimates, service plans) materialized in Redis. A cold build runs four joined queries keyed
+#              on the customer; doc events on the source doctypes drop the bundle after commit. A failing
+#              section is logged and returned empty so it cannot take the other sections down with it.
+# Dependencies: frappe (optional for the pure helpers)
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+CACHE_PREFIX = "repair_portal:portal_home"
+# Backstop for writes that skip doc events (db_set without notify)
+CACHE_TTL = 10 * 60
+RECENT_REPAIRS = 10
+LIVE_PLAN_STATES = ("Active", "Suspended")
+SOURCE_DOCTYPES = frozenset(
+    {"Repair Order", "Instrument Profile", "Player Profile", "Repair Estimate", "Service Plan Enrollment"}
+)
+
+
+# ---------------------------------------------------------------------------
+# Pure helpers
+# ---------------------------------------------------------------------------
+def bundle_key(customer: str) -> str:
+    return f"{CACHE_PREFIX}:{customer}"
+
+
+def instrument_label(row: dict[str, Any]) -> str:
+    parts = [row.get("headline"), row.get("instrument_category"), row.get("serial_no")]
+    return " • ".join(p for p in parts if p) or row.get("instrument_profile") or ""
+
+
+def build_bundle(
+    customer: str,
+    instruments: list[dict[str, Any]],
+    repairs: list[dict[str, Any]],
+    estimates: list[dict[str, Any]],
+    service_plans: list[dict[str, Any]],
+) -> dict[str, Any]:
+    """Shape the query rows into the response; repairs carry ``instrument_label`` like get_my_repairs did."""
+    recent = []
+    for row in repairs:
+        row = dict(row)
+        label = {k: row.pop(k, None) for k in ("headline", "instrument_category", "serial_no")}
+        label["instrument_profile"] = row.get("instrument_profile")
+        row["instrument_label"] = instrument_label(label)
+        recent.append(row)
+    return {
+        "customer": customer,
+        "instruments": list(instruments),
+        "repairs": recent,
+        "estimates": list(estimates),
+        "service_plans": list(service_plans),
+    }
+
+
+def affected_customers(*values: Iterable[str | None] | str | None) -> set[str]:
+    out: set[str] = set()
+    for value in values:
+        if isinstance(value, str) or value is None:
+            value = [value]
+        out.update(v for v in value if v)
+    return out
+
+
+# ---------------------------------------------------------------------------
+# Cold path (joins keyed on the customer instead of chained IN lists)
+# ---------------------------------------------------------------------------
+def _query_instruments(customer: str) -> list[dict[str, Any]]:
+    return frappe.db.sql(
+        """
+        select ip.name, ip.headline, ip.brand, ip.model, ip.instrument_category, ip.serial_no,
+            ip.workflow_state, ip.profile_image, pp.name as player_profile, pp.player_name
+        from `tabInstrument Profile` ip
+        inner join `tabPlayer Profile` pp on pp.name = ip.owner_player
+        where pp.customer = %(customer)s and ip.docstatus < 2
+        order by ip.modified desc
+        """,
+        {"customer": customer},
+        as_dict=True,
+    )
+
+
+def _query_repairs(customer: str) -> list[dict[str, Any]]:
+    return frappe.db.sql(
+        """
+        select ro.name, ro.workflow_state, ro.instrument_profile, ro.priority, ro.target_delivery,
+            ro.modified, ip.headline, ip.instrument_category, ip.serial_no
+        from `tabRepair Order` ro
+        inner join `tabInstrument Profile` ip on ip.name = ro.instrument_profile
+        inner join `tabPlayer Profile` pp on pp.name = ip.owner_player and pp.customer = ro.customer
+        where ro.customer = %(customer)s
+        order by ro.modified desc
+        limit %(limit)s
+        """,
+        {"customer": customer, "limit": RECENT_REPAIRS},
+        as_dict=True,
+    )
+
+
+def _query_estimates(customer: str) -> list[dict[str, Any]]:
+    # Repair Estimate has no workflow or submit step, so every non-cancelled row counts as open.
+    return frappe.get_all(
+        "Repair Estimate",
+        filters={"customer": customer, "docstatus": ["<", 2]},
+        fields=[
+            "name",
+            "repair_order",
+            "instrument_profile",
+            "estimated_completion",
+            "total_cost",
+            "modified",
+        ],
+        order_by="modified desc",
+    )
+
+
+def _query_service_plans(customer: str) -> list[dict[str, Any]]:
+    return frappe.get_all(
+        "Service Plan Enrollment",
+        filters={"customer": customer, "status": ["in", LIVE_PLAN_STATES]},
+        fields=["name", "service_plan", "instrument", "status", "next_billing_date", "end_date"],
+        order_by="start_date desc",
+    )
+
+
+def _section(name: str, query, customer: str, failed: list[str]) -> list[dict[str, Any]]:
+    """Run one section's query; a failure is logged and leaves only that section empty."""
+    try:
+        return query(customer)
+    except Exception:
+        frappe.log_error(frappe.get_traceback(), f"Portal home: {name} section failed for {customer}")
+        failed.append(name)
+        return []
+
+
+def compute_bundle(customer: str) -> dict[str, Any]:
+    failed: list[str] = []
+    bundle = build_bundle(
+        customer,
+        _section("instruments", _query_instruments, customer, failed),
+        _section("repairs", _query_repairs, customer, failed),
+        _section("estimates", _query_estimates, customer, failed),
+        _section("service_plans", _query_service_plans, customer, failed),
+    )
+    if failed:
+        bundle["failed_sections"] = failed
+    return bundle
+
+
+def get_bundle(customer: str) -> dict[str, Any]:
+    """Bundle for ``customer`` from Redis, built on a miss; partial bundles are served but not stored."""
+    cache = frappe.cache()
+    bundle = cache.get_value(bundle_key(customer))
+    if bundle is None:
+        bundle = compute_bundle(customer)
+        if not bundle.get("failed_sections"):
+            cache.set_value(bundle_key(customer), bundle, expires_in_sec=CACHE_TTL)
+    return bundle
+
+
+def customer_for_user(user: str) -> str | None:
+    return frappe.db.get_value("Customer", {"linked_user": user}, "name")
+
+
+# ---------------------------------------------------------------------------
+# Invalidation
+# ---------------------------------------------------------------------------
+def invalidate(*customers: str) -> None:
+    for customer in customers:
+        frappe.cache().delete_value(bundle_key(customer))
+
+
+def _player_customers(*players: str | None) -> list[str | None]:
+    return [frappe.db.get_value("Player Profile", p, "customer") for p in players if p]
+
+
+def on_source_change(doc, method: str | None = None) -> None:
+    """Doc event for the bundle's source doctypes: drop the owning customers' bundles after commit."""
+    if doc.doctype not in SOURCE_DOCTYPES:
+        return
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    old = before.get if before else (lambda _field: None)
+    customers = affected_customers(doc.get("customer"), old("customer"))
+    if doc.doctype == "Instrument Profile":
+        customers |= affected_customers(_player_customers(doc.get("owner_player"), old("owner_player")))
+    if not customers:
+        return
+
+    # Dropping before commit would let a concurrent load re-cache the old rows.
+    frappe.db.after_commit.add(lambda: invalidate(*customers))
@@ -7,6 +7,10 @@
 # doc_events to link child docs -> Repair Order
 from repair_portal.repair import utils as _repair_utils  # noqa: F401
 
+# Opt-in hook timing (site_config: repair_portal_instrumented_hooks + repair_portal_hook_sample_rate);
+# see core/instrumentation.py
+from repair_portal.core.instrumentation import instrument_hooks, instrumented_targets
+
 export_python_type_annotations = True
 app_name = "repair_portal"
 app_title = "Repair Portal"
@@ -92,7 +96,26 @@ doc_events = {
             "repair_portal.repair.doctype.repair_order.repair_order.RepairOrder.on_submit",
             "repair_portal.repair_portal.inventory.material_planner.on_submit"
         ],
-        "on_cancel": "repair_portal.repair.doctype.repair_order.repair_order.RepairOrder.on_cancel"
+        "on_cancel": [
+            "repair_portal.repair.doctype.repair_order.repair_order.RepairOrder.on_cancel",
+            "repair_portal.repair.services.rollup.on_repair_order_change",
+        ],
+        # Reporting rollup (repair.services.rollup): refresh this order's fact row
+        "on_update": "repair_portal.repair.services.rollup.on_repair_order_change",
+        "on_update_after_submit": "repair_portal.repair.services.rollup.on_repair_order_change",
+        "on_trash": [
+            "repair_portal.repair.services.rollup.on_repair_order_change",
+            "repair_portal.core.change_feed.record_change",
+            "repair_portal.customer.services.portal_home.on_source_change",
+            "repair_portal.repair.services.technician_kpis.on_repair_order_change",
+        ],
+        # List/dashboard refresh polling (core.change_feed), the portal home bundle
+        # (customer.services.portal_home) and technician KPI counters (repair.services.technician_kpis)
+        "on_change": [
+            "repair_portal.core.change_feed.record_change",
+            "repair_portal.customer.services.portal_home.on_source_change",
+            "repair_portal.repair.services.technician_kpis.on_repair_order_change",
+        ],
     },
     "Clarinet Intake": {
         # after_insert will call our new function
@@ -104,18 +127,49 @@ doc_events = {
             "repair_portal.repair_portal.utils.barcode.ensure_clarinet_intake_barcode"
         ],
         "on_update": "repair_portal.repair.utils.on_child_validate",
+        "on_change": "repair_portal.core.change_feed.record_change",
+        "on_trash": "repair_portal.core.change_feed.record_change",
     },
+    "Pulse Update": {
+        # Technician dashboard activity feed (repair.services.technician_kpis)
+        "after_insert": "repair_portal.repair.services.technician_kpis.on_pulse_update_insert",
+        "on_change": "repair_portal.core.change_feed.record_change",
+        "on_trash": "repair_portal.core.change_feed.record_change",
+    },
+    # Serial resolution cache (intake.services.serial_resolver) is invalidated from
+    # Instrument, Instrument Profile and Instrument Serial Number events.
     "Instrument": {
         "validate": "repair_portal.repair_portal.utils.barcode.ensure_instrument_barcode",
         "after_insert": "repair_portal.instrument_profile.services.profile_sync.on_linked_doc_change",
-        "on_update": "repair_portal.instrument_profile.services.profile_sync.on_linked_doc_change",
+        "on_update": [
+            "repair_portal.instrument_profile.services.profile_sync.on_linked_doc_change",
+            "repair_portal.intake.services.serial_resolver.on_instrument_change",
+        ],
         "on_change": "repair_portal.instrument_profile.services.profile_sync.on_linked_doc_change",
+        "on_trash": "repair_portal.intake.services.serial_resolver.on_instrument_change",
     },
     "Instrument Profile": {
-        "after_insert": "repair_portal.instrument_profile.events.utils.create_linked_documents",
+        "after_insert": [
+            "repair_portal.instrument_profile.events.utils.create_linked_documents",
+            "repair_portal.intake.services.serial_resolver.on_profile_change",
+        ],
+        "on_update": "repair_portal.intake.services.serial_resolver.on_profile_change",
+        "on_change": [
+            "repair_portal.core.change_feed.record_change",
+            "repair_portal.customer.services.portal_home.on_source_change",
+        ],
+        "on_trash": [
+            "repair_portal.intake.services.serial_resolver.on_profile_change",
+            "repair_portal.core.change_feed.record_change",
+            "repair_portal.customer.services.portal_home.on_source_change",
+        ],
     },
     "Instrument Serial Number": {
-        "on_update": "repair_portal.instrument_profile.services.profile_sync.on_linked_doc_change",
+        "on_update": [
+            "repair_portal.instrument_profile.services.profile_sync.on_linked_doc_change",
+            "repair_portal.intake.services.serial_resolver.on_serial_change",
+        ],
+        "on_trash": "repair_portal.intake.services.serial_resolver.on_serial_change",
     },
     # Optional handlers if these doctypes exist in your app/site:
     "Instrument Condition Record": {
@@ -142,7 +196,21 @@ doc_events = {
     },
     "Repair Estimate": {
         "validate": "repair_portal.repair.utils.on_child_validate",
-        "on_update": "repair_portal.repair.utils.on_child_validate",
+        "on_update": [
+            "repair_portal.repair.utils.on_child_validate",
+            "repair_portal.repair.services.rollup.on_estimate_change",
+        ],
+        "on_change": "repair_portal.customer.services.portal_home.on_source_change",
+        "on_trash": "repair_portal.customer.services.portal_home.on_source_change",
+    },
+    # Portal home bundle (customer.services.portal_home)
+    "Player Profile": {
+        "on_change": "repair_portal.customer.services.portal_home.on_source_change",
+        "on_trash": "repair_portal.customer.services.portal_home.on_source_change",
+    },
+    "Service Plan Enrollment": {
+        "on_change": "repair_portal.customer.services.portal_home.on_source_change",
+        "on_trash": "repair_portal.customer.services.portal_home.on_source_change",
     },
     "Final QA Checklist": {
         "validate": "repair_portal.repair.utils.on_child_validate",
@@ -158,7 +226,11 @@ doc_events = {
     },
     "Repair Task": {
         "validate": "repair_portal.repair.utils.on_child_validate",
-        "on_update": "repair_portal.repair.utils.on_child_validate",
+        "on_update": [
+            "repair_portal.repair.utils.on_child_validate",
+            "repair_portal.repair.services.rollup.on_repair_task_change",
+        ],
+        "on_trash": "repair_portal.repair.services.rollup.on_repair_task_change",
     },
     "Sales Invoice": {
         "before_insert": "repair_portal.repair_portal.utils.pos.suggest_repair_class_upsells",
@@ -167,14 +239,45 @@ doc_events = {
         "after_submit": "repair_portal.repair.hooks_stock_entry.after_submit_stock_entry",
     },
     "Payment Request": {},
+    # Portal user → customer mapping cache (customer.security). Dynamic Link rows
+    # are Contact children, so Contact events cover link edits too.
+    "Contact": {
+        "on_update": "repair_portal.customer.security.on_contact_change",
+        "on_trash": "repair_portal.customer.security.on_contact_change",
+    },
+    # Canonical brands feed the compiled brand index (intake.services.brand_index)
+    "Brand": {
+        "on_update": "repair_portal.intake.services.brand_index.invalidate",
+        "on_trash": "repair_portal.intake.services.brand_index.invalidate",
+        "after_rename": "repair_portal.intake.services.brand_index.invalidate",
+    },
+    # Role → user cache for escalation recipients (repair.services.escalation);
+    # Has Role rows are User children, so User events cover role edits.
+    "User": {
+        "on_update": "repair_portal.repair.services.escalation.invalidate_role_cache",
+        "on_trash": "repair_portal.repair.services.escalation.invalidate_role_cache",
+    },
+    "Customer": {
+        "on_update": "repair_portal.customer.security.on_customer_change",
+        "on_trash": "repair_portal.customer.security.on_customer_change",
+        "after_rename": "repair_portal.customer.security.on_customer_change",
+    },
 }
 
 
 scheduler_events = {
+    "cron": {
+        # Escalation digests (repair.services.escalation.DIGEST_WINDOW_MINUTES)
+        "*/5 * * * *": ["repair_portal.repair.services.escalation.flush_digests"],
+        # Technician KPI consistency check; just after midnight so newly overdue repairs count
+        "5 0 * * *": ["repair_portal.repair.services.technician_kpis.reconcile_all"],
+    },
     "hourly": [
         "repair_portal.core.tasks.sla_breach_scan",
         "repair_portal.core.tasks.finalize_billing_packets",
         "repair_portal.repair_portal.service_plans.automation.process_autopay",
+        "repair_portal.customer.services.consent_fanout.resume_pending",
+        "repair_portal.repair.services.mail_in.retry_stalled",
     ],
     "daily": [
         "repair_portal.intake.tasks.cleanup_intake_sessions",
@@ -182,9 +285,20 @@ scheduler_events = {
         "repair_portal.customer.tasks.warranty.dispatch_warranty_reminders",
         "repair_portal.repair_portal.service_plans.automation.queue_renewal_notifications",
         "repair_portal.repair_portal.utils.compliance.anonymize_closed_repairs",
+        "repair_portal.repair.services.rollup.catch_up",
     ],
 }
 
+# Wrap only the hook targets opted in via site config for sampled timing; every
+# other method path (and so every Scheduled Job Type) stays as written above.
+_instrumented = instrumented_targets()
+if _instrumented:
+    doc_events = instrument_hooks(doc_events, "doc_event", _instrumented)
+    scheduler_events = instrument_hooks(scheduler_events, "scheduler", _instrumented)
+    scheduler_events.setdefault("cron", {})["*/10 * * * *"] = [
+        "repair_portal.core.instrumentation.flush_hook_metrics",
+    ]
+
 website_route_rules = [
     {"from_route": "/repair-status/<portal_token>", "to_route": "repair-status"},
     {"from_route": "/quote/<name>", "to_route": "quote"},
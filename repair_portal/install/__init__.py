@@ -94,7 +94,9 @@ def seed_item_groups_after_migrate():
 # ############################################################################
 # in repair_portal/install/__init__.py
 def seed_all_from_schemas():
-    from ..scripts.doctype_loader import load_from_default_schemas
+    # Dependency-ordered, digest-skipping loader (see scripts/seed_engine.py);
+    # scripts/doctype_loader.py remains available for ad-hoc multi-pass loads.
+    from ..scripts.seed_engine import load_from_default_schemas
 
     try:
         print("🌱 Seeding doctypes from schemas …")
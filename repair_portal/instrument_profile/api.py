@@ -1,6 +1,6 @@
 # Path: repair_portal/instrument_profile/api.py
-# Date: 2025-12-15
-# Version: 0.1.0
+# Date: 2026-10-19
+# Version: 0.2.0
 # Description: Simple API helpers for Instrument Profile UI features (polling, lightweight status checks).
 # Dependencies: frappe
 
@@ -10,23 +10,33 @@ import frappe
 from frappe.utils import get_datetime, now_datetime
 from datetime import timedelta
 
+from repair_portal.core import change_feed
+
 
 @frappe.whitelist()
-def check_pending_updates(last_update: str = "") -> dict:
+def check_pending_updates(last_update: str = "", version: int | str | None = None) -> dict:
     """Return a simple payload indicating whether any Instrument Profile records
-    have been modified since `last_update` (ISO format). If `last_update` is
-    blank, look for updates in the last 60 seconds.
+    have changed, plus the change-feed ``version`` to send on the next poll.
+
+    With ``version`` this is answered from the Redis change counter
+    (repair_portal.core.change_feed). Without it (first poll after a list
+    refresh) it falls back to one ``modified > last_update`` check (ISO format;
+    blank means the last 60 seconds) and returns the baseline version.
 
     Used by the enhanced Instrument Profile ListView to show a refresh hint.
     """
     try:
+        if version not in (None, ""):
+            feed = change_feed.changes_since("Instrument Profile", version)
+            return {"has_updates": feed["changed"], "version": feed["version"]}
+
         if not last_update:
             cutoff = now_datetime() - timedelta(seconds=60)
         else:
             cutoff = get_datetime(last_update)
 
         exists = frappe.db.exists("Instrument Profile", {"modified": [">", cutoff]})
-        return {"has_updates": bool(exists)}
+        return {"has_updates": bool(exists), "version": change_feed.current_version("Instrument Profile")}
     except Exception:
         frappe.log_error(frappe.get_traceback(), "Instrument Profile API: check_pending_updates")
         return {"has_updates": False}
@@ -426,10 +426,15 @@ $.extend(frappe.views.ListView.prototype, {
         frappe.call({
             method: "repair_portal.instrument_profile.api.check_pending_updates",
             args: {
-                last_update: this.last_update_time || ''
+                last_update: this.last_update_time || '',
+                version: this.change_version ?? ''
             },
             callback: (r) => {
-                if (r.message && r.message.has_updates) {
+                if (!r.message) return;
+                if (r.message.version !== undefined) {
+                    this.change_version = r.message.version;
+                }
+                if (r.message.has_updates) {
                     this.show_update_notification();
                 }
             }
@@ -580,6 +585,8 @@ $.extend(frappe.views.ListView.prototype, {
     refresh_status_counts() {
         this.load_status_counts();
         this.last_update_time = moment().format();
+        // Re-baseline the change-feed version on the next poll
+        this.change_version = null;
     },
 
     is_visible() {
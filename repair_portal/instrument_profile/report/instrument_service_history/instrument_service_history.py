@@ -1,14 +1,18 @@
 # Path: repair_portal/instrument_profile/report/instrument_service_history/instrument_service_history.py
-# Date: 2025-10-02
-# Version: 1.0.0
+# Date: 2026-10-19
+# Version: 1.1.0
 # Description: Script Report for Instrument Service History - tracks all service events, maintenance logs, and repair activities for instruments with filtering by profile, serial number, and date range.
 # Dependencies: frappe
 
 import frappe
 
+from repair_portal.core import report_export
 
-def execute(filters=None):
-    columns = [
+FIELDS = ["date", "service_type", "description", "performed_by", "status", "notes"]
+
+
+def _columns():
+    return [
         {"label": "Date", "fieldname": "date", "fieldtype": "Date", "width": 100},
         {"label": "Service Type", "fieldname": "service_type", "fieldtype": "Data", "width": 120},
         {"label": "Description", "fieldname": "description", "fieldtype": "Data", "width": 220},
@@ -16,19 +20,30 @@ def execute(filters=None):
         {"label": "Status", "fieldname": "status", "fieldtype": "Data", "width": 90},
         {"label": "Notes", "fieldname": "notes", "fieldtype": "Data", "width": 160},
     ]
+
+
+def _conditions(filters):
     conditions = {}
     if filters:
         if filters.get("instrument_profile"):
             conditions["instrument_profile"] = filters["instrument_profile"]
         if filters.get("serial_no"):
             conditions["serial_no"] = filters["serial_no"]
-        if filters.get("date_from"):
+        if filters.get("date_from") and filters.get("date_to"):
+            conditions["date"] = ["between", [filters["date_from"], filters["date_to"]]]
+        elif filters.get("date_from"):
             conditions["date"] = [">=", filters["date_from"]]
-        if filters.get("date_to"):
+        elif filters.get("date_to"):
             conditions["date"] = ["<=", filters["date_to"]]
-    data = frappe.get_all(
-        "Service Log",
-        filters=conditions,
-        fields=["date", "service_type", "description", "performed_by", "status", "notes"],
-    )
-    return columns, data
+    return conditions
+
+
+def execute(filters=None):
+    data = frappe.get_all("Service Log", filters=_conditions(filters), fields=FIELDS)
+    return _columns(), data
+
+
+def stream(filters=None):
+    """Streaming variant for core.report_export (chunked by name)."""
+    chunks = report_export.iter_chunks("Service Log", _conditions(filters), FIELDS)
+    return _columns(), report_export.stream_rows(chunks)
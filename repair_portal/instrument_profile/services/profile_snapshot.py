@@ -0,0 +1,236 @@
+# Path: repair_portal/instrument_profile/services/profile_snapshot.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Read-only, versioned Instrument Profile snapshot. The header (instrument, owner, serial
+#              record) plus the newest page of each collection is cached per instrument and keyed by a
+#              change counter that profile_sync.on_linked_doc_change bumps; older rows are fetched with
+#              keyset cursors. Reads never insert or sync anything.
+# Dependencies: frappe (optional for the pure cursor helpers)
+
+from __future__ import annotations
+
+import base64
+import json
+from typing import Any, Sequence
+
+try:
+    import frappe
+    from frappe import _
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+    def _(s: str) -> str:  # type: ignore
+        return s
+
+
+VERSION_KEY = "repair_portal:profile_snapshot:version:{instrument}"
+SNAPSHOT_KEY = "repair_portal:profile_snapshot:{instrument}:{version}"
+SNAPSHOT_TTL_SEC = 6 * 60 * 60  # bounds staleness for sources without hooks (e.g. Customer)
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# collection key -> (doctype, selectable field candidates)
+COLLECTIONS: dict[str, tuple[str, tuple[str, ...]]] = {
+    "accessories": (
+        "Instrument Accessory",
+        ("accessory_type", "type", "description", "acquired_on", "removed_on", "paired_with"),
+    ),
+    "media": ("Instrument Media", ("type", "image", "file", "description", "taken_on")),
+    "conditions": (
+        "Instrument Condition Record",
+        ("recorded_on", "condition_score", "notes", "technician", "workflow_state"),
+    ),
+    "interactions": ("Instrument Interaction Log", ("log_type", "message", "owner")),
+}
+
+
+# ---------------------------------------------------------------------------
+# Keyset cursors (pure)
+# ---------------------------------------------------------------------------
+def encode_cursor(creation: Any, name: str) -> str:
+    """Opaque cursor for the row *after which* the next page starts (newest first)."""
+    raw = json.dumps([str(creation), name], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str | None) -> tuple[str, str] | None:
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        creation, name = json.loads(raw)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor") from None
+    if not isinstance(creation, str) or not isinstance(name, str):
+        raise ValueError("Invalid cursor")
+    return creation, name
+
+
+def clamp_page_size(limit: Any) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return DEFAULT_PAGE_SIZE
+    return max(1, min(MAX_PAGE_SIZE, limit))
+
+
+def build_page(rows: Sequence[dict[str, Any]], limit: int) -> dict[str, Any]:
+    """Trim a ``limit + 1`` fetch to ``limit`` rows; the extra row only signals that more exist."""
+    items = list(rows[:limit])
+    next_cursor = None
+    if len(rows) > limit and items:
+        last = items[-1]
+        next_cursor = encode_cursor(last["creation"], last["name"])
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# ---------------------------------------------------------------------------
+# Change counter
+# ---------------------------------------------------------------------------
+def _version_key(instrument: str) -> str:
+    cache = frappe.cache()
+    return cache.make_key(VERSION_KEY.format(instrument=instrument))
+
+
+def current_version(instrument: str) -> int:
+    raw = frappe.cache().get(_version_key(instrument))
+    return int(raw) if raw else 0
+
+
+def bump_version(instrument: str | None) -> None:
+    """Invalidate every cached snapshot of ``instrument`` (stale keys simply expire)."""
+    if instrument:
+        frappe.cache().incr(_version_key(instrument))
+
+
+def bump_version_after_commit(instrument: str | None) -> None:
+    """Bump once the write commits, so a read in between cannot recache old rows under the new version."""
+    if instrument:
+        frappe.db.after_commit.add(lambda: bump_version(instrument))
+
+
+# ---------------------------------------------------------------------------
+# Collections
+# ---------------------------------------------------------------------------
+def fetch_page(
+    collection: str, instrument: str, cursor: str | None = None, limit: int = DEFAULT_PAGE_SIZE
+) -> dict[str, Any]:
+    """One page of a collection, newest first, continuing after ``cursor``."""
+    from repair_portal.instrument_profile.services.profile_sync import (
+        _doctype_exists,
+        _meta_fields,
+        _safe_fields_for,
+    )
+
+    if collection not in COLLECTIONS:
+        frappe.throw(_("Unknown collection {0}").format(collection))
+    doctype, candidates = COLLECTIONS[collection]
+    if not _doctype_exists(doctype) or "instrument" not in _meta_fields(doctype):
+        return {"items": [], "next_cursor": None}
+
+    fields = _safe_fields_for(doctype, [*candidates, "creation"])
+    conditions = ["`instrument` = %(instrument)s"]
+    values: dict[str, Any] = {"instrument": instrument, "limit": limit + 1}
+    after = decode_cursor(cursor)
+    if after:
+        conditions.append("(`creation` < %(creation)s or (`creation` = %(creation)s and `name` < %(name)s))")
+        values.update(creation=after[0], name=after[1])
+
+    rows = frappe.db.sql(
+        f"""
+        select {", ".join(f"`{f}`" for f in fields)}
+        from `tab{doctype}`
+        where {" and ".join(conditions)}
+        order by `creation` desc, `name` desc
+        limit %(limit)s
+        """,
+        values,
+        as_dict=True,
+    )
+    return build_page(rows, limit)
+
+
+# ---------------------------------------------------------------------------
+# Snapshot
+# ---------------------------------------------------------------------------
+def _build_snapshot(instrument_name: str, profile_name: str | None) -> dict[str, Any]:
+    from repair_portal.instrument_profile.services.profile_sync import (
+        _get_instrument_doc,
+        _get_isn,
+        _get_owner_details,
+        _headline,
+    )
+
+    instrument = _get_instrument_doc(instrument_name)
+    snapshot: dict[str, Any] = {
+        "instrument": instrument,
+        "owner": _get_owner_details(instrument.customer),
+        "serial_record": _get_isn(instrument),
+        "profile_name": profile_name,
+        "headline": _headline(instrument.brand, instrument.model, instrument.serial_no),
+    }
+    for collection in COLLECTIONS:
+        snapshot[collection] = fetch_page(collection, instrument_name)
+    return snapshot
+
+
+def cached_snapshot(instrument: str, profile: str | None) -> dict[str, Any]:
+    cache = frappe.cache()
+    key = SNAPSHOT_KEY.format(instrument=instrument, version=current_version(instrument))
+    snapshot = cache.get_value(key)
+    if snapshot is None or snapshot.get("profile_name") != profile:
+        snapshot = _build_snapshot(instrument, profile)
+        cache.set_value(key, snapshot, expires_in_sec=SNAPSHOT_TTL_SEC)
+    return snapshot
+
+
+def _resolve_readable(instrument: str | None, profile: str | None) -> tuple[str, str | None]:
+    """Permission-check and resolve (instrument, profile) without creating anything."""
+    if not instrument and not profile:
+        frappe.throw(_("Provide instrument or profile"))
+
+    if profile:
+        if not frappe.has_permission("Instrument Profile", "read", profile):
+            frappe.throw(_("Insufficient permissions to read profile"), frappe.PermissionError)
+        instrument = frappe.db.get_value("Instrument Profile", profile, "instrument")
+        if not instrument:
+            frappe.throw(_("Instrument Profile {0} has no instrument").format(profile))
+        return instrument, profile
+
+    if not frappe.has_permission("Instrument", "read", instrument):
+        frappe.throw(_("Insufficient permissions to read instrument"), frappe.PermissionError)
+    profile = frappe.db.get_value("Instrument Profile", {"instrument": instrument}, "name")
+    if profile and not frappe.has_permission("Instrument Profile", "read", profile):
+        frappe.throw(_("Insufficient permissions to read profile"), frappe.PermissionError)
+    return instrument, profile
+
+
+def get_snapshot(instrument: str | None = None, profile: str | None = None) -> dict[str, Any]:
+    """
+    Instrument header + owner + serial record + the newest page of each collection.
+
+    Each collection is ``{"items": [...], "next_cursor": str | None}``; pass the cursor
+    to get_collection_page for older rows. ``profile_name`` is None when the instrument
+    has no profile yet (profiles are created by the Instrument doc events, not by reads).
+    """
+    instrument, profile = _resolve_readable(instrument, profile)
+    return cached_snapshot(instrument, profile)
+
+
+def get_collection_page(
+    collection: str,
+    instrument: str | None = None,
+    profile: str | None = None,
+    cursor: str | None = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+) -> dict[str, Any]:
+    instrument, _profile = _resolve_readable(instrument, profile)
+    try:
+        return fetch_page(collection, instrument, cursor=cursor, limit=clamp_page_size(limit))
+    except ValueError as exc:
+        frappe.throw(_(str(exc)))
+
+
+if frappe is not None:
+    get_snapshot = frappe.whitelist()(get_snapshot)
+    get_collection_page = frappe.whitelist()(get_collection_page)
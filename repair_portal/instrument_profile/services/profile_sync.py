@@ -1,9 +1,11 @@
 # Path: repair_portal/instrument_profile/services/profile_sync.py
-# Last Updated: 2025-08-15
-# Version: v1.4
-# Purpose: Instrument Profile "materialized view" sync + snapshot aggregation (schema-safe).
+# Last Updated: 2026-10-19
+# Version: v1.5
+# Purpose: Instrument Profile "materialized view" sync; linked-doc changes bump the snapshot version
+#          (read-only snapshot aggregation lives in profile_snapshot).
 from __future__ import annotations
 
+import time
 from collections.abc import Sequence
 
 import frappe
@@ -11,19 +13,14 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import now_datetime
 
+from repair_portal import logger as rp_logger
+from repair_portal.instrument_profile.services import profile_snapshot
+
 # ISN helpers (soft import if utils not present)
 try:
-    from repair_portal.utils.serials import (
-        ensure_serial_document,  # type: ignore
-    )
-    from repair_portal.utils.serials import (
-        find_by_serial as isn_find_by_serial,  # type: ignore
-    )
+    from repair_portal.utils.serials import normalize_serial  # type: ignore
 except Exception:  # pragma: no cover
-    isn_find_by_serial = None  # type: ignore
-
-    def ensure_serial_document(serial_input: str, instrument: str) -> str | None:  # type: ignore
-        return None
+    normalize_serial = None  # type: ignore
 
 
 # ---------------------------
@@ -42,18 +39,23 @@ def _structured_log(
     status: str,
     docname: str | None,
     extras: dict | None = None,
+    latency_ms: float = 0,
 ) -> None:
-    payload = {
-        "ts": now_datetime().isoformat(),
-        "user": getattr(frappe.session, "user", "Guest"),
-        "doctype": doctype,
-        "docname": docname,
-        "op": op,
-        "status": status,
-        "latency_ms": 0,
-        "extras": extras or {},
-    }
-    frappe.logger(channel).info(payload)
+    # One record on the queued repair_portal.<channel> logger (JSON-lines sink included);
+    # the payload is only built when INFO is enabled for that channel.
+    rp_logger.structured(
+        lambda: {
+            "ts": now_datetime().isoformat(),
+            "user": getattr(frappe.session, "user", "Guest"),
+            "doctype": doctype,
+            "docname": docname,
+            "op": op,
+            "status": status,
+            "latency_ms": round(latency_ms, 2),
+            "extras": extras or {},
+        },
+        suffix=channel,
+    )
 
 
 def _log_security(
@@ -78,6 +80,7 @@ def _log_job(
     status: str,
     docname: str | None,
     extras: dict | None = None,
+    latency_ms: float = 0,
 ) -> None:
     _structured_log(
         "instrument_profile_jobs",
@@ -86,6 +89,7 @@ def _log_job(
         status=status,
         docname=docname,
         extras=extras,
+        latency_ms=latency_ms,
     )
 
 
@@ -202,25 +206,19 @@ def _get_instrument_doc(instrument: str) -> frappe._dict:
 
 
 def _get_isn(instrument: frappe._dict) -> frappe._dict | None:
-    serial_raw = (instrument.serial_no or "").strip()
-    if not serial_raw:
-        return None
-
-    isn_name: str | None = None
-    if isn_find_by_serial:
-        isn_name = isn_find_by_serial(serial_input=serial_raw, instrument=instrument.name)  # type: ignore
-
-    if not isn_name and ensure_serial_document:
-        isn_name = ensure_serial_document(serial_input=serial_raw, instrument=instrument.name)  # type: ignore
+    """Read-only lookup: the ISN linked to the instrument, else the one matching its serial."""
+    isn_name = frappe.db.get_value("Instrument Serial Number", {"instrument": instrument.name}, "name")
+    if not isn_name:
+        norm = normalize_serial(instrument.serial_no) if normalize_serial else None
+        if norm:
+            isn_name = frappe.db.get_value("Instrument Serial Number", {"normalized_serial": norm}, "name")
 
     if not isn_name:
         return None
 
-    return frappe.db.get_value(  # type: ignore
+    fields = _safe_fields_for(
         "Instrument Serial Number",
-        isn_name,
-        [  # type: ignore
-            "name",
+        [
             "serial",
             "normalized_serial",
             "warranty_start_date",
@@ -228,8 +226,11 @@ def _get_isn(instrument: frappe._dict) -> frappe._dict | None:
             "status",
             "verification_status",
         ],
-        as_dict=True,
     )
+    isn = frappe.db.get_value("Instrument Serial Number", isn_name, fields, as_dict=True)  # type: ignore
+    if isn:
+        _ensure_keys(isn, ["warranty_start_date", "warranty_end_date"])  # type: ignore
+    return isn  # type: ignore
 
 
 def _get_owner_details(customer: str | None) -> frappe._dict | None:
@@ -382,6 +383,7 @@ def sync_now(profile: str | None = None, instrument: str | None = None) -> dict[
             extras={"instrument": instrument},
         )
 
+    started = time.perf_counter()
     result = sync_profile(profile)  # type: ignore[arg-type]
 
     _log_job(
@@ -389,11 +391,23 @@ def sync_now(profile: str | None = None, instrument: str | None = None) -> dict[
         status="success",
         docname=profile,
         extras={"instrument": result.get("instrument")},
+        latency_ms=(time.perf_counter() - started) * 1000.0,
     )
 
     return result
 
 
+def schedule_sync(instrument: str) -> None:
+    """Queue sync_now for ``instrument`` as the current user; one pending job per instrument."""
+    frappe.enqueue(
+        "repair_portal.instrument_profile.services.profile_sync.sync_now",
+        queue="short",
+        job_id=f"repair_portal::profile_sync::{instrument}",
+        deduplicate=True,
+        instrument=instrument,
+    )
+
+
 def on_linked_doc_change(doc, method=None):
     """
     Hook target: called from doc_events to keep Profile up to date when any
@@ -408,6 +422,7 @@ def on_linked_doc_change(doc, method=None):
     if not instrument:
         return
 
+    profile_snapshot.bump_version_after_commit(instrument)
     try:
         profile = _ensure_profile(instrument)
         # run now to keep UX snappy; these are cheap scalar updates
@@ -424,134 +439,15 @@ def on_linked_doc_change(doc, method=None):
 
 
 # ---------------------------
-# Snapshot aggregation (API) — schema-safe lists
+# Snapshot (API) — read-only, see profile_snapshot
 # ---------------------------
 
 
-def _collection_by_instrument(
-    doctype: str,
-    instrument_name: str,
-    field_candidates: Sequence[str],
-    order_candidates: Sequence[str],
-    instrument_link_field: str = "instrument",
-) -> list[frappe._dict]:
-    """
-    Return collection rows for a given instrument, but ONLY if:
-    - the doctype exists
-    - the link field (default 'instrument') exists
-    - we select only existing columns
-    - we order by an existing column (fallback: creation desc)
-    """
-    if not _doctype_exists(doctype):
-        return []
-
-    # If the link field doesn't exist, we can't reliably filter -> return empty
-    if instrument_link_field not in _meta_fields(doctype):
-        return []
-
-    filters = {instrument_link_field: instrument_name}
-    return _safe_get_all(
-        doctype=doctype,
-        filters=filters,
-        field_candidates=field_candidates,
-        order_candidates=order_candidates,
-        as_list=False,
-    )
-
-
-def _aggregate_snapshot(instrument_name: str, profile_name: str) -> dict[str, object]:
-    """
-    Return a full snapshot for UI/API without copying lists into the Profile doc:
-    - instrument (selected fields)
-    - owner
-    - isn (Instrument Serial Number)
-    - accessories / media / condition / interactions (if doctypes exist)
-    """
-    instrument = _get_instrument_doc(instrument_name)
-    owner = _get_owner_details(instrument.customer)
-    isn = _get_isn(instrument)
-
-    accessories = _collection_by_instrument(
-        doctype="Instrument Accessory",
-        instrument_name=instrument_name,
-        field_candidates=[
-            "accessory_type",
-            "type",
-            "description",
-            "acquired_on",
-            "removed_on",
-            "paired_with",
-        ],
-        order_candidates=["acquired_on", "creation"],
-        instrument_link_field="instrument",
-    )
-
-    media = _collection_by_instrument(
-        doctype="Instrument Media",
-        instrument_name=instrument_name,
-        field_candidates=["type", "image", "file", "description", "taken_on"],
-        order_candidates=["taken_on", "creation"],
-        instrument_link_field="instrument",
-    )
-
-    conditions = _collection_by_instrument(
-        doctype="Instrument Condition Record",
-        instrument_name=instrument_name,
-        field_candidates=[
-            "recorded_on",
-            "condition_score",
-            "notes",
-            "technician",
-            "workflow_state",
-        ],
-        order_candidates=["recorded_on", "creation"],
-        instrument_link_field="instrument",
-    )
-
-    interactions = _collection_by_instrument(
-        doctype="Instrument Interaction Log",
-        instrument_name=instrument_name,
-        field_candidates=["log_type", "message", "owner", "creation"],
-        order_candidates=["creation"],
-        instrument_link_field="instrument",
-    )
-
-    return {
-        "instrument": instrument,
-        "owner": owner,
-        "serial_record": isn,
-        "accessories": accessories,
-        "media": media,
-        "conditions": conditions,
-        "interactions": interactions,
-        "profile_name": profile_name,
-        "headline": _headline(instrument.brand, instrument.model, instrument.serial_no),
-    }
-
-
 @frappe.whitelist(allow_guest=False)
 def get_snapshot(instrument: str | None = None, profile: str | None = None) -> dict[str, object]:
     """
-    Public API helper: ensure profile exists + synced, then return the full snapshot.
+    Public API helper: return the cached, read-only snapshot (no profile creation or sync).
 
     Security: Requires read permission on the profile or instrument to prevent cross-customer data access.
     """
-    # Input validation
-    if not instrument and not profile:
-        frappe.throw(_("Provide instrument or profile"))
-
-    # Permission validation BEFORE any operation
-    if profile:
-        if not frappe.has_permission("Instrument Profile", "read", profile):
-            frappe.throw(_("Insufficient permissions to read profile"), frappe.PermissionError)
-    elif instrument:
-        if not frappe.has_permission("Instrument", "read", instrument):
-            frappe.throw(_("Insufficient permissions to read instrument"), frappe.PermissionError)
-        profile = _ensure_profile(instrument)
-
-    # Additional check after profile creation (defensive)
-    if not frappe.has_permission("Instrument Profile", "read", profile):
-        frappe.throw(_("Insufficient permissions to read profile"), frappe.PermissionError)
-
-    res = sync_profile(profile)  # sync scalars  # type: ignore
-    return _aggregate_snapshot(res["instrument"], res["profile"])
+    return profile_snapshot.get_snapshot(instrument=instrument, profile=profile)
@@ -169,3 +169,36 @@ class TestProfileSyncSecurity(FrappeTestCase):
         updated_fields = calls[0][0][2]
         self.assertIsInstance(updated_fields, dict)
         self.assertGreaterEqual(len(updated_fields.keys()), 3)
+
+    def test_linked_doc_change_bumps_snapshot_version_after_commit(self):
+        """The snapshot counter moves only once the write is committed."""
+        from repair_portal.instrument_profile.services import profile_snapshot
+
+        before = profile_snapshot.current_version(self.instrument.name)
+        with patch.object(profile_sync.frappe, "enqueue"):
+            profile_sync.on_linked_doc_change(self.instrument)
+        self.assertEqual(profile_snapshot.current_version(self.instrument.name), before)
+
+        frappe.db.after_commit.run()
+        self.assertEqual(profile_snapshot.current_version(self.instrument.name), before + 1)
+
+    def test_get_profile_checks_instrument_permission_and_queues_sync(self):
+        """A profile-less instrument is never synced inline on the read path."""
+        from repair_portal.api.frontend import instrument_profile as api
+
+        frappe.delete_doc("Instrument Profile", self.profile.name, force=True, ignore_permissions=True)
+        self.profile = None
+
+        user = self._make_user("profile-read-client@example.com", ["Customer"])
+        frappe.set_user(user.name)
+        with patch.object(api, "_schedule_sync") as schedule:
+            with self.assertRaises(frappe.PermissionError):
+                api.get_profile(instrument=self.instrument.name)
+        schedule.assert_not_called()
+
+        frappe.set_user("Administrator")
+        with patch.object(api, "_schedule_sync") as schedule:
+            result = api.get_profile(instrument=self.instrument.name)
+        schedule.assert_called_once_with(self.instrument.name)
+        self.assertEqual(result["pending"], 1)
+        self.assertFalse(frappe.db.exists("Instrument Profile", {"instrument": self.instrument.name}))
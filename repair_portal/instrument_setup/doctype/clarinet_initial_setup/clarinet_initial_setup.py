@@ -1,10 +1,10 @@
 # Path: repair_portal/repair_portal/instrument_setup/doctype/clarinet_initial_setup/clarinet_initial_setup.py
-# Version: v3.3
-# Date: 2025-09-16
+# Version: v3.5
+# Date: 2026-10-19
 # Purpose: Clarinet Initial Setup lifecycle (minutes-aware, template-driven).
 # Notes:
 #   - Loads defaults from Setup Template (server) and supports on-form reload (client)
-#   - Creates Clarinet Setup Tasks from template with minutes-based durations
+#   - Creates Clarinet Setup Tasks from template with minutes-based durations (bulk insert)
 #   - Reads hours_per_day and standard_hourly_rate from Repair Portal Settings (with safe defaults)
 
 from __future__ import annotations
@@ -15,8 +15,10 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 from frappe.utils import add_days, now_datetime, nowdate
-from frappe.utils.file_manager import save_file
-from frappe.utils.pdf import get_pdf
+
+from repair_portal.core.print_batch import ensure_pdf
+from repair_portal.instrument_setup.services.materialize import materialize_tasks
+from repair_portal.instrument_setup.services.progress import reconcile_setup_progress
 
 PRINT_FORMAT_NAME = "Clarinet Setup Certificate"
 
@@ -104,6 +106,8 @@ class ClarinetInitialSetup(Document):
         setup_template: DF.Link | None
         setup_type: DF.Data  # Select field with options: Standard Setup, Advanced Setup, etc.
         status: DF.Data  # Select field with options: Open, In Progress, Completed, etc.
+        task_count: DF.Int
+        task_progress_total: DF.Float
         technical_tags: DF.TextEditor | None
         technician: DF.Link | None
         work_photos: DF.AttachImage | None
@@ -293,55 +297,23 @@ class ClarinetInitialSetup(Document):
         - Maps minutes to calendar dates:
             span_days = max(1, ceil(minutes / 1440))
             exp_end_date = exp_start_date + (span_days - 1)
+        - Tasks and their template dependencies are written in bulk (services.materialize).
         """
         if not self.setup_template:
             frappe.throw(_("Select a Setup Template first."))
 
         template = frappe.get_doc("Setup Template", self.setup_template)  # type: ignore
-        rows = sorted(list(template.get("template_tasks") or []), key=lambda r: r.sequence or 0)
-        if not rows:
+        if not template.get("template_tasks"):
             frappe.msgprint(_("No Template Tasks found on the selected Setup Template."))
             return {"created": [], "count": 0}
 
-        base_date = self.expected_start_date or self.setup_date
-        if not base_date:
+        if not (self.expected_start_date or self.setup_date):
             frappe.throw(_("Expected Start Date or Setup Date is required to create tasks."))
 
-        created = []
-        for row in rows:
-            # Offsets remain in DAYS
-            exp_start = add_days(base_date, int(getattr(row, "exp_start_offset_days", 0) or 0))
-
-            minutes = int(getattr(row, "exp_duration_mins", 0) or 0)
-            if minutes > 0:
-                span_days = max(1, ceil(minutes / 1440.0))  # 1440 mins/day
-            else:
-                # Legacy fallback
-                days = int(getattr(row, "exp_duration_days", 0) or 1)
-                span_days = max(1, days)
-
-            exp_end = add_days(exp_start, span_days - 1)
-
-            doc = frappe.get_doc(
-                {
-                    "doctype": "Clarinet Setup Task",
-                    "clarinet_initial_setup": self.name,
-                    "subject": row.subject,
-                    "description": row.description,
-                    "priority": (row.default_priority or self.priority or "Medium"),
-                    "status": "Open",
-                    "sequence": row.sequence,
-                    "exp_start_date": exp_start,
-                    "exp_end_date": exp_end,
-                    "instrument": self.instrument,
-                    "serial": self.serial,
-                }
-            ).insert(ignore_permissions=True)
-            created.append(doc.name)
-
-    #    update_parent_progress(self.name)  # type: ignore
-    #    frappe.msgprint(_('Created {0} task(s) from template.').format(len(created)))
-    #    return {'created': created, 'count': len(created)}
+        created = materialize_tasks(self, template)
+        frappe.msgprint(_("Created {0} task(s) from template.").format(len(created)))
+        return {"created": created, "count": len(created)}
+
     # (Reference: your original create-tasks entry point)  # :contentReference[oaicite:7]{index=7}
 
     # -----------------
@@ -351,58 +323,23 @@ class ClarinetInitialSetup(Document):
     def generate_certificate(
         self, print_format: str = PRINT_FORMAT_NAME, attach: int = 1, return_file_url: int = 1
     ):
-        """Render the Print Format and (optionally) attach the PDF; return a URL when requested."""
-        pf = (
-            frappe.get_doc("Print Format", print_format)
-            if frappe.db.exists("Print Format", print_format)
-            else None
-        )
-        if not pf or pf.doc_type != self.doctype:  # type: ignore
-            frappe.throw(
-                _(
-                    "Print Format '{0}' is missing or not linked to {1}. Reload the print format files."
-                ).format(print_format, self.doctype)
-            )
-
-        html = frappe.get_print(self.doctype, self.name, print_format)
-        pdf_bytes = get_pdf(html)
-
-        filedoc = None
-        if attach:
-            fname = f"{self.name} - Setup Certificate.pdf"
-            filedoc = save_file(fname, pdf_bytes, self.doctype, self.name, is_private=1)
+        """
+        Attach the certificate PDF and return its URL when requested. The PDF is keyed by the
+        document's and print format's ``modified`` (see core.print_batch), so an unchanged setup
+        reuses the attached File instead of rendering and inserting another copy.
+        """
+        if not (attach or return_file_url):
+            # Nothing to keep: render once to surface template errors to the caller.
+            frappe.get_print(self.doctype, self.name, print_format)
+            return {"ok": True}
 
+        filedoc = ensure_pdf(self.doctype, self.name, print_format, label="Setup Certificate")
         if return_file_url:
-            out = {
-                "file_url": (filedoc.file_url if filedoc else None),  # type: ignore
-                "file_name": (filedoc.file_name if filedoc else None),  # type: ignore
-            }
-            if not out["file_url"]:
-                fname = f"{self.name} - Setup Certificate.pdf"
-                filedoc = frappe.get_doc(
-                    {
-                        "doctype": "File",
-                        "file_name": fname,
-                        "is_private": 1,
-                        "content": pdf_bytes,
-                        "attached_to_doctype": self.doctype,
-                        "attached_to_name": self.name,
-                    }
-                ).insert(ignore_permissions=True)
-                out = {"file_url": filedoc.file_url, "file_name": filedoc.file_name}  # type: ignore
-            return out
-
+            return {"file_url": filedoc.file_url, "file_name": filedoc.file_name}  # type: ignore
         return {"ok": True}
 
 
 @frappe.whitelist()
 def update_parent_progress(initial_setup: str):
-    tasks = frappe.get_all(
-        "Clarinet Setup Task", filters={"clarinet_initial_setup": initial_setup}, fields=["name", "progress"]
-    )
-    if not tasks:
-        frappe.db.set_value("Clarinet Initial Setup", initial_setup, "progress", 0)
-        return
-
-    avg = round(sum((t.get("progress") or 0) for t in tasks) / len(tasks), 2)
-    frappe.db.set_value("Clarinet Initial Setup", initial_setup, "progress", avg)
+    """Recount progress (and the running task counters) from the task table right now."""
+    reconcile_setup_progress(initial_setup)
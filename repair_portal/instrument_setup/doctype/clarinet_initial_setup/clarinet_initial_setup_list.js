@@ -0,0 +1,47 @@
+// Path: repair_portal/instrument_setup/doctype/clarinet_initial_setup/clarinet_initial_setup_list.js
+// Date: 2026-10-19
+// Version: 1.0.0
+// Description: Bulk certificate printing for the selected setups via the background batch renderer
+//              (core.print_batch); the zip / merged PDF link arrives over realtime.
+
+frappe.listview_settings['Clarinet Initial Setup'] = {
+  onload(listview) {
+    [
+      ['zip', __('Download Certificates (ZIP)')],
+      ['pdf', __('Download Certificates (Merged PDF)')],
+    ].forEach(([output, label]) => {
+      listview.page.add_actions_menu_item(label, () => {
+        const names = listview.get_checked_items(true);
+        if (!names.length) {
+          frappe.show_alert({ message: __('Select at least one setup first.'), indicator: 'orange' });
+          return;
+        }
+        frappe
+          .call('repair_portal.core.print_batch.start_batch', {
+            items: names.map((name) => ['Clarinet Initial Setup', name, 'Clarinet Setup Certificate']),
+            output,
+          })
+          .then((r) => {
+            const batchId = r.message.batch_id;
+            frappe.show_alert({ message: __('Rendering {0} certificate(s)', [names.length]), indicator: 'blue' });
+            const handler = (data) => {
+              if (data.batch_id !== batchId) return;
+              if (data.status === 'running') {
+                frappe.show_progress(__('Certificates'), data.chunks_done, data.chunks);
+                return;
+              }
+              frappe.hide_progress();
+              frappe.realtime.off(r.message.event, handler);
+              const link = `<a href="${data.file_url}">${__('Download')}</a>`;
+              frappe.msgprint(
+                data.failed
+                  ? __('{0} certificate(s) failed (see Error Log). Others: {1}', [data.failed, link])
+                  : __('Certificates ready: {0}', [link])
+              );
+            };
+            frappe.realtime.on(r.message.event, handler);
+          });
+      });
+    });
+  },
+};
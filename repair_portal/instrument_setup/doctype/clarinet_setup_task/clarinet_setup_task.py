@@ -1,6 +1,6 @@
 # Path: repair_portal/repair_portal/instrument_setup/doctype/clarinet_setup_task/clarinet_setup_task.py
-# Version: v1.3
-# Date: 2025-08-12
+# Version: v1.4
+# Date: 2026-10-19
 # Purpose: Projects-like Task with dependency gating and parent-progress roll-up.
 
 from __future__ import annotations
@@ -10,6 +10,9 @@ from frappe import _
 from frappe.model.document import Document
 from frappe.utils import now_datetime
 
+from repair_portal.instrument_setup.services import progress
+from repair_portal.instrument_setup.services.critical_path import on_task_change
+
 
 class ClarinetSetupTask(Document):
     # begin: auto-generated types
@@ -80,32 +83,17 @@ class ClarinetSetupTask(Document):
             self.actual_end = now_datetime()
 
     def on_update(self):
-        # Bubble up progress to parent
-        if self.clarinet_initial_setup:
-            try:
-                frappe.enqueue(
-                    "repair_portal.repair_portal.instrument_setup.doctype.clarinet_initial_setup.clarinet_initial_setup.update_parent_progress",
-                    initial_setup=self.clarinet_initial_setup,
-                    queue="short",
-                )
-            except Exception:
-                # Fallback if queue not available
-                update_parent_progress_inline(self.clarinet_initial_setup)
+        # Keep any cached critical-path graph for this setup current
+        on_task_change(self, "on_update")
+
+        # Bubble up progress to parent: O(1) delta now, debounced recount later
+        progress.on_task_update(self)
 
     def on_trash(self):
-        if self.clarinet_initial_setup:
-            update_parent_progress_inline(self.clarinet_initial_setup)
+        on_task_change(self, "on_trash")
+        progress.on_task_trash(self)
 
 
 def update_parent_progress_inline(initial_setup: str):
     """Inline (non-queued) parent progress roll-up fallback."""
-    tasks = frappe.get_all(
-        "Clarinet Setup Task",
-        filters={"clarinet_initial_setup": initial_setup},
-        fields=["name", "progress"],
-    )
-    if not tasks:
-        frappe.db.set_value("Clarinet Initial Setup", initial_setup, "progress", 0)
-        return
-    avg = round(sum((t.get("progress") or 0) for t in tasks) / len(tasks), 2)
-    frappe.db.set_value("Clarinet Initial Setup", initial_setup, "progress", avg)
+    progress.reconcile_setup_progress(initial_setup)
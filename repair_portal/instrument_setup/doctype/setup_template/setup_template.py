@@ -1,6 +1,6 @@
 # File: repair_portal/instrument_setup/doctype/setup_template/setup_template.py
 # Last Updated: 2025-09-16
-# Version: v1.6.1 (minutes-based, deterministic rounding, idempotent recalc)
+# Version: v1.7.0 (minutes-based, deterministic rounding, idempotent recalc, dependency cycle check)
 # Purpose: Robust recomputation of Estimated Hours and Estimated Total Cost.
 # Notes:
 #   - Primary: Hours = sum(exp_duration_mins) / 60
@@ -20,6 +20,8 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 
+from repair_portal.instrument_setup.services.critical_path import validate_template_dependencies
+
 D2 = Decimal("0.01")  # 2-decimal quantizer
 SIXTY = Decimal(60)  # 60 minutes
 
@@ -105,6 +107,7 @@ class SetupTemplate(Document):
         self.validate_template_consistency()
         self.auto_create_pad_map()
         self.validate_template_tasks()
+        validate_template_dependencies(self)
 
         # Save path: recompute deterministically and persist
         _, hours = _sum_minutes_and_hours(self.get("template_tasks"))
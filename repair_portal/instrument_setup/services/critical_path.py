@@ -0,0 +1,494 @@
+"""
+Path: repair_portal/instrument_setup/services/critical_path.py
+Version: 1.0.0
+Purpose:
+    Critical-path (CPM) scheduling over Clarinet Setup Task dependency graphs:
+      - Earliest/latest start & finish, slack and the critical path in O(V + E)
+      - Incremental recompute when one task changes (only descendants on the
+        forward pass; ancestors on the backward pass unless the project end moves)
+      - Cycle detection for Setup Template task dependencies (by sequence)
+      - Bulk schedule API for a multi-setup Gantt view
+
+Public API:
+    - TaskGraph                                     (pure, no DB access)
+    - validate_template_dependencies(template)      (Setup Template.validate)
+    - get_setup_schedules(setups)                   (whitelisted, bulk)
+    - on_task_change(doc, method)                   (Clarinet Setup Task hook)
+
+Units:
+    Durations and offsets are in days, matching exp_start_date/exp_end_date on
+    Clarinet Setup Task. Completed/Canceled tasks have zero remaining duration.
+"""
+
+from __future__ import annotations
+
+from collections import deque
+from collections.abc import Hashable, Iterable
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from typing import Any
+
+try:
+    import frappe
+    from frappe import _
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+    def _(s: str) -> str:  # type: ignore
+        return s
+
+
+TASK_DOCTYPE = "Clarinet Setup Task"
+TASK_DEP_DOCTYPE = "Clarinet Task Depends On"
+TEMPLATE_DEP_DOCTYPE = "Clarinet Template Task Depends On"
+SETUP_DOCTYPE = "Clarinet Initial Setup"
+DONE_STATUSES = {"Completed", "Canceled"}
+
+_CACHE_PREFIX = "repair_portal:setup_cpm:"
+_CACHE_TTL_SECONDS = 6 * 60 * 60
+_EPS = 1e-9
+
+
+class CycleError(ValueError):
+    """Raised when the dependency graph is not a DAG."""
+
+    def __init__(self, cycle: list[Hashable]):
+        self.cycle = cycle
+        super().__init__(" → ".join(str(n) for n in cycle))
+
+
+@dataclass
+class _Node:
+    duration: float = 0.0
+    release: float = 0.0  # earliest allowed start (offset from project start)
+    preds: list[Hashable] = field(default_factory=list)
+    succs: list[Hashable] = field(default_factory=list)
+    es: float = 0.0
+    ef: float = 0.0
+    ls: float = 0.0
+    lf: float = 0.0
+
+
+class TaskGraph:
+    """In-memory DAG with CPM passes and incremental updates."""
+
+    def __init__(self) -> None:
+        self.nodes: dict[Hashable, _Node] = {}
+        self.order: list[Hashable] = []
+        self.position: dict[Hashable, int] = {}
+        self.project_end = 0.0
+
+    # ----------------------------- construction -----------------------------
+
+    def add_task(self, key: Hashable, duration: float = 0.0, release: float = 0.0) -> None:
+        node = self.nodes.setdefault(key, _Node())
+        node.duration = max(0.0, float(duration or 0))
+        node.release = float(release or 0)
+
+    def add_dependency(self, predecessor: Hashable, successor: Hashable) -> None:
+        """``successor`` cannot start before ``predecessor`` finishes. Unknown keys are ignored."""
+        if predecessor == successor:
+            raise CycleError([successor, successor])
+        pred, succ = self.nodes.get(predecessor), self.nodes.get(successor)
+        if pred is None or succ is None or predecessor in succ.preds:
+            return
+        succ.preds.append(predecessor)
+        pred.succs.append(successor)
+
+    @classmethod
+    def build(
+        cls,
+        tasks: Iterable[tuple[Hashable, float, float]],
+        dependencies: Iterable[tuple[Hashable, Hashable]],
+    ) -> TaskGraph:
+        """Build and compute from ``(key, duration, release)`` tuples and ``(pred, succ)`` edges."""
+        graph = cls()
+        for key, duration, release in tasks:
+            graph.add_task(key, duration, release)
+        for pred, succ in dependencies:
+            graph.add_dependency(pred, succ)
+        graph.compute()
+        return graph
+
+    # -------------------------------- passes --------------------------------
+
+    def _toposort(self) -> list[Hashable]:
+        indegree = {k: len(n.preds) for k, n in self.nodes.items()}
+        ready = deque(k for k, d in indegree.items() if d == 0)
+        order: list[Hashable] = []
+        while ready:
+            k = ready.popleft()
+            order.append(k)
+            for s in self.nodes[k].succs:
+                indegree[s] -= 1
+                if indegree[s] == 0:
+                    ready.append(s)
+        if len(order) != len(self.nodes):
+            raise CycleError(self._find_cycle({k for k, d in indegree.items() if d > 0}))
+        return order
+
+    def _find_cycle(self, candidates: set[Hashable]) -> list[Hashable]:
+        """Return one cycle among nodes left over by Kahn's algorithm."""
+        start = next(iter(candidates))
+        seen: dict[Hashable, int] = {}
+        path: list[Hashable] = []
+        node = start
+        # Every leftover node has a leftover predecessor; walk back until we repeat.
+        while node not in seen:
+            seen[node] = len(path)
+            path.append(node)
+            node = next(p for p in self.nodes[node].preds if p in candidates)
+        cycle = path[seen[node] :]
+        cycle.reverse()
+        return [*cycle, cycle[0]]
+
+    def _forward(self, key: Hashable) -> None:
+        n = self.nodes[key]
+        n.es = max([n.release, *(self.nodes[p].ef for p in n.preds)])
+        n.ef = n.es + n.duration
+
+    def _backward(self, key: Hashable) -> None:
+        n = self.nodes[key]
+        n.lf = min([self.project_end, *(self.nodes[s].ls for s in n.succs)])
+        n.ls = n.lf - n.duration
+
+    def compute(self) -> None:
+        """Full forward + backward pass (O(V + E)). Raises CycleError."""
+        self.order = self._toposort()
+        self.position = {k: i for i, k in enumerate(self.order)}
+        for k in self.order:
+            self._forward(k)
+        self.project_end = max((n.ef for n in self.nodes.values()), default=0.0)
+        for k in reversed(self.order):
+            self._backward(k)
+
+    def _reachable(self, start: Hashable, attr: str) -> list[Hashable]:
+        seen = {start}
+        stack = [start]
+        while stack:
+            for nxt in getattr(self.nodes[stack.pop()], attr):
+                if nxt not in seen:
+                    seen.add(nxt)
+                    stack.append(nxt)
+        return sorted(seen, key=self.position.__getitem__)
+
+    def update_task(
+        self, key: Hashable, duration: float | None = None, release: float | None = None
+    ) -> set[Hashable]:
+        """
+        Change one task's duration/release and recompute incrementally.
+
+        Forward pass touches only ``key`` and its descendants. The backward pass
+        touches ``key`` and its ancestors, unless the project end moved, in which
+        case every latest date shifts and a full backward pass runs.
+        Returns the keys whose schedule values changed.
+        """
+        node = self.nodes[key]
+        if duration is not None:
+            node.duration = max(0.0, float(duration))
+        if release is not None:
+            node.release = float(release)
+
+        before = {k: (n.es, n.ls) for k, n in self.nodes.items()}
+        for k in self._reachable(key, "succs"):
+            self._forward(k)
+
+        new_end = max((n.ef for n in self.nodes.values()), default=0.0)
+        if abs(new_end - self.project_end) > _EPS:
+            self.project_end = new_end
+            for k in reversed(self.order):
+                self._backward(k)
+        else:
+            # LS of key may move; that only propagates to its ancestors' LF.
+            for k in reversed(self._reachable(key, "preds")):
+                self._backward(k)
+
+        return {k for k, n in self.nodes.items() if before[k] != (n.es, n.ls)}
+
+    # ------------------------------- queries --------------------------------
+
+    def slack(self, key: Hashable) -> float:
+        n = self.nodes[key]
+        return n.ls - n.es
+
+    def is_critical(self, key: Hashable) -> bool:
+        return abs(self.slack(key)) <= _EPS
+
+    def critical_path(self) -> list[Hashable]:
+        """One chain of zero-slack tasks, in execution order."""
+
+        def _tight(pred: Hashable, succ: Hashable) -> bool:
+            return self.is_critical(pred) and abs(self.nodes[pred].ef - self.nodes[succ].es) <= _EPS
+
+        current = next(
+            (
+                k
+                for k in self.order
+                if self.is_critical(k) and not any(_tight(p, k) for p in self.nodes[k].preds)
+            ),
+            None,
+        )
+        path: list[Hashable] = []
+        while current is not None:
+            path.append(current)
+            current = next(
+                (
+                    s
+                    for s in sorted(self.nodes[current].succs, key=self.position.__getitem__)
+                    if _tight(current, s) and self.is_critical(s)
+                ),
+                None,
+            )
+        return path
+
+    def as_dict(self, key: Hashable) -> dict[str, Any]:
+        n = self.nodes[key]
+        return {
+            "es": n.es,
+            "ef": n.ef,
+            "ls": n.ls,
+            "lf": n.lf,
+            "slack": n.ls - n.es,
+            "critical": self.is_critical(key),
+        }
+
+    # ---------------------------- serialisation -----------------------------
+
+    def dump(self) -> dict[str, Any]:
+        return {
+            "tasks": [[k, n.duration, n.release] for k, n in self.nodes.items()],
+            "deps": [[p, k] for k, n in self.nodes.items() for p in n.preds],
+        }
+
+    @classmethod
+    def load(cls, data: dict[str, Any]) -> TaskGraph:
+        return cls.build(((k, d, r) for k, d, r in data["tasks"]), ((p, s) for p, s in data["deps"]))
+
+
+# --------------------------------------------------------------------------- #
+#  Setup Template: cycle detection at save
+# --------------------------------------------------------------------------- #
+
+
+def _template_dependency_rows(template) -> dict[str, list[int]]:
+    """Map template-task row name → depended-on sequences (in-memory rows, else one DB query)."""
+    rows = list(template.get("template_tasks") or [])
+    deps: dict[str, list[int]] = {}
+    missing: list[str] = []
+    for row in rows:
+        child = row.get("depends_on") or []
+        if child:
+            deps[row.name] = [int(d.get("sequence") or 0) for d in child]
+        elif row.name and not row.is_new():
+            missing.append(row.name)
+    if missing:
+        for d in frappe.get_all(
+            TEMPLATE_DEP_DOCTYPE,
+            filters={"parenttype": "Clarinet Template Task", "parent": ["in", missing]},
+            fields=["parent", "sequence"],
+        ):
+            deps.setdefault(d.parent, []).append(int(d.sequence or 0))
+    return deps
+
+
+def validate_template_dependencies(template) -> TaskGraph:
+    """Throw if template task dependencies reference unknown sequences or form a cycle."""
+    rows = list(template.get("template_tasks") or [])
+    graph = TaskGraph()
+    for row in rows:
+        graph.add_task(
+            int(row.sequence or 0),
+            duration=_days_for_minutes(int(row.get("exp_duration_mins") or 0)),
+            release=int(row.get("exp_start_offset_days") or 0),
+        )
+
+    deps = _template_dependency_rows(template)
+    for row in rows:
+        seq = int(row.sequence or 0)
+        for dep_seq in deps.get(row.name, []):
+            if dep_seq not in graph.nodes:
+                frappe.throw(
+                    _("Template Task {0} depends on unknown sequence {1}.").format(seq, dep_seq)
+                )
+            try:
+                graph.add_dependency(dep_seq, seq)
+            except CycleError:
+                frappe.throw(_("Template Task {0} cannot depend on itself.").format(seq))
+
+    try:
+        graph.compute()
+    except CycleError as e:
+        frappe.throw(_("Template Task dependencies form a cycle: {0}").format(str(e)))
+    return graph
+
+
+def _days_for_minutes(minutes: int) -> float:
+    # Same calendar mapping as create_tasks_from_template: at least one day per task.
+    return float(max(1, -(-minutes // 1440))) if minutes > 0 else 1.0
+
+
+# --------------------------------------------------------------------------- #
+#  Clarinet Setup Task graphs
+# --------------------------------------------------------------------------- #
+
+
+def _as_date(value: Any) -> date | None:
+    if not value:
+        return None
+    return frappe.utils.getdate(value)
+
+
+def _load_setups(setups: list[str]) -> tuple[dict[str, date | None], dict[str, list[dict]], list[dict]]:
+    """Two queries for any number of setups: tasks, then dependency rows."""
+    base = {
+        s.name: _as_date(s.expected_start_date or s.setup_date)
+        for s in frappe.get_all(
+            SETUP_DOCTYPE,
+            filters={"name": ["in", setups]},
+            fields=["name", "expected_start_date", "setup_date"],
+        )
+    }
+    tasks = frappe.get_all(
+        TASK_DOCTYPE,
+        filters={"clarinet_initial_setup": ["in", list(base)]},
+        fields=[
+            "name",
+            "clarinet_initial_setup",
+            "subject",
+            "status",
+            "progress",
+            "sequence",
+            "exp_start_date",
+            "exp_end_date",
+            "assigned_to",
+        ],
+        order_by="sequence asc",
+        limit_page_length=0,
+    )
+    by_setup: dict[str, list[dict]] = {}
+    for t in tasks:
+        by_setup.setdefault(t.clarinet_initial_setup, []).append(t)
+    deps = (
+        frappe.get_all(
+            TASK_DEP_DOCTYPE,
+            filters={"parenttype": TASK_DOCTYPE, "parent": ["in", [t.name for t in tasks]]},
+            fields=["parent", "task"],
+            limit_page_length=0,
+        )
+        if tasks
+        else []
+    )
+    return base, by_setup, deps
+
+
+def _task_tuple(task: dict, base: date | None) -> tuple[str, float, float]:
+    start, end = _as_date(task.get("exp_start_date")), _as_date(task.get("exp_end_date"))
+    span = float(((end - start).days + 1) if start and end else 1)
+    release = float((start - base).days) if start and base else 0.0
+    remaining = 0.0 if task.get("status") in DONE_STATUSES else max(1.0, span)
+    return task["name"], remaining, release
+
+
+def build_setup_graph(tasks: list[dict], deps: Iterable[dict], base: date | None) -> TaskGraph:
+    names = {t["name"] for t in tasks}
+    return TaskGraph.build(
+        (_task_tuple(t, base) for t in tasks),
+        ((d["task"], d["parent"]) for d in deps if d["parent"] in names),
+    )
+
+
+def _schedule_payload(setup: str, base: date | None, tasks: list[dict], graph: TaskGraph) -> dict[str, Any]:
+    def _day(offset: float) -> str | None:
+        return str(base + timedelta(days=int(offset))) if base else None
+
+    rows = []
+    for t in tasks:
+        cpm = graph.as_dict(t["name"])
+        rows.append(
+            {
+                "name": t["name"],
+                "subject": t.get("subject"),
+                "status": t.get("status"),
+                "progress": t.get("progress") or 0,
+                "assigned_to": t.get("assigned_to"),
+                "dependencies": list(graph.nodes[t["name"]].preds),
+                "earliest_start": _day(cpm["es"]),
+                "earliest_finish": _day(max(cpm["ef"] - 1, cpm["es"])),
+                "latest_start": _day(cpm["ls"]),
+                "latest_finish": _day(max(cpm["lf"] - 1, cpm["ls"])),
+                **cpm,
+            }
+        )
+    return {
+        "setup": setup,
+        "base_date": str(base) if base else None,
+        "project_days": graph.project_end,
+        "critical_path": graph.critical_path(),
+        "tasks": rows,
+    }
+
+
+def get_setup_schedules(setups: str | list[str]) -> dict[str, Any]:
+    """Bulk CPM schedule for many Clarinet Initial Setups (Gantt feed)."""
+    if isinstance(setups, str):
+        setups = frappe.parse_json(setups) if setups.strip().startswith("[") else [setups]
+    setups = [s for s in setups if frappe.has_permission(SETUP_DOCTYPE, "read", s)]
+    if not setups:
+        return {"setups": [], "errors": {}}
+
+    base, by_setup, deps = _load_setups(setups)
+    out: list[dict[str, Any]] = []
+    errors: dict[str, str] = {}
+    for setup in setups:
+        tasks = by_setup.get(setup, [])
+        try:
+            graph = build_setup_graph(tasks, deps, base.get(setup))
+        except CycleError as e:
+            errors[setup] = _("Dependency cycle: {0}").format(str(e))
+            continue
+        _cache_graph(setup, graph)
+        out.append(_schedule_payload(setup, base.get(setup), tasks, graph))
+    return {"setups": out, "errors": errors}
+
+
+if frappe is not None:
+    get_setup_schedules = frappe.whitelist()(get_setup_schedules)
+
+
+# --------------------------------------------------------------------------- #
+#  Incremental maintenance (Clarinet Setup Task.on_update)
+# --------------------------------------------------------------------------- #
+
+
+def _cache_graph(setup: str, graph: TaskGraph) -> None:
+    frappe.cache().set_value(_CACHE_PREFIX + setup, graph.dump(), expires_in_sec=_CACHE_TTL_SECONDS)
+
+
+def get_cached_graph(setup: str) -> TaskGraph | None:
+    data = frappe.cache().get_value(_CACHE_PREFIX + setup)
+    return TaskGraph.load(data) if data else None
+
+
+def on_task_change(doc, method: str | None = None) -> None:
+    """Keep the cached setup graph current: incremental update, or drop it when edges changed."""
+    setup = doc.get("clarinet_initial_setup")
+    if not setup:
+        return
+    graph = get_cached_graph(setup)
+    if graph is None:
+        return
+    key = doc.name
+    wanted_preds = {d.task for d in doc.get("depends_on") or [] if d.task}
+    if method == "on_trash" or key not in graph.nodes or set(graph.nodes[key].preds) != wanted_preds:
+        frappe.cache().delete_value(_CACHE_PREFIX + setup)
+        return
+
+    dates = frappe.db.get_value(SETUP_DOCTYPE, setup, ["expected_start_date", "setup_date"], as_dict=True)
+    base = _as_date((dates.expected_start_date or dates.setup_date) if dates else None)
+    _, duration, release = _task_tuple(doc.as_dict(), base)
+    try:
+        graph.update_task(key, duration=duration, release=release)
+    except CycleError:
+        frappe.cache().delete_value(_CACHE_PREFIX + setup)
+        return
+    _cache_graph(setup, graph)
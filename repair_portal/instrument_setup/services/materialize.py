@@ -0,0 +1,159 @@
+"""
+Path: repair_portal/instrument_setup/services/materialize.py
+Version: 1.0.0
+Purpose:
+    Bulk-create Clarinet Setup Tasks (and their depends_on rows) for an
+    Initial Setup from its Setup Template.
+      - Names are assigned up front, so template dependencies (by sequence)
+        resolve to task names before anything is written
+      - Tasks and dependency rows go in with one multi-row INSERT each instead
+        of a full insert() (validate + hooks + child writes) per template row
+      - The parent's task counter is bumped once for the whole batch
+
+Public API:
+    - plan_task_rows(rows, base_date, defaults)   (pure: dates/priorities per row)
+    - materialize_tasks(setup_doc, template)      → list of created task names
+"""
+
+from __future__ import annotations
+
+from math import ceil
+from typing import Any
+
+import frappe
+from frappe.model.naming import set_new_name
+from frappe.utils import add_days, now_datetime
+
+from repair_portal.instrument_setup.services import progress
+from repair_portal.instrument_setup.services.critical_path import (
+    _CACHE_PREFIX,
+    TASK_DEP_DOCTYPE,
+    TASK_DOCTYPE,
+    _template_dependency_rows,
+)
+
+_TASK_FIELDS = (
+    "name",
+    "owner",
+    "creation",
+    "modified",
+    "modified_by",
+    "docstatus",
+    "idx",
+    "clarinet_initial_setup",
+    "subject",
+    "description",
+    "priority",
+    "status",
+    "progress",
+    "sequence",
+    "exp_start_date",
+    "exp_end_date",
+    "instrument",
+    "serial",
+    "is_group",
+)
+_DEP_FIELDS = (
+    "name",
+    "owner",
+    "creation",
+    "modified",
+    "modified_by",
+    "docstatus",
+    "idx",
+    "parent",
+    "parenttype",
+    "parentfield",
+    "task",
+)
+
+
+def _span_days(row) -> int:
+    minutes = int(row.get("exp_duration_mins") or 0)
+    if minutes > 0:
+        return max(1, ceil(minutes / 1440.0))  # 1440 mins/day
+    # Legacy fallback
+    return max(1, int(row.get("exp_duration_days") or 1))
+
+
+def plan_task_rows(rows: list, base_date: Any, defaults: dict[str, Any]) -> list[dict[str, Any]]:
+    """Field values for each template row (offsets in days, durations in minutes)."""
+    planned: list[dict[str, Any]] = []
+    for row in rows:
+        exp_start = add_days(base_date, int(row.get("exp_start_offset_days") or 0))
+        planned.append(
+            {
+                **defaults,
+                "subject": row.subject,
+                "description": row.description,
+                "priority": row.get("default_priority") or defaults.get("priority") or "Medium",
+                "status": "Open",
+                "progress": 0,
+                "sequence": row.sequence,
+                "exp_start_date": exp_start,
+                "exp_end_date": add_days(exp_start, _span_days(row) - 1),
+                "is_group": 0,
+            }
+        )
+    return planned
+
+
+def _stamp(doc, user: str, now) -> None:
+    doc.owner = doc.modified_by = user
+    doc.creation = doc.modified = now
+    doc.docstatus = 0
+
+
+def materialize_tasks(setup_doc, template) -> list[str]:
+    """Insert one task per template row with two bulk INSERTs; returns names in sequence order."""
+    rows = sorted(template.get("template_tasks") or [], key=lambda r: r.sequence or 0)
+    if not rows:
+        return []
+
+    base_date = setup_doc.expected_start_date or setup_doc.setup_date
+    planned = plan_task_rows(
+        rows,
+        base_date,
+        {
+            "clarinet_initial_setup": setup_doc.name,
+            "priority": setup_doc.priority,
+            "instrument": setup_doc.instrument,
+            "serial": setup_doc.serial,
+        },
+    )
+
+    user = frappe.session.user
+    now = now_datetime()
+    tasks = []
+    for idx, values in enumerate(planned, start=1):
+        task = frappe.new_doc(TASK_DOCTYPE)
+        task.update(values)
+        task.idx = idx
+        _stamp(task, user, now)
+        set_new_name(task)
+        tasks.append(task)
+
+    by_sequence = {int(t.sequence or 0): t.name for t in tasks}
+    template_deps = _template_dependency_rows(template)
+    dep_values: list[tuple] = []
+    for row, task in zip(rows, tasks):
+        for dep_idx, dep_seq in enumerate(template_deps.get(row.name, []), start=1):
+            dep_task = by_sequence.get(int(dep_seq))
+            if not dep_task:
+                continue
+            dep = task.append("depends_on", {"task": dep_task})
+            dep.idx = dep_idx
+            _stamp(dep, user, now)
+            set_new_name(dep)
+            dep_values.append(tuple(dep.get(f) for f in _DEP_FIELDS))
+
+    frappe.db.bulk_insert(TASK_DOCTYPE, _TASK_FIELDS, [tuple(t.get(f) for f in _TASK_FIELDS) for t in tasks])
+    if dep_values:
+        frappe.db.bulk_insert(TASK_DEP_DOCTYPE, _DEP_FIELDS, dep_values)
+
+    # New tasks start at 0%, so only the count moves.
+    progress.apply_delta(setup_doc.name, 0, len(tasks))
+    progress.schedule_reconcile(setup_doc.name)
+    # The bulk path skips on_task_change, so any cached CPM graph is now stale.
+    frappe.cache().delete_value(_CACHE_PREFIX + setup_doc.name)
+    return [t.name for t in tasks]
@@ -0,0 +1,110 @@
+"""
+Path: repair_portal/instrument_setup/services/progress.py
+Version: 1.1.0
+Purpose:
+    Incremental progress roll-up for Clarinet Initial Setup.
+      - The parent keeps a running task_count and task_progress_total; each task
+        change applies its delta with one UPDATE (no rescan of sibling tasks)
+      - A full recount still runs as a safety net; the job is deduplicated per setup,
+        so a burst of ticks while one is queued collapses into that job (one scan)
+
+Public API:
+    - on_task_update(doc) / on_task_trash(doc)   (Clarinet Setup Task controller)
+    - apply_delta(setup, progress_delta, count_delta)
+    - schedule_reconcile(setup)
+    - reconcile_setup_progress(setup)            (RQ job target)
+"""
+
+from __future__ import annotations
+
+import frappe
+from frappe.utils import flt
+
+SETUP_DOCTYPE = "Clarinet Initial Setup"
+TASK_DOCTYPE = "Clarinet Setup Task"
+
+_JOB_ID_PREFIX = "setup-progress::"
+
+
+def apply_delta(setup: str, progress_delta: float, count_delta: int) -> None:
+    """Atomically shift the running sum/count and recompute progress in the same statement."""
+    if not setup or (not progress_delta and not count_delta):
+        return
+    # progress is assigned first so it reads the pre-update columns on every backend.
+    frappe.db.sql(
+        """
+        update `tabClarinet Initial Setup`
+        set progress = case
+                when ifnull(task_count, 0) + %(count)s <= 0 then 0
+                else round((ifnull(task_progress_total, 0) + %(delta)s) / (ifnull(task_count, 0) + %(count)s), 2)
+            end,
+            task_progress_total = greatest(ifnull(task_progress_total, 0) + %(delta)s, 0),
+            task_count = greatest(ifnull(task_count, 0) + %(count)s, 0)
+        where name = %(setup)s
+        """,
+        {"setup": setup, "delta": flt(progress_delta), "count": int(count_delta)},
+    )
+
+
+def on_task_update(doc) -> None:
+    """Apply the delta between this save and the previous one."""
+    before = doc.get_doc_before_save()
+    setup = doc.clarinet_initial_setup
+    progress = flt(doc.progress)
+
+    if before is None:
+        apply_delta(setup, progress, 1)
+    elif before.clarinet_initial_setup != setup:
+        apply_delta(before.clarinet_initial_setup, -flt(before.progress), -1)
+        apply_delta(setup, progress, 1)
+        schedule_reconcile(before.clarinet_initial_setup)
+    else:
+        apply_delta(setup, progress - flt(before.progress), 0)
+
+    schedule_reconcile(setup)
+
+
+def on_task_trash(doc) -> None:
+    apply_delta(doc.clarinet_initial_setup, -flt(doc.progress), -1)
+    schedule_reconcile(doc.clarinet_initial_setup)
+
+
+def schedule_reconcile(setup: str | None) -> None:
+    """Enqueue a recount after commit; while one is still queued for this setup, reuse it."""
+    if not setup:
+        return
+    try:
+        frappe.enqueue(
+            "repair_portal.instrument_setup.services.progress.reconcile_setup_progress",
+            queue="short",
+            job_id=_JOB_ID_PREFIX + setup,
+            deduplicate=True,
+            enqueue_after_commit=True,
+            setup=setup,
+        )
+    except Exception:
+        # No queue available (tests, migrate): the incremental delta is already applied.
+        pass
+
+
+def reconcile_setup_progress(setup: str) -> None:
+    """Recount from the task table and overwrite the running sum/count."""
+    row = frappe.db.sql(
+        """
+        select count(*), coalesce(sum(progress), 0)
+        from `tabClarinet Setup Task`
+        where clarinet_initial_setup = %s
+        """,
+        setup,
+    )
+    count, total = (int(row[0][0]), flt(row[0][1])) if row else (0, 0.0)
+    frappe.db.set_value(
+        SETUP_DOCTYPE,
+        setup,
+        {
+            "task_count": count,
+            "task_progress_total": total,
+            "progress": round(total / count, 2) if count else 0,
+        },
+        update_modified=False,
+    )
@@ -219,6 +219,39 @@ class TestInstrumentSetup(unittest.TestCase):
         expected_progress = (100 + 50 + 0) / 3
         assert setup.progress == round(expected_progress, 2)
 
+    def test_incremental_progress_matches_recount(self):
+        """Per-save deltas keep the parent counters equal to a full recount."""
+        setup = self.test_clarinet_initial_setup_creation()
+        tasks = [
+            frappe.get_doc(
+                {
+                    "doctype": "Clarinet Setup Task",
+                    "clarinet_initial_setup": setup.name,
+                    "subject": f"Delta {i}",
+                    "sequence": i + 1,
+                }
+            ).insert()
+            for i in range(4)
+        ]
+        tasks[0].progress = 40
+        tasks[0].save()
+        tasks[0].progress = 80
+        tasks[0].save()
+        tasks[1].status = "Completed"
+        tasks[1].save()
+        tasks[3].delete()
+
+        setup.reload()
+        assert setup.task_count == 3
+        assert setup.task_progress_total == 180
+        assert setup.progress == 60
+
+        from repair_portal.instrument_setup.services.progress import reconcile_setup_progress
+
+        reconcile_setup_progress(setup.name)
+        setup.reload()
+        assert (setup.task_count, setup.task_progress_total, setup.progress) == (3, 180, 60)
+
     def test_data_validation(self):
         """Test data validation rules."""
         # Test date validation
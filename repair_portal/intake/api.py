@@ -17,11 +17,11 @@ from frappe import _
 from frappe.utils import get_link_to_form
 
 from repair_portal.intake.doctype.brand_mapping_rule.brand_mapping_rule import map_brand
-from repair_portal.intake.services import intake_sync
+from repair_portal.intake.services import brand_index, intake_sync, serial_resolver
 from repair_portal.repair_portal_settings.doctype.repair_portal_settings.repair_portal_settings import (  # noqa: F401
     RepairPortalSettings,
 )
-from repair_portal.utils.serials import find_by_serial, normalize_serial
+from repair_portal.utils.serials import normalize_serial
 
 LOGGER = frappe.logger('intake')
 _PRIVILEGED_ROLES = {'System Manager', 'Intake Coordinator'}
@@ -38,14 +38,6 @@ _ALLOWED_PLAYER_FIELDS = {
 }
 
 
-def _ensure_serial_field_type() -> str | None:
-    try:
-        df = frappe.get_meta('Instrument').get_field('serial_no')
-    except Exception:
-        return None
-    return getattr(df, 'fieldtype', None) if df else None
-
-
 def _is_privileged(user: str | None = None) -> bool:
     user = user or frappe.session.user
     if not user:
@@ -238,46 +230,40 @@ def get_instrument_by_serial(serial_no: str) -> dict[str, Any] | None:
     if not serial_no:
         return None
 
-    serial_field_type = _ensure_serial_field_type()
-    isn_doc = find_by_serial(serial_no)
-    instrument_doc = None
-
-    if serial_field_type == 'Link' and isn_doc and isn_doc.get('name'):
-        instrument_name = frappe.db.get_value('Instrument', {'serial_no': isn_doc['name']}, 'name')
-        if instrument_name:
-            instrument_doc = frappe.get_doc('Instrument', instrument_name)
-    if not instrument_doc:
-        instrument_name = frappe.db.get_value('Instrument', {'serial_no': serial_no}, 'name')
-        if instrument_name:
-            instrument_doc = frappe.get_doc('Instrument', instrument_name)
-
+    resolved = serial_resolver.resolve(serial_no)
+    details = resolved['details'] if resolved else None
     normalized = normalize_serial(serial_no)
     response: dict[str, Any] = {
         'serial_input': serial_no,
         'normalized_serial': normalized,
-        'match': bool(instrument_doc),
+        'match': bool(details),
         'instrument': None,
-        'instrument_name': getattr(instrument_doc, 'name', None),
-        'instrument_serial_number': isn_doc.get('name') if isn_doc else None,
+        'instrument_name': resolved['instrument'] if details else None,
+        'instrument_serial_number': resolved['instrument_serial_number'] if resolved else None,
+        'instrument_profile': resolved['instrument_profile'] if details else None,
+        'customer': resolved['customer'] if details else None,
         'brand_mapping': None,
     }
 
-    if instrument_doc:
+    if details:
         data = {
-            'name': instrument_doc.name,
-            'manufacturer': getattr(instrument_doc, 'brand', None),
-            'model': getattr(instrument_doc, 'model', None),
-            'clarinet_type': getattr(instrument_doc, 'clarinet_type', None),
-            'body_material': getattr(instrument_doc, 'body_material', None),
-            'key_plating': getattr(instrument_doc, 'key_plating', None),
-            'instrument_category': getattr(instrument_doc, 'instrument_category', None),
+            'name': resolved['instrument'],
+            'manufacturer': details.get('brand'),
+            'model': details.get('model'),
+            'clarinet_type': details.get('clarinet_type'),
+            'body_material': details.get('body_material'),
+            'key_plating': details.get('key_plating'),
+            'instrument_category': details.get('instrument_category'),
         }
         if data.get('manufacturer'):
+            brand_match = brand_index.match_brand(data['manufacturer'])
             response['brand_mapping'] = {
                 'input': data['manufacturer'],
-                'mapped': map_brand(data['manufacturer']),
+                'mapped': brand_match.brand or map_brand(data['manufacturer']),
+                'confidence': round(brand_match.confidence, 3),
+                'method': brand_match.method,
             }
-            data['manufacturer'] = response['brand_mapping']['mapped']
+            # The stored manufacturer stays as recorded; the (possibly fuzzy) mapping is advisory only
         response['instrument'] = data
 
     LOGGER.info(
@@ -1,32 +1,23 @@
 # Absolute Path: /home/frappe/frappe-bench/apps/repair_portal/repair_portal/intake/doctype/brand_mapping_rule/brand_mapping_rule.py
-# Last Updated: 2025-09-19
-# Version: v1.2.0 (Normalization + case-insensitive uniqueness + reusable map_brand helper)
+# Last Updated: 2026-10-19
+# Version: v1.3.1 (Indexed normalized_key + site-wide compiled brand index with fuzzy matching)
 # Purpose:
 #   Define brand mapping rules for instrument profiles in the Repair Portal, ensuring consistent brand naming.
-#   • Normalizes inputs (trim, collapse whitespace) and performs case-insensitive duplicate checks
-#   • Exposes map_brand(name: str) -> str for controller reuse
+#   • Normalizes inputs (trim, collapse whitespace) and stores an indexed normalized_key
+#   • Case-insensitive duplicate check is a single indexed lookup on normalized_key; rows saved through
+#     the Clarinet Intake Settings grid are de-duplicated (and the brand index refreshed) by the parent
+#   • Exposes map_brand(name: str) -> str for controller reuse (backed by intake.services.brand_index)
 # Dependencies: Frappe Framework (Document API)
 
 from __future__ import annotations
 
-import re
-
 import frappe
 from frappe import _
 from frappe.model.document import Document
 
-# Simple in-process cache to avoid repeated full scans during a single request
-_brand_map_cache_key = "repair_portal__brand_map_cache"
-
-
-def _collapse_ws(s: str) -> str:
-    """Trim and collapse internal whitespace to single spaces."""
-    return re.sub(r"\s+", " ", (s or "").strip())
-
-
-def _normalized_for_compare(s: str) -> str:
-    """Normalization used for comparisons (trim/collapse + casefold)."""
-    return _collapse_ws(s).casefold()
+from repair_portal.intake.services import brand_index
+from repair_portal.intake.services.brand_index import collapse_ws as _collapse_ws
+from repair_portal.intake.services.brand_index import normalize_key as _normalized_for_compare
 
 
 class BrandMappingRule(Document):
@@ -47,55 +38,29 @@ class BrandMappingRule(Document):
         if not self.to_brand:  # type: ignore
             frappe.throw(_("Mapped Brand is required"))
 
+        self.normalized_key = _normalized_for_compare(self.from_brand)  # type: ignore
+
         # Enforce case-insensitive uniqueness on from_brand (across all rows)
         self._validate_unique_from_brand()
 
-        # Invalidate the cache so subsequent lookups reflect this change
-        if hasattr(frappe.local, _brand_map_cache_key):
-            delattr(frappe.local, _brand_map_cache_key)
-
     def _validate_unique_from_brand(self) -> None:
-        """Ensure there is no other row whose normalized from_brand equals ours."""
-        target_norm = _normalized_for_compare(self.from_brand)  # type: ignore
-
-        # Pull all sibling rules (child table rows live globally)
-        rows = frappe.get_all(
+        """Ensure there is no other row whose normalized from_brand equals ours (indexed lookup)."""
+        clash = frappe.db.get_value(
             "Brand Mapping Rule",
-            fields=["name", "from_brand"],
+            {"normalized_key": self.normalized_key, "name": ["!=", self.name or ""]},  # type: ignore
+            "name",
         )
-
-        for r in rows:
-            if r.get("name") == self.name:
-                continue
-            other_norm = _normalized_for_compare(r.get("from_brand") or "")
-            if other_norm == target_norm:
-                frappe.throw(
-                    _("A mapping for source brand '{0}' already exists (case-insensitive match).").format(
-                        self.from_brand  # type: ignore
-                    )
+        if clash:
+            frappe.throw(
+                _("A mapping for source brand '{0}' already exists (case-insensitive match).").format(
+                    self.from_brand  # type: ignore
                 )
+            )
 
 
-def _load_brand_map() -> dict[str, str]:
-    """
-    Load all brand mappings into a dict keyed by normalized from_brand (case-insensitive),
-    values are the stored to_brand strings.
-    """
-    cache = getattr(frappe.local, _brand_map_cache_key, None)
-    if cache is not None:
-        return cache
-
-    rows = frappe.get_all("Brand Mapping Rule", fields=["from_brand", "to_brand"])
-    brand_map: dict[str, str] = {}
-    for r in rows:
-        f = _normalized_for_compare(r.get("from_brand") or "")
-        t = _collapse_ws(r.get("to_brand") or "")
-        if f:
-            # Last-one-wins if duplicates somehow exist; validation should prevent it
-            brand_map[f] = t
-
-    setattr(frappe.local, _brand_map_cache_key, brand_map)
-    return brand_map
+def normalize_brand(name: str | None) -> str:
+    """Comparison form of a brand: trim, collapse whitespace, casefold."""
+    return _normalized_for_compare(name or "")
 
 
 def map_brand(name: str | None) -> str | None:
@@ -105,5 +70,13 @@ def map_brand(name: str | None) -> str | None:
     """
     if not name:
         return name
-    m = _load_brand_map()
+    m = brand_index.get_index().exact
     return m.get(_normalized_for_compare(name), _collapse_ws(name))
+
+
+def find_brand_match(name: str | None) -> str | None:
+    """Like map_brand, but also accepts punctuation variants and confident fuzzy matches (typos)."""
+    if not name:
+        return name
+    match = brand_index.match_brand(name)
+    return match.brand or _collapse_ws(name)
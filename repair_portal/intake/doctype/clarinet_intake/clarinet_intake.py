@@ -1,8 +1,8 @@
 # ---
 # File Header:
 # Absolute Path: /home/frappe/frappe-bench/apps/repair_portal/repair_portal/intake/doctype/clarinet_intake/clarinet_intake.py
-# Last Updated: 2025-09-19
-# Version: v9.3.0 (Hardening: idempotent creation guards, legacy-serial compatibility, stricter API permissions)
+# Last Updated: 2026-10-19
+# Version: v9.4.0 (Serial lookups via cached intake.services.serial_resolver)
 # Purpose:
 #   Ensures all intake types auto-create:
 #     • Instrument (custom)
@@ -29,6 +29,7 @@ from frappe.utils import nowdate
 from repair_portal.intake.doctype.clarinet_intake.clarinet_intake_timeline import (
     add_timeline_entries,
 )
+from repair_portal.intake.services import serial_resolver
 from repair_portal.repair_portal_settings.doctype.clarinet_intake_settings.clarinet_intake_settings import (
     get_intake_settings,
 )
@@ -167,32 +168,18 @@ class ClarinetIntake(Document):
         Works whether Instrument.serial_no is a Link (→ Instrument Serial Number) or Data.
         """
         if self.serial_no and not self.instrument:  # type: ignore
-            serial_no_input = self.serial_no.strip()  # type: ignore
-            isn = find_by_serial(serial_no_input)
-            instr_doc = None
-
-            # Prefer the new Link-to-ISN schema
-            if isn and isn.get("name"):
-                if _get_instrument_serial_field_type() == "Link":
-                    instr_name = frappe.db.get_value("Instrument", {"serial_no": isn["name"]}, "name")
-                    if instr_name:
-                        instr_doc = frappe.get_doc("Instrument", instr_name)  # type: ignore
-
-            # Fallback for legacy Data schema
-            if not instr_doc:
-                instr_name = frappe.db.get_value("Instrument", {"serial_no": serial_no_input}, "name")
-                if instr_name:
-                    instr_doc = frappe.get_doc("Instrument", instr_name)  # type: ignore
+            resolved = serial_resolver.resolve(self.serial_no.strip())  # type: ignore
+            details = resolved["details"] if resolved else None
 
             # Populate basic fields from the Instrument, if found
-            if instr_doc:
-                self.instrument = instr_doc.name
+            if details:
+                self.instrument = resolved["instrument"]
                 if not self.manufacturer:
-                    self.manufacturer = getattr(instr_doc, "brand", None)
+                    self.manufacturer = details.get("brand")
                 if not self.model:
-                    self.model = getattr(instr_doc, "model", None)
+                    self.model = details.get("model")
                 if not self.instrument_category:
-                    self.instrument_category = getattr(instr_doc, "instrument_category", None)
+                    self.instrument_category = details.get("instrument_category")
 
     def _ensure_player_profile_link(self) -> None:
         if not self.meta.has_field("player_profile"):
@@ -557,14 +544,10 @@ class ClarinetIntake(Document):
         • Link → Instrument Serial Number: search by ISN name.
         • Data: search by raw serial string.
         """
-        field_type = _get_instrument_serial_field_type()
-
-        if field_type == "Link" and isn_name:
+        resolved = serial_resolver.resolve(serial_no_input)
+        name = resolved["instrument"] if resolved else None
+        if not name and isn_name and _get_instrument_serial_field_type() == "Link":
             name = frappe.db.get_value("Instrument", {"serial_no": isn_name}, "name")
-            return frappe.get_doc("Instrument", name) if name else None  # type: ignore
-
-        # Legacy Data field or no ISN yet — search by plain serial
-        name = frappe.db.get_value("Instrument", {"serial_no": serial_no_input}, "name")
         return frappe.get_doc("Instrument", name) if name else None  # type: ignore
 
     def _should_create_consent(self) -> bool:
@@ -652,48 +635,21 @@ def get_instrument_by_serial(serial_no: str) -> dict[str, str | int | None] | No
     if not frappe.has_permission("Clarinet Intake", ptype="read"):
         frappe.throw(_("Not permitted"), frappe.PermissionError)
 
-    # Prefer ISN path for Link-style Instrument.serial_no
-    isn = find_by_serial(serial_no)
-    if isn and isn.get("name") and _get_instrument_serial_field_type() == "Link":
-        instr_name = frappe.db.get_value("Instrument", {"serial_no": isn["name"]}, "name")
-        if instr_name:
-            data = frappe.db.get_value(
-                "Instrument",
-                instr_name,
-                [
-                    "name",
-                    "brand",
-                    "model",
-                    "clarinet_type",
-                    "body_material",
-                    "key_plating",
-                    "year_of_manufacture",
-                    "instrument_category",
-                ],
-                as_dict=True,
-            )
-            if data:
-                data["manufacturer"] = data.pop("brand", None)  # normalize key for intake UI
-            return data  # type: ignore
-
-    # Legacy Data fallback
-    data = frappe.db.get_value(
-        "Instrument",
-        {"serial_no": serial_no},
-        [
-            "name",
-            "brand",
-            "model",
-            "clarinet_type",
-            "body_material",
-            "key_plating",
-            "year_of_manufacture",
-            "instrument_category",
-        ],
-        as_dict=True,
-    )
-    if data:
-        data["manufacturer"] = data.pop("brand", None)
+    # Cached resolution (ISN → Instrument, or legacy Data serial_no match)
+    resolved = serial_resolver.resolve(serial_no)
+    details = resolved["details"] if resolved else None
+    if not details:
+        return None
+    data = {
+        "name": resolved["instrument"],
+        "manufacturer": details.get("brand"),  # normalize key for intake UI
+        "model": details.get("model"),
+        "clarinet_type": details.get("clarinet_type"),
+        "body_material": details.get("body_material"),
+        "key_plating": details.get("key_plating"),
+        "year_of_manufacture": details.get("year_of_manufacture"),
+        "instrument_category": details.get("instrument_category"),
+    }
     return data  # type: ignore
 
 
@@ -718,14 +674,9 @@ def get_instrument_inspection_name(intake_record_id: str) -> str | None:
 def _get_instrument_serial_field_type() -> str | None:
     """
     Return the fieldtype of Instrument.serial_no ('Link' | 'Data' | None).
-    Kept dynamic to support both legacy and modern schemas.
+    Kept dynamic to support both legacy and modern schemas; memoized per request.
     """
-    try:
-        meta = frappe.get_meta("Instrument")
-        df = meta.get_field("serial_no")
-        return getattr(df, "fieldtype", None) if df else None
-    except Exception:
-        return None
+    return serial_resolver.serial_field_type()
 
 
 def _get_field_df(doctype: str, fieldname: str):
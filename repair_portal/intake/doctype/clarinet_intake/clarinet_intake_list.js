@@ -163,6 +163,20 @@
         bulk_set_status(listview, 'Returned to Customer')
       );
 
+      // ---------- Bulk Actions: QR tag sheet (one PDF for the whole selection) ----------
+      listview.page.add_actions_menu_item(__('Print QR Tag Sheet'), () => {
+        const names = listview.get_checked_items(true);
+        if (!names.length) {
+          frappe.show_alert({ message: __('Select at least one Intake first.'), indicator: 'orange' });
+          return;
+        }
+        const url = frappe.urllib.get_full_url(
+          '/api/method/repair_portal.repair_portal.utils.barcode.render_label_sheet?' +
+            $.param({ doctype: DOCTYPE, names: JSON.stringify(names) })
+        );
+        window.open(url);
+      });
+
       // ---------- Suggested list columns (informational) ----------
       // Users can still customize columns via List Settings; below is just documentation/comment:
       // Proposed columns: intake_record_id (Title), status, intake_type, serial_no, manufacturer, model, customer, modified
@@ -0,0 +1,271 @@
+# Path: repair_portal/intake/services/brand_index.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Site-wide compiled brand index (Brand Mapping Rule + canonical brands) with exact,
+#              punctuation-insensitive and trigram/edit-distance fuzzy matching and confidence scores.
+# Dependencies: frappe (optional for the pure BrandIndex)
+
+from __future__ import annotations
+
+import re
+import uuid
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from heapq import nlargest
+from itertools import chain
+from typing import Any, Iterable
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+RULE_DOCTYPE = "Brand Mapping Rule"
+VERSION_KEY = "repair_portal:brand_index:version"
+PAIRS_KEY = "repair_portal:brand_index:pairs"
+_LOCAL_VERSION_ATTR = "repair_portal_brand_index_version"
+
+DEFAULT_MIN_CONFIDENCE = 0.8
+COMPACT_CONFIDENCE = 0.97
+_MAX_CANDIDATES = 8
+_MEMO_LIMIT = 20000
+
+_WS_RE = re.compile(r"\s+")
+_NON_ALNUM_RE = re.compile(r"[^0-9a-z]+")
+
+
+# ---------------------------------------------------------------------------
+# Normalization
+# ---------------------------------------------------------------------------
+def collapse_ws(s: str | None) -> str:
+    """Trim and collapse internal whitespace to single spaces."""
+    return _WS_RE.sub(" ", (s or "").strip())
+
+
+def normalize_key(s: str | None) -> str:
+    """Comparison key stored in Brand Mapping Rule.normalized_key (trim/collapse + casefold)."""
+    return collapse_ws(s).casefold()
+
+
+def compact_key(s: str | None) -> str:
+    """Punctuation/space-insensitive key: 'Buffet-Crampon  Paris' → 'buffetcramponparis'."""
+    return _NON_ALNUM_RE.sub("", normalize_key(s))
+
+
+def _trigrams(key: str) -> set[str]:
+    padded = f"  {key} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+def _levenshtein(a: str, b: str, limit: int) -> int:
+    """Edit distance restricted to the diagonal band of width ``limit`` (returns limit + 1 beyond it)."""
+    la, lb = len(a), len(b)
+    if abs(la - lb) > limit:
+        return limit + 1
+    over = limit + 1
+    prev = [j if j <= limit else over for j in range(lb + 1)]
+    for i in range(1, la + 1):
+        lo, hi = max(1, i - limit), min(lb, i + limit)
+        cur = [over] * (lb + 1)
+        if i <= limit:
+            cur[0] = i
+        ca = a[i - 1]
+        best = cur[0]
+        for j in range(lo, hi + 1):
+            v = prev[j - 1] + (ca != b[j - 1])
+            if prev[j] + 1 < v:
+                v = prev[j] + 1
+            if cur[j - 1] + 1 < v:
+                v = cur[j - 1] + 1
+            cur[j] = v
+            if v < best:
+                best = v
+        if best > limit:
+            return over
+        prev = cur
+    return min(prev[lb], over)
+
+
+# ---------------------------------------------------------------------------
+# Index
+# ---------------------------------------------------------------------------
+@dataclass(frozen=True)
+class BrandMatch:
+    input: str
+    brand: str | None
+    confidence: float
+    method: str  # exact | compact | fuzzy | none
+
+    def as_dict(self) -> dict[str, Any]:
+        return {
+            "input": self.input,
+            "brand": self.brand,
+            "confidence": round(self.confidence, 3),
+            "method": self.method,
+        }
+
+
+class BrandIndex:
+    """Compiled lookup over (source brand → standard brand) pairs.
+
+    Standard brands also map to themselves, so a sloppy spelling of the
+    canonical name resolves even without an explicit rule.
+    """
+
+    def __init__(self, pairs: Iterable[tuple[str, str]], min_confidence: float = DEFAULT_MIN_CONFIDENCE):
+        self.min_confidence = min_confidence
+        self.exact: dict[str, str] = {}
+        self.compact: dict[str, str] = {}
+        targets: list[str] = []
+        for source, target in pairs:
+            target = collapse_ws(target)
+            key = normalize_key(source)
+            if key and target:
+                self.exact[key] = target
+                targets.append(target)
+        for target in targets:
+            self.exact.setdefault(normalize_key(target), target)
+        for key, target in self.exact.items():
+            ck = compact_key(key)
+            if ck:
+                self.compact.setdefault(ck, target)
+
+        self._keys = list(self.compact)
+        self._gram_counts: list[int] = []
+        self._grams: dict[str, list[int]] = defaultdict(list)
+        for idx, ck in enumerate(self._keys):
+            grams = _trigrams(ck)
+            self._gram_counts.append(len(grams))
+            for g in grams:
+                self._grams[g].append(idx)
+        self._memo: dict[str, BrandMatch] = {}
+
+    def __len__(self) -> int:
+        return len(self.exact)
+
+    def _fuzzy(self, ck: str) -> tuple[str | None, float]:
+        grams = _trigrams(ck)
+        n = len(grams)
+        # Upper bound on edits we could accept, and the q-gram lemma's minimum overlap
+        # (one edit destroys at most three trigrams). Any qualifying key must then share
+        # at least one of the n - need + 1 rarest query grams, so only those are probed.
+        max_edits = int(len(ck) / self.min_confidence * (1.0 - self.min_confidence))
+        need = max(1, n - 3 * max_edits)
+        probe = sorted(grams, key=lambda g: len(self._grams.get(g, ())))[: n - need + 1]
+        hits = Counter(chain.from_iterable(self._grams.get(g, ()) for g in probe))
+        if not hits:
+            return None, 0.0
+        # Shared-gram count shortlists (C-level heap), Dice coefficient orders the shortlist,
+        # and bounded edit distance produces the final score.
+        shortlist = hits.most_common(_MAX_CANDIDATES * 4)
+        ranked = nlargest(_MAX_CANDIDATES, shortlist, key=lambda h: h[1] / (n + self._gram_counts[h[0]]))
+        best_target, best_score = None, 0.0
+        for idx, _shared in ranked:
+            key = self._keys[idx]
+            longest = max(len(ck), len(key))
+            limit = int(longest * (1.0 - self.min_confidence))
+            dist = _levenshtein(ck, key, limit)
+            if dist > limit:
+                continue
+            score = 1.0 - dist / longest
+            if score > best_score:
+                best_target, best_score = self.compact[key], score
+                if dist == 1:
+                    break
+        return best_target, best_score
+
+    def match(self, raw: str | None) -> BrandMatch:
+        text = collapse_ws(raw)
+        cached = self._memo.get(text)
+        if cached is not None:
+            return cached
+
+        key = normalize_key(text)
+        if not key:
+            result = BrandMatch(text, None, 0.0, "none")
+        elif key in self.exact:
+            result = BrandMatch(text, self.exact[key], 1.0, "exact")
+        else:
+            ck = compact_key(key)
+            if ck in self.compact:
+                result = BrandMatch(text, self.compact[ck], COMPACT_CONFIDENCE, "compact")
+            else:
+                brand, score = self._fuzzy(ck) if ck else (None, 0.0)
+                if brand and score >= self.min_confidence:
+                    result = BrandMatch(text, brand, score, "fuzzy")
+                else:
+                    result = BrandMatch(text, None, 0.0, "none")
+
+        if len(self._memo) >= _MEMO_LIMIT:
+            self._memo.clear()
+        self._memo[text] = result
+        return result
+
+    def match_many(self, raws: Iterable[str | None]) -> list[BrandMatch]:
+        return [self.match(r) for r in raws]
+
+
+# ---------------------------------------------------------------------------
+# Site-wide cache (Redis pairs + version stamp, per-process compiled index)
+# ---------------------------------------------------------------------------
+_compiled: dict[str, Any] = {"site": None, "version": None, "index": None}
+
+
+def _load_pairs() -> list[tuple[str, str]]:
+    cache = frappe.cache()
+    pairs = cache.get_value(PAIRS_KEY)
+    if pairs is None:
+        # Canonical Brand names first so explicit rules override them.
+        pairs = []
+        if frappe.db.table_exists("Brand"):
+            pairs.extend((b, b) for b in frappe.get_all("Brand", pluck="name"))
+        rows = frappe.get_all(RULE_DOCTYPE, fields=["from_brand", "to_brand"], order_by="idx asc")
+        pairs.extend((r.from_brand or "", r.to_brand or "") for r in rows)
+        cache.set_value(PAIRS_KEY, pairs)
+    return [tuple(p) for p in pairs]
+
+
+def _current_version() -> str:
+    """Version stamp, read from Redis at most once per request."""
+    version = getattr(frappe.local, _LOCAL_VERSION_ATTR, None)
+    if version is None:
+        cache = frappe.cache()
+        version = cache.get_value(VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set_value(VERSION_KEY, version)
+        setattr(frappe.local, _LOCAL_VERSION_ATTR, version)
+    return version
+
+
+def get_index() -> BrandIndex:
+    version = _current_version()
+    site = getattr(frappe.local, "site", None)
+    if _compiled["index"] is None or _compiled["version"] != version or _compiled["site"] != site:
+        _compiled.update(site=site, version=version, index=BrandIndex(_load_pairs()))
+    return _compiled["index"]
+
+
+def invalidate(*_args: Any, **_kwargs: Any) -> None:
+    """Bump the version stamp so every worker recompiles on its next lookup (doc-event safe)."""
+    cache = frappe.cache()
+    cache.delete_value(PAIRS_KEY)
+    cache.set_value(VERSION_KEY, uuid.uuid4().hex)
+    if hasattr(frappe.local, _LOCAL_VERSION_ATTR):
+        delattr(frappe.local, _LOCAL_VERSION_ATTR)
+
+
+def match_brand(raw: str | None) -> BrandMatch:
+    return get_index().match(raw)
+
+
+def match_brands(brands: str | list[str]) -> list[dict[str, Any]]:
+    """Bulk mapping for imports: one result (brand, confidence, method) per input string."""
+    if isinstance(brands, str):
+        brands = frappe.parse_json(brands)
+    index = get_index()
+    return [m.as_dict() for m in index.match_many(brands or [])]
+
+
+if frappe is not None:
+    match_brands = frappe.whitelist()(match_brands)
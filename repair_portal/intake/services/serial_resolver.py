@@ -0,0 +1,401 @@
+# Path: repair_portal/intake/services/serial_resolver.py
+# Date: 2026-10-19
+# Version: 1.0.2
+# Description: Serial → (Instrument Serial Number, Instrument, Instrument Profile, Customer) resolution
+#              for intake type-ahead and packing-list imports. Per-process LRU in front of Redis,
+#              batched DB resolution for misses, and a sorted prefix index over normalized serials.
+# Dependencies: frappe (optional for the pure LRUCache / PrefixIndex)
+
+from __future__ import annotations
+
+import time
+import uuid
+from bisect import bisect_left
+from collections import OrderedDict
+from typing import Any, Iterable
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+ISN = "Instrument Serial Number"
+VERSION_KEY = "repair_portal:serial_resolver:version"
+# Part of every entry key: bumping it orphans all cached entries at once (set-based writers)
+GENERATION_KEY = "repair_portal:serial_resolver:generation"
+_ENTRY_KEY = "repair_portal:serial_resolver:entry:{}:{}"
+_LOCAL_ATTR = "repair_portal_serial_resolver"
+_DIRTY_ATTR = "repair_portal_serial_resolver_dirty"
+
+HIT_TTL_SECONDS = 6 * 60 * 60
+MISS_TTL_SECONDS = 60
+LRU_SIZE = 4096
+MAX_BATCH = 5000
+PREFIX_MIN_REBUILD_SECONDS = 30
+INSTRUMENT_FIELDS = (
+    "name",
+    "serial_no",
+    "brand",
+    "model",
+    "clarinet_type",
+    "body_material",
+    "key_plating",
+    "year_of_manufacture",
+    "instrument_category",
+    "customer",
+)
+
+
+# ---------------------------------------------------------------------------
+# Pure structures
+# ---------------------------------------------------------------------------
+class LRUCache:
+    """Small ordered-dict LRU; ``get`` returns ``default`` on a miss."""
+
+    def __init__(self, maxsize: int = LRU_SIZE):
+        self.maxsize = maxsize
+        self._data: OrderedDict[str, Any] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def get(self, key: str, default: Any = None) -> Any:
+        try:
+            self._data.move_to_end(key)
+        except KeyError:
+            return default
+        return self._data[key]
+
+    def set(self, key: str, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class PrefixIndex:
+    """Sorted normalized serials; a prefix query is one bisect plus a short forward scan."""
+
+    def __init__(self, serials: Iterable[str]):
+        self._keys = sorted({s for s in serials if s})
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def search(self, prefix: str, limit: int = 10) -> list[str]:
+        if not prefix:
+            return []
+        out: list[str] = []
+        i = bisect_left(self._keys, prefix)
+        keys = self._keys
+        while i < len(keys) and len(out) < limit and keys[i].startswith(prefix):
+            out.append(keys[i])
+            i += 1
+        return out
+
+
+# ---------------------------------------------------------------------------
+# Cache plumbing (Redis + per-process LRU, version-stamped)
+# ---------------------------------------------------------------------------
+_process: dict[str, Any] = {"site": None, "version": None, "lru": LRUCache(), "prefix": None, "built_at": 0.0}
+
+
+def _normalize(serial: str | None) -> str | None:
+    from repair_portal.utils.serials import normalize_serial
+
+    return normalize_serial(serial)
+
+
+def _version() -> str:
+    """Global version stamp, read from Redis once per request; resets the LRU when it moves."""
+    local = getattr(frappe.local, _LOCAL_ATTR, None)
+    if local is None:
+        cache = frappe.cache()
+        version = cache.get_value(VERSION_KEY)
+        if version is None:
+            version = uuid.uuid4().hex
+            cache.set_value(VERSION_KEY, version)
+        local = {"version": version, "generation": cache.get_value(GENERATION_KEY) or "0"}
+        setattr(frappe.local, _LOCAL_ATTR, local)
+    version = local["version"]
+    site = getattr(frappe.local, "site", None)
+    if _process["version"] != version or _process["site"] != site:
+        _process["lru"].clear()
+        _process.update(site=site, version=version)
+    return version
+
+
+def serial_field_type() -> str | None:
+    """Fieldtype of Instrument.serial_no ('Link' | 'Data' | None), read from meta once per request."""
+    _version()
+    local = getattr(frappe.local, _LOCAL_ATTR)
+    if "field_type" not in local:
+        try:
+            df = frappe.get_meta("Instrument").get_field("serial_no")
+            local["field_type"] = getattr(df, "fieldtype", None) if df else None
+        except Exception:
+            local["field_type"] = None
+    return local["field_type"]
+
+
+def _entry_key(norm: str) -> str:
+    local = getattr(frappe.local, _LOCAL_ATTR, None)
+    generation = local["generation"] if local else frappe.cache().get_value(GENERATION_KEY) or "0"
+    return _ENTRY_KEY.format(generation, norm)
+
+
+def invalidate(*normalized: str | None) -> None:
+    """Drop cached resolutions for these normalized serials and bump the version stamp."""
+    cache = frappe.cache()
+    for norm in {n for n in normalized if n}:
+        cache.delete_value(_entry_key(norm))
+    cache.set_value(VERSION_KEY, uuid.uuid4().hex)
+    if hasattr(frappe.local, _LOCAL_ATTR):
+        delattr(frappe.local, _LOCAL_ATTR)
+
+
+def invalidate_all() -> None:
+    """Forget every cached resolution; for set-based writers that bypass doc events.
+
+    Call after the write is committed (see invalidate_after_commit for why).
+    """
+    frappe.cache().set_value(GENERATION_KEY, uuid.uuid4().hex)
+    invalidate()
+
+
+def _dirty() -> set[str]:
+    dirty = getattr(frappe.local, _DIRTY_ATTR, None)
+    if dirty is None:
+        dirty = set()
+        setattr(frappe.local, _DIRTY_ATTR, dirty)
+    return dirty
+
+
+def invalidate_after_commit(*normalized: str | None) -> None:
+    """Doc-event path: invalidate once the write is committed.
+
+    Dropping entries before commit would let a concurrent resolve re-cache the
+    old row (or a miss) from the still-committed state. Until then this request
+    reads these serials straight from the DB and does not cache them.
+    """
+    norms = {n for n in normalized if n}
+    _dirty().update(norms)
+    for norm in norms:
+        _process["lru"].pop(norm)
+
+    def _after_commit() -> None:
+        _dirty().difference_update(norms)
+        invalidate(*norms)
+
+    frappe.db.after_commit.add(_after_commit)
+
+
+# ---------------------------------------------------------------------------
+# Resolution
+# ---------------------------------------------------------------------------
+def _empty(norm: str) -> dict[str, Any]:
+    return {
+        "normalized_serial": norm,
+        "instrument_serial_number": None,
+        "instrument": None,
+        "instrument_profile": None,
+        "customer": None,
+        "details": None,
+    }
+
+
+def _resolve_from_db(raw_by_norm: dict[str, str]) -> dict[str, dict[str, Any]]:
+    """Resolve many normalized serials with a fixed number of queries."""
+    norms = list(raw_by_norm)
+    out = {norm: _empty(norm) for norm in norms}
+
+    isn_rows = frappe.get_all(
+        ISN,
+        filters={"normalized_serial": ["in", norms]},
+        fields=["name", "normalized_serial", "instrument", "duplicate_of"],
+        order_by="creation asc",
+    )
+    best: dict[str, tuple] = {}
+    for row in isn_rows:
+        # Prefer a live ISN over a merged-away duplicate, then one linked to an Instrument
+        rank = (bool(row.duplicate_of), not row.instrument)
+        if row.normalized_serial not in best or rank < best[row.normalized_serial]:
+            best[row.normalized_serial] = rank
+            entry = out[row.normalized_serial]
+            entry["instrument_serial_number"] = row.duplicate_of or row.name
+            entry["instrument"] = row.instrument
+
+    # Instruments not reachable through ISN.instrument: match Instrument.serial_no on the raw
+    # token, the normalized form, or (Link schema) the ISN name.
+    unresolved = {}
+    for norm, entry in out.items():
+        if entry["instrument"]:
+            continue
+        for token in (raw_by_norm[norm].strip(), norm, entry["instrument_serial_number"]):
+            if token:
+                unresolved[token] = norm
+    if unresolved:
+        for row in frappe.get_all(
+            "Instrument", filters={"serial_no": ["in", list(unresolved)]}, fields=["name", "serial_no"]
+        ):
+            # Collation is case-insensitive, so map back by normalized form as well
+            norm = unresolved.get(row.serial_no) or _normalize(row.serial_no)
+            if norm in out and not out[norm]["instrument"]:
+                out[norm]["instrument"] = row.name
+
+    instruments = {e["instrument"] for e in out.values() if e["instrument"]}
+    if instruments:
+        details = {
+            row.name: row
+            for row in frappe.get_all(
+                "Instrument", filters={"name": ["in", list(instruments)]}, fields=list(INSTRUMENT_FIELDS)
+            )
+        }
+        profiles: dict[str, Any] = {}
+        for row in frappe.get_all(
+            "Instrument Profile",
+            filters={"instrument": ["in", list(instruments)]},
+            fields=["name", "instrument", "customer"],
+            order_by="modified desc",
+        ):
+            profiles.setdefault(row.instrument, row)
+        for entry in out.values():
+            inst = details.get(entry["instrument"]) if entry["instrument"] else None
+            if not inst:
+                entry["instrument"] = None
+                continue
+            profile = profiles.get(inst.name)
+            entry["instrument_profile"] = profile.name if profile else None
+            entry["customer"] = inst.customer or (profile.customer if profile else None)
+            entry["details"] = {k: inst.get(k) for k in INSTRUMENT_FIELDS if k not in ("name", "customer")}
+    return out
+
+
+def resolve_many(serials: Iterable[str | None]) -> list[dict[str, Any] | None]:
+    """Resolve raw serials in input order (None for inputs that normalize to nothing)."""
+    _version()
+    lru: LRUCache = _process["lru"]
+    cache = frappe.cache()
+
+    norms = [(_normalize(s) if s else None) for s in serials]
+    raws = {norm: raw for raw, norm in zip(serials, norms) if norm}
+    dirty = getattr(frappe.local, _DIRTY_ATTR, None) or set()
+    found: dict[str, dict[str, Any]] = {}
+    misses: dict[str, str] = {}
+    for norm, raw in raws.items():
+        if norm in dirty:
+            misses[norm] = raw or ""
+            continue
+        hit = lru.get(norm)
+        if hit is None:
+            hit = cache.get_value(_entry_key(norm))
+            if hit is not None:
+                lru.set(norm, hit)
+        if hit is None:
+            misses[norm] = raw or ""
+        else:
+            found[norm] = hit
+
+    if misses:
+        for norm, entry in _resolve_from_db(misses).items():
+            found[norm] = entry
+            if norm in dirty:
+                continue
+            ttl = HIT_TTL_SECONDS if entry["instrument"] or entry["instrument_serial_number"] else MISS_TTL_SECONDS
+            cache.set_value(_entry_key(norm), entry, expires_in_sec=ttl)
+            lru.set(norm, entry)
+
+    return [dict(found[n]) if n else None for n in norms]
+
+
+def resolve(serial: str | None) -> dict[str, Any] | None:
+    return resolve_many([serial])[0]
+
+
+def suggest(prefix: str | None, limit: int = 10) -> list[str]:
+    """Normalized serials starting with the normalized ``prefix`` (type-ahead)."""
+    norm = _normalize(prefix) if prefix else None
+    if not norm:
+        return []
+    _version()
+    index: PrefixIndex | None = _process["prefix"]
+    stale = _process.get("prefix_version") != _process["version"]
+    # Index rebuilds are throttled: suggestions may lag new serials by a few seconds,
+    # while exact resolution (resolve/resolve_many) is always current.
+    if index is None or (stale and time.monotonic() - _process["built_at"] > PREFIX_MIN_REBUILD_SECONDS):
+        legacy = frappe.get_all("Instrument", filters={"serial_no": ["is", "set"]}, pluck="serial_no")
+        live = frappe.get_all(ISN, filters={"duplicate_of": ["is", "not set"]}, pluck="normalized_serial")
+        index = PrefixIndex([*live, *map(_normalize, legacy)])
+        _process.update(prefix=index, prefix_version=_process["version"], built_at=time.monotonic())
+    return index.search(norm, limit=limit)
+
+
+# ---------------------------------------------------------------------------
+# Doc events
+# ---------------------------------------------------------------------------
+def on_serial_change(doc, method: str | None = None) -> None:
+    """Instrument Serial Number hook: the old and new normalized serial both go stale."""
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    invalidate_after_commit(
+        getattr(doc, "normalized_serial", None), getattr(before, "normalized_serial", None)
+    )
+
+
+def _instrument_serials(instrument: str | None) -> list[str]:
+    if not instrument:
+        return []
+    return frappe.get_all(ISN, filters={"instrument": instrument}, pluck="normalized_serial")
+
+
+def on_instrument_change(doc, method: str | None = None) -> None:
+    """Instrument hook: serials stored on the Instrument and every ISN linked to it."""
+    before = doc.get_doc_before_save() if hasattr(doc, "get_doc_before_save") else None
+    raw = [getattr(doc, "serial_no", None), getattr(before, "serial_no", None)]
+    invalidate_after_commit(*(_normalize(r) for r in raw if r), *_instrument_serials(doc.name))
+
+
+def on_profile_change(doc, method: str | None = None) -> None:
+    """Instrument Profile hook: the profile/customer of the instrument's serials changed."""
+    instrument = getattr(doc, "instrument", None)
+    serial = frappe.db.get_value("Instrument", instrument, "serial_no") if instrument else None
+    invalidate_after_commit(_normalize(serial) if serial else None, *_instrument_serials(instrument))
+
+
+# ---------------------------------------------------------------------------
+# Whitelisted endpoints
+# ---------------------------------------------------------------------------
+def _check_read() -> None:
+    if not frappe.has_permission("Clarinet Intake", ptype="read"):
+        frappe.throw("Not permitted", frappe.PermissionError)
+
+
+def resolve_serials(serials: str | list[str]) -> list[dict[str, Any] | None]:
+    """Batch resolution for vendor packing lists (input order preserved)."""
+    _check_read()
+    if isinstance(serials, str):
+        serials = frappe.parse_json(serials)
+    serials = list(serials or [])
+    if len(serials) > MAX_BATCH:
+        frappe.throw(f"At most {MAX_BATCH} serials per call")
+    results = resolve_many(serials)
+    for raw, entry in zip(serials, results):
+        if entry is not None:
+            entry["serial_input"] = raw
+    return results
+
+
+def suggest_serials(prefix: str, limit: int = 10) -> list[str]:
+    """Type-ahead over normalized serials."""
+    _check_read()
+    return suggest(prefix, limit=max(1, min(int(limit or 10), 50)))
+
+
+if frappe is not None:
+    resolve_serials = frappe.whitelist()(resolve_serials)
+    suggest_serials = frappe.whitelist()(suggest_serials)
@@ -0,0 +1,4 @@
+# File: repair_portal/lab/doctype/instrument_wellness_point/__init__.py
+# Updated: 2026-10-19
+# Version: 1.0
+# Purpose: Package initializer for Instrument Wellness Point DocType
@@ -0,0 +1,21 @@
+# Path: repair_portal/lab/doctype/instrument_wellness_point/instrument_wellness_point.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Append-only wellness score series per Instrument (lab.services.wellness)
+# Dependencies: frappe
+
+import frappe
+from frappe.model.document import Document
+
+
+class InstrumentWellnessPoint(Document):
+    """
+    Instrument Wellness Point: one row per analyzed lab session with the typed
+    scores at that moment. Rows are only ever inserted (by lab.services.wellness);
+    Instrument Wellness Summary keeps the latest values.
+    """
+
+
+def on_doctype_update():
+    # Every read is "one instrument, ordered by time"
+    frappe.db.add_index("Instrument Wellness Point", ["instrument", "ts"], "instrument_ts_index")
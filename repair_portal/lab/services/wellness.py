@@ -0,0 +1,188 @@
+"""
+Path: repair_portal/lab/services/wellness.py
+Version: 1.0.0
+Purpose:
+    Instrument wellness score history:
+      - record_session(sess) appends one Instrument Wellness Point (typed float
+        columns, indexed on (instrument, ts)) and writes the latest scores to
+        Instrument Wellness Summary in a single UPDATE
+      - get_trend(...) reads one metric for one instrument and downsamples it
+        into day/week buckets (min/mean/max/count) for sparklines
+
+Public API:
+    - downsample(points, bucket)                 (pure, no DB access)
+    - record_session(sess_doc)
+    - get_trend(instrument, metric, bucket, from_date, to_date)
+    - wellness_trend(...)                        (whitelisted)
+
+Notes:
+    - The series is append-only: concurrent lab sessions on the same instrument
+      each insert their own row instead of rewriting a shared JSON blob, and
+      nothing is truncated.
+    - Downsampling happens in Python over two fetched columns; a single
+      instrument's history is small even across decades of sessions.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable
+from datetime import date, datetime, timedelta
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+POINT_DOCTYPE = "Instrument Wellness Point"
+SUMMARY_DOCTYPE = "Instrument Wellness Summary"
+METRICS = ("overall_score", "intonation_score", "resonance_score", "leak_score", "tone_score")
+BUCKETS = ("raw", "day", "week")
+MAX_RAW_POINTS = 500
+
+
+# -----------------------------
+# Pure downsampling
+# -----------------------------
+def _as_datetime(value: Any) -> datetime:
+    if isinstance(value, datetime):
+        return value
+    if isinstance(value, date):
+        return datetime(value.year, value.month, value.day)
+    return datetime.fromisoformat(str(value))
+
+
+def bucket_start(ts: Any, bucket: str) -> date:
+    """Day of ``ts``, or the Monday of its ISO week."""
+    day = _as_datetime(ts).date()
+    if bucket == "week":
+        return day - timedelta(days=day.weekday())
+    return day
+
+
+def downsample(points: Iterable[tuple[Any, float | None]], bucket: str = "day") -> list[dict[str, Any]]:
+    """
+    Collapse ``(ts, value)`` pairs (any order; None values skipped) into buckets.
+
+    Returns ``[{"bucket", "min", "mean", "max", "count"}]`` ordered by bucket.
+    """
+    acc: dict[date, list[float]] = {}
+    for ts, value in points:
+        if value is None:
+            continue
+        key = bucket_start(ts, bucket)
+        slot = acc.get(key)
+        v = float(value)
+        if slot is None:
+            acc[key] = [v, v, v, 1.0]
+        else:
+            if v < slot[0]:
+                slot[0] = v
+            if v > slot[2]:
+                slot[2] = v
+            slot[1] += v
+            slot[3] += 1
+    return [
+        {
+            "bucket": key.isoformat(),
+            "min": round(lo, 2),
+            "mean": round(total / n, 2),
+            "max": round(hi, 2),
+            "count": int(n),
+        }
+        for key, (lo, total, hi, n) in sorted(acc.items())
+    ]
+
+
+# -----------------------------
+# Write side
+# -----------------------------
+def record_session(sess_doc) -> None:
+    """Append the session's scores to the series and refresh the Summary's latest values."""
+    instrument = getattr(sess_doc, "instrument", None)
+    if not instrument:
+        return
+    scores = {m: getattr(sess_doc, m, None) for m in METRICS}
+
+    frappe.get_doc(
+        {
+            "doctype": POINT_DOCTYPE,
+            "instrument": instrument,
+            "ts": frappe.utils.now(),
+            "session": sess_doc.name,
+            **scores,
+        }
+    ).insert(ignore_permissions=True)
+
+    if not frappe.db.table_exists(SUMMARY_DOCTYPE):
+        return
+    latest = {"last_session": sess_doc.name, **scores}
+    name = frappe.db.get_value(SUMMARY_DOCTYPE, {"instrument": instrument}, "name")
+    if name:
+        frappe.db.set_value(SUMMARY_DOCTYPE, name, latest)
+    else:
+        frappe.get_doc({"doctype": SUMMARY_DOCTYPE, "instrument": instrument, **latest}).insert(
+            ignore_permissions=True
+        )
+
+
+# -----------------------------
+# Read side
+# -----------------------------
+def get_trend(
+    instrument: str,
+    metric: str = "overall_score",
+    bucket: str = "day",
+    from_date: Any = None,
+    to_date: Any = None,
+) -> list[dict[str, Any]]:
+    """One metric's history for an instrument: raw points (latest MAX_RAW_POINTS) or bucketed."""
+    if metric not in METRICS:
+        frappe.throw(f"Unknown wellness metric: {metric}")
+    if bucket not in BUCKETS:
+        frappe.throw(f"Unknown bucket: {bucket}")
+
+    conditions = ["instrument = %(instrument)s", f"`{metric}` IS NOT NULL"]
+    values: dict[str, Any] = {"instrument": instrument}
+    if from_date:
+        conditions.append("ts >= %(from_date)s")
+        values["from_date"] = frappe.utils.getdate(from_date)
+    if to_date:
+        conditions.append("ts < %(to_date)s")
+        values["to_date"] = frappe.utils.add_days(frappe.utils.getdate(to_date), 1)
+    where = " AND ".join(conditions)
+
+    if bucket == "raw":
+        rows = frappe.db.sql(
+            f"""
+            SELECT ts, `{metric}`, session FROM `tab{POINT_DOCTYPE}`
+            WHERE {where} ORDER BY ts DESC LIMIT {MAX_RAW_POINTS}
+            """,
+            values,
+        )
+        return [{"ts": str(ts), "value": value, "session": session} for ts, value, session in reversed(rows)]
+
+    rows = frappe.db.sql(f"SELECT ts, `{metric}` FROM `tab{POINT_DOCTYPE}` WHERE {where}", values)
+    return downsample(rows, bucket)
+
+
+def wellness_trend(
+    instrument: str,
+    metric: str = "overall_score",
+    bucket: str = "day",
+    from_date: str | None = None,
+    to_date: str | None = None,
+) -> dict[str, Any]:
+    """Sparkline data for an instrument the caller may read."""
+    if not frappe.has_permission("Instrument", "read", instrument):
+        frappe.throw("Not permitted", frappe.PermissionError)
+    return {
+        "instrument": instrument,
+        "metric": metric,
+        "bucket": bucket,
+        "points": get_trend(instrument, metric, bucket, from_date, to_date),
+    }
+
+
+if frappe is not None:
+    wellness_trend = frappe.whitelist()(wellness_trend)
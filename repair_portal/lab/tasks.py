@@ -9,6 +9,8 @@ from typing import Any
 import frappe
 from frappe import _
 
+from repair_portal.lab.services import wellness
+
 # Optional scientific stack (plots will be skipped if not present)
 try:
     import numpy as np  # type: ignore
@@ -455,24 +457,5 @@ def _update_rollups(sess_doc):
 
 
 def _update_instrument_wellness(sess_doc):
-    inst = getattr(sess_doc, "instrument", None)
-    if not inst:
-        return
-    name = frappe.db.get_value("Instrument Wellness Summary", {"instrument": inst}, "name")
-    if name:
-        iws = frappe.get_doc("Instrument Wellness Summary", name)  # type: ignore
-    else:
-        iws = frappe.get_doc({"doctype": "Instrument Wellness Summary", "instrument": inst})
-    iws.last_session = sess_doc.name  # type: ignore
-    iws.intonation_score = sess_doc.intonation_score  # type: ignore
-    iws.resonance_score = sess_doc.resonance_score  # type: ignore
-    iws.leak_score = sess_doc.leak_score  # type: ignore
-    iws.tone_score = sess_doc.tone_score  # type: ignore
-    iws.overall_score = sess_doc.overall_score  # type: ignore
-
-    # append trend datapoint
-    trend = _parse(iws.trend_json) or []  # type: ignore
-    trend.append({"ts": frappe.utils.now(), "session": sess_doc.name, "overall": iws.overall_score})  # type: ignore
-    # keep last 50
-    iws.trend_json = _json(trend[-50:])  # type: ignore
-    iws.save(ignore_permissions=True)
+    # Append-only score series + single-row summary update (see lab.services.wellness)
+    wellness.record_session(sess_doc)
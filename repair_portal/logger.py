@@ -1,19 +1,28 @@
 # Relative Path: repair_portal/logger.py
-# Last Updated: 2025-08-10
-# Version: v1.1
+# Last Updated: 2026-10-19
+# Version: v1.2
 # Purpose: Provide a namespaced, memoised wrapper around ``frappe.logger`` so all
 #          modules within the *repair_portal* app emit uniformly-tagged log
 #          entries. Ensures Fortune-500-grade observability and simplifies
 #          future log-aggregation pipelines.
+#          v1.2: file I/O moved off the request thread (QueueHandler →
+#          QueueListener, bounded queue, drop-on-full counter); context is
+#          resolved only for records that will be emitted; optional JSON-lines
+#          sink for structured payloads.
 # Dependencies: frappe (core)
 
 from __future__ import annotations
 
+import atexit
 import functools
+import json
 import logging
 import os
+import queue
 import sys
-from logging.handlers import RotatingFileHandler
+import threading
+from collections.abc import Callable
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from typing import Any
 
 import frappe
@@ -55,13 +64,21 @@ _BACKUP_COUNT = 10
 # Filenames inside the logs directory
 _DEBUG_FILENAME = "repair_portal.debug.log"
 _ERROR_FILENAME = "repair_portal.error.log"
+_JSONL_FILENAME = "repair_portal.events.jsonl"
 
-# Default log level for our base loggers
-_BASE_LEVEL = logging.DEBUG
+# Default log level for our base loggers (override with REPAIR_PORTAL_LOG_LEVEL=INFO etc.)
+_BASE_LEVEL = getattr(logging, os.environ.get("REPAIR_PORTAL_LOG_LEVEL", "DEBUG").upper(), logging.DEBUG)
 
 # Whether to also echo to stderr (useful during local dev)
 _ECHO_TO_STDERR = os.environ.get("REPAIR_PORTAL_LOG_STDERR", "0") in ("1", "true", "True")
 
+# Optional JSON-lines sink for structured payloads (see ``structured``)
+_JSONL_ENABLED = os.environ.get("REPAIR_PORTAL_LOG_JSONL", "0") in ("1", "true", "True")
+
+# Records buffered between request threads and the writer thread. When full,
+# new records are dropped (and counted) rather than blocking the request.
+_QUEUE_MAXSIZE = int(os.environ.get("REPAIR_PORTAL_LOG_QUEUE_SIZE", "10000"))
+
 
 # --------------------------------------------------------------------------- #
 #  Utility: resolve & create logs directory with fallbacks
@@ -145,19 +162,203 @@ def _current_context() -> dict[str, Any]:
     }
 
 
+_CONTEXT_FIELDS = ("site", "user", "request_id", "job")
+
+
+class _ContextFilter(logging.Filter):
+    """Fill site/user/request/job on records that are about to be queued.
+
+    Attached to the queue handler, so it runs in the calling thread (where
+    ``frappe.local`` is valid) and only after level checks have passed.
+    Explicit ``extra=`` values supplied by the caller win.
+    """
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if all(hasattr(record, k) for k in _CONTEXT_FIELDS):
+            return True
+        for k, v in _current_context().items():
+            if not hasattr(record, k):
+                setattr(record, k, v)
+        return True
+
+
 class _ContextAdapter(logging.LoggerAdapter):
-    """Injects Frappe contextual fields into every log record."""
+    """Kept for API compatibility; context is now added lazily by ``_ContextFilter``."""
 
     def process(self, msg, kwargs):
-        extra = kwargs.get("extra") or {}
-        # Do not overwrite explicit extras supplied by caller
-        base = _current_context()
-        for k, v in base.items():
-            extra.setdefault(k, v)
-        kwargs["extra"] = extra
         return msg, kwargs
 
 
+# --------------------------------------------------------------------------- #
+#  Non-blocking pipeline: QueueHandler (request thread) → QueueListener (writer)
+# --------------------------------------------------------------------------- #
+
+
+class _DropCountingQueueHandler(QueueHandler):
+    """QueueHandler that never blocks: records are dropped and counted when full."""
+
+    def __init__(self, q: queue.Queue) -> None:
+        super().__init__(q)
+        self.pid = os.getpid()
+        self.dropped = 0
+        self._lock_dropped = threading.Lock()
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        if self.pid != os.getpid():
+            # Inherited across fork: nobody drains this queue here; use this process's pipeline.
+            _pipeline().handler.enqueue(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._lock_dropped:
+                self.dropped += 1
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep ``payload`` as a dict for the JSON-lines sink; the stock prepare()
+        # would flatten it into the formatted message.
+        payload = getattr(record, "payload", None)
+        record = super().prepare(record)
+        if payload is not None:
+            record.payload = payload
+        return record
+
+
+class _JsonLinesFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        body = {
+            "ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S%z"),
+            "level": record.levelname,
+            "logger": record.name,
+        }
+        body.update({k: getattr(record, k, "-") for k in _CONTEXT_FIELDS})
+        body["payload"] = getattr(record, "payload", None)
+        return json.dumps(body, default=str, ensure_ascii=False)
+
+
+class _HasPayload(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        return getattr(record, "payload", None) is not None
+
+
+class _Pipeline:
+    """Per-process queue + listener owning the file handlers for every namespace."""
+
+    def __init__(self) -> None:
+        self.pid = os.getpid()
+        self.queue: queue.Queue = queue.Queue(maxsize=_QUEUE_MAXSIZE)
+        self.handler = _DropCountingQueueHandler(self.queue)
+        self.handler.setLevel(logging.DEBUG)
+        self.handler.addFilter(_ContextFilter())
+        self.listener = QueueListener(self.queue, *self._sinks(), respect_handler_level=True)
+        self.listener.start()
+
+    @staticmethod
+    def _sinks() -> list[logging.Handler]:
+        logs_dir = _logs_dir()
+
+        # Format includes site/user/job/request for ops visibility
+        fmt = (
+            "%(asctime)s %(levelname)s [%(name)s] "
+            "[site=%(site)s user=%(user)s job=%(job)s req=%(request_id)s] "
+            "%(message)s"
+        )
+        formatter = logging.Formatter(fmt=fmt, datefmt="%Y-%m-%d %H:%M:%S%z")
+
+        # DEBUG (all levels) → repair_portal.debug.log
+        debug_handler = RotatingFileHandler(
+            os.path.join(logs_dir, _DEBUG_FILENAME),
+            maxBytes=_DEBUG_MAX_BYTES,
+            backupCount=_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        debug_handler.setLevel(logging.DEBUG)
+        debug_handler.setFormatter(formatter)
+
+        # ERROR+ → repair_portal.error.log
+        error_handler = RotatingFileHandler(
+            os.path.join(logs_dir, _ERROR_FILENAME),
+            maxBytes=_ERROR_MAX_BYTES,
+            backupCount=_BACKUP_COUNT,
+            encoding="utf-8",
+        )
+        error_handler.setLevel(logging.ERROR)
+        error_handler.setFormatter(formatter)
+        sinks: list[logging.Handler] = [debug_handler, error_handler]
+
+        # Structured payloads only → repair_portal.events.jsonl
+        if _JSONL_ENABLED:
+            jsonl_handler = RotatingFileHandler(
+                os.path.join(logs_dir, _JSONL_FILENAME),
+                maxBytes=_DEBUG_MAX_BYTES,
+                backupCount=_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+            jsonl_handler.setLevel(logging.DEBUG)
+            jsonl_handler.addFilter(_HasPayload())
+            jsonl_handler.setFormatter(_JsonLinesFormatter())
+            sinks.append(jsonl_handler)
+
+        # Optional STDERR echo for local dev / CI visibility
+        if _ECHO_TO_STDERR:
+            stderr_handler = logging.StreamHandler(stream=sys.stderr)
+            stderr_handler.setLevel(logging.INFO)
+            stderr_handler.setFormatter(formatter)
+            sinks.append(stderr_handler)
+        return sinks
+
+    def stop(self) -> None:
+        try:
+            self.listener.stop()  # drains the queue before returning
+        except Exception:
+            pass
+        for h in self.listener.handlers:
+            try:
+                h.close()
+            except Exception:
+                pass
+
+
+_PIPELINE: _Pipeline | None = None
+_PIPELINE_LOCK = threading.Lock()
+_NAMESPACES: set[str] = set()
+
+
+def _pipeline() -> _Pipeline:
+    """Return this process's pipeline, rebuilding it after a fork (threads don't survive fork)."""
+    global _PIPELINE
+    current = _PIPELINE
+    if current is not None and current.pid == os.getpid():
+        return current
+    with _PIPELINE_LOCK:
+        if _PIPELINE is None or _PIPELINE.pid != os.getpid():
+            stale = _PIPELINE
+            _PIPELINE = _Pipeline()
+            if stale is not None:
+                for namespace in _NAMESPACES:
+                    lg = logging.getLogger(namespace)
+                    lg.removeHandler(stale.handler)
+                    lg.addHandler(_PIPELINE.handler)
+        return _PIPELINE
+
+
+@atexit.register
+def _shutdown_pipeline() -> None:
+    if _PIPELINE is not None and _PIPELINE.pid == os.getpid():
+        _PIPELINE.stop()
+
+
+def jsonl_enabled() -> bool:
+    """True when the JSON-lines structured sink is configured."""
+    return _JSONL_ENABLED
+
+
+def queue_stats() -> dict[str, int]:
+    """Queue depth and number of records dropped because the queue was full."""
+    p = _pipeline()
+    return {"queued": p.queue.qsize(), "dropped": p.handler.dropped, "maxsize": _QUEUE_MAXSIZE}
+
+
 # --------------------------------------------------------------------------- #
 #  Handler/formatter factory (dedup-safe)
 # --------------------------------------------------------------------------- #
@@ -166,7 +367,7 @@ class _ContextAdapter(logging.LoggerAdapter):
 @functools.cache
 def _build_logger(namespace: str) -> logging.Logger:
     """
-    Create (or fetch) a Python logger with rotating file handlers for DEBUG and ERROR.
+    Create (or fetch) a Python logger wired to the shared non-blocking pipeline.
     Idempotent: repeated calls won't attach duplicate handlers.
     """
     logger = logging.getLogger(namespace)
@@ -177,40 +378,9 @@ def _build_logger(namespace: str) -> logging.Logger:
     if logger.handlers:
         return logger
 
-    logs_dir = _logs_dir()
-    debug_path = os.path.join(logs_dir, _DEBUG_FILENAME)
-    error_path = os.path.join(logs_dir, _ERROR_FILENAME)
-
-    # Format includes site/user/job/request for ops visibility
-    fmt = (
-        "%(asctime)s %(levelname)s [%(name)s] "
-        "[site=%(site)s user=%(user)s job=%(job)s req=%(request_id)s] "
-        "%(message)s"
-    )
-    formatter = logging.Formatter(fmt=fmt, datefmt="%Y-%m-%d %H:%M:%S%z")
-
-    # DEBUG (all levels) → repair_portal.debug.log
-    debug_handler = RotatingFileHandler(
-        debug_path, maxBytes=_DEBUG_MAX_BYTES, backupCount=_BACKUP_COUNT, encoding="utf-8"
-    )
-    debug_handler.setLevel(logging.DEBUG)
-    debug_handler.setFormatter(formatter)
-    logger.addHandler(debug_handler)
-
-    # ERROR+ → repair_portal.error.log
-    error_handler = RotatingFileHandler(
-        error_path, maxBytes=_ERROR_MAX_BYTES, backupCount=_BACKUP_COUNT, encoding="utf-8"
-    )
-    error_handler.setLevel(logging.ERROR)
-    error_handler.setFormatter(formatter)
-    logger.addHandler(error_handler)
-
-    # Optional STDERR echo for local dev / CI visibility
-    if _ECHO_TO_STDERR:
-        stderr_handler = logging.StreamHandler(stream=sys.stderr)
-        stderr_handler.setLevel(logging.INFO)
-        stderr_handler.setFormatter(formatter)
-        logger.addHandler(stderr_handler)
+    # Request threads only enqueue; rotation and disk writes happen on the listener thread.
+    logger.addHandler(_pipeline().handler)
+    _NAMESPACES.add(namespace)
 
     # Also register with Frappe’s logger namespace so Error Log links stay useful
     try:
@@ -300,6 +470,27 @@ def info(msg: str, *args, suffix: str | None = None, **kwargs) -> None:
     get_logger(suffix).info(msg, *args, **kwargs)
 
 
+def structured(
+    payload: dict[str, Any] | Callable[[], dict[str, Any]],
+    *,
+    suffix: str | None = None,
+    level: int = logging.INFO,
+) -> None:
+    """
+    Emit a structured payload (also written to the JSON-lines sink when enabled).
+
+    Pass a zero-arg callable to defer building the payload until we know the
+    record will actually be emitted:
+
+        structured(lambda: {"op": "sync", "docname": name}, suffix="jobs")
+    """
+    log = get_logger(suffix)
+    if not log.isEnabledFor(level):
+        return
+    body = payload() if callable(payload) else payload
+    log.log(level, "%s", body, extra={"payload": body})
+
+
 # --------------------------------------------------------------------------- #
 #  Decorator: auto-log exceptions with tracebacks (opt-in)
 # --------------------------------------------------------------------------- #
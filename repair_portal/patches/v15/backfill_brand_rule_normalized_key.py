@@ -0,0 +1,28 @@
+import frappe
+
+from repair_portal.intake.services import brand_index
+
+
+def execute():
+    """Populate Brand Mapping Rule.normalized_key; later duplicates are left blank and logged."""
+    if not frappe.db.has_column("Brand Mapping Rule", "normalized_key"):
+        return
+
+    seen: set[str] = set()
+    duplicates: list[str] = []
+    for row in frappe.get_all(
+        "Brand Mapping Rule", fields=["name", "from_brand", "normalized_key"], order_by="creation asc"
+    ):
+        key = brand_index.normalize_key(row.from_brand)
+        if not key:
+            continue
+        if key in seen:
+            duplicates.append(row.name)
+            continue
+        seen.add(key)
+        if row.normalized_key != key:
+            frappe.db.set_value("Brand Mapping Rule", row.name, "normalized_key", key, update_modified=False)
+
+    if duplicates:
+        frappe.logger().warning(f"Brand Mapping Rule rows with duplicate source brand: {duplicates}")
+    brand_index.invalidate()
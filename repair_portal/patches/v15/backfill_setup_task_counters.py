@@ -0,0 +1,21 @@
+import frappe
+
+
+def execute():
+    """Seed task_count/task_progress_total on Clarinet Initial Setup for incremental progress roll-up."""
+    if not frappe.db.table_exists("Clarinet Setup Task"):
+        return
+
+    frappe.db.sql(
+        """
+        update `tabClarinet Initial Setup` s
+        left join (
+            select clarinet_initial_setup as setup, count(*) as n, coalesce(sum(progress), 0) as total
+            from `tabClarinet Setup Task`
+            group by clarinet_initial_setup
+        ) t on t.setup = s.name
+        set s.task_count = coalesce(t.n, 0),
+            s.task_progress_total = coalesce(t.total, 0),
+            s.progress = if(coalesce(t.n, 0) = 0, 0, round(t.total / t.n, 2))
+        """
+    )
@@ -0,0 +1,41 @@
+import json
+
+import frappe
+
+
+def execute():
+    """Copy Instrument Wellness Summary.trend_json points into the Instrument Wellness Point series."""
+    if not frappe.db.table_exists("Instrument Wellness Summary") or not frappe.db.has_column(
+        "Instrument Wellness Summary", "trend_json"
+    ):
+        return
+    frappe.reload_doc("lab", "doctype", "instrument_wellness_point")
+
+    rows = frappe.db.sql(
+        """
+        select instrument, trend_json from `tabInstrument Wellness Summary`
+        where ifnull(trend_json, '') != '' and ifnull(instrument, '') != ''
+        """,
+        as_dict=True,
+    )
+    for row in rows:
+        try:
+            trend = json.loads(row.trend_json) or []
+        except ValueError:
+            continue
+        for point in trend:
+            if not isinstance(point, dict) or not point.get("ts"):
+                continue
+            if frappe.db.exists(
+                "Instrument Wellness Point", {"instrument": row.instrument, "session": point.get("session")}
+            ):
+                continue
+            frappe.get_doc(
+                {
+                    "doctype": "Instrument Wellness Point",
+                    "instrument": row.instrument,
+                    "ts": point["ts"],
+                    "session": point.get("session"),
+                    "overall_score": point.get("overall"),
+                }
+            ).insert(ignore_permissions=True)
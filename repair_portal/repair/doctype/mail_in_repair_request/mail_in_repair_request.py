@@ -18,5 +18,5 @@ class MailInRepairRequest(Document):
         """Validate mail-in repair request requirements."""
         if not self.customer:
             frappe.throw(_("Customer is required"))
-        if not self.instrument_description:
-            frappe.throw(_("Instrument Description is required"))
\ No newline at end of file
+        if not self.instrument:
+            frappe.throw(_("Instrument is required"))
\ No newline at end of file
@@ -0,0 +1,4 @@
+# File: repair_portal/repair/doctype/mail_in_submission/__init__.py
+# Updated: 2026-10-19
+# Version: 1.0
+# Purpose: Package initializer for Mail In Submission DocType
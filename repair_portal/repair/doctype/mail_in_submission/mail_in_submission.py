@@ -0,0 +1,16 @@
+# Path: repair_portal/repair/doctype/mail_in_submission/mail_in_submission.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Staging record for a public mail-in repair submission, processed in the background
+# Dependencies: frappe
+
+from frappe.model.document import Document
+
+
+class MailInSubmission(Document):
+    """
+    Mail In Submission: named by the client's idempotency key, so a retried
+    POST finds the first record instead of creating a second one. The
+    background stage (repair.services.mail_in.process_submission) records each
+    document it creates here, which lets a failed run resume where it stopped.
+    """
@@ -0,0 +1,4 @@
+# File: repair_portal/repair/doctype/repair_daily_rollup/__init__.py
+# Updated: 2026-10-19
+# Version: 1.0
+# Purpose: Package initializer for Repair Daily Rollup DocType
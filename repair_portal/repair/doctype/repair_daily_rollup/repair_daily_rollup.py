@@ -0,0 +1,15 @@
+# Path: repair_portal/repair/doctype/repair_daily_rollup/repair_daily_rollup.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Daily repair analytics rollup maintained by repair.services.rollup
+# Dependencies: frappe
+
+from frappe.model.document import Document
+
+
+class RepairDailyRollup(Document):
+    """
+    Repair Daily Rollup: one row per (date, workflow state, repair class,
+    technician, workshop) aggregated from Repair Order Fact rows.
+    Written by the rollup service; not edited by hand.
+    """
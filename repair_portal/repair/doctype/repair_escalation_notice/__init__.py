@@ -0,0 +1,4 @@
+# File: repair_portal/repair/doctype/repair_escalation_notice/__init__.py
+# Updated: 2026-10-19
+# Version: 1.0
+# Purpose: Package initializer for Repair Escalation Notice DocType
@@ -0,0 +1,16 @@
+# Path: repair_portal/repair/doctype/repair_escalation_notice/repair_escalation_notice.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: One row per (Repair Order, escalation level), queued for digest delivery
+# Dependencies: frappe
+
+from frappe.model.document import Document
+
+
+class RepairEscalationNotice(Document):
+    """
+    Repair Escalation Notice: named by "<repair order>::<level>", so a second
+    escalation of the same order at the same level is rejected by the primary
+    key. Pending notices are emailed in per-recipient digests by
+    repair.services.escalation.flush_digests.
+    """
@@ -580,22 +580,18 @@ def _process_single_order(order: dict[str, object]) -> None:
 
 
 def _notify_sla_escalation(doc: RepairOrder) -> None:
-    recipients: list[str] = []
-    if doc.assigned_technician:
-        recipients.append(doc.assigned_technician)
-    manager_role_users = [
-        x.parent for x in frappe.get_all("Has Role", filters={"role": "Repair Manager"}, fields=["parent"])
-    ]
-    recipients.extend(manager_role_users)
-    recipients = sorted(set([r for r in recipients if r]))
-    if not recipients:
-        return
-    frappe.sendmail(
-        recipients=recipients,
+    # Queued for the per-recipient digest; repeats for the same status are dropped
+    from repair_portal.repair.services import escalation
+
+    escalation.notify(
+        doc.name,
+        f"status:{doc.sla_status}",
         subject=_("Repair Order {0} SLA {1}").format(doc.name, doc.sla_status),
-        message=_("Repair Order {0} is now {1} against SLA and needs attention.").format(
+        summary=_("Repair Order {0} is now {1} against SLA and needs attention.").format(
             doc.name, doc.sla_status
         ),
+        users=[doc.assigned_technician],
+        roles=["Repair Manager"],
     )
 
 
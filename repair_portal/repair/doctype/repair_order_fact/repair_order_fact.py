@@ -0,0 +1,16 @@
+# Path: repair_portal/repair/doctype/repair_order_fact/repair_order_fact.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Per-Repair-Order analytics fact maintained by repair.services.rollup
+# Dependencies: frappe
+
+from frappe.model.document import Document
+
+
+class RepairOrderFact(Document):
+    """
+    Repair Order Fact: one row per Repair Order holding the measures the
+    analytics reports need (cycle/task hours, parts cost/revenue, SLA outcome)
+    and the bucket it contributes to in Repair Daily Rollup.
+    Written by the rollup service; not edited by hand.
+    """
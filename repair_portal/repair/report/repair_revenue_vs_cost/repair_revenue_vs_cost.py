@@ -1,13 +1,44 @@
 # File: repair_portal/repair/report/repair_revenue_vs_cost/repair_revenue_vs_cost.py
-# Updated: 2025-07-13
-# Version: 1.1
+# Updated: 2026-10-19
+# Version: 1.2
 # Purpose: Script Report showing repair revenue vs cost (parameterized and secure)
+#          Reads Repair Order Fact rows when the rollup covers the requested range.
 
 import frappe
 
+from repair_portal.repair.services import rollup
+
+LABOR_RATE = 50
+
 
 def execute(filters=None):
     filters = filters or {}
+    if rollup.is_covered(filters.get("from_date"), filters.get("to_date")):
+        data = _from_facts(filters)
+    else:
+        data = _live(filters)
+    return _columns(), data
+
+
+def _from_facts(filters):
+    facts = rollup.query_facts(
+        ["repair_order", "parts_cost", "task_hours"],
+        from_date=filters.get("from_date"),
+        to_date=filters.get("to_date"),
+        date_field="created_on",
+    )
+    return [
+        {
+            "repair_order": f.repair_order,
+            "total_parts_cost": f.parts_cost,
+            "labor_value": (f.task_hours or 0) * LABOR_RATE,
+            "total_cost": (f.parts_cost or 0) + (f.task_hours or 0) * LABOR_RATE,
+        }
+        for f in facts
+    ]
+
+
+def _live(filters):
     conditions = []
 
     if filters.get("from_date"):
@@ -27,9 +58,11 @@ def execute(filters=None):
         {where_clause}
     """
 
-    data = frappe.db.sql(query, filters, as_dict=True)
+    return frappe.db.sql(query, filters, as_dict=True)
 
-    columns = [
+
+def _columns():
+    return [
         {
             "label": "Repair Order",
             "fieldname": "repair_order",
@@ -40,5 +73,3 @@ def execute(filters=None):
         {"label": "Labor Value ($50/hr)", "fieldname": "labor_value", "fieldtype": "Currency"},
         {"label": "Total Cost", "fieldname": "total_cost", "fieldtype": "Currency"},
     ]
-
-    return columns, data
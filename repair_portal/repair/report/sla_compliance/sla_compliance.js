@@ -30,5 +30,40 @@ frappe.query_reports["SLA Compliance"] = {
       "fieldtype": "Check",
       "default": 0
     }
-  ]
+  ],
+
+  onload(report) {
+    // Large ranges: stream the export in a background job (core.report_export)
+    ["csv", "xlsx"].forEach((fmt) => {
+      report.page.add_inner_button(__("Background Export ({0})", [fmt.toUpperCase()]), () => {
+        frappe
+          .call("repair_portal.core.report_export.start_export", {
+            report_name: report.report_name,
+            filters: report.get_filter_values(),
+            file_format: fmt,
+          })
+          .then((r) => {
+            const exportId = r.message.export_id;
+            frappe.show_alert({ message: __("Export queued"), indicator: "blue" });
+            const handler = (data) => {
+              if (data.export_id !== exportId) return;
+              if (data.status === "running") {
+                frappe.show_progress(__("Exporting"), data.rows, data.rows + 1, __("{0} rows", [data.rows]));
+                return;
+              }
+              frappe.hide_progress();
+              frappe.realtime.off(r.message.event, handler);
+              if (data.status === "done") {
+                frappe.msgprint(
+                  __("Export ready ({0} rows): {1}", [data.rows, `<a href="${data.file_url}">${__("Download")}</a>`])
+                );
+              } else {
+                frappe.msgprint(__("Export failed. See Error Log."));
+              }
+            };
+            frappe.realtime.on(r.message.event, handler);
+          });
+      }, __("Export"));
+    });
+  }
 };
@@ -1,13 +1,17 @@
 # Path: repair_portal/repair/report/sla_compliance/sla_compliance.py
 # Script Report: SLA Compliance for Repair Orders
+# Exports stream through core.report_export (see stream()).
 
 from __future__ import annotations
 
+from collections.abc import Iterator
 from typing import Any
 
 import frappe
 from frappe.utils import now_datetime
 
+from repair_portal.core import report_export
+
 RO = "Repair Order"
 
 # Preferred → fallback fieldnames we’ll try to read on Repair Order
@@ -33,6 +37,14 @@ def execute(filters: dict[str, Any] | None = None) -> tuple[list[dict], list[lis
     return columns, rows
 
 
+def stream(filters: dict[str, Any] | None = None):
+    """Streaming variant for core.report_export: same rows, fetched and transformed per chunk."""
+    filters = filters or {}
+    select_fields, where, actual_map, order_by = _plan(filters)
+    chunks = report_export.iter_ordered_chunks(RO, where, select_fields, order_by)
+    return _get_columns(), report_export.stream_rows(chunks, lambda chunk: _transform(chunk, actual_map))
+
+
 def _get_columns() -> list[dict[str, Any]]:
     return [
         {"label": "Repair Order", "fieldname": "name", "fieldtype": "Link", "options": RO, "width": 140},
@@ -63,7 +75,7 @@ def _get_columns() -> list[dict[str, Any]]:
     ]
 
 
-def _get_data(filters: dict[str, Any]) -> list[dict[str, Any]]:
+def _plan(filters: dict[str, Any]) -> tuple[list[str], dict[str, Any], dict[str, str | None], str]:
     meta = frappe.get_meta(RO)
 
     def exists(fieldname: str) -> bool:
@@ -109,34 +121,41 @@ def _get_data(filters: dict[str, Any]) -> list[dict[str, Any]]:
     if filters.get("breached_only") and actual_map["sla_breached"]:
         where[actual_map["sla_breached"]] = 1
 
-    # Query
-    ros = frappe.get_all(
-        RO,
-        filters=where,
-        fields=select_fields,
-        order_by=f"{actual_map['sla_due'] or 'modified'} asc, modified desc",
-    )
+    # name breaks ties so the on-screen report and the streamed export list rows identically
+    order_by = report_export.stable_order(f"{actual_map['sla_due'] or 'modified'} asc, modified desc")
+    return select_fields, where, actual_map, order_by
 
-    # Bulk resolve customer display names (once per unique customer)
-    customer_field = actual_map["customer"]
-    customer_map: dict[str, str] = {}
-    if customer_field:
-        unique_customers = sorted({r.get(customer_field) for r in ros if r.get(customer_field)})
-        if unique_customers:
-            try:
-                # Try to fetch Customer.customer_name (if present), fallback to name
-                rows = frappe.get_all(
-                    "Customer", filters={"name": ["in", unique_customers]}, fields=["name", "customer_name"]
-                )
-                for rr in rows:
-                    display = rr.get("customer_name") or rr.get("name")
-                    customer_map[rr["name"]] = display
-            except Exception:
-                for cname in unique_customers:
-                    customer_map[cname] = cname
 
+def _get_data(filters: dict[str, Any]) -> list[dict[str, Any]]:
+    select_fields, where, actual_map, order_by = _plan(filters)
+    ros = frappe.get_all(RO, filters=where, fields=select_fields, order_by=order_by)
+    return list(_transform(ros, actual_map))
+
+
+def _customer_names(customers: set[str]) -> dict[str, str]:
+    """Bulk resolve customer display names (once per unique customer in the batch)."""
+    customer_map: dict[str, str] = {}
+    unique_customers = sorted(c for c in customers if c)
+    if not unique_customers:
+        return customer_map
+    try:
+        # Try to fetch Customer.customer_name (if present), fallback to name
+        rows = frappe.get_all(
+            "Customer", filters={"name": ["in", unique_customers]}, fields=["name", "customer_name"]
+        )
+        for rr in rows:
+            customer_map[rr["name"]] = rr.get("customer_name") or rr.get("name")
+    except Exception:
+        for cname in unique_customers:
+            customer_map[cname] = cname
+    return customer_map
+
+
+def _transform(ros: list[dict[str, Any]], actual_map: dict[str, str | None]) -> Iterator[dict[str, Any]]:
+    """Map raw Repair Order rows (one batch) into report rows."""
+    customer_field = actual_map["customer"]
+    customer_map = _customer_names({r.get(customer_field) for r in ros}) if customer_field else {}
     now = now_datetime()
-    out: list[dict[str, Any]] = []
 
     for r in ros:
         row: dict[str, Any] = {"name": r["name"]}
@@ -168,6 +187,4 @@ def _get_data(filters: dict[str, Any]) -> list[dict[str, Any]]:
             overdue = int(delta.total_seconds() // 60) if delta.total_seconds() > 0 else 0
         row["overdue_minutes"] = overdue
 
-        out.append(row)
-
-    return out
+        yield row
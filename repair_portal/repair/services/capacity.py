@@ -0,0 +1,283 @@
+"""
+Path: repair_portal/repair/services/capacity.py
+Version: 1.0.0
+Purpose:
+    Technician capacity planner for Repair Orders (RO):
+      - Builds a per-technician calendar of free minutes per day from
+        Technician Availability, minus work already committed to open ROs
+        (remaining estimate, or open labor-session estimates)
+      - Walks unassigned open ROs in SLA order (sla_due_date, then priority)
+        and greedily suggests the technician who finishes each one earliest,
+        preferring anyone who can still meet the SLA
+      - Returns suggestions with projected finish dates and per-technician
+        projected utilization; nothing is written back
+
+Public API:
+    - CapacityCalendar                           (pure, no DB access)
+    - plan_assignments(calendar, orders)         (pure greedy planner)
+    - suggest_assignments(horizon_days=14)       (whitelisted)
+
+Notes:
+    - Buckets are one calendar day wide (Technician Availability stores
+      available_minutes per day). Each technician row is a flat array('d');
+      a whole shop is a few thousand floats, so no NumPy dependency.
+    - ROs without an estimate are planned at DEFAULT_ESTIMATE_MINUTES.
+"""
+
+from __future__ import annotations
+
+import heapq
+import time
+from array import array
+from collections import defaultdict
+from dataclasses import dataclass, field
+from datetime import date, datetime, timedelta
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+# -----------------------------
+# Configuration & Constants
+# -----------------------------
+DEFAULT_HORIZON_DAYS = 14
+MAX_HORIZON_DAYS = 90
+DEFAULT_ESTIMATE_MINUTES = 120.0
+CLOSED_STATES = ("Completed", "Delivered")
+PRIORITY_RANK = {"Critical": 0, "High": 1, "Medium": 2, "Low": 3}
+PLANNER_ROLES = ("Repair Manager", "System Manager")
+
+
+# -----------------------------
+# Calendar model
+# -----------------------------
+@dataclass
+class CapacityCalendar:
+    """Free minutes per technician per day over ``[start, start + days)``."""
+
+    start: date
+    days: int
+    capacity: dict[str, array] = field(default_factory=dict)
+    free: dict[str, array] = field(default_factory=dict)
+    # First day index that may still have free minutes (monotonic per technician).
+    _cursor: dict[str, int] = field(default_factory=dict)
+
+    def day_index(self, when: date | datetime | None) -> int | None:
+        if when is None:
+            return None
+        if isinstance(when, datetime):
+            when = when.date()
+        return (when - self.start).days
+
+    def add_technician(self, technician: str) -> None:
+        if technician not in self.capacity:
+            self.capacity[technician] = array("d", bytes(8 * self.days))
+            self.free[technician] = array("d", bytes(8 * self.days))
+            self._cursor[technician] = 0
+
+    def add_availability(self, technician: str, day: date, minutes: float) -> None:
+        idx = self.day_index(day)
+        if idx is None or not 0 <= idx < self.days:
+            return
+        self.add_technician(technician)
+        self.capacity[technician][idx] += minutes
+        self.free[technician][idx] += minutes
+
+    def _advance(self, technician: str) -> int:
+        free, i = self.free[technician], self._cursor[technician]
+        while i < self.days and free[i] <= 0:
+            i += 1
+        self._cursor[technician] = i
+        return i
+
+    def finish_day(self, technician: str, minutes: float) -> int | None:
+        """Day index on which ``minutes`` of work started now would finish, or None past the horizon."""
+        free = self.free[technician]
+        remaining = minutes
+        for i in range(self._advance(technician), self.days):
+            remaining -= free[i]
+            if remaining <= 0:
+                return i
+        return None
+
+    def book(self, technician: str, minutes: float) -> float:
+        """Consume free minutes earliest-first; returns minutes that did not fit in the horizon."""
+        self.add_technician(technician)
+        free = self.free[technician]
+        remaining = minutes
+        for i in range(self._advance(technician), self.days):
+            if remaining <= 0:
+                break
+            take = min(free[i], remaining)
+            if take > 0:
+                free[i] -= take
+                remaining -= take
+        self._advance(technician)
+        return max(remaining, 0.0)
+
+    def utilization(self, technician: str) -> float:
+        cap = sum(self.capacity[technician])
+        if cap <= 0:
+            return 0.0
+        return (cap - sum(self.free[technician])) / cap * 100.0
+
+
+@dataclass(frozen=True)
+class PlanOrder:
+    name: str
+    minutes: float
+    sla_due: datetime | date | None = None
+    priority: str | None = None
+
+
+def _order_key(order: PlanOrder, seq: int) -> tuple:
+    due = order.sla_due
+    if isinstance(due, date) and not isinstance(due, datetime):
+        due = datetime.combine(due, datetime.min.time())
+    return (due is None, due or datetime.max, PRIORITY_RANK.get(order.priority or "", 9), seq)
+
+
+def plan_assignments(calendar: CapacityCalendar, orders: list[PlanOrder]) -> dict[str, list[dict[str, Any]]]:
+    """Greedy earliest-finish assignment in SLA order. Mutates ``calendar`` (books suggestions)."""
+    heap = [(_order_key(o, i), o) for i, o in enumerate(orders)]
+    heapq.heapify(heap)
+    technicians = sorted(calendar.capacity)
+
+    suggestions: list[dict[str, Any]] = []
+    unplaced: list[dict[str, Any]] = []
+    while heap:
+        _key, order = heapq.heappop(heap)
+        due_idx = calendar.day_index(order.sla_due)
+        best: tuple | None = None
+        for tech in technicians:
+            finish = calendar.finish_day(tech, order.minutes)
+            if finish is None:
+                continue
+            late = due_idx is not None and finish > due_idx
+            rank = (late, finish, calendar.utilization(tech), tech)
+            if best is None or rank < best:
+                best = rank
+        if best is None:
+            unplaced.append({"repair_order": order.name, "estimated_minutes": order.minutes})
+            continue
+
+        late, finish, _util, tech = best
+        calendar.book(tech, order.minutes)
+        suggestions.append(
+            {
+                "repair_order": order.name,
+                "technician": tech,
+                "estimated_minutes": round(order.minutes, 1),
+                "projected_finish": calendar.start + timedelta(days=finish),
+                "sla_due_date": order.sla_due,
+                "on_time": not late,
+            }
+        )
+    return {"suggestions": suggestions, "unplaced": unplaced}
+
+
+# -----------------------------
+# Data loading
+# -----------------------------
+def _load_calendar(start: date, days: int) -> CapacityCalendar:
+    calendar = CapacityCalendar(start=start, days=days)
+    for row in frappe.get_all(
+        "Technician Availability",
+        filters={"date": ["between", [start, start + timedelta(days=days - 1)]]},
+        fields=["technician", "date", "available_minutes"],
+    ):
+        if row.technician:
+            calendar.add_availability(row.technician, row.date, float(row.available_minutes or 0))
+    return calendar
+
+
+def _committed_minutes(open_orders: list[dict]) -> dict[str, float]:
+    """Remaining minutes already owed per technician on assigned open ROs."""
+    committed: dict[str, float] = defaultdict(float)
+    assigned = [o for o in open_orders if o.assigned_technician]
+    needs_sessions = [o.name for o in assigned if not o.total_estimated_minutes]
+    sessions_by_ro: dict[str, list[dict]] = defaultdict(list)
+    if needs_sessions:
+        for s in frappe.get_all(
+            "Repair Labor Session",
+            filters={"parenttype": "Repair Order", "parent": ["in", needs_sessions]},
+            fields=["parent", "technician", "estimated_minutes", "billable_minutes"],
+        ):
+            sessions_by_ro[s.parent].append(s)
+
+    for o in assigned:
+        if o.total_estimated_minutes:
+            remaining = float(o.total_estimated_minutes) - float(o.total_actual_minutes or 0)
+            committed[o.assigned_technician] += max(remaining, 0.0)
+            continue
+        for s in sessions_by_ro.get(o.name, []):
+            remaining = float(s.estimated_minutes or 0) - float(s.billable_minutes or 0)
+            committed[s.technician or o.assigned_technician] += max(remaining, 0.0)
+    return committed
+
+
+def suggest_assignments(horizon_days: int = DEFAULT_HORIZON_DAYS) -> dict[str, Any]:
+    """Suggest technicians for unassigned open Repair Orders, in SLA order."""
+    frappe.only_for(PLANNER_ROLES)
+    started = time.perf_counter()
+    days = max(1, min(int(horizon_days or DEFAULT_HORIZON_DAYS), MAX_HORIZON_DAYS))
+    start = frappe.utils.getdate(frappe.utils.nowdate())
+
+    calendar = _load_calendar(start, days)
+    open_orders = frappe.get_all(
+        "Repair Order",
+        filters={"workflow_state": ["not in", CLOSED_STATES], "docstatus": ["<", 2]},
+        fields=[
+            "name",
+            "assigned_technician",
+            "priority",
+            "sla_due_date",
+            "total_estimated_minutes",
+            "total_actual_minutes",
+        ],
+    )
+
+    committed = _committed_minutes(open_orders)
+    overflow: dict[str, float] = {}
+    for tech, minutes in committed.items():
+        left = calendar.book(tech, minutes)
+        if left:
+            overflow[tech] = round(left, 1)
+    committed_util = {tech: calendar.utilization(tech) for tech in calendar.capacity}
+
+    plan = plan_assignments(
+        calendar,
+        [
+            PlanOrder(
+                name=o.name,
+                minutes=float(o.total_estimated_minutes or 0) or DEFAULT_ESTIMATE_MINUTES,
+                sla_due=o.sla_due_date,
+                priority=o.priority,
+            )
+            for o in open_orders
+            if not o.assigned_technician
+        ],
+    )
+
+    technicians = [
+        {
+            "technician": tech,
+            "capacity_minutes": round(sum(calendar.capacity[tech]), 1),
+            "committed_utilization": round(committed_util.get(tech, 0.0), 2),
+            "projected_utilization": round(calendar.utilization(tech), 2),
+            "overbooked_minutes": overflow.get(tech, 0.0),
+        }
+        for tech in sorted(calendar.capacity)
+    ]
+    return {
+        "horizon": {"start": start, "days": days},
+        **plan,
+        "technicians": technicians,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000.0, 2),
+    }
+
+
+if frappe is not None:
+    suggest_assignments = frappe.whitelist()(suggest_assignments)
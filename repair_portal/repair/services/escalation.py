@@ -0,0 +1,246 @@
+"""
+Path: repair_portal/repair/services/escalation.py
+Version: 1.0.0
+Purpose:
+    Single dispatcher for Repair Order (RO) escalation mail:
+      - notify(order, level, ...) records one Repair Escalation Notice per
+        (order, level); repeats are dropped by the notice's primary key
+      - Role → user resolution is cached in Redis and cleared on User changes
+      - flush_digests() (cron, every DIGEST_WINDOW_MINUTES) sends each recipient
+        one email listing all of their pending notices; recipients with the same
+        notice set share a single sendmail call
+      - Outbound mail is capped per flush and paused while the Email Queue
+        backlog is above MAX_EMAIL_BACKLOG; unsent notices wait for the next run
+
+Public API:
+    - plan_digests(notices)                      (pure grouping)
+    - render_digest(notices, link_for)           (pure HTML)
+    - users_with_role(role) / invalidate_role_cache(...)
+    - claim(order, level, ...) -> bool
+    - notify(order, level, subject, summary, users=(), roles=()) -> bool
+    - flush_digests() -> dict
+"""
+
+from __future__ import annotations
+
+import html
+from collections import defaultdict
+from collections.abc import Callable, Iterable
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+# -----------------------------
+# Configuration & Constants
+# -----------------------------
+NOTICE_DOCTYPE = "Repair Escalation Notice"
+ROLE_USERS_KEY = "repair_portal:escalation:role_users"
+DIGEST_WINDOW_MINUTES = 5
+MAX_NOTICES_PER_FLUSH = 1000
+MAX_EMAIL_BACKLOG = 500
+MAX_EMAILS_PER_FLUSH = 100
+
+
+# -----------------------------
+# Pure helpers
+# -----------------------------
+def dedupe_key(order: str, level: str) -> str:
+    return f"{order}::{level}"
+
+
+def split_recipients(value: str | Iterable[str] | None) -> list[str]:
+    if not value:
+        return []
+    items = value.splitlines() if isinstance(value, str) else value
+    return sorted({item.strip() for item in items if item and item.strip()})
+
+
+def plan_digests(notices: Iterable[dict[str, Any]]) -> list[tuple[tuple[str, ...], list[dict[str, Any]]]]:
+    """
+    Group pending notices into emails.
+
+    Each recipient gets exactly one email holding every notice addressed to them;
+    recipients whose notice sets are identical (e.g. all Repair Managers) are put
+    on the same email. Returns ``[(recipients, notices)]``, largest audience first.
+    """
+    by_recipient: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for notice in notices:
+        for recipient in split_recipients(notice.get("recipients")):
+            by_recipient[recipient].append(notice)
+
+    groups: dict[tuple[str, ...], list[str]] = defaultdict(list)
+    members: dict[tuple[str, ...], list[dict[str, Any]]] = {}
+    for recipient, items in by_recipient.items():
+        key = tuple(sorted(n["name"] for n in items))
+        groups[key].append(recipient)
+        members[key] = sorted(items, key=lambda n: n["name"])
+    plan = [(tuple(sorted(recipients)), members[key]) for key, recipients in groups.items()]
+    plan.sort(key=lambda item: (-len(item[0]), item[0]))
+    return plan
+
+
+def digest_subject(notices: list[dict[str, Any]]) -> str:
+    if len(notices) == 1:
+        return notices[0].get("subject") or f"Repair Order {notices[0].get('repair_order')} escalation"
+    return f"{len(notices)} Repair Orders need attention"
+
+
+def render_digest(notices: list[dict[str, Any]], link_for: Callable[[str], str]) -> str:
+    """HTML body: one list item per notice, linking to its Repair Order."""
+    items = []
+    for notice in notices:
+        order = notice.get("repair_order") or ""
+        items.append(
+            f"<li><a href='{html.escape(link_for(order), quote=True)}'><b>{html.escape(order)}</b></a>"
+            f" &mdash; {html.escape(notice.get('summary') or notice.get('subject') or '')}</li>"
+        )
+    return (
+        "<p>The following Repair Orders were escalated and need attention:</p>"
+        f"<ul>{''.join(items)}</ul>"
+    )
+
+
+# -----------------------------
+# Recipients
+# -----------------------------
+def users_with_role(role: str) -> list[str]:
+    """Enabled users holding ``role`` (cached until a User is saved or deleted)."""
+    cache = frappe.cache()
+    users = cache.hget(ROLE_USERS_KEY, role)
+    if users is None:
+        holders = frappe.get_all("Has Role", filters={"role": role, "parenttype": "User"}, pluck="parent")
+        users = (
+            frappe.get_all("User", filters={"name": ["in", holders], "enabled": 1}, pluck="name")
+            if holders
+            else []
+        )
+        cache.hset(ROLE_USERS_KEY, role, users)
+    return list(users)
+
+
+def invalidate_role_cache(*_args: Any, **_kwargs: Any) -> None:
+    """Doc-event safe: role membership or enabled flag may have changed."""
+    frappe.cache().delete_value(ROLE_USERS_KEY)
+
+
+# -----------------------------
+# Recording notices
+# -----------------------------
+def claim(
+    order: str,
+    level: str,
+    subject: str | None = None,
+    summary: str | None = None,
+    recipients: Iterable[str] = (),
+    status: str = "Sent",
+) -> bool:
+    """Record (order, level) once; False if it was already recorded."""
+    key = dedupe_key(order, level)
+    if frappe.db.exists(NOTICE_DOCTYPE, key):
+        return False
+    try:
+        frappe.get_doc(
+            {
+                "doctype": NOTICE_DOCTYPE,
+                "dedupe_key": key,
+                "repair_order": order,
+                "level": level,
+                "status": status,
+                "subject": subject,
+                "summary": summary,
+                "recipients": "\n".join(split_recipients(recipients)),
+                "sent_on": frappe.utils.now_datetime() if status == "Sent" else None,
+            }
+        ).insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        # Lost a race with another worker for the same (order, level)
+        return False
+    return True
+
+
+def notify(
+    order: str,
+    level: str,
+    subject: str,
+    summary: str,
+    users: Iterable[str | None] = (),
+    roles: Iterable[str] = (),
+) -> bool:
+    """Queue an escalation for the next digest. Returns False for duplicates or no recipients."""
+    if frappe.db.exists(NOTICE_DOCTYPE, dedupe_key(order, level)):
+        return False
+    recipients = {u for u in users if u}
+    for role in roles:
+        if role:
+            recipients.update(users_with_role(role))
+    if not recipients:
+        return False
+    return claim(order, level, subject=subject, summary=summary, recipients=recipients, status="Pending")
+
+
+# -----------------------------
+# Delivery
+# -----------------------------
+def _email_backlog() -> int:
+    return frappe.db.count("Email Queue", {"status": ["in", ["Not Sent", "Sending"]]})
+
+
+def flush_digests() -> dict[str, Any]:
+    """Cron: email pending notices as per-recipient digests, within the mail budget."""
+    backlog = _email_backlog()
+    if backlog >= MAX_EMAIL_BACKLOG:
+        _log().warning("Escalation digests deferred: %s emails already queued", backlog)
+        return {"deferred": True, "backlog": backlog, "emails": 0, "sent": 0}
+
+    notices = frappe.get_all(
+        NOTICE_DOCTYPE,
+        filters={"status": "Pending"},
+        fields=["name", "repair_order", "level", "subject", "summary", "recipients"],
+        order_by="creation asc",
+        limit_page_length=MAX_NOTICES_PER_FLUSH,
+    )
+    if not notices:
+        return {"deferred": False, "backlog": backlog, "emails": 0, "sent": 0}
+
+    remaining = {n["name"]: set(split_recipients(n["recipients"])) for n in notices}
+    budget = min(MAX_EMAILS_PER_FLUSH, MAX_EMAIL_BACKLOG - backlog)
+    link_for = lambda order: frappe.utils.get_url_to_form("Repair Order", order)  # noqa: E731
+    emails = 0
+    for recipients, items in plan_digests(notices):
+        if emails >= budget:
+            break
+        single = items[0]["repair_order"] if len(items) == 1 else None
+        try:
+            frappe.sendmail(
+                recipients=list(recipients),
+                subject=digest_subject(items),
+                message=render_digest(items, link_for),
+                reference_doctype="Repair Order" if single else None,
+                reference_name=single,
+            )
+        except Exception:
+            _log().exception("Escalation digest to %s failed", ", ".join(recipients))
+            frappe.clear_last_message()
+            break
+        emails += 1
+        for notice in items:
+            remaining[notice["name"]].difference_update(recipients)
+
+    now = frappe.utils.now_datetime()
+    done = [name for name, left in remaining.items() if not left]
+    if done:
+        frappe.db.set_value(NOTICE_DOCTYPE, {"name": ["in", done]}, {"status": "Sent", "sent_on": now})
+    for notice in notices:
+        left = remaining[notice["name"]]
+        if left and left != set(split_recipients(notice["recipients"])):
+            # Partially delivered: keep only who is still owed this notice
+            frappe.db.set_value(NOTICE_DOCTYPE, notice["name"], "recipients", "\n".join(sorted(left)))
+    frappe.db.commit()
+    return {"deferred": False, "backlog": backlog, "emails": emails, "sent": len(done)}
+
+
+def _log():
+    return frappe.logger("repair_portal.sla", allow_site=True)
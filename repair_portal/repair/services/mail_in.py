@@ -0,0 +1,495 @@
+"""
+Path: repair_portal/repair/services/mail_in.py
+Version: 1.0.0
+Purpose:
+    Two-phase pipeline for public mail-in repair submissions:
+      - accept(payload): validate the form and persist one Mail In Submission
+        keyed by the client's idempotency key in a single insert; a retried POST
+        gets the original submission back instead of a duplicate
+      - process_submission(name) (background): reconcile Customer, Instrument and
+        Address, create the Repair Request / Mail In Repair Request, upsert the
+        Player Profile, place the payment hold and issue the shipping label;
+        each result is recorded on the submission so a failed run resumes
+      - retry_stalled() (hourly): re-queue submissions whose job died
+
+Public API:
+    - submission_key(client_key, form_fields)   (pure)
+    - pending_steps(record)                      (pure)
+    - accept(payload) -> dict
+    - process_submission(name) -> dict
+    - retry_stalled() -> int
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+from dataclasses import dataclass
+from typing import Any
+
+try:
+    import frappe
+    from frappe import _
+    from frappe.model.document import Document
+    from frappe.utils import add_to_date, cint, flt, now_datetime
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+    def _(s: str) -> str:  # type: ignore
+        return s
+
+
+# -----------------------------
+# Configuration & Constants
+# -----------------------------
+SUBMISSION_DOCTYPE = "Mail In Submission"
+TOKEN_CONTEXT = "repair-request"
+MAX_ATTEMPTS = 5
+STALLED_AFTER_MINUTES = 15
+
+REQUIRED_FIELDS = (
+    "full_name",
+    "email",
+    "serial_no",
+    "make",
+    "model",
+    "family",
+    "finish",
+    "requested_services",
+    "preferred_carrier",
+    "address_line1",
+    "city",
+    "postal_code",
+    "country",
+)
+
+# (submission field that records the step, step name) in execution order
+PIPELINE_STEPS = (
+    ("customer", "customer"),
+    ("instrument", "instrument"),
+    ("customer_address", "address"),
+    ("repair_request", "repair_request"),
+    ("mail_in_request", "mail_in_request"),
+    ("payment_link", "hold"),
+)
+
+
+# -----------------------------
+# Pure helpers
+# -----------------------------
+def submission_key(client_key: str | None, fields: dict[str, Any]) -> tuple[str, bool]:
+    """
+    Submission name for a POST: ``(key, from_client)``.
+
+    Clients send a per-form idempotency key. Without one, a digest of the
+    identifying fields and day is used so an accidental double submit still
+    collapses into one request.
+    """
+    client_key = (client_key or "").strip()
+    if client_key:
+        return f"key:{hashlib.sha256(client_key.encode()).hexdigest()[:40]}", True
+    parts = [
+        str(fields.get(k) or "").strip().lower()
+        for k in ("email", "serial_no", "requested_services", "postal_code", "day")
+    ]
+    return f"auto:{hashlib.sha256('|'.join(parts).encode()).hexdigest()[:40]}", False
+
+
+def pending_steps(record: dict[str, Any]) -> list[str]:
+    """Steps whose result is not yet recorded on the submission."""
+    return [step for field, step in PIPELINE_STEPS if not record.get(field)]
+
+
+# -----------------------------
+# Form
+# -----------------------------
+@dataclass
+class MailInForm:
+    full_name: str
+    email: str
+    phone: str
+    marketing_consent: bool
+    serial_no: str
+    make: str
+    model: str
+    family: str
+    finish: str
+    requested_services: str
+    preferred_carrier: str
+    insurance_value: float
+    address_line1: str
+    address_line2: str
+    city: str
+    state: str
+    postal_code: str
+    country: str
+    consent_storage: bool
+
+    @classmethod
+    def from_dict(cls, payload: dict[str, Any]) -> MailInForm:
+        missing = [key for key in REQUIRED_FIELDS if not payload.get(key)]
+        if missing:
+            frappe.throw(_("Missing required fields: {0}").format(", ".join(missing)))
+        return cls(
+            full_name=payload.get("full_name").strip(),
+            email=payload.get("email").strip().lower(),
+            phone=payload.get("phone", "").strip(),
+            marketing_consent=bool(cint(payload.get("marketing_consent"))),
+            serial_no=payload.get("serial_no").strip(),
+            make=payload.get("make").strip(),
+            model=payload.get("model").strip(),
+            family=payload.get("family"),
+            finish=payload.get("finish"),
+            requested_services=payload.get("requested_services").strip(),
+            preferred_carrier=payload.get("preferred_carrier"),
+            insurance_value=flt(payload.get("insurance_value") or 0),
+            address_line1=payload.get("address_line1").strip(),
+            address_line2=payload.get("address_line2", "").strip(),
+            city=payload.get("city").strip(),
+            state=payload.get("state", "").strip(),
+            postal_code=payload.get("postal_code").strip(),
+            country=payload.get("country").strip(),
+            consent_storage=bool(cint(payload.get("consent_storage", 0))),
+        )
+
+
+# -----------------------------
+# Phase 1: accept
+# -----------------------------
+def _response(sub: Document, portal_token: str | None) -> dict[str, Any]:
+    return {
+        "submission": sub.name,
+        "mail_in_request": sub.mail_in_request or sub.name,
+        "status": sub.status,
+        "status_page": f"/repair-status/{portal_token}" if portal_token else None,
+        "portal_token": portal_token,
+        "payment_link": sub.payment_link,
+    }
+
+
+def _existing_response(name: str, from_client: bool) -> dict[str, Any]:
+    sub = frappe.get_doc(SUBMISSION_DOCTYPE, name)
+    # Only a caller holding the original idempotency key may see the portal token again.
+    token = sub.get_password("portal_token", raise_exception=False) if from_client else None
+    return {**_response(sub, token), "duplicate": True}
+
+
+def _enqueue(name: str) -> None:
+    frappe.enqueue(
+        "repair_portal.repair.services.mail_in.process_submission",
+        queue="short",
+        job_id=f"repair_portal::mail_in::{name}",
+        deduplicate=True,
+        enqueue_after_commit=True,
+        name=name,
+    )
+
+
+def accept(payload: dict[str, Any]) -> dict[str, Any]:
+    """Validate and durably record one submission; all side effects run in the background."""
+    from repair_portal.repair_portal.utils import token as token_utils
+
+    form = MailInForm.from_dict(payload)
+    if not form.consent_storage:
+        frappe.throw(_("Consent is required to process your mail-in repair."))
+
+    key, from_client = submission_key(
+        payload.get("idempotency_key"), {**payload, "day": now_datetime().date().isoformat()}
+    )
+    if frappe.db.exists(SUBMISSION_DOCTYPE, key):
+        return _existing_response(key, from_client)
+
+    raw_token, hashed = token_utils.generate_token(TOKEN_CONTEXT)
+    sub = frappe.get_doc(
+        {
+            "doctype": SUBMISSION_DOCTYPE,
+            "idempotency_key": key,
+            "status": "Queued",
+            "email": form.email,
+            "serial_no": form.serial_no,
+            "payload": json.dumps(payload, default=str),
+            "portal_token_hash": hashed,
+            "portal_token": raw_token,
+        }
+    )
+    try:
+        sub.insert(ignore_permissions=True)
+    except frappe.DuplicateEntryError:
+        # A concurrent retry of the same POST won the insert
+        frappe.db.rollback()
+        return _existing_response(key, from_client)
+    _enqueue(sub.name)
+    frappe.db.commit()
+    return _response(sub, raw_token)
+
+
+# -----------------------------
+# Phase 2: reconcile (background)
+# -----------------------------
+def _ensure_customer(form: MailInForm) -> str:
+    existing = frappe.db.get_value("Customer", {"email_id": form.email})
+    if existing:
+        return existing
+    defaults = frappe.defaults.get_defaults()
+    customer_group = defaults.get("customer_group") or frappe.db.get_value(
+        "Customer Group", {"is_group": 0}, "name"
+    )
+    territory = defaults.get("territory") or frappe.db.get_value("Territory", {"is_group": 0}, "name")
+    customer = frappe.get_doc(
+        {
+            "doctype": "Customer",
+            "customer_name": form.full_name,
+            "customer_type": "Individual",
+            "customer_group": customer_group,
+            "territory": territory,
+            "email_id": form.email,
+            "mobile_no": form.phone,
+        }
+    )
+    customer.flags.ignore_permissions = True
+    customer.insert()
+    return customer.name
+
+
+def _ensure_instrument(customer: str, form: MailInForm) -> str:
+    existing = frappe.db.get_value("Instrument", {"serial_no": form.serial_no})
+    if existing:
+        # Security: Do not automatically transfer instrument ownership on public form submission.
+        # If the serial number exists but belongs to a different customer, we use the existing
+        # instrument record without updating the owner. The discrepancy will be visible
+        # to the repair shop in the Repair Request (Customer vs Instrument Owner).
+        return existing
+    instrument = frappe.get_doc(
+        {
+            "doctype": "Instrument",
+            "customer": customer,
+            "serial_no": form.serial_no,
+            "make": form.make,
+            "model": form.model,
+            "family": form.family,
+            "finish": form.finish,
+            "portal_visible": 1,
+        }
+    )
+    instrument.flags.ignore_permissions = True
+    instrument.insert()
+    return instrument.name
+
+
+def _ensure_address(customer: str, form: MailInForm) -> str:
+    existing = frappe.db.get_value(
+        "Address",
+        {
+            "address_line1": form.address_line1,
+            "pincode": form.postal_code,
+            "city": form.city,
+            "email_id": form.email,
+        },
+        "name",
+    )
+    if existing:
+        # Security/Data Integrity: Ensure existing address is linked to this customer
+        # to prevent "orphan" usage where the customer cannot manage their address.
+        addr_doc = frappe.get_doc("Address", existing)
+        is_linked = any(link.link_name == customer for link in (addr_doc.links or []))
+        if not is_linked:
+            addr_doc.append("links", {"link_doctype": "Customer", "link_name": customer})
+            addr_doc.save(ignore_permissions=True)
+        return existing
+    address = frappe.get_doc(
+        {
+            "doctype": "Address",
+            "address_title": form.full_name,
+            "address_type": "Shipping",
+            "address_line1": form.address_line1,
+            "address_line2": form.address_line2,
+            "city": form.city,
+            "state": form.state,
+            "pincode": form.postal_code,
+            "country": form.country,
+            "email_id": form.email,
+            "phone": form.phone,
+            "links": [{"link_doctype": "Customer", "link_name": customer}],
+        }
+    )
+    address.flags.ignore_permissions = True
+    address.insert()
+    return address.name
+
+
+def _create_repair_request(customer: str, instrument: str, form: MailInForm, token_hash: str) -> str:
+    request = frappe.get_doc(
+        {
+            "doctype": "Repair Request",
+            "customer": customer,
+            "instrument": instrument,
+            "issue_description": form.requested_services,
+            "requested_services": form.requested_services,
+            "preferred_carrier": form.preferred_carrier,
+            "insurance_value": form.insurance_value,
+            "portal_token": token_hash,
+        }
+    )
+    request.flags.ignore_permissions = True
+    request.insert()
+    if form.marketing_consent:
+        _upsert_player_profile(customer, instrument, form)
+    return request.name
+
+
+def _create_mail_in_request(
+    customer: str, instrument: str, address_name: str, repair_request: str, form: MailInForm
+) -> str:
+    mail_in = frappe.get_doc(
+        {
+            "doctype": "Mail In Repair Request",
+            "customer": customer,
+            "repair_request": repair_request,
+            "instrument": instrument,
+            "customer_address": address_name,
+            "requested_services": form.requested_services,
+            "carrier": form.preferred_carrier,
+            "insurance_value": form.insurance_value,
+            "status": "Draft",
+            "arrival_condition_notes": "",
+        }
+    )
+    mail_in.flags.ignore_permissions = True
+    mail_in.insert()
+    return mail_in.name
+
+
+def _maybe_create_hold(mail_in: str, customer: str) -> str | None:
+    hold_amount = flt(frappe.conf.get("repair_portal_mail_in_hold_amount") or 1)
+    gateway_account = frappe.db.get_value(
+        "Payment Gateway Account", {"payment_gateway": "Stripe", "enabled": 1}, "name"
+    )
+    if hold_amount <= 0 or not gateway_account:
+        return None
+    currency = frappe.defaults.get_global_default("currency") or "USD"
+    payment_request = frappe.get_doc(
+        {
+            "doctype": "Payment Request",
+            "payment_request_type": "Inward",
+            "party_type": "Customer",
+            "party": customer,
+            "reference_doctype": "Mail In Repair Request",
+            "reference_name": mail_in,
+            "payment_gateway_account": gateway_account,
+            "payment_gateway": "Stripe",
+            "grand_total": hold_amount,
+            "currency": currency,
+            "status": "Draft",
+            "message": _("Authorization hold for mail-in repair intake."),
+        }
+    )
+    payment_request.flags.ignore_permissions = True
+    payment_request.insert()
+    payment_request.submit()
+    return payment_request.get_payment_url()
+
+
+def _upsert_player_profile(customer: str, instrument: str, form: MailInForm) -> None:
+    existing = frappe.db.get_value("Player Profile", {"customer": customer})
+    if existing:
+        profile = frappe.get_doc("Player Profile", existing)
+        profile.marketing_consent = 1
+        profile.consent_timestamp = now_datetime()
+        if not profile.primary_instrument:
+            profile.primary_instrument = instrument
+        profile.save(ignore_permissions=True)
+        return
+    profile = frappe.get_doc(
+        {
+            "doctype": "Player Profile",
+            "customer": customer,
+            "primary_instrument": instrument,
+            "marketing_consent": 1 if form.marketing_consent else 0,
+            "consent_timestamp": now_datetime(),
+            "preferences": form.requested_services,
+        }
+    )
+    profile.flags.ignore_permissions = True
+    profile.insert()
+
+
+def _record(sub: Document, **values: Any) -> None:
+    """Persist a step's result together with the documents it created."""
+    sub.db_set(values)
+    frappe.db.commit()
+
+
+def _run_step(step: str, sub: Document, form: MailInForm) -> None:
+    if step == "customer":
+        _record(sub, customer=_ensure_customer(form))
+    elif step == "instrument":
+        _record(sub, instrument=_ensure_instrument(sub.customer, form))
+    elif step == "address":
+        _record(sub, customer_address=_ensure_address(sub.customer, form))
+    elif step == "repair_request":
+        name = _create_repair_request(sub.customer, sub.instrument, form, sub.portal_token_hash)
+        _record(sub, repair_request=name)
+    elif step == "mail_in_request":
+        name = _create_mail_in_request(
+            sub.customer, sub.instrument, sub.customer_address, sub.repair_request, form
+        )
+        _record(sub, mail_in_request=name)
+    elif step == "hold":
+        link = _maybe_create_hold(sub.mail_in_request, sub.customer)
+        if link:
+            _record(sub, payment_link=link)
+
+
+def process_submission(name: str) -> dict[str, Any]:
+    """Background stage: run every pending step, then issue the label when a carrier API is set."""
+    from repair_portal.repair_portal.api import portal
+
+    sub = frappe.get_doc(SUBMISSION_DOCTYPE, name)
+    if sub.status == "Completed":
+        return {"submission": name, "status": sub.status}
+
+    _record(sub, status="Processing", attempts=cint(sub.attempts) + 1, error=None)
+    try:
+        form = MailInForm.from_dict(json.loads(sub.payload or "{}"))
+        for step in pending_steps(sub.as_dict()):
+            _run_step(step, sub, form)
+        if portal.shipping_provider() != "manual":
+            portal.issue_shipping_label(sub.mail_in_request)
+    except Exception:
+        frappe.db.rollback()
+        sub.reload()
+        failed = cint(sub.attempts) >= MAX_ATTEMPTS
+        _record(sub, status="Failed" if failed else "Queued", error=frappe.get_traceback()[-1000:])
+        frappe.log_error(frappe.get_traceback(), f"Mail-in submission {name} failed")
+        return {"submission": name, "status": sub.status}
+
+    _record(sub, status="Completed", processed_on=now_datetime())
+    return {"submission": name, "status": "Completed", "mail_in_request": sub.mail_in_request}
+
+
+def retry_stalled() -> int:
+    """Hourly: re-queue submissions left Queued/Processing by a failed or lost job."""
+    cutoff = add_to_date(now_datetime(), minutes=-STALLED_AFTER_MINUTES)
+    names = frappe.get_all(
+        SUBMISSION_DOCTYPE,
+        filters={
+            "status": ["in", ["Queued", "Processing"]],
+            "attempts": ["<", MAX_ATTEMPTS],
+            "modified": ["<", cutoff],
+        },
+        pluck="name",
+        limit_page_length=500,
+    )
+    for name in names:
+        _enqueue(name)
+    return len(names)
+
+
+def status_for_token(token_hash: str) -> dict[str, Any] | None:
+    """Submission state for the repair-status page (None when the token is unknown)."""
+    return frappe.db.get_value(
+        SUBMISSION_DOCTYPE,
+        {"portal_token_hash": token_hash},
+        ["name", "status", "creation", "modified", "repair_request", "mail_in_request", "payment_link"],
+        as_dict=True,
+    )
@@ -0,0 +1,553 @@
+"""
+Path: repair_portal/repair/services/rollup.py
+Version: 1.1.1
+Purpose:
+    Pre-aggregated analytics for the repair reports:
+      - Repair Order Fact: one row per Repair Order with its measures (cycle
+        hours, task hours, estimated hours, parts cost/revenue, SLA outcome)
+      - Repair Daily Rollup: facts summed per (date, workflow state, repair
+        class, technician, workshop) bucket
+      - Doc events refresh the touched order and rebuild only the buckets it
+        left/entered; a nightly catch-up sweeps anything modified since the
+        last run (and does the initial full build)
+      - Aggregate reports call query_split: days before the last catch-up
+        come from the rollup, the catch-up day onwards (today included) is
+        computed live from the same fact definitions and merged in
+      - Per-order reports call is_covered(from_date, to_date) and read facts
+        only when the last catch-up ran on or after the range's last day
+
+Public API:
+    - aggregate(facts)                          (pure: facts → bucket rows)
+    - refresh_orders(names)                     (RQ job target)
+    - catch_up()                                (daily scheduler)
+    - fact_from_order(order, ...) / group_rows(rows, dims)   (pure)
+    - is_covered(from_date, to_date) -> bool
+    - split_range(from_date, to_date, through) -> (rollup range | None, live range | None)
+    - query_rollup(group_by, from_date, to_date, states) -> list[dict]
+    - query_split(group_by, from_date, to_date, states) -> list[dict]
+    - on_repair_order_change / on_repair_task_change / on_estimate_change (doc events)
+
+Notes:
+    - fact_date is the order's last-modified date, the same anchor the live
+      reports used (cycle hours = modified − creation).
+    - workflow_state is kept as a bucket dimension so the reports' state
+      filters can still be honoured from the rollup.
+    - repair_class / workshop are read only when the Repair Order meta has
+      those fields (same tolerance as the SLA Compliance report); the live
+      path uses the same source, so both paths bucket orders identically.
+    - Bucket rebuilds are serialized per bucket with MariaDB named locks
+      (GET_LOCK, taken in key order and held until the batch commits) and
+      read facts with a locking read, so concurrent refreshes of different
+      orders in one bucket cannot overwrite each other; deadlocks and lock
+      timeouts roll the batch back and retry it.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from typing import Any
+
+try:
+    import frappe
+    from frappe.utils import add_days, flt, getdate, now_datetime
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+# -----------------------------
+# Configuration & Constants
+# -----------------------------
+RO = "Repair Order"
+FACT_DOCTYPE = "Repair Order Fact"
+ROLLUP_DOCTYPE = "Repair Daily Rollup"
+
+WATERMARK_KEY = "repair_rollup_watermark"  # datetime the last catch-up started
+COVERED_THROUGH_KEY = "repair_rollup_covered_through"  # date facts are complete through
+
+CLOSED_STATES = ("Completed", "Delivered", "Ready to Ship")
+UNCLASSIFIED = "Unclassified"
+BATCH_SIZE = 500
+_JOB_ID_PREFIX = "repair_rollup::"
+_LOCK_PREFIX = "repair_rollup:"  # + bucket_key, well under MariaDB's 64-char lock name limit
+LOCK_TIMEOUT_SEC = 30
+DEADLOCK_RETRIES = 3
+
+DIMENSIONS = ("fact_date", "workflow_state", "repair_class", "technician", "workshop")
+SUM_MEASURES = ("cycle_hours", "task_hours", "estimated_hours", "parts_cost", "parts_revenue")
+_ROLLUP_MEASURES = (
+    "orders",
+    "cycle_hours_total",
+    "cycle_hours_min",
+    "cycle_hours_max",
+    "task_hours",
+    "estimated_hours",
+    "parts_cost",
+    "parts_revenue",
+    "sla_met",
+    "sla_breached",
+)
+_FACT_FIELDS = ("repair_order", "bucket_key", "created_on", "customer", "sla_outcome", *DIMENSIONS, *SUM_MEASURES)
+_STD_FIELDS = ("name", "owner", "creation", "modified", "modified_by", "docstatus")
+_ORDER_FIELDS = (
+    "name",
+    "creation",
+    "modified",
+    "workflow_state",
+    "assigned_technician",
+    "customer",
+    "sla_due_date",
+    "sla_status",
+    "total_estimated_minutes",
+)
+
+
+# -----------------------------
+# Pure helpers
+# -----------------------------
+def bucket_key(fact_date: Any, workflow_state: Any, repair_class: Any, technician: Any, workshop: Any) -> str:
+    """Stable bucket name: ISO date prefix (sortable) + digest of the other dimensions."""
+    raw = "\x1f".join(str(v or "") for v in (workflow_state, repair_class, technician, workshop))
+    return f"{fact_date}-{hashlib.sha1(raw.encode()).hexdigest()[:16]}"
+
+
+def _as_date(value: Any) -> date | None:
+    if value is None:
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.fromisoformat(str(value)).date()
+
+
+def sla_outcome(sla_due: Any, sla_status: Any, finished_at: Any, closed: bool) -> str:
+    if sla_status == "Breached":
+        return "Breached"
+    if not closed:
+        return "Open"
+    if sla_due and finished_at and finished_at > sla_due:
+        return "Breached"
+    return "Met"
+
+
+def aggregate(facts: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Fold fact rows into Repair Daily Rollup rows keyed by bucket_key."""
+    out: dict[str, dict[str, Any]] = {}
+    for f in facts:
+        key = f["bucket_key"]
+        row = out.get(key)
+        cycle = float(f.get("cycle_hours") or 0)
+        if row is None:
+            row = out[key] = {d: f.get(d) for d in DIMENSIONS}
+            row.update(
+                bucket_key=key,
+                orders=0,
+                cycle_hours_total=0.0,
+                cycle_hours_min=cycle,
+                cycle_hours_max=cycle,
+                task_hours=0.0,
+                estimated_hours=0.0,
+                parts_cost=0.0,
+                parts_revenue=0.0,
+                sla_met=0,
+                sla_breached=0,
+            )
+        row["orders"] += 1
+        row["cycle_hours_total"] += cycle
+        row["cycle_hours_min"] = min(row["cycle_hours_min"], cycle)
+        row["cycle_hours_max"] = max(row["cycle_hours_max"], cycle)
+        for m in ("task_hours", "estimated_hours", "parts_cost", "parts_revenue"):
+            row[m] += float(f.get(m) or 0)
+        outcome = f.get("sla_outcome")
+        row["sla_met"] += outcome == "Met"
+        row["sla_breached"] += outcome == "Breached"
+    return out
+
+
+def group_rows(rows: list[dict[str, Any]], dims: list[str]) -> list[dict[str, Any]]:
+    """Sum rollup rows (bucket rows or query_rollup output) over ``dims``, as query_rollup does in SQL."""
+    out: dict[tuple, dict[str, Any]] = {}
+    for r in rows:
+        if not r.get("orders"):
+            continue
+        key = tuple(r.get(d) for d in dims)
+        row = out.get(key)
+        if row is None:
+            row = out[key] = {d: r.get(d) for d in dims}
+            row.update({m: 0 for m in _ROLLUP_MEASURES})
+            row["cycle_hours_min"] = r.get("cycle_hours_min")
+            row["cycle_hours_max"] = r.get("cycle_hours_max")
+        else:
+            row["cycle_hours_min"] = min(row["cycle_hours_min"], r.get("cycle_hours_min"))
+            row["cycle_hours_max"] = max(row["cycle_hours_max"], r.get("cycle_hours_max"))
+        for m in _ROLLUP_MEASURES:
+            if m not in ("cycle_hours_min", "cycle_hours_max"):
+                row[m] += float(r.get(m) or 0)
+        row["orders"] = int(row["orders"])
+    return list(out.values())
+
+
+def fact_from_order(
+    o: dict[str, Any], task_minutes: float = 0.0, parts_cost: float = 0.0, parts_revenue: float = 0.0
+) -> dict[str, Any]:
+    """The one definition of an order's fact row, shared by the rollup writer and the live path."""
+    fact_date = _as_date(o.get("modified"))
+    state, technician = o.get("workflow_state"), o.get("assigned_technician")
+    repair_class = o.get("repair_class") or UNCLASSIFIED
+    workshop = o.get("workshop") or ""
+    return {
+        "repair_order": o.get("name"),
+        "bucket_key": bucket_key(fact_date, state, repair_class, technician, workshop),
+        "fact_date": fact_date,
+        "created_on": _as_date(o.get("creation")),
+        "workflow_state": state,
+        "repair_class": repair_class,
+        "technician": technician,
+        "workshop": workshop,
+        "customer": o.get("customer"),
+        "cycle_hours": round(max((o["modified"] - o["creation"]).total_seconds(), 0) / 3600.0, 3),
+        "task_hours": round(float(task_minutes or 0) / 60.0, 3),
+        "estimated_hours": round(float(o.get("total_estimated_minutes") or 0) / 60.0, 3),
+        "parts_cost": parts_cost,
+        "parts_revenue": parts_revenue,
+        "sla_outcome": sla_outcome(
+            o.get("sla_due_date"), o.get("sla_status"), o.get("modified"), state in CLOSED_STATES
+        ),
+    }
+
+
+def split_range(from_date: Any, to_date: Any, through: date | None, today: date) -> tuple:
+    """Split ``[from_date, to_date]`` into (rollup part, live part); either may be None.
+
+    Days before ``through`` (the last catch-up's date) are complete in the rollup.
+    From ``through`` on, including today, orders are read live.
+    """
+    lower = _as_date(from_date) if from_date else None
+    upper = min(_as_date(to_date), today) if to_date else today
+    if through is None or (lower and lower >= through):
+        return None, (from_date, to_date)
+    if upper < through:
+        return (from_date, to_date), None
+    last_complete = through - timedelta(days=1)
+    return (from_date, last_complete), (through, to_date)
+
+
+# -----------------------------
+# Fact computation
+# -----------------------------
+
+def _ro_has_field(fieldname: str) -> bool:
+    return frappe.get_meta(RO).has_field(fieldname)
+
+
+def _grouped_sum(sql: str, names: list[str], doctype: str) -> dict[str, float]:
+    if not frappe.db.table_exists(doctype):
+        return {}
+    return {k: flt(v) for k, v in frappe.db.sql(sql, {"names": names})}
+
+
+def compute_facts(names: list[str]) -> list[dict[str, Any]]:
+    """Fact rows for the given Repair Orders (cancelled/missing orders produce none)."""
+    if not names:
+        return []
+    orders = frappe.get_all(
+        RO, filters={"name": ["in", names], "docstatus": ["<", 2]}, fields=_order_fields()
+    )
+    if not orders:
+        return []
+    present = [o.name for o in orders]
+
+    task_minutes = _grouped_sum(
+        """select repair_order, sum(ifnull(actual_minutes, 0)) from `tabRepair Task`
+        where repair_order in %(names)s group by repair_order""",
+        present,
+        "Repair Task",
+    )
+    parts_cost = _grouped_sum(
+        """select parent, sum(if(ifnull(amount, 0) != 0, amount, ifnull(qty, 0) * ifnull(valuation_rate, 0)))
+        from `tabRepair Actual Material`
+        where parenttype = 'Repair Order' and parent in %(names)s group by parent""",
+        present,
+        "Repair Actual Material",
+    )
+    parts_revenue = _grouped_sum(
+        """select re.repair_order, sum(ifnull(eu.price, 0))
+        from `tabEstimate Upsell` eu join `tabRepair Estimate` re on re.name = eu.parent
+        where eu.accepted = 1 and re.repair_order in %(names)s group by re.repair_order""",
+        present,
+        "Estimate Upsell",
+    )
+
+    return [
+        fact_from_order(
+            o,
+            task_minutes.get(o.name, 0.0),
+            parts_cost.get(o.name, 0.0),
+            parts_revenue.get(o.name, 0.0),
+        )
+        for o in orders
+    ]
+
+
+def _order_fields() -> list[str]:
+    return [*_ORDER_FIELDS, *(f for f in ("repair_class", "workshop") if _ro_has_field(f))]
+
+
+def live_facts(from_date: Any = None, to_date: Any = None, states: Any = None) -> list[dict[str, Any]]:
+    """Order-level facts (cycle, estimate, SLA) straight from Repair Order, for ranges the rollup lacks.
+
+    Task hours and parts measures are left at zero: the aggregate reports that
+    use this path only read the order-level measures.
+    """
+    filters: list[list[Any]] = [[RO, "docstatus", "<", 2]]
+    if states:
+        filters.append([RO, "workflow_state", "in", list(states)])
+    if from_date:
+        filters.append([RO, "modified", ">=", getdate(from_date)])
+    if to_date:
+        filters.append([RO, "modified", "<", add_days(getdate(to_date), 1)])
+    return [fact_from_order(o) for o in frappe.get_all(RO, filters=filters, fields=_order_fields())]
+
+
+# -----------------------------
+# Writers
+# -----------------------------
+def _replace_rows(doctype: str, names: list[str], rows: list[dict[str, Any]], fields: tuple[str, ...]) -> None:
+    """Delete ``names`` then bulk-insert ``rows`` (each row carries its own ``name``)."""
+    if names:
+        frappe.db.delete(doctype, {"name": ["in", names]})
+    if not rows:
+        return
+    now, user = now_datetime(), frappe.session.user
+    columns = (*_STD_FIELDS, *fields)
+    frappe.db.bulk_insert(
+        doctype,
+        columns,
+        [(r["name"], user, now, now, user, 0, *(r.get(f) for f in fields)) for r in rows],
+    )
+
+
+@contextmanager
+def _bucket_locks(keys: set[str]):
+    """Hold one named lock per bucket (acquired in sorted order) for the duration of the block."""
+    held: list[str] = []
+    try:
+        for key in sorted(keys):
+            name = _LOCK_PREFIX + key
+            if not frappe.db.sql("select get_lock(%s, %s)", (name, LOCK_TIMEOUT_SEC))[0][0]:
+                raise frappe.QueryTimeoutError(f"Timed out waiting for rollup bucket {key}")
+            held.append(name)
+        yield
+    finally:
+        for name in reversed(held):
+            frappe.db.sql("select release_lock(%s)", (name,))
+
+
+def _rebuild_buckets(keys: set[str]) -> None:
+    """Re-aggregate ``keys`` from facts; the caller holds their bucket locks."""
+    if not keys:
+        return
+    # Locking read: sees facts other jobs committed after this transaction's snapshot
+    facts = frappe.get_all(
+        FACT_DOCTYPE, filters={"bucket_key": ["in", list(keys)]}, fields=list(_FACT_FIELDS), for_update=True
+    )
+    rows = [{**row, "name": key} for key, row in aggregate(facts).items()]
+    _replace_rows(ROLLUP_DOCTYPE, list(keys), rows, ("bucket_key", *DIMENSIONS, *_ROLLUP_MEASURES))
+
+
+def _refresh_batch(batch: list[str]) -> None:
+    """Rewrite the batch's facts and the buckets they touch, then commit while the locks are held."""
+    old_keys = set(frappe.get_all(FACT_DOCTYPE, filters={"name": ["in", batch]}, pluck="bucket_key"))
+    facts = compute_facts(batch)
+    keys = {k for k in old_keys | {f["bucket_key"] for f in facts} if k}
+    with _bucket_locks(keys):
+        try:
+            _replace_rows(FACT_DOCTYPE, batch, [{**f, "name": f["repair_order"]} for f in facts], _FACT_FIELDS)
+            _rebuild_buckets(keys)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            raise
+
+
+def refresh_orders(names: list[str] | str) -> int:
+    """Recompute facts for ``names`` and rebuild every bucket they left or entered (one commit per batch)."""
+    if isinstance(names, str):
+        names = [names]
+    names = sorted({n for n in names if n})
+    for i in range(0, len(names), BATCH_SIZE):
+        batch = names[i : i + BATCH_SIZE]
+        for attempt in range(DEADLOCK_RETRIES + 1):
+            try:
+                _refresh_batch(batch)
+                break
+            except (frappe.QueryDeadlockError, frappe.QueryTimeoutError):
+                if attempt == DEADLOCK_RETRIES:
+                    raise
+                time.sleep(0.2 * (attempt + 1))
+    return len(names)
+
+
+def _changed_orders(since: datetime | None) -> list[str]:
+    if since is None:
+        return frappe.get_all(RO, pluck="name")
+    changed = set(frappe.get_all(RO, filters={"modified": [">=", since]}, pluck="name"))
+    for doctype in ("Repair Task", "Repair Estimate"):
+        if frappe.db.table_exists(doctype):
+            changed.update(
+                frappe.get_all(
+                    doctype,
+                    filters={"modified": [">=", since], "repair_order": ["is", "set"]},
+                    pluck="repair_order",
+                )
+            )
+    # Facts whose order was deleted outright
+    changed.update(
+        r[0]
+        for r in frappe.db.sql(
+            """select f.name from `tabRepair Order Fact` f
+            left join `tabRepair Order` ro on ro.name = f.repair_order where ro.name is null"""
+        )
+    )
+    return sorted(changed)
+
+
+def catch_up() -> int:
+    """Daily job: refresh everything modified since the last run (full build on first run)."""
+    started = now_datetime()
+    raw = frappe.db.get_default(WATERMARK_KEY)
+    since = frappe.utils.get_datetime(raw) if raw else None
+    count = refresh_orders(_changed_orders(since))
+    frappe.db.set_default(WATERMARK_KEY, str(started))
+    frappe.db.set_default(COVERED_THROUGH_KEY, str(started.date()))
+    frappe.db.commit()
+    return count
+
+
+# -----------------------------
+# Doc events
+# -----------------------------
+def enqueue_refresh(repair_order: str | None) -> None:
+    if not repair_order:
+        return
+    try:
+        frappe.enqueue(
+            "repair_portal.repair.services.rollup.refresh_orders",
+            queue="short",
+            job_id=_JOB_ID_PREFIX + repair_order,
+            deduplicate=True,
+            enqueue_after_commit=True,
+            names=[repair_order],
+        )
+    except Exception:
+        # No queue available; the nightly catch-up will pick the order up.
+        pass
+
+
+def on_repair_order_change(doc, method: str | None = None) -> None:
+    enqueue_refresh(doc.name)
+
+
+def on_repair_task_change(doc, method: str | None = None) -> None:
+    enqueue_refresh(doc.get("repair_order"))
+
+
+def on_estimate_change(doc, method: str | None = None) -> None:
+    enqueue_refresh(doc.get("repair_order"))
+
+
+# -----------------------------
+# Report readers
+# -----------------------------
+def covered_through() -> date | None:
+    raw = frappe.db.get_default(COVERED_THROUGH_KEY)
+    return getdate(raw) if raw else None
+
+
+def is_covered(from_date: Any = None, to_date: Any = None) -> bool:
+    """True when the last catch-up ran on or after the range's last day (open end = today).
+
+    Facts are complete from the first full build onwards, so only the upper
+    bound matters. A catch-up from yesterday does not cover today.
+    """
+    through = covered_through()
+    if through is None:
+        return False
+    today = getdate()
+    upper = min(getdate(to_date), today) if to_date else today
+    return through >= upper
+
+
+def _range_conditions(from_date: Any, to_date: Any, states: Any, date_field: str = "fact_date"):
+    conditions, values = ["1=1"], {}
+    if from_date:
+        conditions.append(f"{date_field} >= %(from_date)s")
+        values["from_date"] = getdate(from_date)
+    if to_date:
+        conditions.append(f"{date_field} <= %(to_date)s")
+        values["to_date"] = getdate(to_date)
+    if states:
+        conditions.append("workflow_state in %(states)s")
+        values["states"] = tuple(states)
+    return " and ".join(conditions), values
+
+
+def query_rollup(
+    group_by: list[str], from_date: Any = None, to_date: Any = None, states: Any = None
+) -> list[dict[str, Any]]:
+    """Sum rollup buckets over a date range, grouped by any of the non-date dimensions."""
+    dims = [d for d in group_by if d in DIMENSIONS]
+    where, values = _range_conditions(from_date, to_date, states)
+    select_dims = "".join(f"{d}, " for d in dims)
+    group = f"group by {', '.join(dims)}" if dims else ""
+    return frappe.db.sql(
+        f"""
+        select {select_dims}
+            sum(orders) as orders,
+            sum(cycle_hours_total) as cycle_hours_total,
+            min(cycle_hours_min) as cycle_hours_min,
+            max(cycle_hours_max) as cycle_hours_max,
+            sum(task_hours) as task_hours,
+            sum(estimated_hours) as estimated_hours,
+            sum(parts_cost) as parts_cost,
+            sum(parts_revenue) as parts_revenue,
+            sum(sla_met) as sla_met,
+            sum(sla_breached) as sla_breached
+        from `tabRepair Daily Rollup`
+        where {where}
+        {group}
+        """,
+        values,
+        as_dict=True,
+    )
+
+
+def query_facts(
+    fields: list[str], from_date: Any = None, to_date: Any = None, states: Any = None, date_field: str = "fact_date"
+) -> list[dict[str, Any]]:
+    """Per-order fact rows for per-job reports (no IN-lists over order names)."""
+    columns = ", ".join(f for f in fields if f in _FACT_FIELDS)
+    if date_field not in ("fact_date", "created_on"):
+        raise ValueError(date_field)
+    where, values = _range_conditions(from_date, to_date, states, date_field)
+    return frappe.db.sql(
+        f"select {columns} from `tabRepair Order Fact` where {where} order by repair_order",
+        values,
+        as_dict=True,
+    )
+
+
+def query_split(
+    group_by: list[str], from_date: Any = None, to_date: Any = None, states: Any = None
+) -> list[dict[str, Any]]:
+    """query_rollup over the complete days plus the same measures computed live for the rest."""
+    dims = [d for d in group_by if d in DIMENSIONS]
+    rollup_part, live_part = split_range(from_date, to_date, covered_through(), getdate())
+    rows: list[dict[str, Any]] = []
+    if rollup_part:
+        rows.extend(query_rollup(dims, *rollup_part, states))
+    if live_part:
+        rows.extend(aggregate(live_facts(*live_part, states)).values())
+    return group_rows(rows, dims)
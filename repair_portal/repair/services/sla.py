@@ -1,6 +1,6 @@
 """
 Path: repair_portal/repair/services/sla.py
-Version: 1.0.2
+Version: 1.1.0
 Purpose:
     SLA engine for Repair Orders (RO):
       - Applies SLA when a RO enters a configured "start" workflow state
@@ -25,15 +25,16 @@ Notes / Requirements:
     - Expected workflow_state labels on RO for matching:
         START: {"Intake Received", "Estimate Approved", "Work Started"}
         STOP : {"Ready for QA", "Delivered"}
-    - Escalations are idempotent per level using Communication.subject matching:
-        "SLA Escalation L1: <RO-NAME>", "SLA Escalation L2: <RO-NAME>"
+    - Escalations are idempotent per (RO, level) via Repair Escalation Notice and
+      are mailed as per-recipient digests by repair.services.escalation
 """
 
 from __future__ import annotations
 
 import frappe
-from frappe.utils import add_to_date, flt, get_url_to_form, now_datetime
-from frappe.utils.jinja import render_template
+from frappe.utils import add_to_date, flt, now_datetime
+
+from repair_portal.repair.services import escalation
 
 # -----------------------------
 # Configuration & Constants
@@ -47,9 +48,6 @@ STATUS_GREEN = "Green"
 STATUS_YELLOW = "Yellow"
 STATUS_RED = "Red"
 
-# Email template for escalations (optional; we fall back to plain HTML if missing)
-ESCALATION_TEMPLATE = "repair_portal/templates/emails/sla_escalation.html"
-
 # Field names on Repair Order (kept here to avoid typos)
 RO_FIELD_SLA_POLICY = "sla_policy"
 RO_FIELD_SLA_START = "sla_start"
@@ -354,70 +352,15 @@ def _maybe_escalate(ro, rule, level: int):
         return
 
     subject = f"SLA Escalation {level_tag}: {ro.name}"
-
-    # Idempotency: avoid duplicate Communications for the same level
-    already = frappe.get_all(
-        "Communication",
-        filters={
-            "reference_doctype": "Repair Order",
-            "reference_name": ro.name,
-            "subject": subject,
-        },
-        limit=1,
-    )
-    if already:
-        return
-
-    recipients = _users_with_role(role)
-    if not recipients:
-        _log().warning("No active users found for role '%s' (RO %s) during SLA escalation.", role, ro.name)
-        return
-
-    link = get_url_to_form("Repair Order", ro.name)
-    body = _render_escalation_body(
-        ro=ro,
-        overdue_minutes=minutes_overdue,
-        level_tag=level_tag,
-        link=link,
+    summary = (
+        f"Overdue by {minutes_overdue} minutes "
+        f"({ro.get('customer_name') or ro.get('customer') or '-'}, {ro.get('workshop') or '-'})"
     )
 
-    try:
-        frappe.sendmail(
-            recipients=recipients,
-            subject=subject,
-            message=body,
-            reference_doctype="Repair Order",
-            reference_name=ro.name,
-        )
-    except Exception:
-        # Don't crash the sweep; log and continue
-        _log().exception("Failed to send SLA escalation email for %s (%s)", ro.name, level_tag)
-        frappe.clear_last_message()
-
-
-def _render_escalation_body(ro, overdue_minutes: int, level_tag: str, link: str) -> str:
-    """Render escalation email body using the HTML template if present; fallback to simple HTML."""
-    ctx = {
-        "ro": ro.as_dict(),
-        "overdue_minutes": overdue_minutes,
-        "level_tag": level_tag,
-        "link": link,
-        "frappe": frappe,
-    }
-    try:
-        # Will raise TemplateNotFound if missing
-        return render_template(ESCALATION_TEMPLATE, ctx)
-    except Exception:
-        # Fallback body: minimal, safe, no template dependency
-        return (
-            f"<h3>SLA Escalation {level_tag}</h3>"
-            f"<p>Repair Order <b>{frappe.utils.escape_html(ro.name)}</b> "
-            f"is overdue by <b>{overdue_minutes} minutes</b> against SLA.</p>"
-            f"<p><b>Customer:</b> {frappe.utils.escape_html(ro.get('customer_name') or ro.get('customer') or '-')}</p>"
-            f"<p><b>Workshop:</b> {frappe.utils.escape_html(ro.get('workshop') or '-')}<br>"
-            f"<b>Service Type:</b> {frappe.utils.escape_html(ro.get('service_type') or '-')}</p>"
-            f"<p><a href='{frappe.utils.escape_html(link)}'>Open Repair Order</a></p>"
-        )
+    # Idempotent per (RO, level); delivered in the next per-recipient digest
+    if not escalation.notify(ro.name, level_tag, subject=subject, summary=summary, roles=[role]):
+        if not escalation.users_with_role(role):
+            _log().warning("No active users found for role '%s' (RO %s) during SLA escalation.", role, ro.name)
 
 
 def _minutes_overdue(ro) -> int | None:
@@ -433,13 +376,8 @@ def _minutes_overdue(ro) -> int | None:
 
 
 def _users_with_role(role: str) -> list[str]:
-    """Return enabled user IDs having the given Role."""
-    rows = frappe.get_all("Has Role", filters={"role": role}, fields=["parent as user"])
-    users = [r.user for r in rows] if rows else []
-    if not users:
-        return []
-    active = frappe.get_all("User", filters={"name": ["in", users], "enabled": 1}, pluck="name")
-    return active or []
+    """Return enabled user IDs having the given Role (cached; see repair.services.escalation)."""
+    return escalation.users_with_role(role)
 
 
 def _log():
@@ -0,0 +1,330 @@
+"""
+Path: repair_portal/repair/services/technician_kpis.py
+Version: 1.0.0
+Purpose:
+    Materialized technician dashboard state in Redis:
+      - KPI hash per technician (open / in progress / overdue Repair Orders),
+        moved by the delta between a Repair Order's saved and previous row
+      - capped activity list per technician, fed by Pulse Update inserts
+      - every change is pushed to the technician on the
+        ``technician_dashboard_update`` realtime event, so the open dashboard
+        applies deltas instead of re-polling
+      - a nightly reconcile recomputes all counters from SQL, repairing drift
+        from writes that skip doc events (db_set) and rolling repairs whose
+        target date passed overnight into "overdue"
+
+Public API:
+    - classify(row, today) / kpi_deltas(before, after, today)   (pure)
+    - get_kpis(technician) / get_activity(technician, limit)
+    - on_repair_order_change / on_pulse_update_insert             (doc events)
+    - reconcile_all()                                             (nightly scheduler)
+
+Notes:
+    - Counters and feeds are only moved once seeded (Lua checks existence), so a
+      cold read always seeds from SQL that already includes committed changes.
+    - KPI definitions are the ones the dashboard query used before.
+"""
+
+from __future__ import annotations
+
+import json
+from collections import defaultdict
+from datetime import date
+from typing import Any
+
+try:
+    import frappe
+    from frappe.utils import getdate, nowdate
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+# -----------------------------
+# Configuration & Constants
+# -----------------------------
+KPI_FIELDS = ("open_repairs", "in_progress_repairs", "overdue_repairs")
+OPEN_STATES = ("Draft", "In Progress")
+IN_PROGRESS_STATE = "In Progress"
+CLOSED_STATES = ("Delivered", "Closed")
+FEED_CAP = 50
+FEED_PAGE = 5
+REALTIME_EVENT = "technician_dashboard_update"
+
+_KPI_PREFIX = "repair_portal:tech_kpis"
+_FEED_PREFIX = "repair_portal:tech_activity"
+_INDEX_KEY = "repair_portal:tech_kpis:index"
+
+# HINCRBY only an already-seeded hash; returns the new values (nil when cold).
+_APPLY_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then return nil end
+for i = 1, #ARGV, 2 do redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1]) end
+return redis.call('HMGET', KEYS[1], 'open_repairs', 'in_progress_repairs', 'overdue_repairs')
+"""
+
+# Push onto a seeded feed (KEYS[2] is the seeded flag) and cap its length.
+_PUSH_LUA = """
+if redis.call('EXISTS', KEYS[2]) == 0 then return 0 end
+redis.call('LPUSH', KEYS[1], ARGV[1])
+redis.call('LTRIM', KEYS[1], 0, tonumber(ARGV[2]) - 1)
+return 1
+"""
+
+
+# -----------------------------
+# Pure helpers
+# -----------------------------
+def _as_date(value: Any) -> date | None:
+    if not value:
+        return None
+    if isinstance(value, date):
+        return value
+    return date.fromisoformat(str(value)[:10])
+
+
+def classify(row: dict[str, Any] | None, today: date) -> dict[str, int]:
+    """KPI membership (0/1 per KPI) of one Repair Order row."""
+    if not row:
+        return dict.fromkeys(KPI_FIELDS, 0)
+    state = row.get("workflow_state")
+    target = _as_date(row.get("target_delivery"))
+    return {
+        "open_repairs": int(state in OPEN_STATES),
+        "in_progress_repairs": int(state == IN_PROGRESS_STATE),
+        "overdue_repairs": int(bool(target and target < today and state not in CLOSED_STATES)),
+    }
+
+
+def kpi_deltas(
+    before: dict[str, Any] | None, after: dict[str, Any] | None, today: date
+) -> dict[str, dict[str, int]]:
+    """Per-technician KPI changes when a Repair Order goes from ``before`` to ``after``."""
+    out: dict[str, dict[str, int]] = defaultdict(lambda: dict.fromkeys(KPI_FIELDS, 0))
+    for row, sign in ((before, -1), (after, 1)):
+        technician = row.get("assigned_technician") if row else None
+        if not technician:
+            continue
+        for kpi, member in classify(row, today).items():
+            out[technician][kpi] += sign * member
+    return {tech: delta for tech, delta in out.items() if any(delta.values())}
+
+
+def kpi_key(technician: str) -> str:
+    return f"{_KPI_PREFIX}:{technician}"
+
+
+def feed_keys(technician: str) -> tuple[str, str]:
+    base = f"{_FEED_PREFIX}:{technician}"
+    return base, f"{base}:seeded"
+
+
+def _row(doc) -> dict[str, Any] | None:
+    if doc is None:
+        return None
+    return {f: doc.get(f) for f in ("assigned_technician", "workflow_state", "target_delivery")}
+
+
+# -----------------------------
+# Redis access
+# -----------------------------
+class _Scripts:
+    """Lua scripts registered once per Redis client (as core.change_feed does)."""
+
+    def __init__(self) -> None:
+        self._client = None
+        self.apply = None
+        self.push = None
+
+    def redis(self):
+        cache = frappe.cache()
+        if self._client is not cache:
+            self.apply = cache.register_script(_APPLY_LUA)
+            self.push = cache.register_script(_PUSH_LUA)
+            self._client = cache
+        return cache
+
+
+_SCRIPTS = _Scripts()
+
+
+def _query_kpis(technician: str | None = None) -> dict[str, dict[str, int]]:
+    condition = "assigned_technician = %(technician)s" if technician else "assigned_technician is not null"
+    rows = frappe.db.sql(
+        f"""
+        select assigned_technician,
+            sum(case when workflow_state in %(open)s then 1 else 0 end) as open_repairs,
+            sum(case when workflow_state = %(in_progress)s then 1 else 0 end) as in_progress_repairs,
+            sum(case when target_delivery is not null and target_delivery < %(today)s
+                and ifnull(workflow_state, '') not in %(closed)s then 1 else 0 end) as overdue_repairs
+        from `tabRepair Order`
+        where {condition}
+        group by assigned_technician
+        """,
+        {
+            "technician": technician,
+            "open": OPEN_STATES,
+            "in_progress": IN_PROGRESS_STATE,
+            "closed": CLOSED_STATES,
+            "today": nowdate(),
+        },
+        as_dict=True,
+    )
+    return {r.assigned_technician: {k: int(r[k] or 0) for k in KPI_FIELDS} for r in rows}
+
+
+# Plain counters and JSON strings live under made keys and go through raw pipelines:
+# frappe's RedisWrapper helpers (hset, lrange, sadd...) re-prefix names and pickle values.
+def _decode(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+def _read_kpis(cache, technician: str) -> dict[str, int]:
+    (raw,) = cache.pipeline().hgetall(cache.make_key(kpi_key(technician))).execute()
+    return {_decode(k): int(v) for k, v in raw.items()}
+
+
+def _store_kpis(cache, technician: str, kpis: dict[str, int]) -> None:
+    pipe = cache.pipeline()
+    pipe.hset(cache.make_key(kpi_key(technician)), mapping=kpis)
+    pipe.sadd(cache.make_key(_INDEX_KEY), technician)
+    pipe.execute()
+
+
+def get_kpis(technician: str) -> dict[str, int]:
+    cache = _SCRIPTS.redis()
+    stored = _read_kpis(cache, technician)
+    if stored:
+        return stored
+    kpis = _query_kpis(technician).get(technician) or dict.fromkeys(KPI_FIELDS, 0)
+    _store_kpis(cache, technician, kpis)
+    return kpis
+
+
+def _query_activity(technician: str) -> list[dict[str, Any]]:
+    return frappe.db.sql(
+        """
+        select pu.repair_order, pu.status, pu.update_note as note, pu.update_time as timestamp
+        from `tabPulse Update` pu
+        join `tabRepair Order` ro on pu.repair_order = ro.name
+        where ro.assigned_technician = %(technician)s
+        order by pu.update_time desc
+        limit %(limit)s
+        """,
+        {"technician": technician, "limit": FEED_CAP},
+        as_dict=True,
+    )
+
+
+def get_activity(technician: str, limit: int = FEED_PAGE) -> list[dict[str, Any]]:
+    cache = _SCRIPTS.redis()
+    feed, seeded = (cache.make_key(k) for k in feed_keys(technician))
+    is_seeded, entries = cache.pipeline().exists(seeded).lrange(feed, 0, limit - 1).execute()
+    if not is_seeded:
+        rows = _query_activity(technician)
+        pipe = cache.pipeline()
+        pipe.delete(feed)
+        if rows:
+            pipe.rpush(feed, *(json.dumps(r, default=str) for r in rows))
+        pipe.set(seeded, 1)
+        pipe.execute()
+        return [dict(r) for r in rows[:limit]]
+    return [json.loads(v) for v in entries]
+
+
+def _publish(technician: str, payload: dict[str, Any]) -> None:
+    frappe.publish_realtime(REALTIME_EVENT, payload, user=technician, after_commit=False)
+
+
+def _apply(technician: str, delta: dict[str, int], repair_order: str) -> None:
+    cache = _SCRIPTS.redis()
+    args: list[Any] = []
+    for kpi, change in delta.items():
+        args.extend((kpi, change))
+    values = _SCRIPTS.apply(keys=[cache.make_key(kpi_key(technician))], args=args)
+    kpis = dict(zip(KPI_FIELDS, (int(v) for v in values))) if values else get_kpis(technician)
+    _publish(
+        technician, {"kpis": kpis, "delta": delta, "repair_order": repair_order, "assignments_changed": True}
+    )
+
+
+def _refresh(technician: str, repair_order: str) -> None:
+    """Recount one technician from SQL (when the previous row is unknown) and push the result."""
+    cache = _SCRIPTS.redis()
+    kpis = _query_kpis(technician).get(technician) or dict.fromkeys(KPI_FIELDS, 0)
+    _store_kpis(cache, technician, kpis)
+    _publish(technician, {"kpis": kpis, "repair_order": repair_order, "assignments_changed": True})
+
+
+def _after_commit(fn) -> None:
+    def run() -> None:
+        try:
+            fn()
+        except Exception:
+            frappe.logger("repair_portal.technician_kpis").warning("technician KPI update failed")
+
+    frappe.db.after_commit.add(run)
+
+
+# -----------------------------
+# Doc events
+# -----------------------------
+def on_repair_order_change(doc, method: str | None = None) -> None:
+    """on_change / on_trash: move the counters of the technicians the order left or joined."""
+    name = doc.name
+    if method == "on_trash":
+        before, after = _row(doc), None
+    else:
+        previous = doc.get_doc_before_save()
+        if previous is None and not doc.flags.in_insert:
+            # db_set(notify=True) and similar: no previous row to diff against
+            technician = doc.get("assigned_technician")
+            if technician:
+                _after_commit(lambda: _refresh(technician, name))
+            return
+        before, after = _row(previous), _row(doc)
+
+    deltas = kpi_deltas(before, after, getdate(nowdate()))
+    for technician, delta in deltas.items():
+        _after_commit(lambda t=technician, d=delta: _apply(t, d, name))
+
+
+def on_pulse_update_insert(doc, method: str | None = None) -> None:
+    """after_insert: prepend the update to the assigned technician's activity feed."""
+    technician = frappe.db.get_value("Repair Order", doc.repair_order, "assigned_technician")
+    if not technician:
+        return
+    entry = {
+        "repair_order": doc.repair_order,
+        "status": doc.status,
+        "note": doc.update_note,
+        "timestamp": doc.update_time or doc.creation,
+    }
+
+    def push() -> None:
+        cache = _SCRIPTS.redis()
+        keys = [cache.make_key(k) for k in feed_keys(technician)]
+        _SCRIPTS.push(keys=keys, args=[json.dumps(entry, default=str), FEED_CAP])
+        _publish(technician, {"activity": json.loads(json.dumps(entry, default=str))})
+
+    _after_commit(push)
+
+
+# -----------------------------
+# Nightly consistency check
+# -----------------------------
+def reconcile_all() -> dict[str, int]:
+    """Recount every technician's KPIs, fix drifted hashes and reseed activity feeds lazily."""
+    cache = _SCRIPTS.redis()
+    actual = _query_kpis()
+    (members,) = cache.pipeline().smembers(cache.make_key(_INDEX_KEY)).execute()
+    technicians = {_decode(m) for m in members} | set(actual)
+    drifted = 0
+    for technician in technicians:
+        kpis = actual.get(technician) or dict.fromkeys(KPI_FIELDS, 0)
+        stored = _read_kpis(cache, technician)
+        if stored and stored != kpis:
+            drifted += 1
+            _publish(technician, {"kpis": kpis})
+        _store_kpis(cache, technician, kpis)
+        cache.pipeline().delete(cache.make_key(feed_keys(technician)[1])).execute()
+    if drifted:
+        frappe.logger("repair_portal.technician_kpis").info("reconciled %s drifted technician(s)", drifted)
+    return {"technicians": len(technicians), "drifted": drifted}
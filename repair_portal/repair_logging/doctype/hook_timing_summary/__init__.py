@@ -0,0 +1,4 @@
+# File: repair_portal/repair_logging/doctype/hook_timing_summary/__init__.py
+# Updated: 2026-10-19
+# Version: 1.0
+# Purpose: Package initializer for Hook Timing Summary DocType
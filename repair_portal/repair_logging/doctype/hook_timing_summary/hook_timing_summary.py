@@ -0,0 +1,15 @@
+# Path: repair_portal/repair_logging/doctype/hook_timing_summary/hook_timing_summary.py
+# Date: 2026-10-19
+# Version: 1.0.0
+# Description: Periodic per-hook timing rollup written by core.instrumentation.flush_hook_metrics
+# Dependencies: frappe
+
+from frappe.model.document import Document
+
+
+class HookTimingSummary(Document):
+    """
+    Hook Timing Summary: one row per instrumented hook per flush period
+    (calls, p50/p95/p99/max wall time, mean SQL queries and rows touched).
+    Written by the scheduler; not edited by hand.
+    """
@@ -12,29 +12,57 @@ from frappe.utils import flt, get_url, nowdate
 from frappe.utils.file_manager import save_file
 from frappe.utils.pdf import get_pdf
 
+from repair_portal.repair_portal.utils import render_cache
 from repair_portal.repair_portal.utils import token as token_utils
 
 
 @frappe.whitelist()
 def generate_shipping_label(mail_in_request: str) -> Dict[str, Any]:
-    """Create or register a shipping label for a mail-in repair request."""
+    """Register a manual label, or queue label creation with the configured carrier API."""
     doc = frappe.get_doc('Mail In Repair Request', mail_in_request)
     doc.check_permission('write')
-    provider = (frappe.conf.get('repair_portal_shipping_provider') or 'manual').lower()
+    provider = shipping_provider()
     tracking_no = doc.tracking_no
     file_url = doc.label_file
-    if provider == 'manual' or not frappe.conf.get('repair_portal_shipping_api_key'):
+    if provider == 'manual':
         if not file_url:
             frappe.throw(_('Upload a carrier label before marking the request as issued.'))
         _update_mail_in_status(doc, tracking_no or 'MANUAL', file_url)
         return {'tracking_no': tracking_no or 'MANUAL', 'label_url': file_url, 'provider': 'manual'}
+    # Shipment creation and PDF rendering run on a worker; the label shows up on the
+    # request (and the customer's repair-status page) once issued.
+    frappe.enqueue(
+        'repair_portal.repair_portal.api.portal.issue_shipping_label',
+        queue='short',
+        job_id=f'repair_portal::mail_in_label::{doc.name}',
+        deduplicate=True,
+        enqueue_after_commit=True,
+        mail_in_request=doc.name,
+    )
+    return {'queued': True, 'provider': provider, 'mail_in_request': doc.name}
+
+
+def shipping_provider() -> str:
+    """Configured carrier integration, or 'manual' when none (or no API key) is set."""
+    provider = (frappe.conf.get('repair_portal_shipping_provider') or 'manual').lower()
+    if not frappe.conf.get('repair_portal_shipping_api_key'):
+        return 'manual'
+    return provider
+
+
+def issue_shipping_label(mail_in_request: str) -> Dict[str, Any]:
+    """Background job: create the Shipment and label PDF once per mail-in request."""
+    doc = frappe.get_doc('Mail In Repair Request', mail_in_request)
+    if doc.label_file and doc.tracking_no:
+        return {'tracking_no': doc.tracking_no, 'label_url': doc.label_file, 'provider': shipping_provider()}
     shipment = _create_shipment(doc)
     label_url, tracking_no = _render_label(doc, shipment)
     _update_mail_in_status(doc, tracking_no, label_url)
+    frappe.db.commit()
     return {
         'tracking_no': tracking_no,
         'label_url': label_url,
-        'provider': provider,
+        'provider': shipping_provider(),
         'shipment': shipment.name,
     }
 
@@ -82,7 +110,9 @@ def _render_label(mail_in: Document, shipment: Document) -> tuple[str, str]:
         '<html><body><h2>Mail-In Repair Label</h2><p>Shipment: {{ shipment.name }}</p><p>Tracking: {{ tracking }}</p></body></html>',
         {'shipment': shipment, 'tracking': tracking_no},
     )
-    pdf_bytes = get_pdf(html)
+    # Re-issuing the same shipment renders identical HTML; reuse that PDF. The attached
+    # File below is the persisted copy, so the cache skips its own File layer.
+    pdf_bytes = render_cache.get_or_render('label', html, None, 'pdf', lambda: get_pdf(html), persist=False)
     file_doc = save_file(
         f'Mail-In-Label-{tracking_no}.pdf',
         pdf_bytes,
@@ -1,35 +1,20 @@
 """Permission logic for Clarinet Intake."""
 from __future__ import annotations
 
-import frappe
+from repair_portal.repair_portal.permissions.principal import Principal, decide
 
 STAFF_ROLES = {"Owner/Admin", "Front Desk", "Repair Technician", "Intake Coordinator"}
 
 
 def has_permission(doc, ptype: str, user: str | None = None) -> bool:
-    user = user or frappe.session.user
-    if user == "Guest":
-        return False
-    if set(frappe.get_roles(user)) & STAFF_ROLES:
-        return True
-    if frappe.has_role(user, "Customer") and ptype in {"read"}:
-        return _is_customer_owner(doc.customer, user)
-    return False
+    return decide(doc, ptype, user, _rule)
 
 
-def _is_customer_owner(customer: str, user: str) -> bool:
-    contact = frappe.db.get_value("Contact", {"user": user}, "name")
-    if not contact:
+def _rule(doc, ptype: str, principal: Principal) -> bool:
+    if principal.is_guest:
         return False
-    return bool(
-        frappe.db.exists(
-            "Dynamic Link",
-            {
-                "parent": contact,
-                "parenttype": "Contact",
-                "link_doctype": "Customer",
-                "link_name": customer,
-            },
-        )
-    )
-
+    if principal.has_any(STAFF_ROLES):
+        return True
+    if principal.has_role("Customer") and ptype in {"read"}:
+        return principal.owns(doc.customer)
+    return False
@@ -3,42 +3,32 @@ from __future__ import annotations
 
 import frappe
 
+from repair_portal.repair_portal.permissions.principal import Principal, decide, remember
+
 STAFF_ROLES = {"Owner/Admin", "Front Desk", "Repair Technician", "Inventory", "Accounting"}
 
 
 def has_permission(doc, ptype: str, user: str | None = None) -> bool:
-    user = user or frappe.session.user
-    if user == "Guest":
+    return decide(doc, ptype, user, _rule)
+
+
+def _rule(doc, ptype: str, principal: Principal) -> bool:
+    if principal.is_guest:
         return False
-    if set(frappe.get_roles(user)) & STAFF_ROLES:
+    if principal.has_any(STAFF_ROLES):
         return True
-    if frappe.has_role(user, "Customer") and ptype in {"read"}:
-        return _is_customer_owner(doc.customer, user)
-    if frappe.has_role(user, "School/Teacher") and ptype in {"read"}:
-        return _is_school_contact(doc.customer, user)
+    if principal.has_role("Customer") and ptype in {"read"}:
+        return principal.owns(doc.customer)
+    if principal.has_role("School/Teacher") and ptype in {"read"}:
+        return _is_school_contact(doc.customer, principal)
     return False
 
 
-def _is_customer_owner(customer: str, user: str) -> bool:
-    contact = frappe.db.get_value("Contact", {"user": user}, "name")
-    if not contact:
+def _is_school_contact(customer: str, principal: Principal) -> bool:
+    # Linked customers first; the school flag is looked up once per customer per request.
+    if not principal.owns(customer):
         return False
-    return bool(
-        frappe.db.exists(
-            "Dynamic Link",
-            {
-                "parent": contact,
-                "parenttype": "Contact",
-                "link_doctype": "Customer",
-                "link_name": customer,
-            },
-        )
+    return remember(
+        ("customer_is_school", customer),
+        lambda: bool(frappe.db.get_value("Customer", customer, "is_school")),
     )
-
-
-def _is_school_contact(customer: str, user: str) -> bool:
-    school_flag = frappe.db.get_value("Customer", customer, "is_school")
-    if not school_flag:
-        return False
-    return _is_customer_owner(customer, user)
-
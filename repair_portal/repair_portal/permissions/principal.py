@@ -0,0 +1,133 @@
+"""Request-scoped principal and decision cache shared by the portal ``has_permission`` hooks.
+
+Frappe calls ``has_permission`` once per row in list and report views. Each
+handler describes its rule as ``rule(doc, ptype, principal)`` and goes through
+:func:`decide`, which resolves the user's roles (and, only when a rule asks,
+linked customers) once per request and memoises every (user, doctype, name,
+ptype) decision and portal-token hash on ``frappe.local``. Nothing outlives
+the request, so role or customer changes apply from the next one.
+"""
+
+from __future__ import annotations
+
+from collections.abc import Callable, Hashable, Iterable
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+_LOCAL_ATTR = "repair_portal_permission_cache"
+
+
+class Principal:
+    """A user's roles plus (lazily) the customers linked to them."""
+
+    __slots__ = ("user", "roles", "_customers", "_load_customers")
+
+    def __init__(self, user: str, roles: Iterable[str], load_customers: Callable[[str], Iterable[str]]):
+        self.user = user
+        self.roles = frozenset(roles)
+        self._customers: frozenset[str] | None = None
+        self._load_customers = load_customers
+
+    @property
+    def is_guest(self) -> bool:
+        return self.user == "Guest"
+
+    @property
+    def customers(self) -> frozenset[str]:
+        if self._customers is None:
+            self._customers = frozenset(self._load_customers(self.user)) if not self.is_guest else frozenset()
+        return self._customers
+
+    def has_role(self, role: str) -> bool:
+        return role in self.roles
+
+    def has_any(self, roles: Iterable[str]) -> bool:
+        return not self.roles.isdisjoint(roles)
+
+    def owns(self, customer: str | None) -> bool:
+        return bool(customer) and customer in self.customers
+
+
+class RequestCache:
+    """Principals, decisions and token hashes memoised for one request."""
+
+    def __init__(self) -> None:
+        self.principals: dict[str, Principal] = {}
+        self.memo: dict[Hashable, Any] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def principal(
+        self,
+        user: str,
+        get_roles: Callable[[str], Iterable[str]],
+        load_customers: Callable[[str], Iterable[str]],
+    ) -> Principal:
+        principal = self.principals.get(user)
+        if principal is None:
+            roles = () if user == "Guest" else get_roles(user)
+            principal = self.principals[user] = Principal(user, roles, load_customers)
+        return principal
+
+    def remember(self, key: Hashable, compute: Callable[[], Any]) -> Any:
+        if key in self.memo:
+            self.hits += 1
+            return self.memo[key]
+        self.misses += 1
+        value = self.memo[key] = compute()
+        return value
+
+    def token_hash(self, token: str, context: str, hasher: Callable[[str, str], str]) -> str:
+        return self.remember(("token", token, context), lambda: hasher(token, context))
+
+
+Rule = Callable[[Any, str, Principal], bool]
+
+
+def request_cache() -> RequestCache:
+    cache = getattr(frappe.local, _LOCAL_ATTR, None)
+    if cache is None:
+        cache = RequestCache()
+        setattr(frappe.local, _LOCAL_ATTR, cache)
+    return cache
+
+
+def reset() -> None:
+    """Forget this request's principals and decisions (after role / customer-link edits)."""
+    setattr(frappe.local, _LOCAL_ATTR, None)
+
+
+def principal_for(user: str | None = None) -> Principal:
+    from repair_portal.customer.security import customer_set_for_user
+
+    return request_cache().principal(user or frappe.session.user, frappe.get_roles, customer_set_for_user)
+
+
+def decide(doc, ptype: str, user: str | None, rule: Rule) -> bool:
+    """Evaluate ``rule`` for ``doc`` once per request; unsaved documents are never cached."""
+    principal = principal_for(user)
+    name = doc.get("name")
+    if not name or doc.get("__islocal"):
+        return bool(rule(doc, ptype, principal))
+    key = (principal.user, doc.doctype, name, ptype)
+    return request_cache().remember(key, lambda: bool(rule(doc, ptype, principal)))
+
+
+def remember(key: Hashable, compute: Callable[[], Any]) -> Any:
+    """Request-scoped memo for lookups rules share across rows (e.g. a customer's school flag)."""
+    return request_cache().remember(key, compute)
+
+
+def hash_token(token: str, context: str) -> str:
+    """``token_utils.hash_token`` computed once per (token, context) per request."""
+    from repair_portal.repair_portal.utils import token as token_utils
+
+    return request_cache().token_hash(token, context, token_utils.hash_token)
+
+
+def portal_token() -> str | None:
+    return frappe.form_dict.get("portal_token") or frappe.form_dict.get("token")
@@ -6,17 +6,67 @@ import frappe
 from frappe import _
 from frappe.utils import flt
 
+from repair_portal.repair.services import rollup
+
 
 def execute(filters: dict | None = None):
     filters = filters or {}
     states = tuple(filters.get("states") or ["Completed", "Ready to Ship", "QC"])
+    if rollup.is_covered():
+        data = _from_facts(states)
+    else:
+        data = _live(states)
+    if not data:
+        return _columns(), [], None, None
+
+    chart = {
+        "data": {
+            "labels": [row["repair_order"] for row in data],
+            "datasets": [
+                {
+                    "name": _("Margin"),
+                    "values": [row["margin"] for row in data],
+                }
+            ],
+        },
+        "type": "bar",
+    }
+
+    return _columns(), data, None, chart
+
+
+def _row(repair_order: str, repair_class, customer, revenue: float, cost: float) -> dict:
+    margin = revenue - cost
+    margin_pct = (margin / revenue * 100.0) if revenue else 0.0
+    return {
+        "repair_order": repair_order,
+        "repair_class": repair_class or "-",
+        "customer": customer,
+        "parts_revenue": round(revenue, 2),
+        "parts_cost": round(cost, 2),
+        "margin": round(margin, 2),
+        "margin_pct": round(margin_pct, 2),
+    }
+
+
+def _from_facts(states: tuple) -> list[dict]:
+    facts = rollup.query_facts(
+        ["repair_order", "repair_class", "customer", "parts_revenue", "parts_cost"], states=states
+    )
+    return [
+        _row(f.repair_order, f.repair_class, f.customer, flt(f.parts_revenue), flt(f.parts_cost))
+        for f in facts
+    ]
+
+
+def _live(states: tuple) -> list[dict]:
     orders = frappe.db.get_all(
         "Repair Order",
         filters={"workflow_state": ("in", states)},
         fields=["name", "customer", "repair_class"],
     )
     if not orders:
-        return _columns(), [], None, None
+        return []
 
     order_names = [row.name for row in orders]
     cost_map = defaultdict(float)
@@ -46,38 +96,16 @@ def execute(filters: dict | None = None):
             if order_name:
                 revenue_map[order_name] += flt(row.price)
 
-    data = []
-    for order in orders:
-        revenue = revenue_map.get(order.name, 0.0)
-        cost = cost_map.get(order.name, 0.0)
-        margin = revenue - cost
-        margin_pct = (margin / revenue * 100.0) if revenue else 0.0
-        data.append(
-            {
-                "repair_order": order.name,
-                "repair_class": order.repair_class or "-",
-                "customer": order.customer,
-                "parts_revenue": round(revenue, 2),
-                "parts_cost": round(cost, 2),
-                "margin": round(margin, 2),
-                "margin_pct": round(margin_pct, 2),
-            }
+    return [
+        _row(
+            order.name,
+            order.repair_class,
+            order.customer,
+            revenue_map.get(order.name, 0.0),
+            cost_map.get(order.name, 0.0),
         )
-
-    chart = {
-        "data": {
-            "labels": [row["repair_order"] for row in data],
-            "datasets": [
-                {
-                    "name": _("Margin"),
-                    "values": [row["margin"] for row in data],
-                }
-            ],
-        },
-        "type": "bar",
-    }
-
-    return _columns(), data, None, chart
+        for order in orders
+    ]
 
 
 def _columns():
@@ -1,30 +1,16 @@
 from __future__ import annotations
 
-import frappe
 from frappe import _
 
+from repair_portal.repair.services import rollup
+
 
 def execute(filters: dict | None = None):
     filters = filters or {}
     states = tuple(filters.get("states") or ["Completed", "Ready to Ship"])
-    placeholders = ",".join(["%s"] * len(states))
-    results = frappe.db.sql(
-        f"""
-        SELECT
-            coalesce(re.repair_class, 'Unclassified') AS repair_class,
-            COUNT(ro.name) AS total_orders,
-            AVG(TIMESTAMPDIFF(HOUR, ro.creation, ro.modified)) AS avg_hours,
-            MIN(TIMESTAMPDIFF(HOUR, ro.creation, ro.modified)) AS min_hours,
-            MAX(TIMESTAMPDIFF(HOUR, ro.creation, ro.modified)) AS max_hours
-        FROM `tabRepair Order` ro
-        LEFT JOIN `tabRepair Estimate` re ON re.repair_order = ro.name
-        WHERE ro.workflow_state IN ({placeholders})
-        GROUP BY repair_class
-        ORDER BY avg_hours ASC
-        """,
-        states,
-        as_dict=True,
-    )
+    from_date, to_date = filters.get("from_date"), filters.get("to_date")
+    # Complete days from the rollup, the rest live from the same fact definitions
+    results = _summarize(rollup.query_split(["repair_class"], from_date, to_date, states))
 
     columns = [
         {"label": _("Repair Class"), "fieldname": "repair_class", "fieldtype": "Data", "width": 200},
@@ -54,3 +40,20 @@ def execute(filters: dict | None = None):
                 row[key] = round(value, 2)
 
     return columns, results, None, chart
+
+
+def _summarize(rows: list[dict]) -> list[dict]:
+    results = []
+    for row in rows:
+        orders = int(row.get("orders") or 0)
+        results.append(
+            {
+                "repair_class": row.get("repair_class") or rollup.UNCLASSIFIED,
+                "total_orders": orders,
+                "avg_hours": float(row.get("cycle_hours_total") or 0) / orders if orders else None,
+                "min_hours": row.get("cycle_hours_min"),
+                "max_hours": row.get("cycle_hours_max"),
+            }
+        )
+    results.sort(key=lambda r: r["avg_hours"] or 0)
+    return results
@@ -5,6 +5,10 @@ import frappe
 from frappe import _
 from frappe.utils import add_days, getdate, nowdate
 
+from repair_portal.repair.services import rollup
+
+ACTIVE_STATES = ["In Progress", "QC", "Ready to Ship", "Approved"]
+
 
 def execute(filters: dict | None = None):
     filters = filters or {}
@@ -20,18 +24,7 @@ def execute(filters: dict | None = None):
     for row in availability:
         available_by_tech[row.technician] += row.available_minutes or 0
 
-    orders = frappe.db.get_all(
-        "Repair Order",
-        filters={
-            "technician": ("is", "set"),
-            "workflow_state": ("in", ["In Progress", "QC", "Ready to Ship", "Approved"]),
-            "modified": (">=", start),
-        },
-        fields=["technician", "planned_hours", "name"],
-    )
-    planned_by_tech = defaultdict(float)
-    for row in orders:
-        planned_by_tech[row.technician] += float(row.planned_hours or 0) * 60.0
+    planned_by_tech = _planned_minutes(start)
 
     columns = [
         {"label": _("Technician"), "fieldname": "technician", "fieldtype": "Link", "options": "User", "width": 160},
@@ -80,3 +73,12 @@ def execute(filters: dict | None = None):
     }
 
     return columns, data, None, chart
+
+
+def _planned_minutes(start) -> dict[str, float]:
+    """Estimated minutes of active orders per assigned technician (rollup for complete days, live after)."""
+    planned_by_tech = defaultdict(float)
+    for row in rollup.query_split(["technician"], from_date=start, states=ACTIVE_STATES):
+        if row.get("technician"):
+            planned_by_tech[row["technician"]] += float(row.get("estimated_hours") or 0) * 60.0
+    return planned_by_tech
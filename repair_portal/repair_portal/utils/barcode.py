@@ -1,13 +1,15 @@
 """Barcode and QR helpers for Repair Portal doctypes."""
 from __future__ import annotations
 
-import base64
 from io import BytesIO
 from typing import Iterable
 
 import frappe
 from frappe import _
 from frappe.utils import now_datetime
+from frappe.utils.pdf import get_pdf
+
+from repair_portal.repair_portal.utils import render_cache
 
 try:  # pragma: no cover - import guard depends on frappe distribution
     from frappe.utils import qr_code as frappe_qr  # type: ignore[attr-defined]
@@ -59,23 +61,71 @@ def ensure_instrument_barcode(doc: frappe.Document, _event: str | None = None) -
     _ensure_barcode(doc, "barcode", ("serial_no",))
 
 
-def _generate_qr_image(value: str):
-    if frappe_qr and hasattr(frappe_qr, "make_qr_code"):
-        return frappe_qr.make_qr_code(value)
+def _qr_png(value: str, size: int) -> bytes:
     if qrcode:
-        qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M)
-        qr.add_data(value)
-        qr.make(fit=True)
-        return qr.make_image(fill_color="black", back_color="white")
+        return render_cache.qr_png(value, size)
+    if frappe_qr and hasattr(frappe_qr, "make_qr_code"):
+        buffer = BytesIO()
+        frappe_qr.make_qr_code(value).save(buffer, format="PNG")
+        return buffer.getvalue()
     frappe.throw(_("QR code generation library is unavailable."))
     raise RuntimeError("QR code generation library is unavailable.")
 
 
-def qr_data_uri(value: str | None) -> str:
+def qr_data_uri(value: str | None, size: int | None = None) -> str:
     if not value:
         return ""
-    image = _generate_qr_image(value)
-    buffer = BytesIO()
-    image.save(buffer, format="PNG")
-    encoded = base64.b64encode(buffer.getvalue()).decode()
-    return f"data:image/png;base64,{encoded}"
+    size = int(size or render_cache.DEFAULT_QR_SIZE)
+    content = render_cache.get_or_render("qr", value, size, "png", lambda: _qr_png(value, size))
+    return render_cache.data_uri(content, "png")
+
+
+# Doctypes that carry a ``barcode`` field, with the extra lines printed under each tag.
+SHEET_FIELDS = {
+    "Clarinet Intake": ("serial_no", "customer_full_name"),
+    "Repair Order": ("customer", "instrument_profile"),
+    "Instrument": ("serial_no", "brand"),
+}
+MAX_SHEET_LABELS = 200
+
+
+@frappe.whitelist()
+def render_label_sheet(doctype: str, names, columns: int = 3, size: int | None = None) -> None:
+    """Download a PDF sheet of QR tags for ``names`` rendered in one pass."""
+    if doctype not in SHEET_FIELDS:
+        frappe.throw(_("Label sheets are not available for {0}").format(doctype))
+    names = frappe.parse_json(names) if isinstance(names, str) else list(names or [])
+    if not names:
+        frappe.throw(_("Select at least one document"))
+    if len(names) > MAX_SHEET_LABELS:
+        frappe.throw(_("A label sheet holds at most {0} tags").format(MAX_SHEET_LABELS))
+
+    size = int(size or render_cache.DEFAULT_QR_SIZE)
+    extra = SHEET_FIELDS[doctype]
+    rows = {
+        row.name: row
+        for row in frappe.get_list(
+            doctype, filters={"name": ["in", names]}, fields=["name", "barcode", *extra]
+        )
+    }
+    ordered = [rows[name] for name in names if name in rows]
+    if not ordered:
+        frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+    values = [row.barcode or row.name for row in ordered]
+    images = render_cache.qr_batch(values, size, render=_qr_png)
+    labels = [
+        {
+            "qr": render_cache.data_uri(images[value]),
+            "title": row.name,
+            "lines": [value if value != row.name else None, *(row.get(f) for f in extra)],
+        }
+        for row, value in zip(ordered, values)
+    ]
+    html = render_cache.sheet_html(labels, int(columns))
+    # A sheet is a one-off selection: cache it briefly, but never as a permanent File.
+    pdf = render_cache.get_or_render("sheet", html, columns, "pdf", lambda: get_pdf(html), persist=False)
+
+    frappe.local.response.filename = f"{frappe.scrub(doctype)}_labels.pdf"
+    frappe.local.response.filecontent = pdf
+    frappe.local.response.type = "pdf"
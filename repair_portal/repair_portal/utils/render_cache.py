@@ -0,0 +1,224 @@
+"""Content-addressed render cache for QR images, shipping labels and label sheets.
+
+A render is identified by sha256 of (kind, value, size, format). Lookups go
+through a per-process LRU, then Redis, then a private File named after the key;
+only a miss renders. New renders are written to the File store by a background
+job so print previews (GET requests, never committed) stay read-only; a batch
+queues one such job for all of its new renders. One-off documents (label
+sheets, shipping labels) pass ``persist=False`` and live in memory/Redis only.
+"""
+
+from __future__ import annotations
+
+import base64
+import hashlib
+import html
+from collections import OrderedDict
+from collections.abc import Callable, Iterable, Sequence
+from io import BytesIO
+from typing import Any
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+try:  # pragma: no cover - optional dependency
+    import qrcode
+except Exception:  # pragma: no cover - optional dependency path
+    qrcode = None
+
+CACHE_PREFIX = "repair_portal:render"
+REDIS_TTL = 24 * 60 * 60
+MAX_REDIS_BYTES = 512 * 1024
+MAX_MEMORY_ENTRIES = 512
+DEFAULT_QR_SIZE = 4
+MIME_TYPES = {"png": "image/png", "pdf": "application/pdf"}
+
+Render = Callable[[str, int], bytes]
+
+
+# ---------------------------------------------------------------------------
+# Pure helpers
+# ---------------------------------------------------------------------------
+def render_key(kind: str, value: Any, size: Any = None, fmt: str = "png") -> str:
+    payload = "\x1f".join((kind, str(value), "" if size is None else str(size), fmt.lower()))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def file_name_for(key: str, fmt: str) -> str:
+    return f"render-{key[:40]}.{fmt.lower()}"
+
+
+def data_uri(content: bytes, fmt: str = "png") -> str:
+    mime = MIME_TYPES.get(fmt.lower(), "application/octet-stream")
+    return f"data:{mime};base64,{base64.b64encode(content).decode()}"
+
+
+class RenderCache:
+    """Byte-content LRU shared by every render kind in this process."""
+
+    def __init__(self, maxsize: int = MAX_MEMORY_ENTRIES):
+        self.maxsize = maxsize
+        self._entries: OrderedDict[str, bytes] = OrderedDict()
+
+    def get(self, key: str) -> bytes | None:
+        content = self._entries.get(key)
+        if content is not None:
+            self._entries.move_to_end(key)
+        return content
+
+    def put(self, key: str, content: bytes) -> None:
+        self._entries[key] = content
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+def qr_png(value: str, size: int = DEFAULT_QR_SIZE) -> bytes:
+    """PNG QR code for ``value``."""
+    if qrcode is None:
+        raise RuntimeError("qrcode is not installed")
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_M, box_size=int(size), border=2)
+    qr.add_data(value)
+    qr.make(fit=True)
+    buffer = BytesIO()
+    qr.make_image(fill_color="black", back_color="white").save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def render_many(values: Sequence[str], size: int, render: Render = qr_png) -> dict[str, bytes]:
+    """Render each distinct value once, in-process (sheets are capped, so no worker pool)."""
+    return {value: render(value, size) for value in dict.fromkeys(values)}
+
+
+def sheet_html(labels: Iterable[dict[str, Any]], columns: int = 3) -> str:
+    """
+    One HTML document laying ``labels`` out in a table of ``columns`` cells per
+    row. Each label has ``qr`` (data URI), ``title`` and optional ``lines``.
+    """
+    columns = max(1, int(columns))
+    cells = []
+    for label in labels:
+        lines = "".join(f"<div>{html.escape(str(line))}</div>" for line in label.get("lines") or [] if line)
+        cells.append(
+            f'<td class="rp-label"><img src="{label["qr"]}" alt="QR">'
+            f'<div class="rp-title">{html.escape(str(label.get("title") or ""))}</div>{lines}</td>'
+        )
+    rows = []
+    for start in range(0, len(cells), columns):
+        row = cells[start : start + columns]
+        row += ["<td></td>"] * (columns - len(row))
+        rows.append(f"<tr>{''.join(row)}</tr>")
+    width = round(100 / columns, 2)
+    return (
+        "<html><head><style>"
+        "table{width:100%;border-collapse:collapse}tr{page-break-inside:avoid}"
+        f".rp-label{{width:{width}%;padding:6px;text-align:center;vertical-align:top;font-size:10px}}"
+        ".rp-label img{height:90px}.rp-title{font-weight:bold;font-size:12px}"
+        f"</style></head><body><table>{''.join(rows)}</table></body></html>"
+    )
+
+
+# ---------------------------------------------------------------------------
+# Redis + File store
+# ---------------------------------------------------------------------------
+_MEMORY = RenderCache()
+
+
+def _redis_key(key: str) -> str:
+    return f"{CACHE_PREFIX}:{key}"
+
+
+def _remember(key: str, content: bytes, redis: bool = True) -> None:
+    _MEMORY.put(key, content)
+    if redis and len(content) <= MAX_REDIS_BYTES:
+        frappe.cache().set_value(_redis_key(key), content, expires_in_sec=REDIS_TTL)
+
+
+def _load_file(key: str, fmt: str) -> bytes | None:
+    name = frappe.db.get_value("File", {"file_name": file_name_for(key, fmt), "is_private": 1}, "name")
+    if not name:
+        return None
+    try:
+        return frappe.get_doc("File", name).get_content()
+    except Exception:
+        # Row without its file on disk (restored DB, pruned storage): render again
+        return None
+
+
+def _queue_persist(items: Sequence[tuple[str, str, bytes]]) -> None:
+    """One background job storing every ``(key, fmt, content)`` render of a call."""
+    if not items:
+        return
+    keys = [key for key, _fmt, _content in items]
+    job_key = keys[0] if len(keys) == 1 else hashlib.sha256("".join(sorted(keys)).encode()).hexdigest()
+    frappe.enqueue(
+        "repair_portal.repair_portal.utils.render_cache.persist_renders",
+        queue="short",
+        job_id=f"repair_portal::render::{job_key}",
+        deduplicate=True,
+        items=list(items),
+    )
+
+
+def persist_renders(items: Sequence[tuple[str, str, bytes]]) -> None:
+    """Background job: store renders as unattached private Files, skipping ones already stored."""
+    from frappe.utils.file_manager import save_file
+
+    for key, fmt, content in items:
+        if not frappe.db.exists("File", {"file_name": file_name_for(key, fmt), "is_private": 1}):
+            save_file(file_name_for(key, fmt), content, None, None, is_private=1)
+    frappe.db.commit()
+
+
+def _lookup(key: str, fmt: str, persist: bool) -> bytes | None:
+    content = _MEMORY.get(key)
+    if content is not None:
+        return content
+    content = frappe.cache().get_value(_redis_key(key))
+    if content is not None:
+        _remember(key, content, redis=False)
+        return content
+    if persist:
+        content = _load_file(key, fmt)
+        if content is not None:
+            _remember(key, content)
+    return content
+
+
+def get_or_render(
+    kind: str, value: Any, size: Any, fmt: str, render: Callable[[], bytes], persist: bool = True
+) -> bytes:
+    """Cached render of ``value``; ``persist=False`` keeps one-off renders out of the File store."""
+    key = render_key(kind, value, size, fmt)
+    content = _lookup(key, fmt, persist)
+    if content is None:
+        content = render()
+        _remember(key, content)
+        if persist:
+            _queue_persist([(key, fmt, content)])
+    return content
+
+
+def qr_batch(values: Sequence[str], size: int, render: Render = qr_png) -> dict[str, bytes]:
+    """PNG QR codes for ``values``; cache misses are rendered together and persisted by one job."""
+    found: dict[str, bytes] = {}
+    missing: list[str] = []
+    for value in dict.fromkeys(values):
+        content = _lookup(render_key("qr", value, size, "png"), "png", True)
+        if content is None:
+            missing.append(value)
+        else:
+            found[value] = content
+    new: list[tuple[str, str, bytes]] = []
+    for value, content in render_many(missing, size, render).items():
+        key = render_key("qr", value, size, "png")
+        _remember(key, content)
+        new.append((key, "png", content))
+        found[value] = content
+    _queue_persist(new)
+    return found
@@ -1,10 +1,11 @@
 # Absolute Path: /home/frappe/frappe-bench/apps/repair_portal/repair_portal/doctype/clarinet_intake_settings/clarinet_intake_settings.py
-# Last Updated: 2025-10-11
-# Version: v1.3
+# Last Updated: 2026-10-19
+# Version: v1.4
 # Purpose:
 #   Backend controller for Clarinet Intake Settings (Single DocType).
 #   • Validates default links used across intake automation flows.
 #   • Enforces consent template integrity and SLA fallbacks.
+#   • Normalizes Brand Mapping Rule rows and refreshes the site-wide brand index.
 #   • Provides a helper for callers to fetch settings with safe defaults.
 
 from __future__ import annotations
@@ -13,6 +14,8 @@ import frappe
 from frappe import _
 from frappe.model.document import Document
 
+from repair_portal.intake.services import brand_index
+
 DEFAULT_SLA_TARGET_HOURS = 72
 DEFAULT_SLA_LABEL = "Promise by"
 
@@ -31,6 +34,10 @@ class ClarinetIntakeSettings(Document):
         self._validate_consent_template()
         self._ensure_naming_hint()
         self._ensure_sla_defaults()
+        self._normalize_brand_rules()
+
+    def on_update(self) -> None:
+        brand_index.invalidate()
 
     def _validate_link(self, fieldname: str, doctype: str, *, fallback: str | None = None) -> None:
         value = (getattr(self, fieldname, None) or "").strip()  # type: ignore[attr-defined]
@@ -65,6 +72,20 @@ class ClarinetIntakeSettings(Document):
             )
             self.default_consent_template = None  # type: ignore[attr-defined]
 
+    def _normalize_brand_rules(self) -> None:
+        # Child rows skip their own controller when saved through the grid.
+        seen: set[str] = set()
+        for row in self.get("brand_mapping_rules") or []:
+            row.from_brand = brand_index.collapse_ws(row.from_brand)
+            row.to_brand = brand_index.collapse_ws(row.to_brand)
+            row.normalized_key = brand_index.normalize_key(row.from_brand)
+            if row.normalized_key in seen:
+                frappe.throw(
+                    _("Row {0}: a mapping for source brand '{1}' already exists (case-insensitive match).")
+                    .format(row.idx, row.from_brand)
+                )
+            seen.add(row.normalized_key)
+
     def _ensure_naming_hint(self) -> None:
         if self.intake_naming_series or self.intake_id_pattern:  # type: ignore[attr-defined]
             return
@@ -0,0 +1,439 @@
+# repair_portal/repair_portal/scripts/seed_engine.py
+"""
+Dependency-ordered bulk seeding engine for scripts/schemas.
+
+Replaces the "try everything, retry up to N passes" strategy used by
+``doctype_loader`` / ``json_loader`` with a single planned run:
+
+✔ Builds a dependency graph up front from Link fields and tree parents
+  (``meta.nsm_parent_field``) and applies documents in topological order
+✔ Prefetches existing records per doctype in one query (plus one query per
+  child table) instead of a lookup per document
+✔ Skips unchanged rows by comparing a digest of the seeded fields against
+  the stored values — no ``get_doc``/``save`` for no-op rows
+✔ Applies the rest in batched transactions (savepoint per document, commit
+  per batch) so one bad row never rolls back its neighbours
+✔ Prints per-doctype throughput (created/updated/skipped/failed, docs/s)
+
+Usage:
+   bench --site <site> execute repair_portal.scripts.seed_engine.load_from_default_schemas
+   bench --site <site> execute repair_portal.scripts.seed_engine.load_from_folder \
+         --kwargs "{'folder': 'apps/repair_portal/repair_portal/scripts/schemas'}"
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import time
+import traceback
+from collections import defaultdict, deque
+from collections.abc import Callable, Iterable
+from dataclasses import dataclass, field
+from decimal import Decimal
+from glob import glob
+from typing import Any
+
+import frappe
+from frappe.exceptions import DuplicateEntryError, ValidationError
+
+from .doctype_loader import _META_KEYS, _ensure_site_context, _read_json_docs
+
+DEFAULT_BATCH_SIZE = 200
+
+# Keys that never take part in digests or updates (besides _META_KEYS).
+_IGNORED_KEYS = _META_KEYS | {"docstatus", "__last_sync_on", "parent", "parentfield", "parenttype"}
+
+# ERPNext suffixes company-scoped names with " - <abbr>" (Department, Warehouse, …).
+_COMPANY_SUFFIX_SEP = " - "
+
+
+# -------------------------------
+# Stats
+# -------------------------------
+
+
+@dataclass
+class DoctypeStats:
+    created: int = 0
+    updated: int = 0
+    skipped: int = 0
+    failed: int = 0
+    seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return self.created + self.updated + self.skipped + self.failed
+
+    @property
+    def rate(self) -> float:
+        return self.total / self.seconds if self.seconds > 0 else float(self.total)
+
+
+@dataclass
+class SeedReport:
+    stats: dict[str, DoctypeStats] = field(default_factory=lambda: defaultdict(DoctypeStats))
+    cycles: list[str] = field(default_factory=list)
+    errors: list[str] = field(default_factory=list)
+
+    def print_summary(self) -> None:
+        print(f"{'Doctype':<32} {'created':>8} {'updated':>8} {'skipped':>8} {'failed':>7} {'docs/s':>9}")
+        for doctype, s in sorted(self.stats.items()):
+            print(
+                f"{doctype:<32} {s.created:>8} {s.updated:>8} {s.skipped:>8} {s.failed:>7} {s.rate:>9.1f}"
+            )
+        if self.cycles:
+            print(f"⚠️  Dependency cycle(s) applied in file order: {', '.join(self.cycles)}")
+
+
+# -------------------------------
+# Normalisation + digests
+# -------------------------------
+
+
+def _norm(value: Any) -> str:
+    """Normalise a scalar so JSON payload values and DB values compare equal."""
+    if value is None:
+        return ""
+    if isinstance(value, bool):
+        return str(int(value))
+    if isinstance(value, (int, float, Decimal)):
+        return repr(float(value))
+    text = str(value).strip()
+    try:
+        return repr(float(text))
+    except ValueError:
+        return text
+
+
+def _scalar_fields(payload: dict[str, Any]) -> list[str]:
+    return sorted(k for k, v in payload.items() if k not in _IGNORED_KEYS and not isinstance(v, list))
+
+
+def _table_fields(payload: dict[str, Any]) -> list[str]:
+    return sorted(k for k, v in payload.items() if k not in _IGNORED_KEYS and isinstance(v, list))
+
+
+def _row_projection(row: dict[str, Any], keys: Iterable[str]) -> list[tuple[str, str]]:
+    return [(k, _norm(row.get(k))) for k in keys]
+
+
+def field_digest(payload: dict[str, Any], current: dict[str, Any]) -> tuple[str, str]:
+    """
+    Return (payload_digest, current_digest) over the fields the payload seeds.
+
+    ``current`` is the prefetched DB row; child tables appear in it as lists of
+    row dicts (ordered by idx). Only keys present in the payload are compared,
+    so extra columns in the DB never count as drift.
+    """
+    left: list[Any] = []
+    right: list[Any] = []
+    for key in _scalar_fields(payload):
+        left.append((key, _norm(payload.get(key))))
+        right.append((key, _norm(current.get(key))))
+    for key in _table_fields(payload):
+        rows = [r for r in payload[key] if isinstance(r, dict)]
+        child_keys = sorted({k for r in rows for k in r if k not in _IGNORED_KEYS})
+        left.append((key, [_row_projection(r, child_keys) for r in rows]))
+        right.append((key, [_row_projection(r, child_keys) for r in current.get(key) or []]))
+
+    def _hash(obj: Any) -> str:
+        return hashlib.sha1(json.dumps(obj, sort_keys=True).encode("utf-8")).hexdigest()
+
+    return _hash(left), _hash(right)
+
+
+# -------------------------------
+# Dependency graph
+# -------------------------------
+
+
+def _autoname_field(doctype: str) -> str | None:
+    autoname = (frappe.get_meta(doctype).autoname or "").strip()
+    if autoname.startswith("field:"):
+        return autoname.split(":", 1)[1].strip()
+    return None
+
+
+def expected_name(doc: dict[str, Any]) -> str | None:
+    """Best-effort name the document will have once inserted."""
+    if doc.get("name"):
+        return doc["name"]
+    fieldname = _autoname_field(doc["doctype"])
+    if fieldname and doc.get(fieldname):
+        return str(doc[fieldname])
+    return None
+
+
+def _link_targets(doctype: str) -> dict[str, str]:
+    """Map of fieldname → linked doctype, including the tree parent field."""
+    meta = frappe.get_meta(doctype)
+    targets = {df.fieldname: df.options for df in meta.get_link_fields() if df.options}
+    parent_field = getattr(meta, "nsm_parent_field", None)
+    if meta.is_tree and parent_field:
+        targets.setdefault(parent_field, doctype)
+    return targets
+
+
+def toposort(
+    docs: list[dict[str, Any]],
+    key_of: Callable[[dict[str, Any]], str | None],
+    deps_of: Callable[[dict[str, Any]], Iterable[tuple[str, str]]],
+) -> tuple[list[dict[str, Any]], list[str]]:
+    """
+    Kahn's algorithm over the seed documents, stable with respect to input order.
+
+    ``key_of(doc)`` returns the name the doc is known by (or None);
+    ``deps_of(doc)`` yields (doctype, name) link targets. Links that point
+    outside the batch are ignored — those records either exist already or the
+    insert will report a real validation error.
+
+    Returns (ordered_docs, cycle_labels); documents caught in a cycle are
+    appended in file order so they still get a single attempt.
+    """
+    index: dict[tuple[str, str], int] = {}
+    for i, doc in enumerate(docs):
+        key = key_of(doc)
+        if key:
+            index.setdefault((doc["doctype"], key), i)
+
+    def _resolve(target: tuple[str, str]) -> int | None:
+        if target in index:
+            return index[target]
+        doctype, name = target
+        if _COMPANY_SUFFIX_SEP in name:
+            return index.get((doctype, name.rsplit(_COMPANY_SUFFIX_SEP, 1)[0]))
+        return None
+
+    indegree = [0] * len(docs)
+    children: list[list[int]] = [[] for _ in docs]
+    for i, doc in enumerate(docs):
+        seen: set[int] = set()
+        for target in deps_of(doc):
+            j = _resolve(target)
+            if j is None or j == i or j in seen:
+                continue
+            seen.add(j)
+            children[j].append(i)
+            indegree[i] += 1
+
+    ready = deque(i for i, d in enumerate(indegree) if d == 0)
+    ordered: list[int] = []
+    while ready:
+        i = ready.popleft()
+        ordered.append(i)
+        for c in children[i]:
+            indegree[c] -= 1
+            if indegree[c] == 0:
+                ready.append(c)
+
+    cycles: list[str] = []
+    if len(ordered) < len(docs):
+        placed = set(ordered)
+        for i, doc in enumerate(docs):
+            if i not in placed:
+                ordered.append(i)
+                cycles.append(f"{doc['doctype']}/{key_of(doc) or '(new)'}")
+    return [docs[i] for i in ordered], cycles
+
+
+def _deps_of(doc: dict[str, Any]) -> list[tuple[str, str]]:
+    deps: list[tuple[str, str]] = []
+    for fieldname, target in _link_targets(doc["doctype"]).items():
+        value = doc.get(fieldname)
+        if value and isinstance(value, str):
+            deps.append((target, value))
+    return deps
+
+
+# -------------------------------
+# Prefetch
+# -------------------------------
+
+
+def _prefetch(doctype: str, docs: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    """Load the seeded fields of every existing target row in one query per table."""
+    names = sorted({n for n in (expected_name(d) for d in docs) if n})
+    if not names:
+        return {}
+
+    meta = frappe.get_meta(doctype)
+    valid = {df.fieldname for df in meta.fields} | {"name"}
+    scalar = sorted({k for d in docs for k in _scalar_fields(d) if k in valid})
+    rows = frappe.get_all(
+        doctype,
+        filters={"name": ["in", names]},
+        fields=["name", *[f for f in scalar if f != "name"]],
+        limit_page_length=0,
+    )
+    existing: dict[str, dict[str, Any]] = {r["name"]: dict(r) for r in rows}
+    if not existing:
+        return existing
+
+    for table_field in sorted({k for d in docs for k in _table_fields(d)}):
+        df = meta.get_field(table_field)
+        if not df or not df.options:
+            continue
+        child_meta = frappe.get_meta(df.options)
+        child_valid = {f.fieldname for f in child_meta.fields}
+        child_keys = sorted(
+            {
+                k
+                for d in docs
+                for r in d.get(table_field) or []
+                if isinstance(r, dict)
+                for k in r
+                if k in child_valid
+            }
+        )
+        child_rows = frappe.get_all(
+            df.options,
+            filters={"parenttype": doctype, "parentfield": table_field, "parent": ["in", list(existing)]},
+            fields=["parent", "idx", *child_keys],
+            order_by="parent asc, idx asc",
+            limit_page_length=0,
+        )
+        for row in child_rows:
+            existing[row["parent"]].setdefault(table_field, []).append(row)
+    return existing
+
+
+# -------------------------------
+# Apply
+# -------------------------------
+
+
+def _apply(doc: dict[str, Any], existing: dict[str, Any] | None, report: SeedReport) -> None:
+    doctype = doc["doctype"]
+    stats = report.stats[doctype]
+    name = expected_name(doc)
+
+    if existing is None and isinstance(doc.get("_match"), dict) and doc["_match"]:
+        found = frappe.get_all(doctype, filters=doc["_match"], pluck="name", limit=1)
+        if found:
+            name = found[0]
+            existing = {}
+
+    if existing is not None:
+        if existing:
+            wanted, current = field_digest(doc, existing)
+            if wanted == current:
+                stats.skipped += 1
+                return
+        target = frappe.get_doc(doctype, name)
+        for k, v in doc.items():
+            if k not in _IGNORED_KEYS:
+                target.set(k, v)
+        target.save(ignore_permissions=True)
+        stats.updated += 1
+        return
+
+    try:
+        frappe.get_doc(doc).insert(ignore_permissions=True)
+        stats.created += 1
+    except DuplicateEntryError:
+        # Name derived by the controller (e.g. company-suffixed) already exists.
+        stats.skipped += 1
+
+
+def _run_batches(ordered: list[dict[str, Any]], batch_size: int, report: SeedReport) -> list[dict[str, Any]]:
+    """Apply docs in order; commit per batch, savepoint per doc. Returns docs needing a retry."""
+    by_doctype: dict[str, list[dict[str, Any]]] = defaultdict(list)
+    for doc in ordered:
+        by_doctype[doc["doctype"]].append(doc)
+
+    existing: dict[str, dict[str, dict[str, Any]]] = {}
+    for doctype, docs in by_doctype.items():
+        started = time.monotonic()
+        existing[doctype] = _prefetch(doctype, docs)
+        report.stats[doctype].seconds += time.monotonic() - started
+
+    deferred: list[dict[str, Any]] = []
+    for offset in range(0, len(ordered), max(batch_size, 1)):
+        for i, doc in enumerate(ordered[offset : offset + batch_size]):
+            doctype = doc["doctype"]
+            name = expected_name(doc)
+            savepoint = f"seed_{offset + i}"
+            started = time.monotonic()
+            frappe.db.savepoint(savepoint)
+            try:
+                _apply(doc, existing[doctype].get(name) if name else None, report)
+                if name and name not in existing[doctype]:
+                    # Later docs in this run may update it; make them hit the update path.
+                    existing[doctype][name] = {}
+            except ValidationError as e:
+                frappe.db.rollback(save_point=savepoint)
+                deferred.append(doc)
+                report.errors.append(f"{doctype} / {name or '(new)'}: {e}")
+            except Exception as e:
+                frappe.db.rollback(save_point=savepoint)
+                report.stats[doctype].failed += 1
+                report.errors.append(f"{doctype} / {name or '(new)'}: {e}")
+                frappe.log_error(title=f"Seed Engine Error ({doctype})", message=traceback.format_exc())
+            finally:
+                report.stats[doctype].seconds += time.monotonic() - started
+        frappe.db.commit()
+    return deferred
+
+
+# -------------------------------
+# Public entry points
+# -------------------------------
+
+
+def seed_docs(docs: list[dict[str, Any]], batch_size: int = DEFAULT_BATCH_SIZE) -> SeedReport:
+    """Seed a list of payloads (each with "doctype") in dependency order."""
+    report = SeedReport()
+    docs = [d for d in docs if d.get("doctype")]
+    if not docs:
+        print("⚠️  No docs with 'doctype' found.")
+        return report
+
+    ordered, report.cycles = toposort(docs, expected_name, _deps_of)
+    deferred = _run_batches(ordered, batch_size, report)
+
+    # Dependencies the graph could not see (controller-derived names, validations
+    # on other records) get exactly one more attempt, now that everything else exists.
+    if deferred:
+        report.errors.clear()
+        still = _run_batches(deferred, batch_size, report)
+        for doc in still:
+            report.stats[doc["doctype"]].failed += 1
+
+    report.print_summary()
+    for err in report.errors:
+        print(f"  ✗ {err}")
+    return report
+
+
+def load_from_folder(folder: str, batch_size: int = DEFAULT_BATCH_SIZE) -> SeedReport:
+    """Load every *.json file in a folder (non-recursive) as one dependency-ordered run."""
+    _ensure_site_context()
+    folder = os.path.abspath(folder)
+    if not os.path.isdir(folder):
+        raise RuntimeError(f"Folder not found: {folder}")
+
+    files = sorted(glob(os.path.join(folder, "*.json")))
+    all_docs: list[dict[str, Any]] = []
+    for fpath in files:
+        try:
+            all_docs.extend(_read_json_docs(fpath))
+        except Exception as e:
+            print(f"  ✗ error reading {fpath}: {e}")
+
+    print(f"📁 Seeding {len(all_docs)} docs from {len(files)} file(s) in {folder}")
+    return seed_docs(all_docs, batch_size=batch_size)
+
+
+def load_from_default_schemas(dir_name: str = "schemas", batch_size: int = DEFAULT_BATCH_SIZE) -> SeedReport:
+    """Seed from scripts/<dir_name> (preferred) or ../<dir_name>."""
+    _ensure_site_context()
+    here = os.path.dirname(os.path.abspath(__file__))
+    candidates = [os.path.join(here, dir_name), os.path.abspath(os.path.join(here, "..", dir_name))]
+    folder = next((p for p in candidates if os.path.isdir(p)), None)
+    if not folder:
+        raise RuntimeError(
+            "No schemas folder found. Tried:\n" f"  - {candidates[0]}\n" f"  - {candidates[1]}"
+        )
+    return load_from_folder(folder, batch_size=batch_size)
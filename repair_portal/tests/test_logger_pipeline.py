@@ -0,0 +1,55 @@
+"""Queued repair_portal logger pipeline tests."""
+
+from __future__ import annotations
+
+import logging
+import queue
+
+from frappe.tests.utils import FrappeTestCase
+
+from repair_portal import logger as rp_logger
+from repair_portal.instrument_profile.services import profile_sync
+
+
+class _Capture(logging.Handler):
+    def __init__(self) -> None:
+        super().__init__(logging.DEBUG)
+        self.records: list[logging.LogRecord] = []
+
+    def emit(self, record: logging.LogRecord) -> None:
+        self.records.append(record)
+
+
+class TestLoggerPipeline(FrappeTestCase):
+    def _capture(self, suffix: str) -> _Capture:
+        rp_logger.get_logger(suffix)
+        base = logging.getLogger(f"repair_portal.{suffix}")
+        capture = _Capture()
+        base.addHandler(capture)
+        self.addCleanup(base.removeHandler, capture)
+        self.addCleanup(base.setLevel, base.level)
+        return capture
+
+    def test_structured_log_emits_one_record_per_event(self) -> None:
+        capture = self._capture("instrument_profile_jobs")
+        profile_sync._log_job("sync", "ok", "IP-0001", latency_ms=1.234)
+
+        self.assertEqual(len(capture.records), 1)
+        payload = capture.records[0].payload
+        self.assertEqual((payload["op"], payload["docname"], payload["latency_ms"]), ("sync", "IP-0001", 1.23))
+
+    def test_structured_skips_payload_build_below_level(self) -> None:
+        capture = self._capture("pipeline_test")
+        logging.getLogger("repair_portal.pipeline_test").setLevel(logging.WARNING)
+        built = []
+        rp_logger.structured(lambda: built.append(1) or {"op": "x"}, suffix="pipeline_test")
+        self.assertEqual(built, [])
+        self.assertEqual(capture.records, [])
+
+    def test_full_queue_drops_and_counts_instead_of_blocking(self) -> None:
+        handler = rp_logger._DropCountingQueueHandler(queue.Queue(maxsize=1))
+        record = logging.makeLogRecord({"msg": "hello"})
+        handler.enqueue(record)
+        handler.enqueue(record)
+        self.assertEqual(handler.dropped, 1)
+        self.assertEqual(handler.queue.qsize(), 1)
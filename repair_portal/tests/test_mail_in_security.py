@@ -4,6 +4,7 @@ NOTE: This test requires a running Frappe bench environment.
 """
 import frappe
 from frappe.tests.utils import FrappeTestCase
+from repair_portal.repair.services.mail_in import process_submission
 from repair_portal.www.mail_in_repair import submit_mail_in_request
 import json
 from unittest.mock import patch
@@ -62,7 +63,9 @@ class TestMailInSecurity(FrappeTestCase):
         }
 
         try:
-            submit_mail_in_request(json.dumps(payload))
+            result = submit_mail_in_request(json.dumps(payload))
+            # Reconciliation runs in the background stage; run it inline here
+            process_submission(result["submission"])
         except Exception as e:
             # If it throws, that's interesting, but we expect success
             print(f"Submission failed: {e}")
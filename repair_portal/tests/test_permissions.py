@@ -7,7 +7,7 @@ from typing import Tuple
 import frappe
 from frappe.tests.utils import FrappeTestCase
 
-from repair_portal.customer.security import customers_for_user
+from repair_portal.customer.security import customers_for_user, on_customer_change
 
 
 class TestPortalPermissions(FrappeTestCase):
@@ -85,3 +85,22 @@ class TestPortalPermissions(FrappeTestCase):
         frappe.set_user(self.user_a.name)
         self.assertIn(self.customer_a.name, customers_for_user(self.user_a.name))
         self.assertNotIn(self.customer_a.name, customers_for_user(self.user_b.name))
+
+    def test_customer_mapping_cache_invalidated_on_contact_change(self) -> None:
+        self.assertNotIn(self.customer_b.name, customers_for_user(self.user_a.name))
+        contact = frappe.get_doc("Contact", {"user": self.user_a.name})
+        contact.append("links", {"link_doctype": "Customer", "link_name": self.customer_b.name})
+        contact.save()
+        self.assertIn(self.customer_b.name, customers_for_user(self.user_a.name))
+
+    def test_customer_after_rename_hook_accepts_rename_arguments(self) -> None:
+        self.assertIn(self.customer_a.name, customers_for_user(self.user_a.name))
+        old_name = self.customer_a.name
+        new_name = f"{old_name} Renamed"
+        # Frappe calls after_rename handlers with (doc, method, old, new, merge)
+        on_customer_change(self.customer_a, "after_rename", old_name, new_name, False)
+
+        renamed = frappe.rename_doc("Customer", old_name, new_name, force=True)
+        self.assertEqual(renamed, new_name)
+        self.assertIn(new_name, customers_for_user(self.user_a.name))
+        self.assertNotIn(old_name, customers_for_user(self.user_a.name))
@@ -0,0 +1,56 @@
+"""Seed engine ordering and digest tests."""
+
+from __future__ import annotations
+
+from frappe.tests.utils import FrappeTestCase
+
+from repair_portal.scripts.seed_engine import field_digest, toposort
+
+
+def _key(doc):
+    return doc.get("name")
+
+
+def _deps(doc):
+    return [(doc["doctype"], doc["parent_group"])] if doc.get("parent_group") else []
+
+
+class TestSeedEngine(FrappeTestCase):
+    def test_toposort_places_parents_first(self) -> None:
+        docs = [
+            {"doctype": "Item Group", "name": "Soprano", "parent_group": "Clarinets"},
+            {"doctype": "Item Group", "name": "Clarinets", "parent_group": "Woodwinds"},
+            {"doctype": "Item Group", "name": "Woodwinds", "parent_group": "All Item Groups"},
+        ]
+        ordered, cycles = toposort(docs, _key, _deps)
+        self.assertEqual([d["name"] for d in ordered], ["Woodwinds", "Clarinets", "Soprano"])
+        self.assertEqual(cycles, [])
+
+    def test_toposort_resolves_company_suffixed_links(self) -> None:
+        docs = [
+            {"doctype": "Department", "name": "Clarinet Repair", "parent_group": "Instrument Repair - MAI"},
+            {"doctype": "Department", "name": "Instrument Repair"},
+        ]
+        ordered, _ = toposort(docs, _key, _deps)
+        self.assertEqual(ordered[0]["name"], "Instrument Repair")
+
+    def test_toposort_reports_cycles_without_dropping_docs(self) -> None:
+        docs = [
+            {"doctype": "Item Group", "name": "A", "parent_group": "B"},
+            {"doctype": "Item Group", "name": "B", "parent_group": "A"},
+        ]
+        ordered, cycles = toposort(docs, _key, _deps)
+        self.assertEqual(len(ordered), 2)
+        self.assertEqual(len(cycles), 2)
+
+    def test_digest_ignores_type_noise_and_extra_columns(self) -> None:
+        payload = {"doctype": "Item Group", "name": "Clarinets", "is_group": 1, "parent_item_group": "Woodwinds"}
+        current = {"name": "Clarinets", "is_group": "1", "parent_item_group": "Woodwinds", "image": "x.png"}
+        wanted, stored = field_digest(payload, current)
+        self.assertEqual(wanted, stored)
+
+    def test_digest_detects_child_table_drift(self) -> None:
+        payload = {"doctype": "Holiday List", "holidays": [{"holiday_date": "2025-01-01"}]}
+        current = {"holidays": [{"holiday_date": "2025-01-02", "idx": 1}]}
+        wanted, stored = field_digest(payload, current)
+        self.assertNotEqual(wanted, stored)
@@ -0,0 +1,51 @@
+import time
+
+from repair_portal.intake.services.brand_index import BrandIndex, compact_key, normalize_key
+
+RULES = [
+    ("Buffet", "Buffet Crampon"),
+    ("BC", "Buffet Crampon"),
+    ("Selmer Paris", "Henri Selmer Paris"),
+    ("Yamaha", "Yamaha"),
+    ("Leblanc", "Leblanc"),
+]
+
+
+def test_normalization_keys():
+    assert normalize_key("  Selmer   PARIS ") == "selmer paris"
+    assert compact_key("Buffet-Crampon  Paris") == "buffetcramponparis"
+
+
+def test_exact_compact_and_fuzzy_matches():
+    index = BrandIndex(RULES)
+    m = index.match("Selmer Paris ")
+    assert (m.brand, m.method, m.confidence) == ("Henri Selmer Paris", "exact", 1.0)
+
+    m = index.match("buffet-crampon")
+    assert m.brand == "Buffet Crampon" and m.method == "compact"
+
+    m = index.match("Buffett")
+    assert m.brand == "Buffet Crampon" and m.method == "fuzzy"
+    assert 0.8 <= m.confidence < 1.0
+
+    m = index.match("Leblnc")
+    assert m.brand == "Leblanc"
+
+
+def test_unrelated_input_is_unmapped():
+    index = BrandIndex(RULES)
+    m = index.match("Backun")
+    assert m.brand is None and m.method == "none" and m.confidence == 0.0
+    assert index.match("").method == "none"
+
+
+def test_bulk_throughput():
+    pairs = RULES + [(f"Maker {i:04d}", f"Maker {i:04d} Ltd") for i in range(2000)]
+    index = BrandIndex(pairs)
+    # Imports repeat the same sloppy spellings; repeats are served from the memo.
+    messy = [f"maker {i:04d}x" for i in range(1000)] * 3 + ["Buffett", " yamaha "] * 500
+    started = time.perf_counter()
+    results = index.match_many(messy)
+    assert time.perf_counter() - started < 2.0
+    assert results[0].brand == "Maker 0000 Ltd"
+    assert results[-1].brand == "Yamaha"
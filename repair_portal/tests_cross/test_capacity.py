@@ -0,0 +1,56 @@
+import time
+from datetime import date, datetime, timedelta
+
+from repair_portal.repair.services.capacity import CapacityCalendar, PlanOrder, plan_assignments
+
+START = date(2026, 3, 2)
+
+
+def _calendar(per_day: dict[str, float], days: int = 5) -> CapacityCalendar:
+    cal = CapacityCalendar(start=START, days=days)
+    for tech, minutes in per_day.items():
+        for d in range(days):
+            cal.add_availability(tech, START + timedelta(days=d), minutes)
+    return cal
+
+
+def test_book_consumes_earliest_days_and_reports_overflow():
+    cal = _calendar({"a": 60}, days=3)
+    assert cal.book("a", 90) == 0
+    assert list(cal.free["a"]) == [0, 30, 60]
+    assert cal.finish_day("a", 40) == 2
+    assert cal.book("a", 200) == 110
+    assert cal.utilization("a") == 100
+
+
+def test_committed_senior_is_not_overbooked():
+    cal = _calendar({"senior": 480, "junior": 240})
+    cal.book("senior", 480 * 4)  # senior already carries four days of work
+
+    due = datetime.combine(START + timedelta(days=1), datetime.min.time())
+    plan = plan_assignments(cal, [PlanOrder("RO-1", 300, due, "High")])
+    (s,) = plan["suggestions"]
+    assert s["technician"] == "junior"
+    assert s["on_time"] is True
+    assert s["projected_finish"] == START + timedelta(days=1)
+
+
+def test_orders_are_taken_in_sla_order():
+    cal = _calendar({"a": 100}, days=2)
+    orders = [
+        PlanOrder("late", 100, START + timedelta(days=1), "Low"),
+        PlanOrder("none", 50, None, "Critical"),
+        PlanOrder("soon", 100, START, "Low"),
+    ]
+    plan = plan_assignments(cal, orders)
+    assert [s["repair_order"] for s in plan["suggestions"]] == ["soon", "late"]
+    assert plan["unplaced"] == [{"repair_order": "none", "estimated_minutes": 50}]
+
+
+def test_whole_shop_plans_quickly():
+    cal = _calendar({f"tech{i}": 420 for i in range(25)}, days=30)
+    orders = [PlanOrder(f"RO-{i}", 60 + i % 240, START + timedelta(days=i % 30), "Medium") for i in range(800)]
+    started = time.perf_counter()
+    plan = plan_assignments(cal, orders)
+    assert time.perf_counter() - started < 1.0
+    assert len(plan["suggestions"]) + len(plan["unplaced"]) == 800
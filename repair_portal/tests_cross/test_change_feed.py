@@ -0,0 +1,28 @@
+from repair_portal.core.change_feed import FEED_DOCTYPES, feed_keys, summarize
+
+
+def test_feed_keys_are_per_doctype():
+    version, log, floor = feed_keys("Repair Order")
+    assert version == "repair_portal:change_feed:repair_order:version"
+    assert log == "repair_portal:change_feed:repair_order:log"
+    assert floor == "repair_portal:change_feed:repair_order:floor"
+    assert len({feed_keys(d)[0] for d in FEED_DOCTYPES}) == len(FEED_DOCTYPES)
+
+
+def test_baseline_and_unchanged_polls():
+    assert summarize(7, 0, None) == {"version": 7, "changed": False, "names": [], "truncated": False}
+    assert summarize(7, 0, 7)["changed"] is False
+
+
+def test_changed_names_are_decoded():
+    result = summarize(9, 0, 7, [b"IP-0001", "IP-0002"])
+    assert result["changed"] and not result["truncated"]
+    assert result["names"] == ["IP-0001", "IP-0002"]
+
+
+def test_trimmed_log_or_reset_counter_asks_for_reload():
+    trimmed = summarize(5000, 4000, 3000, [])
+    assert trimmed["changed"] and trimmed["truncated"] and trimmed["names"] is None
+
+    reset = summarize(2, 0, 40, [])
+    assert reset["changed"] and reset["truncated"]
@@ -0,0 +1,45 @@
+from repair_portal.customer.services.consent_fanout import fields_signature, plan_form_changes, scrub_label
+
+TEMPLATE = [
+    {"field_label": "Parent Name", "field_type": "Data", "default_value": ""},
+    {"field_label": "Photo Release", "field_type": "Check", "default_value": "0"},
+]
+
+
+def test_scrub_matches_frappe_scrub():
+    assert scrub_label("Photo-Release Form") == "photo_release_form"
+    assert scrub_label(None) == ""
+
+
+def test_missing_rows_are_appended_after_existing_ones():
+    rows = {
+        "CF-1": [{"name": "r1", "idx": 1, "field_label": "parent name", "field_value": "Ann"}],
+        "CF-2": [],
+    }
+    inserts, deletes = plan_form_changes(TEMPLATE, rows)
+    assert deletes == []
+    assert [(r["parent"], r["idx"], r["field_label"]) for r in inserts] == [
+        ("CF-1", 2, "Photo Release"),
+        ("CF-2", 1, "Parent Name"),
+        ("CF-2", 2, "Photo Release"),
+    ]
+    assert inserts[0]["field_value"] == "0"
+
+
+def test_only_blank_rows_of_removed_fields_are_deleted():
+    rows = {
+        "CF-1": [
+            {"name": "r1", "idx": 1, "field_label": "Parent Name", "field_value": ""},
+            {"name": "r2", "idx": 2, "field_label": "Photo Release", "field_value": "1"},
+            {"name": "r3", "idx": 3, "field_label": "Old Blank", "field_value": ""},
+            {"name": "r4", "idx": 4, "field_label": "Old Filled", "field_value": "kept"},
+        ]
+    }
+    inserts, deletes = plan_form_changes(TEMPLATE, rows)
+    assert inserts == [] and deletes == ["r3"]
+
+
+def test_signature_detects_field_edits():
+    edited = [dict(TEMPLATE[0]), dict(TEMPLATE[1], default_value="1")]
+    assert fields_signature(TEMPLATE) != fields_signature(edited)
+    assert fields_signature(TEMPLATE) == fields_signature([dict(r) for r in TEMPLATE])
@@ -0,0 +1,88 @@
+import time
+
+import pytest
+
+from repair_portal.customer.services.consent_render import CompiledTemplateCache, bind, resolve_values
+
+MAPPINGS = [
+    {
+        "enabled": 1,
+        "variable_name": "customer_name",
+        "source_doctype": "Customer",
+        "form_link_field": "customer",
+        "source_fieldname": "customer_name",
+    },
+    {
+        "enabled": 1,
+        "variable_name": "customer_email",
+        "source_doctype": "Customer",
+        "form_link_field": "customer",
+        "source_fieldname": "email_id",
+        "default_value": "n/a",
+    },
+    {"enabled": 1, "variable_name": "shop", "default_value": "Main Street"},
+    {"enabled": 0, "variable_name": "ignored", "default_value": "x"},
+]
+
+
+def _fetcher(calls):
+    def fetch(doctype, name, fields):
+        calls.append((doctype, name, tuple(fields)))
+        return {"customer_name": f"Name of {name}", "email_id": None}
+
+    return fetch
+
+
+def test_one_fetch_per_source_document():
+    calls = []
+    values = resolve_values({"customer": "CUST-1"}, MAPPINGS, _fetcher(calls))
+    assert calls == [("Customer", "CUST-1", ("customer_name", "email_id"))]
+    assert values == {"customer_name": "Name of CUST-1", "customer_email": "n/a", "shop": "Main Street"}
+
+
+def test_unlinked_form_uses_defaults_only():
+    calls = []
+    values = resolve_values({"customer": None}, MAPPINGS, _fetcher(calls))
+    assert calls == []
+    assert values == {"customer_email": "n/a", "shop": "Main Street"}
+
+
+def test_template_cache_compiles_each_content_once():
+    cache = CompiledTemplateCache(lambda source: source.upper())
+    assert cache.get("hello") == "HELLO"
+    assert cache.get("hello") == "HELLO"
+    assert cache.get("bye") == "BYE"
+    assert cache.compiles == 2
+
+
+def test_cached_code_renders_with_each_environments_globals():
+    jinja2 = pytest.importorskip("jinja2")
+    cache = CompiledTemplateCache(jinja2.Environment().compile)
+    source = "{{ user }}"
+    first, second = jinja2.Environment(), jinja2.Environment()
+    first.globals["user"] = "a@example.com"
+    second.globals["user"] = "b@example.com"
+
+    assert bind(first, cache.get(source)).render() == "a@example.com"
+    assert bind(second, cache.get(source)).render() == "b@example.com"
+    assert cache.compiles == 1
+
+
+def test_render_benchmark_1000_forms():
+    jinja2 = pytest.importorskip("jinja2")
+    env = jinja2.Environment(autoescape=True)
+    cache = CompiledTemplateCache(env.compile)
+    source = "<p>I, {{ customer_name }}, consent on {{ date }} at {{ shop }}.</p>" * 20
+    calls = []
+    fetch = _fetcher(calls)
+
+    started = time.perf_counter()
+    for i in range(1000):
+        ctx = {"date": "2026-10-19", **resolve_values({"customer": f"CUST-{i}"}, MAPPINGS, fetch)}
+        html = bind(env, cache.get(source)).render(ctx)
+    elapsed = time.perf_counter() - started
+
+    assert cache.compiles == 1
+    assert len(calls) == 1000
+    assert "Name of CUST-999" in html
+    assert elapsed < 2.0
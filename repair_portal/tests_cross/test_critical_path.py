@@ -0,0 +1,62 @@
+import pytest
+
+from repair_portal.instrument_setup.services.critical_path import CycleError, TaskGraph
+
+
+def _graph():
+    #   A(3) ─┬─> B(2) ─┐
+    #         └─> C(5) ─┴─> D(1)
+    return TaskGraph.build(
+        [("A", 3, 0), ("B", 2, 0), ("C", 5, 0), ("D", 1, 0)],
+        [("A", "B"), ("A", "C"), ("B", "D"), ("C", "D")],
+    )
+
+
+def test_earliest_latest_and_slack():
+    g = _graph()
+    assert g.project_end == 9
+    assert g.as_dict("C")["es"] == 3
+    assert g.as_dict("D")["es"] == 8
+    assert g.slack("B") == 3
+    assert g.slack("C") == 0
+    assert g.critical_path() == ["A", "C", "D"]
+
+
+def test_release_offset_delays_start():
+    g = TaskGraph.build([("A", 1, 0), ("B", 1, 4)], [("A", "B")])
+    assert g.as_dict("B")["es"] == 4
+    assert g.project_end == 5
+
+
+def test_incremental_update_matches_full_recompute():
+    g = _graph()
+    changed = g.update_task("B", duration=7)
+    assert "D" in changed
+    assert g.project_end == 11
+    assert g.critical_path() == ["A", "B", "D"]
+
+    fresh = TaskGraph.build(
+        [("A", 3, 0), ("B", 7, 0), ("C", 5, 0), ("D", 1, 0)],
+        [("A", "B"), ("A", "C"), ("B", "D"), ("C", "D")],
+    )
+    for key in "ABCD":
+        assert g.as_dict(key) == fresh.as_dict(key)
+
+
+def test_incremental_update_without_end_change_only_touches_ancestors():
+    g = _graph()
+    changed = g.update_task("B", duration=3)
+    assert g.project_end == 9
+    assert changed == {"B"}
+    assert g.slack("B") == 2
+
+
+def test_cycle_detection_reports_cycle():
+    with pytest.raises(CycleError) as err:
+        TaskGraph.build([(1, 1, 0), (2, 1, 0), (3, 1, 0)], [(1, 2), (2, 3), (3, 2)])
+    assert set(err.value.cycle) == {2, 3}
+
+
+def test_dump_and_load_round_trip():
+    g = _graph()
+    assert TaskGraph.load(g.dump()).critical_path() == g.critical_path()
@@ -0,0 +1,41 @@
+from repair_portal.repair.services.escalation import (
+    dedupe_key,
+    digest_subject,
+    plan_digests,
+    render_digest,
+    split_recipients,
+)
+
+
+def _notice(name, order, recipients, summary="late"):
+    return {"name": name, "repair_order": order, "recipients": "\n".join(recipients), "summary": summary}
+
+
+def test_split_recipients_dedupes_and_sorts():
+    assert split_recipients(" b@x \n\na@x\nb@x") == ["a@x", "b@x"]
+    assert split_recipients(None) == []
+    assert dedupe_key("RO-1", "L1") == "RO-1::L1"
+
+
+def test_each_recipient_gets_one_email_and_identical_sets_share_it():
+    managers = ["m1@x", "m2@x", "m3@x"]
+    notices = [_notice(f"RO-{i}::L1", f"RO-{i}", managers) for i in range(200)]
+    notices.append(_notice("RO-7::status:Breached", "RO-7", [*managers, "tech@x"]))
+
+    plan = plan_digests(notices)
+    assert len(plan) == 2
+    recipients, items = plan[0]
+    assert recipients == ("m1@x", "m2@x", "m3@x") and len(items) == 201
+    assert plan[1][0] == ("tech@x",) and [n["repair_order"] for n in plan[1][1]] == ["RO-7"]
+
+    seen = [r for recipients, _items in plan for r in recipients]
+    assert sorted(seen) == sorted(set(seen))
+
+
+def test_digest_rendering_escapes_and_links():
+    items = [_notice("a", "RO-<1>", ["x"], summary="Overdue & late")]
+    body = render_digest(items, lambda order: f"/app/repair-order/{order}")
+    assert "RO-&lt;1&gt;" in body and "Overdue &amp; late" in body
+    assert "href='/app/repair-order/RO-&lt;1&gt;'" in body
+    assert digest_subject(items) == "Repair Order RO-<1> escalation"
+    assert digest_subject(items * 3) == "3 Repair Orders need attention"
@@ -0,0 +1,85 @@
+from types import SimpleNamespace
+
+from repair_portal.core import instrumentation
+
+
+def test_instrument_hooks_wraps_only_opted_in_targets():
+    events = {
+        "Repair Order": {
+            "validate": ["repair_portal.repair.utils.on_child_validate", "erpnext.some.hook"],
+            "on_submit": "repair_portal.repair_portal.inventory.material_planner.on_submit",
+        }
+    }
+    targets = frozenset({"repair_portal.repair.utils.on_child_validate", "erpnext.some.hook"})
+    wrapped = instrumentation.instrument_hooks(events, "doc_event", targets)
+    validate = wrapped["Repair Order"]["validate"]
+    assert validate[0] == "repair_portal.core.instrumentation.doc_event:repair_portal:repair:utils:on_child_validate"
+    assert validate[1] == "erpnext.some.hook"
+    assert wrapped["Repair Order"]["on_submit"] == events["Repair Order"]["on_submit"]
+    # the original mapping is left untouched
+    assert events["Repair Order"]["validate"][0] == "repair_portal.repair.utils.on_child_validate"
+
+
+def test_nothing_is_wrapped_without_opt_in(monkeypatch):
+    monkeypatch.setattr(instrumentation, "frappe", None)
+    events = {"x": "repair_portal.core.tasks.sla_breach_scan"}
+    assert instrumentation.instrument_hooks(events, "scheduler") is events
+
+
+def test_wrapper_attribute_resolves_and_is_cached():
+    target = "repair_portal.core.tasks.sla_breach_scan"
+    path = instrumentation.instrument_hooks({"x": target}, "scheduler", frozenset({target}))["x"]
+    attr = path.rsplit(".", 1)[1]
+    first = getattr(instrumentation, attr)
+    assert first is getattr(instrumentation, attr)
+    assert first.instrumented_target == "repair_portal.core.tasks.sla_breach_scan"
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert instrumentation.percentile(values, 50) == 50.0
+    assert instrumentation.percentile(values, 95) == 95.0
+    assert instrumentation.percentile(values, 99) == 99.0
+    assert instrumentation.percentile([], 99) == 0.0
+
+
+def test_summarize_groups_by_hook():
+    samples = [
+        {"hook": "a", "kind": "doc_event", "wall_ms": 10, "queries": 2, "rows": 4, "ok": True},
+        {"hook": "a", "kind": "doc_event", "wall_ms": 30, "queries": 4, "rows": 0, "ok": False},
+        {"hook": "b", "kind": "scheduler", "wall_ms": 5, "queries": 1, "rows": 1, "ok": True},
+    ]
+    rows = {r["hook"]: r for r in instrumentation.summarize(samples)}
+    assert rows["a"]["calls"] == 2
+    assert rows["a"]["errors"] == 1
+    assert rows["a"]["max_ms"] == 30
+    assert rows["a"]["avg_queries"] == 3
+    assert rows["b"]["kind"] == "scheduler"
+
+
+class FakeDb:
+    def __init__(self):
+        self._cursor = SimpleNamespace(rowcount=2)
+
+    def sql(self, query, *args, **kwargs):
+        return [(1,), (2,)]
+
+
+def test_sql_counter_restores_connection_after_each_sampled_call(monkeypatch):
+    db = FakeDb()
+    monkeypatch.setattr(instrumentation, "frappe", SimpleNamespace(db=db))
+    recorded = []
+    monkeypatch.setattr(instrumentation, "record", recorded.append)
+
+    def hook(doc, method):
+        db.sql("select 1")
+        # a nested sampled hook shares the outer counter instead of wrapping again
+        instrumentation._timed_call(lambda: db.sql("select 2"), "inner", "doc_event", (), {})
+        return "ok"
+
+    for _ in range(3):
+        assert instrumentation._timed_call(hook, "outer", "doc_event", (None, "validate"), {}) == "ok"
+        assert "sql" not in vars(db) and not hasattr(db, "_rp_sql_counter")
+
+    outer = [s for s in recorded if s.hook == "outer"]
+    assert [(s.queries, s.rows) for s in outer] == [(2, 4)] * 3
@@ -0,0 +1,30 @@
+from repair_portal.repair.services.mail_in import PIPELINE_STEPS, pending_steps, submission_key
+
+FIELDS = {
+    "email": "Player@Example.com ",
+    "serial_no": "B12345",
+    "requested_services": "Overhaul",
+    "postal_code": "60601",
+    "day": "2026-10-19",
+}
+
+
+def test_client_key_wins_and_is_hashed():
+    key, from_client = submission_key("  abc-123  ", FIELDS)
+    assert from_client is True
+    assert key.startswith("key:") and "abc" not in key
+    assert submission_key("abc-123", {}) == (key, True)
+
+
+def test_derived_key_collapses_double_submits_on_the_same_day():
+    first, from_client = submission_key(None, FIELDS)
+    assert from_client is False and first.startswith("auto:")
+    assert submission_key("", {**FIELDS, "email": "player@example.com"})[0] == first
+    assert submission_key(None, {**FIELDS, "day": "2026-10-20"})[0] != first
+    assert len(first) <= 140
+
+
+def test_pending_steps_resume_after_recorded_results():
+    assert pending_steps({}) == [step for _field, step in PIPELINE_STEPS]
+    done = {"customer": "CUST-1", "instrument": "INS-1", "customer_address": "ADDR-1"}
+    assert pending_steps(done) == ["repair_request", "mail_in_request", "hold"]
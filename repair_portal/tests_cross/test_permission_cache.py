@@ -0,0 +1,121 @@
+import hashlib
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from repair_portal.repair_portal.permissions import clarinet_intake, principal
+from repair_portal.repair_portal.permissions.principal import Principal, RequestCache
+
+USER = "parent@example.com"
+ROWS = 500
+
+
+class Doc(dict):
+    def __init__(self, name, customer, doctype="Clarinet Intake"):
+        super().__init__(name=name, customer=customer)
+        self.doctype = doctype
+        self.name = name
+        self.customer = customer
+
+
+def _rows():
+    return [Doc(f"CI-{i:04d}", "CUST-1" if i % 2 else "CUST-2") for i in range(ROWS)]
+
+
+@pytest.fixture
+def backend(monkeypatch):
+    calls = {"roles": 0, "customers": 0}
+
+    def get_roles(user):
+        calls["roles"] += 1
+        return ["Customer", "All"]
+
+    def load_customers(user):
+        calls["customers"] += 1
+        return {"CUST-1"}
+
+    local = SimpleNamespace()
+    monkeypatch.setattr(principal, "frappe", SimpleNamespace(local=local, session=SimpleNamespace(user=USER)))
+    monkeypatch.setattr(
+        principal,
+        "principal_for",
+        lambda user=None: principal.request_cache().principal(user or USER, get_roles, load_customers),
+    )
+    return calls
+
+
+def test_principal_loads_customers_lazily():
+    loads = []
+    p = Principal(USER, ["Customer"], lambda user: loads.append(user) or ["CUST-1"])
+    assert p.has_role("Customer") and not p.has_any({"Front Desk"})
+    assert loads == []
+    assert p.owns("CUST-1") and not p.owns("CUST-2") and not p.owns(None)
+    assert loads == [USER]
+    assert Principal("Guest", [], lambda user: ["x"]).customers == frozenset()
+
+
+def test_token_hash_is_memoised_per_request():
+    cache = RequestCache()
+    hashed = []
+
+    def hasher(token, context):
+        hashed.append(token)
+        return hashlib.sha256(f"{token}:{context}".encode()).hexdigest()
+
+    first = cache.token_hash("tok", "repair-request", hasher)
+    assert cache.token_hash("tok", "repair-request", hasher) == first
+    assert cache.token_hash("tok", "other", hasher) != first
+    assert hashed == ["tok", "tok"]
+
+
+def test_decisions_cached_per_user_doctype_name_ptype(backend):
+    rows = _rows()
+    for _ in range(3):  # list view, then report view, then export of the same rows
+        allowed = [clarinet_intake.has_permission(doc, "read") for doc in rows]
+    assert allowed == [bool(i % 2) for i in range(ROWS)]
+    assert backend == {"roles": 1, "customers": 1}
+    cache = principal.request_cache()
+    assert cache.misses == ROWS and cache.hits == 2 * ROWS
+
+    assert clarinet_intake.has_permission(rows[1], "write") is False
+    assert cache.misses == ROWS + 1
+
+
+def test_unsaved_documents_are_not_cached(backend):
+    doc = Doc(None, "CUST-1")
+    assert clarinet_intake.has_permission(doc, "read") is True
+    assert principal.request_cache().memo == {}
+
+
+def test_benchmark_500_row_portal_list(backend):
+    """Per-row overhead of the old handler shape (two role lookups per row) against the cache."""
+    rows = _rows()
+    staff = {"Owner/Admin", "Front Desk", "Repair Technician", "Intake Coordinator"}
+    role_lookups = 0
+
+    def legacy_get_roles(user):
+        nonlocal role_lookups
+        role_lookups += 1
+        # Stand-in for the Redis round trip frappe.get_roles makes per call
+        return list(hashlib.sha256(user.encode()).hexdigest()[:4]) + ["Customer"]
+
+    def legacy(doc):
+        if set(legacy_get_roles(USER)) & staff:
+            return True
+        if "Customer" in legacy_get_roles(USER):
+            return doc.customer in {"CUST-1"}
+        return False
+
+    start = time.perf_counter()
+    before = [legacy(doc) for doc in rows]
+    legacy_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    after = [clarinet_intake.has_permission(doc, "read") for doc in rows]
+    cached_seconds = time.perf_counter() - start
+
+    assert before == after
+    assert role_lookups == 2 * ROWS
+    assert backend["roles"] == 1
+    print(f"\n{ROWS} rows: legacy {legacy_seconds * 1e3:.2f} ms, cached {cached_seconds * 1e3:.2f} ms")
@@ -0,0 +1,91 @@
+from types import SimpleNamespace
+
+from repair_portal.customer.services import portal_home
+from repair_portal.customer.services.portal_home import affected_customers, build_bundle, instrument_label
+
+
+def test_instrument_label_falls_back_to_profile_name():
+    assert instrument_label({"headline": "Buffet R13", "serial_no": "123"}) == "Buffet R13 • 123"
+    assert instrument_label({"instrument_profile": "IP-1"}) == "IP-1"
+    assert instrument_label({}) == ""
+
+
+def test_build_bundle_labels_repairs_without_leaking_join_columns():
+    repairs = [
+        {
+            "name": "RO-1",
+            "instrument_profile": "IP-1",
+            "headline": "Buffet R13",
+            "instrument_category": "B♭ Clarinet",
+            "serial_no": "123",
+        },
+        {"name": "RO-2", "instrument_profile": "IP-2", "headline": None},
+    ]
+    bundle = build_bundle("CUST-1", [{"name": "IP-1"}], repairs, [], [{"name": "SRV-1"}])
+    assert bundle["customer"] == "CUST-1"
+    assert [r["instrument_label"] for r in bundle["repairs"]] == ["Buffet R13 • B♭ Clarinet • 123", "IP-2"]
+    assert "headline" not in bundle["repairs"][0]
+    assert repairs[0]["headline"] == "Buffet R13"
+    assert bundle["service_plans"] == [{"name": "SRV-1"}]
+
+
+def test_affected_customers_merges_scalars_and_lists():
+    assert affected_customers("A", None, ["B", None, "A"], "") == {"A", "B"}
+
+
+class FakeCache:
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, key):
+        return self.values.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.values[key] = value
+
+    def delete_value(self, key):
+        self.values.pop(key, None)
+
+
+def test_bundle_is_served_from_cache_until_invalidated(monkeypatch):
+    cache = FakeCache()
+    builds = []
+    monkeypatch.setattr(portal_home, "frappe", SimpleNamespace(cache=lambda: cache))
+    monkeypatch.setattr(portal_home, "compute_bundle", lambda c: builds.append(c) or {"customer": c})
+
+    assert portal_home.get_bundle("CUST-1") == {"customer": "CUST-1"}
+    portal_home.get_bundle("CUST-1")
+    assert builds == ["CUST-1"]
+
+    portal_home.invalidate("CUST-1")
+    portal_home.get_bundle("CUST-1")
+    assert builds == ["CUST-1", "CUST-1"]
+
+
+def test_failing_section_is_logged_and_bundle_not_cached(monkeypatch):
+    cache = FakeCache()
+    errors = []
+    monkeypatch.setattr(
+        portal_home,
+        "frappe",
+        SimpleNamespace(
+            cache=lambda: cache,
+            get_traceback=lambda: "tb",
+            log_error=lambda message, title: errors.append(title),
+        ),
+    )
+
+    def broken(customer):
+        raise RuntimeError("unknown column")
+
+    monkeypatch.setattr(portal_home, "_query_instruments", lambda c: [{"name": "IP-1"}])
+    monkeypatch.setattr(portal_home, "_query_repairs", lambda c: [])
+    monkeypatch.setattr(portal_home, "_query_estimates", broken)
+    monkeypatch.setattr(portal_home, "_query_service_plans", lambda c: [])
+
+    bundle = portal_home.get_bundle("CUST-1")
+    assert bundle["instruments"] == [{"name": "IP-1"}]
+    assert bundle["estimates"] == []
+    assert bundle["failed_sections"] == ["estimates"]
+    assert errors == ["Portal home: estimates section failed for CUST-1"]
+    assert cache.values == {}
@@ -0,0 +1,54 @@
+import io
+import zipfile
+
+import pytest
+
+from repair_portal.core.print_batch import (
+    chunked,
+    normalize_items,
+    pdf_file_name,
+    render_fingerprint,
+    zip_pdfs,
+)
+
+
+def test_normalize_items_accepts_dicts_and_sequences_and_dedupes():
+    items = normalize_items(
+        [
+            ["Clarinet Initial Setup", "CIS-1", "Clarinet Setup Certificate"],
+            {"doctype": "Clarinet Intake", "name": "CI-1", "print_format": "Intake Receipt"},
+            ("Clarinet Initial Setup", "CIS-1", "Clarinet Setup Certificate"),
+        ]
+    )
+    assert items == [
+        ("Clarinet Initial Setup", "CIS-1", "Clarinet Setup Certificate"),
+        ("Clarinet Intake", "CI-1", "Intake Receipt"),
+    ]
+
+
+@pytest.mark.parametrize("bad", [["Clarinet Intake", "CI-1"], {"doctype": "Clarinet Intake", "name": "CI-1"}])
+def test_normalize_items_rejects_incomplete_items(bad):
+    with pytest.raises(ValueError):
+        normalize_items([bad])
+
+
+def test_chunked():
+    items = [("D", str(i), "P") for i in range(5)]
+    assert [len(c) for c in chunked(items, 2)] == [2, 2, 1]
+    assert chunked(items, 0) == [[item] for item in items]
+
+
+def test_fingerprint_changes_with_document_or_format_modified():
+    doc = ("Clarinet Initial Setup", "CIS-1", "Cert")
+    base = render_fingerprint(*doc, "2026-10-01 10:00", "2026-01-01")
+    assert base == render_fingerprint(*doc, "2026-10-01 10:00", "2026-01-01")
+    assert base != render_fingerprint(*doc, "2026-10-02 10:00", "2026-01-01")
+    assert base != render_fingerprint(*doc, "2026-10-01 10:00", "2026-02-01")
+    assert pdf_file_name("CIS/1", "Setup Certificate", base) == f"CIS-1 - Setup Certificate ({base[:10]}).pdf"
+
+
+def test_zip_pdfs_keeps_order_and_suffixes_repeated_names():
+    content = zip_pdfs([("a.pdf", b"1"), ("b.pdf", b"2"), ("a.pdf", b"3")])
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        assert archive.namelist() == ["a.pdf", "b.pdf", "a 2.pdf"]
+        assert archive.read("a 2.pdf") == b"3"
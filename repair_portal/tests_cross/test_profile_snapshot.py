@@ -0,0 +1,46 @@
+import pytest
+
+from repair_portal.instrument_profile.services.profile_snapshot import (
+    MAX_PAGE_SIZE,
+    build_page,
+    clamp_page_size,
+    decode_cursor,
+    encode_cursor,
+)
+
+
+def _rows(n):
+    # newest first, as fetch_page orders them
+    return [
+        {"name": f"ROW-{i:04d}", "creation": f"2026-10-{19 - i // 100:02d} 10:{i % 60:02d}:00"} for i in range(n)
+    ]
+
+
+def test_cursor_round_trip():
+    cursor = encode_cursor("2026-10-19 10:00:00.123456", "ICR-0001")
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2026-10-19 10:00:00.123456", "ICR-0001")
+    assert decode_cursor(None) is None
+
+
+def test_bad_cursor_is_rejected():
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+    with pytest.raises(ValueError):
+        decode_cursor("e30")  # base64 of "{}"
+
+
+def test_build_page_signals_more_rows():
+    page = build_page(_rows(21), 20)
+    assert len(page["items"]) == 20
+    assert decode_cursor(page["next_cursor"]) == ("2026-10-19 10:19:00", "ROW-0019")
+
+    last = build_page(_rows(5), 20)
+    assert len(last["items"]) == 5 and last["next_cursor"] is None
+
+
+def test_page_size_is_clamped():
+    assert clamp_page_size("5") == 5
+    assert clamp_page_size(0) == 1
+    assert clamp_page_size(10_000) == MAX_PAGE_SIZE
+    assert clamp_page_size("abc") == 20
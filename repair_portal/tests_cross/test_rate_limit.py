@@ -0,0 +1,102 @@
+from types import SimpleNamespace
+
+import pytest
+
+from repair_portal.core import rate_limit
+from repair_portal.core.rate_limit import LocalTokenBucket, RateLimiter, RateLimitPolicy, Scope
+
+
+def test_policy_rejects_non_positive_limits():
+    with pytest.raises(ValueError):
+        RateLimitPolicy(key="demo", limit=0)
+    with pytest.raises(ValueError):
+        RateLimitPolicy(key="demo", limit=1, window_seconds=0)
+
+
+def test_policy_identity_by_scope():
+    per_user = RateLimitPolicy(key="demo", limit=5, shared_users=frozenset({"svc@example.com"}))
+    assert per_user.identity("tech@example.com", "10.0.0.1") == "tech@example.com"
+    assert per_user.identity("Guest", "10.0.0.1") == "ip:10.0.0.1"
+    assert per_user.identity("svc@example.com", "10.0.0.1") == "service"
+
+    per_ip = RateLimitPolicy(key="demo", limit=5, scope=Scope.IP)
+    assert per_ip.identity("tech@example.com", "10.0.0.2") == "ip:10.0.0.2"
+
+    shared = RateLimitPolicy(key="demo", limit=5, scope=Scope.SHARED)
+    assert shared.identity("a", "1") == shared.identity("b", "2")
+
+
+def test_local_token_bucket_refills_over_window():
+    bucket = LocalTokenBucket()
+    assert bucket.allow("k", limit=2, window_seconds=10, now=0.0)
+    assert bucket.allow("k", limit=2, window_seconds=10, now=0.0)
+    assert not bucket.allow("k", limit=2, window_seconds=10, now=1.0)
+    # 2 tokens per 10s → one token back after 5s
+    assert bucket.allow("k", limit=2, window_seconds=10, now=6.0)
+
+
+def test_limiter_falls_back_and_counts_throttles(monkeypatch):
+    monkeypatch.setattr(rate_limit, "frappe", None, raising=False)
+    limiter = RateLimiter()
+    policy = RateLimitPolicy(key="demo", limit=1, window_seconds=60)
+
+    assert limiter.hit(policy, "u1")
+    assert not limiter.hit(policy, "u1")
+    assert limiter.hit(policy, "u2")
+    stats = limiter.stats()
+    assert stats["local"] == {"demo": 1}
+    assert stats["fallbacks"] == 3
+
+
+class FakeRedis:
+    """Raw client: no prefixing or pickling, values come back as bytes."""
+
+    def __init__(self):
+        self.hashes = {}
+
+    def make_key(self, key):
+        return f"site1|{key}"
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+    def register_script(self, script):
+        return lambda keys, args: [0, args[2]]
+
+
+class FakePipeline:
+    def __init__(self, redis):
+        self.redis = redis
+        self.ops = []
+
+    def hincrby(self, name, key, amount):
+        self.ops.append(("hincrby", name, key, amount))
+        return self
+
+    def hgetall(self, name):
+        self.ops.append(("hgetall", name))
+        return self
+
+    def execute(self):
+        out = []
+        for op in self.ops:
+            table = self.redis.hashes.setdefault(op[1], {})
+            if op[0] == "hincrby":
+                field = op[2].encode()
+                table[field] = str(int(table.get(field, b"0")) + op[3]).encode()
+                out.append(int(table[field]))
+            else:
+                out.append(dict(table))
+        return out
+
+
+def test_site_throttle_counter_round_trips_through_stats(monkeypatch):
+    redis = FakeRedis()
+    monkeypatch.setattr(rate_limit, "frappe", SimpleNamespace(cache=lambda: redis), raising=False)
+    limiter = RateLimiter()
+    policy = RateLimitPolicy(key="demo", limit=1, window_seconds=60)
+
+    assert not limiter.hit(policy, "u1")
+    assert not limiter.hit(policy, "u1")
+    assert list(redis.hashes) == ["site1|rl::throttled"]
+    assert limiter.stats()["site"] == {"demo": 2}
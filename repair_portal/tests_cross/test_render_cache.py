@@ -0,0 +1,88 @@
+from types import SimpleNamespace
+
+from repair_portal.repair_portal.utils import render_cache
+from repair_portal.repair_portal.utils.render_cache import (
+    RenderCache,
+    data_uri,
+    file_name_for,
+    render_key,
+    render_many,
+    sheet_html,
+)
+
+
+def test_render_key_is_stable_and_input_sensitive():
+    key = render_key("qr", "CI-0001", 4, "png")
+    assert key == render_key("qr", "CI-0001", 4, "PNG")
+    assert len({key, render_key("qr", "CI-0001", 5, "png"), render_key("qr", "CI-0002", 4, "png")}) == 3
+    assert render_key("qr", "CI-0001", 4, "png") != render_key("label", "CI-0001", 4, "png")
+    assert file_name_for(key, "PNG") == f"render-{key[:40]}.png"
+
+
+def test_data_uri():
+    assert data_uri(b"abc", "png") == "data:image/png;base64,YWJj"
+    assert data_uri(b"abc", "pdf").startswith("data:application/pdf;base64,")
+
+
+def test_render_cache_evicts_least_recently_used():
+    cache = RenderCache(maxsize=2)
+    cache.put("a", b"1")
+    cache.put("b", b"2")
+    assert cache.get("a") == b"1"
+    cache.put("c", b"3")
+    assert cache.get("b") is None
+    assert cache.get("a") == b"1" and cache.get("c") == b"3"
+
+
+def test_render_many_renders_each_value_once_in_process():
+    calls = []
+
+    def render(value, size):
+        calls.append(value)
+        return f"{value}@{size}".encode()
+
+    result = render_many(["A", "B", "A"], 4, render)
+    assert result == {"A": b"A@4", "B": b"B@4"}
+    assert calls == ["A", "B"]
+
+
+class FakeCache:
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, key):
+        return self.values.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.values[key] = value
+
+
+def test_qr_batch_queues_one_persist_job_for_all_misses(monkeypatch):
+    jobs = []
+    monkeypatch.setattr(
+        render_cache,
+        "frappe",
+        SimpleNamespace(
+            cache=lambda: FakeCache(),
+            db=SimpleNamespace(get_value=lambda *args, **kwargs: None),
+            enqueue=lambda method, **kwargs: jobs.append(kwargs),
+        ),
+    )
+    monkeypatch.setattr(render_cache, "_MEMORY", render_cache.RenderCache())
+
+    images = render_cache.qr_batch(["A", "B", "A", "C"], 4, lambda value, size: value.encode())
+    assert images == {"A": b"A", "B": b"B", "C": b"C"}
+    assert len(jobs) == 1
+    assert [content for _key, _fmt, content in jobs[0]["items"]] == [b"A", b"B", b"C"]
+
+    render_cache.qr_batch(["A", "C"], 4, lambda value, size: value.encode())
+    assert len(jobs) == 1
+
+
+def test_sheet_html_fills_rows_and_escapes_text():
+    labels = [{"qr": "data:x", "title": f"CI-{i}", "lines": ["<b>", None]} for i in range(4)]
+    html = sheet_html(labels, columns=3)
+    assert html.count("<tr>") == 2
+    assert html.count('class="rp-label"') == 4
+    assert html.count("<td></td>") == 2
+    assert "&lt;b&gt;" in html and "<b>" not in html
@@ -0,0 +1,88 @@
+import csv
+
+from repair_portal.core import report_export
+
+COLUMNS = [
+    {"label": "Repair Order", "fieldname": "name"},
+    {"label": "Overdue (min)", "fieldname": "overdue_minutes"},
+]
+
+
+def test_write_csv_consumes_generator_and_reports_progress(tmp_path, monkeypatch):
+    monkeypatch.setattr(report_export, "_PROGRESS_EVERY_ROWS", 2)
+    seen = []
+    rows = ({"name": f"RO-{i}", "overdue_minutes": i or None} for i in range(5))
+
+    path = tmp_path / "out.csv"
+    count = report_export.write_csv(str(path), COLUMNS, rows, on_progress=seen.append)
+
+    assert count == 5
+    assert seen == [2, 4]
+    with open(path, newline="", encoding="utf-8") as fh:
+        lines = list(csv.reader(fh))
+    assert lines[0] == ["Repair Order", "Overdue (min)"]
+    assert lines[1] == ["RO-0", ""]
+    assert lines[-1] == ["RO-4", "4"]
+
+
+def test_stream_rows_applies_transform_per_chunk():
+    calls = []
+
+    def transform(chunk):
+        calls.append(len(chunk))
+        for row in chunk:
+            yield {**row, "double": row["n"] * 2}
+
+    out = list(report_export.stream_rows(iter([[{"n": 1}, {"n": 2}], [{"n": 3}]]), transform))
+    assert [r["double"] for r in out] == [2, 4, 6]
+    assert calls == [2, 1]
+
+
+def test_filter_list_normalises_dict_filters():
+    assert report_export._filter_list({"docstatus": ["<", 2], "workshop": "Main"}) == [
+        ["docstatus", "<", 2],
+        ["workshop", "=", "Main"],
+    ]
+
+
+def test_stable_order_adds_name_tiebreak_once():
+    assert report_export.stable_order("sla_due asc, modified desc") == "sla_due asc, modified desc, name asc"
+    assert report_export.stable_order("modified desc, `name` desc") == "modified desc, `name` desc"
+
+
+class FakeFrappe:
+    def __init__(self, rows):
+        self.rows = rows
+        self.calls = []
+
+    def get_all(self, doctype, filters=None, fields=None, order_by=None, pluck=None, **kwargs):
+        self.calls.append(order_by)
+        if pluck:
+            # sla_due asc, modified desc, name asc
+            ordered = sorted(self.rows, key=lambda r: r["name"])
+            ordered = sorted(ordered, key=lambda r: r["modified"], reverse=True)
+            ordered = sorted(ordered, key=lambda r: r["sla_due"])
+            return [r[pluck] for r in ordered]
+        wanted = set(filters["name"][1])
+        # unordered, as a plain IN lookup may return them
+        return [dict(r) for r in reversed(self.rows) if r["name"] in wanted]
+
+
+def test_ordered_chunks_keep_report_order(monkeypatch):
+    rows = [
+        {"name": "RO-1", "sla_due": 3, "modified": 1},
+        {"name": "RO-2", "sla_due": 1, "modified": 1},
+        {"name": "RO-3", "sla_due": 1, "modified": 5},
+        {"name": "RO-4", "sla_due": 2, "modified": 1},
+        {"name": "RO-5", "sla_due": 1, "modified": 1},
+    ]
+    fake = FakeFrappe(rows)
+    monkeypatch.setattr(report_export, "frappe", fake)
+
+    chunks = list(
+        report_export.iter_ordered_chunks(
+            "Repair Order", {}, ["sla_due"], "sla_due asc, modified desc", chunk_size=2
+        )
+    )
+    assert [[r["name"] for r in c] for c in chunks] == [["RO-3", "RO-2"], ["RO-5", "RO-4"], ["RO-1"]]
+    assert fake.calls[0] == "sla_due asc, modified desc, name asc"
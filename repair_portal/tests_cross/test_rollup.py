@@ -0,0 +1,197 @@
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+
+from repair_portal.repair.services import rollup
+from repair_portal.repair.services.rollup import (
+    aggregate,
+    bucket_key,
+    fact_from_order,
+    group_rows,
+    sla_outcome,
+    split_range,
+)
+
+DAY = date(2026, 5, 4)
+
+
+def _fact(order, tech, cycle, cost=0.0, outcome="Met", state="Completed"):
+    return {
+        "repair_order": order,
+        "bucket_key": bucket_key(DAY, state, "Overhaul", tech, ""),
+        "fact_date": DAY,
+        "workflow_state": state,
+        "repair_class": "Overhaul",
+        "technician": tech,
+        "workshop": "",
+        "cycle_hours": cycle,
+        "task_hours": 1.5,
+        "estimated_hours": 2.0,
+        "parts_cost": cost,
+        "parts_revenue": cost * 2,
+        "sla_outcome": outcome,
+    }
+
+
+def test_bucket_key_is_stable_and_date_prefixed():
+    key = bucket_key(DAY, "Completed", "Overhaul", "tech@example.com", "")
+    assert key == bucket_key(DAY, "Completed", "Overhaul", "tech@example.com", None)
+    assert key.startswith("2026-05-04-")
+    assert key != bucket_key(DAY, "Delivered", "Overhaul", "tech@example.com", "")
+
+
+def test_aggregate_sums_and_tracks_min_max():
+    rows = aggregate(
+        [
+            _fact("RO-1", "a", 10, cost=5),
+            _fact("RO-2", "a", 4, cost=1, outcome="Breached"),
+            _fact("RO-3", "b", 7),
+        ]
+    )
+    assert len(rows) == 2
+    a = rows[bucket_key(DAY, "Completed", "Overhaul", "a", "")]
+    assert a["orders"] == 2
+    assert a["cycle_hours_total"] == 14
+    assert (a["cycle_hours_min"], a["cycle_hours_max"]) == (4, 10)
+    assert a["parts_cost"] == 6 and a["parts_revenue"] == 12
+    assert (a["sla_met"], a["sla_breached"]) == (1, 1)
+    assert a["task_hours"] == 3.0
+
+
+def test_sla_outcome():
+    due = datetime(2026, 5, 4, 12)
+    assert sla_outcome(due, "On Track", datetime(2026, 5, 4, 11), closed=True) == "Met"
+    assert sla_outcome(due, "On Track", datetime(2026, 5, 4, 13), closed=True) == "Breached"
+    assert sla_outcome(due, "On Track", datetime(2026, 5, 4, 13), closed=False) == "Open"
+    assert sla_outcome(due, "Breached", None, closed=False) == "Breached"
+
+
+def _order(name, day, hours, tech, state="Completed", minutes=90, repair_class=None):
+    modified = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+    order = {
+        "name": name,
+        "creation": modified - timedelta(hours=hours),
+        "modified": modified,
+        "workflow_state": state,
+        "assigned_technician": tech,
+        "total_estimated_minutes": minutes,
+    }
+    if repair_class:
+        order["repair_class"] = repair_class
+    return order
+
+
+def _by(rows, dim):
+    return {r[dim]: r for r in rows}
+
+
+def test_split_range_reads_catch_up_day_and_today_live():
+    today = date(2026, 5, 6)
+    through = date(2026, 5, 6)
+    assert split_range("2026-05-01", None, through, today) == (("2026-05-01", date(2026, 5, 5)), (through, None))
+    assert split_range("2026-05-01", "2026-05-03", through, today) == (("2026-05-01", "2026-05-03"), None)
+    # a catch-up from yesterday does not cover today
+    assert split_range(None, None, date(2026, 5, 5), today)[1] == (date(2026, 5, 5), None)
+    assert split_range("2026-05-06", None, through, today) == (None, ("2026-05-06", None))
+    assert split_range(None, None, None, today) == (None, (None, None))
+
+
+def test_rollup_and_live_paths_agree():
+    orders = [
+        _order("RO-1", date(2026, 5, 4), 10, "a", repair_class="Overhaul"),
+        _order("RO-2", date(2026, 5, 4), 4, "b"),
+        _order("RO-3", date(2026, 5, 5), 7, "a", repair_class="Overhaul", minutes=30),
+        _order("RO-4", date(2026, 5, 6), 2, "a", state="Delivered"),
+        _order("RO-5", date(2026, 5, 6), 30, "b", repair_class="Overhaul"),
+    ]
+    facts = [fact_from_order(o) for o in orders]
+    through = date(2026, 5, 6)
+
+    for dim in ("repair_class", "technician"):
+        live = _by(group_rows(list(aggregate(facts).values()), [dim]), dim)
+        # rollup for the complete days (grouped as query_rollup does), today's orders computed live
+        stored = group_rows(list(aggregate([f for f in facts if f["fact_date"] < through]).values()), [dim])
+        fresh = aggregate([f for f in facts if f["fact_date"] >= through]).values()
+        merged = _by(group_rows([*stored, *fresh], [dim]), dim)
+        assert merged == live
+
+    classes = _by(group_rows(list(aggregate(facts).values()), ["repair_class"]), "repair_class")
+    assert classes["Overhaul"]["orders"] == 3 and classes["Unclassified"]["orders"] == 2
+    assert (classes["Overhaul"]["cycle_hours_min"], classes["Overhaul"]["cycle_hours_max"]) == (7, 30)
+    techs = _by(group_rows(list(aggregate(facts).values()), ["technician"]), "technician")
+    assert techs["a"]["estimated_hours"] == 3.5
+
+
+class _Deadlock(Exception):
+    pass
+
+
+class _LockTimeout(Exception):
+    pass
+
+
+class FakeDB:
+    def __init__(self, deadlocks=0):
+        self.deadlocks = deadlocks
+        self.log = []
+
+    def sql(self, query, values=()):
+        if query.startswith("select get_lock"):
+            self.log.append(("lock", values[0]))
+            return ((1,),)
+        self.log.append(("release", values[0]))
+        return ((1,),)
+
+    def commit(self):
+        if self.deadlocks:
+            self.deadlocks -= 1
+            raise _Deadlock()
+        self.log.append(("commit",))
+
+    def rollback(self):
+        self.log.append(("rollback",))
+
+
+def _fake_frappe(monkeypatch, db):
+    monkeypatch.setattr(
+        rollup,
+        "frappe",
+        SimpleNamespace(
+            db=db,
+            get_all=lambda *args, **kwargs: ["k-old"] if kwargs.get("pluck") else [],
+            QueryDeadlockError=_Deadlock,
+            QueryTimeoutError=_LockTimeout,
+        ),
+        raising=False,
+    )
+    fact = {"repair_order": "RO-1", "bucket_key": "k-new"}
+    monkeypatch.setattr(rollup, "compute_facts", lambda batch: [fact])
+    monkeypatch.setattr(rollup, "_replace_rows", lambda *args: None)
+    monkeypatch.setattr(rollup.time, "sleep", lambda seconds: None)
+
+
+def test_refresh_commits_buckets_while_holding_sorted_locks(monkeypatch):
+    db = FakeDB()
+    _fake_frappe(monkeypatch, db)
+    assert rollup.refresh_orders("RO-1") == 1
+    assert db.log == [
+        ("lock", "repair_rollup:k-new"),
+        ("lock", "repair_rollup:k-old"),
+        ("commit",),
+        ("release", "repair_rollup:k-old"),
+        ("release", "repair_rollup:k-new"),
+    ]
+
+
+def test_refresh_retries_a_deadlocked_batch(monkeypatch):
+    db = FakeDB(deadlocks=2)
+    _fake_frappe(monkeypatch, db)
+    rollup.refresh_orders(["RO-1"])
+    assert db.log.count(("rollback",)) == 2
+    assert db.log[-3:] == [("commit",), ("release", "repair_rollup:k-old"), ("release", "repair_rollup:k-new")]
+
+    db = FakeDB(deadlocks=rollup.DEADLOCK_RETRIES + 1)
+    _fake_frappe(monkeypatch, db)
+    with pytest.raises(_Deadlock):
+        rollup.refresh_orders(["RO-1"])
@@ -0,0 +1,112 @@
+from types import SimpleNamespace
+
+from repair_portal.utils import serial_cleanup
+from repair_portal.utils.serial_cleanup import (
+    case_update_sql,
+    confusable_variants,
+    fold_serial,
+    plan_clusters,
+)
+
+
+def _row(name, norm, **kw):
+    return {"name": name, "normalized_serial": norm, **kw}
+
+
+def test_fold_and_variants():
+    assert fold_serial("B1O23I") == "B10231"
+    variants = confusable_variants("B10")
+    assert variants[0] == "B10"
+    assert {"B10", "BI0", "BLO", "B1Q"} <= set(variants)
+    assert len(confusable_variants("1" * 12, cap=16)) == 16
+
+
+def test_clusters_exact_near_and_brand_split():
+    rows = [
+        _row("ISN-1", "B12345", brand="Buffet", instrument="I-1", creation="2024-01-02"),
+        _row("ISN-2", "B12345", creation="2024-01-01"),
+        _row("ISN-3", "B1234S", brand="Buffet", instrument="I-3"),  # S is not confusable
+        _row("ISN-4", "A1O0O7", verification_status="Verified by Technician"),
+        _row("ISN-5", "A10007", brand="Selmer", instrument="I-5"),
+        _row("ISN-6", "C55555", brand="Selmer", instrument="I-6"),
+        _row("ISN-7", "C55555", brand="Yamaha", instrument="I-7"),
+        _row("ISN-8", "X1"),
+        _row("ISN-9", "XI"),  # too short for near matching
+    ]
+    clusters = plan_clusters(rows)
+    assert clusters == [
+        {
+            "key": "B12345",
+            "instrument": "I-1",
+            "brand": "Buffet",
+            "method": "exact",
+            "primary": "ISN-1",
+            "duplicates": ["ISN-2"],
+        },
+        {
+            "key": "A10007",
+            "instrument": "I-5",
+            "brand": "Selmer",
+            "method": "near",
+            "primary": "ISN-5",
+            "duplicates": ["ISN-4"],
+        },
+    ]
+    assert [c["key"] for c in plan_clusters(rows, near=False)] == ["B12345"]
+
+
+def test_same_brand_rows_linked_to_different_instruments_are_not_merged():
+    rows = [
+        _row("ISN-1", "12O4", brand="Buffet", instrument="I-1"),
+        _row("ISN-2", "1204", brand="Buffet", instrument="I-2"),
+        _row("ISN-3", "1L23", brand="Buffet", instrument="I-3"),
+        _row("ISN-4", "1L23", brand="Buffet", instrument="I-4"),
+    ]
+    assert plan_clusters(rows) == []
+    assert plan_clusters(rows, near=False) == []
+
+
+def test_unlinked_rows_stay_apart_when_instruments_conflict():
+    rows = [
+        _row("ISN-1", "777777", brand="Buffet", instrument="I-1"),
+        _row("ISN-2", "777777", brand="Selmer", instrument="I-2"),
+        _row("ISN-3", "777777"),
+        _row("ISN-4", "777777"),
+    ]
+    (cluster,) = plan_clusters(rows)
+    assert cluster["brand"] is None and cluster["duplicates"] == ["ISN-4"]
+
+
+def test_case_update_sql():
+    sql, values = case_update_sql("tabX", "name", "v", [("a", 1), ("b", 2)])
+    assert sql == (
+        "UPDATE `tabX` SET `v` = CASE `name` WHEN %s THEN %s WHEN %s THEN %s END WHERE `name` IN (%s, %s)"
+    )
+    assert values == ["a", 1, "b", 2, "a", "b"]
+
+
+def test_plan_scales_to_import_size():
+    rows = [_row(f"ISN-{i}", f"B{i % 20000:06d}", brand="Buffet") for i in range(40000)]
+    clusters = plan_clusters(rows)
+    assert len(clusters) == 20000
+    assert all(len(c["duplicates"]) == 1 for c in clusters)
+
+
+def test_near_clusters_merge_only_when_approved(monkeypatch):
+    relinked = []
+    monkeypatch.setattr(serial_cleanup, "frappe", SimpleNamespace(db=SimpleNamespace(commit=lambda: None)))
+    monkeypatch.setattr(serial_cleanup, "_isn_link_fields", lambda: [])
+    monkeypatch.setattr(serial_cleanup, "_relink", lambda p, d, f: relinked.append(p) or 0)
+    invalidations = []
+    monkeypatch.setattr(serial_cleanup.serial_resolver, "invalidate_all", lambda: invalidations.append(1))
+    clusters = [
+        {"method": "exact", "primary": "ISN-1", "duplicates": ["ISN-2"]},
+        {"method": "near", "primary": "ISN-3", "duplicates": ["ISN-4"]},
+        {"method": "near", "primary": "ISN-5", "duplicates": ["ISN-6"]},
+    ]
+
+    result = serial_cleanup.merge_clusters(clusters, approved=["ISN-5"])
+    assert relinked == ["ISN-1", "ISN-5"]
+    assert result["merged"] == 2
+    assert result["awaiting_approval"] == ["ISN-3"]
+    assert len(invalidations) == 2  # once per committed cluster
@@ -0,0 +1,87 @@
+from types import SimpleNamespace
+
+from repair_portal.intake.services import serial_resolver
+from repair_portal.intake.services.serial_resolver import LRUCache, PrefixIndex
+
+
+def test_lru_evicts_least_recently_used():
+    lru = LRUCache(maxsize=2)
+    lru.set("a", 1)
+    lru.set("b", 2)
+    assert lru.get("a") == 1  # refresh "a"
+    lru.set("c", 3)
+    assert lru.get("b") is None
+    assert (lru.get("a"), lru.get("c"), len(lru)) == (1, 3, 2)
+    lru.pop("a")
+    assert lru.get("a", "missing") == "missing"
+
+
+def test_prefix_search_is_sorted_and_bounded():
+    index = PrefixIndex(["B12345", "B12300", "A99", "B12", "", "B12345", "C1"])
+    assert len(index) == 5
+    assert index.search("B12") == ["B12", "B12300", "B12345"]
+    assert index.search("B123", limit=1) == ["B12300"]
+    assert index.search("Z") == []
+    assert index.search("") == []
+
+
+def test_prefix_search_scales():
+    index = PrefixIndex(f"B{i:07d}" for i in range(200_000))
+    for i in range(5000):
+        assert len(index.search(f"B{i % 2000:05d}", limit=10)) == 10
+
+
+class FakeCache:
+    def __init__(self):
+        self.values = {}
+
+    def get_value(self, key):
+        return self.values.get(key)
+
+    def set_value(self, key, value, expires_in_sec=None):
+        self.values[key] = value
+
+    def delete_value(self, key):
+        self.values.pop(key, None)
+
+
+def test_doc_event_invalidation_waits_for_commit(monkeypatch):
+    cache = FakeCache()
+    callbacks = []
+    fake = SimpleNamespace(
+        local=SimpleNamespace(),
+        cache=lambda: cache,
+        db=SimpleNamespace(after_commit=SimpleNamespace(add=callbacks.append)),
+    )
+    monkeypatch.setattr(serial_resolver, "frappe", fake)
+    entry_key = serial_resolver._entry_key("B123")
+    cache.set_value(entry_key, {"instrument": "INS-1"})
+    cache.set_value(serial_resolver.VERSION_KEY, "v1")
+
+    serial_resolver.invalidate_after_commit("B123", None)
+    # other workers keep the committed entry until the write commits
+    assert cache.get_value(entry_key) == {"instrument": "INS-1"}
+    assert cache.get_value(serial_resolver.VERSION_KEY) == "v1"
+    assert fake.local.repair_portal_serial_resolver_dirty == {"B123"}
+
+    for callback in callbacks:
+        callback()
+    assert cache.get_value(entry_key) is None
+    assert cache.get_value(serial_resolver.VERSION_KEY) != "v1"
+    assert fake.local.repair_portal_serial_resolver_dirty == set()
+
+
+def test_invalidate_all_orphans_every_cached_entry(monkeypatch):
+    cache = FakeCache()
+    fake = SimpleNamespace(local=SimpleNamespace(), cache=lambda: cache)
+    monkeypatch.setattr(serial_resolver, "frappe", fake)
+    cache.set_value(serial_resolver.VERSION_KEY, "v1")
+    serial_resolver._version()
+    old_key = serial_resolver._entry_key("B123")
+    cache.set_value(old_key, {"instrument_serial_number": "ISN-OLD"})
+
+    serial_resolver.invalidate_all()
+    serial_resolver._version()
+    assert serial_resolver._entry_key("B123") != old_key
+    assert cache.get_value(serial_resolver._entry_key("B123")) is None
+    assert cache.get_value(serial_resolver.VERSION_KEY) != "v1"
@@ -0,0 +1,44 @@
+from datetime import date
+
+from repair_portal.repair.services.technician_kpis import classify, kpi_deltas
+
+TODAY = date(2026, 10, 19)
+
+
+def _ro(tech="tech@example.com", state="In Progress", target=None):
+    return {"assigned_technician": tech, "workflow_state": state, "target_delivery": target}
+
+
+def test_classify_matches_dashboard_definitions():
+    assert classify(_ro(), TODAY) == {"open_repairs": 1, "in_progress_repairs": 1, "overdue_repairs": 0}
+    assert classify(_ro(state="Quoted", target="2026-10-18"), TODAY) == {
+        "open_repairs": 0,
+        "in_progress_repairs": 0,
+        "overdue_repairs": 1,
+    }
+    assert classify(_ro(state="Delivered", target=date(2026, 1, 1)), TODAY)["overdue_repairs"] == 0
+    assert classify(_ro(target="2026-10-19 00:00:00"), TODAY)["overdue_repairs"] == 0
+    assert classify(None, TODAY) == {"open_repairs": 0, "in_progress_repairs": 0, "overdue_repairs": 0}
+
+
+def test_transition_moves_only_changed_counters():
+    deltas = kpi_deltas(_ro(state="Quoted"), _ro(state="In Progress"), TODAY)
+    assert deltas == {"tech@example.com": {"open_repairs": 1, "in_progress_repairs": 1, "overdue_repairs": 0}}
+    assert kpi_deltas(_ro(), _ro(), TODAY) == {}
+
+
+def test_reassignment_moves_counts_between_technicians():
+    deltas = kpi_deltas(_ro(tech="a@example.com"), _ro(tech="b@example.com"), TODAY)
+    assert deltas["a@example.com"] == {"open_repairs": -1, "in_progress_repairs": -1, "overdue_repairs": 0}
+    assert deltas["b@example.com"] == {"open_repairs": 1, "in_progress_repairs": 1, "overdue_repairs": 0}
+
+
+def test_insert_and_delete():
+    overdue = _ro(state="In Progress", target="2026-10-01")
+    assert kpi_deltas(None, overdue, TODAY)["tech@example.com"]["overdue_repairs"] == 1
+    assert kpi_deltas(overdue, None, TODAY)["tech@example.com"] == {
+        "open_repairs": -1,
+        "in_progress_repairs": -1,
+        "overdue_repairs": -1,
+    }
+    assert kpi_deltas(None, _ro(tech=None), TODAY) == {}
@@ -0,0 +1,30 @@
+from datetime import datetime
+
+from repair_portal.lab.services.wellness import bucket_start, downsample
+
+
+def test_week_buckets_start_on_monday():
+    assert str(bucket_start("2026-10-18 23:59:00", "week")) == "2026-10-12"
+    assert str(bucket_start(datetime(2026, 10, 19, 8), "week")) == "2026-10-19"
+    assert str(bucket_start("2026-10-18 23:59:00", "day")) == "2026-10-18"
+
+
+def test_downsample_min_mean_max():
+    points = [
+        ("2026-10-13 09:00:00", 80.0),
+        ("2026-10-12 10:00:00", 70.0),
+        ("2026-10-12 15:00:00", None),
+        (datetime(2026, 10, 20, 9), 90.0),
+        ("2026-10-12 11:00:00", 75.0),
+    ]
+    assert downsample(points, "day") == [
+        {"bucket": "2026-10-12", "min": 70.0, "mean": 72.5, "max": 75.0, "count": 2},
+        {"bucket": "2026-10-13", "min": 80.0, "mean": 80.0, "max": 80.0, "count": 1},
+        {"bucket": "2026-10-20", "min": 90.0, "mean": 90.0, "max": 90.0, "count": 1},
+    ]
+    weekly = downsample(points, "week")
+    assert [(b["bucket"], b["count"], b["mean"]) for b in weekly] == [
+        ("2026-10-12", 3, 75.0),
+        ("2026-10-19", 1, 90.0),
+    ]
+    assert downsample([], "day") == []
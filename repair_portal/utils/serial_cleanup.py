@@ -0,0 +1,362 @@
+# Path: repair_portal/repair_portal/utils/serial_cleanup.py
+# Purpose: Set-based maintenance for Instrument Serial Number (ISN) at import scale
+# Notes:
+# - backfill_normalized_serials(): keyset-chunked re-normalization written with one
+#   UPDATE ... CASE per chunk; the cursor is persisted so an interrupted run resumes
+# - find_duplicate_clusters(): groups ISNs by normalized serial and by "near" key
+#   (confusable characters folded: O/Q→0, I/L→1), split per linked instrument
+# - merge_clusters(): relinks every Link field that points at ISN (standard + custom
+#   fields, discovered from meta) with one UPDATE per field, one transaction per cluster;
+#   "near" clusters are merged only when their primary is explicitly approved
+# - Both writers bypass doc events, so they reset the serial resolver cache after each commit
+# - Pure helpers (fold_serial, confusable_variants, plan_clusters, case_update_sql)
+#   have no frappe dependency so they can be unit tested on their own
+
+from __future__ import annotations
+
+import time
+from collections import defaultdict
+from itertools import product
+from typing import Any, Iterable
+
+try:
+    import frappe
+except ImportError:  # pragma: no cover - unit tests skip when frappe missing
+    frappe = None  # type: ignore
+
+from repair_portal.intake.services import serial_resolver
+
+ISN = "Instrument Serial Number"
+BACKFILL_CURSOR_KEY = "repair_portal_isn_backfill_cursor"
+DEFAULT_CHUNK_SIZE = 1000
+MIN_NEAR_LENGTH = 4  # shorter serials fold together far too easily
+CLEANUP_ROLES = ("Repair Manager", "System Manager")
+
+# Characters commonly misread on stamped/engraved serials; the first of each group is canonical
+_CONFUSABLE_GROUPS = ("0OQ", "1IL")
+_FOLD_TABLE = str.maketrans({ch: group[0] for group in _CONFUSABLE_GROUPS for ch in group[1:]})
+_VARIANTS = {ch: tuple(c for c in group if c != ch) for group in _CONFUSABLE_GROUPS for ch in group}
+
+_VERIFICATION_RANK = {"Verified by Technician": 0, "Customer Reported": 1, "Unverified": 2, "Disputed": 3}
+_STATUS_RANK = {"Active": 0, "Replaced": 1, "Error": 2, "Deprecated": 3}
+
+
+# --------------------------
+# Pure helpers
+# --------------------------
+
+
+def fold_serial(normalized: str | None) -> str:
+    """Near-match key: fold confusable characters of an already-normalized serial."""
+    return (normalized or "").translate(_FOLD_TABLE)
+
+
+def confusable_variants(normalized: str | None, cap: int = 64) -> list[str]:
+    """Spellings of ``normalized`` that differ only in confusable characters (self first, capped)."""
+    if not normalized:
+        return []
+    choices = [(ch, *_VARIANTS.get(ch, ())) for ch in normalized]
+    out: list[str] = []
+    for combo in product(*choices):
+        out.append("".join(combo))
+        if len(out) >= cap:
+            break
+    return out
+
+
+def _primary_rank(row: dict[str, Any]) -> tuple:
+    # The linked row leads so the cluster's instrument keeps its own ISN
+    return (
+        0 if row.get("instrument") else 1,
+        _VERIFICATION_RANK.get(row.get("verification_status") or "Unverified", 2),
+        _STATUS_RANK.get(row.get("status") or "Active", 0),
+        str(row.get("creation") or ""),
+        row["name"],
+    )
+
+
+def plan_clusters(rows: Iterable[dict[str, Any]], near: bool = True) -> list[dict[str, Any]]:
+    """
+    Group ISN rows into duplicate clusters.
+
+    Each row needs ``name`` and ``normalized_serial``; ``instrument``, ``brand`` (of
+    the linked Instrument), ``status``, ``verification_status`` and ``creation``
+    refine grouping and the choice of primary. A cluster holds at most one linked
+    instrument: ISNs already pointing at different Instruments are distinct
+    physical serials (makers reuse patterns, stamps get misread) and are never
+    merged. Unlinked rows join the single linked group for their key, if any.
+
+    The primary is the instrument-linked, best-verified, active, oldest member.
+    """
+    by_key: dict[str, dict[Any, list[dict[str, Any]]]] = defaultdict(lambda: defaultdict(list))
+    for row in rows:
+        norm = row.get("normalized_serial")
+        if not norm:
+            continue
+        key = fold_serial(norm) if near and len(norm) >= MIN_NEAR_LENGTH else norm
+        by_key[key][row.get("instrument") or None].append(row)
+
+    clusters: list[dict[str, Any]] = []
+    for key, groups in by_key.items():
+        unlinked = groups.pop(None, [])
+        if len(groups) == 1:
+            next(iter(groups.values())).extend(unlinked)
+        elif unlinked:
+            groups[None] = unlinked
+        for instrument, members in groups.items():
+            if len(members) < 2:
+                continue
+            members.sort(key=_primary_rank)
+            method = "exact" if len({m["normalized_serial"] for m in members}) == 1 else "near"
+            clusters.append(
+                {
+                    "key": key,
+                    "instrument": instrument,
+                    "brand": next((m.get("brand") for m in members if m.get("brand")), None),
+                    "method": method,
+                    "primary": members[0]["name"],
+                    "duplicates": [m["name"] for m in members[1:]],
+                }
+            )
+    clusters.sort(key=lambda c: (c["method"] != "exact", c["key"], c["instrument"] or ""))
+    return clusters
+
+
+def case_update_sql(table: str, key_col: str, set_col: str, pairs: list[tuple[str, Any]]) -> tuple[str, list]:
+    """Build ``UPDATE table SET set_col = CASE key_col WHEN .. THEN .. END WHERE key_col IN (..)``."""
+    whens = " ".join(["WHEN %s THEN %s"] * len(pairs))
+    placeholders = ", ".join(["%s"] * len(pairs))
+    sql = (
+        f"UPDATE `{table}` SET `{set_col}` = CASE `{key_col}` {whens} END "
+        f"WHERE `{key_col}` IN ({placeholders})"
+    )
+    values: list = [v for pair in pairs for v in pair]
+    values.extend(k for k, _v in pairs)
+    return sql, values
+
+
+def _throughput(count: int, started: float) -> dict[str, float]:
+    seconds = time.perf_counter() - started
+    return {"seconds": round(seconds, 3), "per_second": round(count / seconds, 1) if seconds else 0.0}
+
+
+# --------------------------
+# Backfill
+# --------------------------
+
+
+def backfill_normalized_serials(
+    chunk_size: int = DEFAULT_CHUNK_SIZE, max_chunks: int | None = None, restart: bool = False
+) -> dict[str, Any]:
+    """
+    Re-derive normalized_serial for every ISN, one chunk (keyset on name) per UPDATE.
+
+    Only rows whose stored value differs are written. Progress is committed with
+    each chunk; a later call picks up after the last committed name unless
+    ``restart`` is set. Returns counts plus throughput; ``done`` is False when
+    ``max_chunks`` stopped the run early.
+    """
+    from repair_portal.utils.serials import normalize_serial
+
+    started = time.perf_counter()
+    cursor = None if restart else frappe.db.get_default(BACKFILL_CURSOR_KEY)
+    scanned = updated = chunks = 0
+    done = False
+    while max_chunks is None or chunks < max_chunks:
+        filters = {"name": [">", cursor]} if cursor else {}
+        rows = frappe.get_all(
+            ISN,
+            filters=filters,
+            fields=["name", "serial", "normalized_serial"],
+            order_by="name asc",
+            limit_page_length=chunk_size,
+        )
+        if not rows:
+            done = True
+            break
+        pairs = []
+        for r in rows:
+            norm = normalize_serial(r.serial)
+            if norm != r.normalized_serial:
+                pairs.append((r.name, norm))
+        if pairs:
+            sql, values = case_update_sql(f"tab{ISN}", "name", "normalized_serial", pairs)
+            frappe.db.sql(sql, values)
+        cursor = rows[-1].name
+        frappe.db.set_default(BACKFILL_CURSOR_KEY, cursor)
+        frappe.db.commit()
+        if pairs:
+            serial_resolver.invalidate_all()
+        scanned += len(rows)
+        updated += len(pairs)
+        chunks += 1
+        if len(rows) < chunk_size:
+            done = True
+            break
+
+    if done:
+        frappe.db.set_default(BACKFILL_CURSOR_KEY, "")
+        frappe.db.commit()
+    return {"scanned": scanned, "updated": updated, "chunks": chunks, "done": done, **_throughput(scanned, started)}
+
+
+# --------------------------
+# Duplicate clusters
+# --------------------------
+
+
+def _load_rows() -> list[dict[str, Any]]:
+    return frappe.db.sql(
+        """
+        SELECT isn.name, isn.normalized_serial, isn.instrument, isn.status,
+               isn.verification_status, isn.creation, inst.brand
+        FROM `tabInstrument Serial Number` isn
+        LEFT JOIN `tabInstrument` inst ON inst.name = isn.instrument
+        WHERE IFNULL(isn.normalized_serial, '') != ''
+          AND IFNULL(isn.duplicate_of, '') = ''
+          AND IFNULL(isn.status, '') != 'Deprecated'
+        """,
+        as_dict=True,
+    )
+
+
+def find_duplicate_clusters(near: bool = True, limit: int | None = None) -> list[dict[str, Any]]:
+    """Duplicate clusters across all live ISNs (see :func:`plan_clusters`)."""
+    clusters = plan_clusters(_load_rows(), near=bool(int(near)))
+    return clusters[: int(limit)] if limit else clusters
+
+
+def _isn_link_fields() -> list[tuple[str, str]]:
+    """(doctype, fieldname) for every non-single Link field targeting ISN, custom fields included."""
+    found: set[tuple[str, str]] = set()
+    for source in ("DocField", "Custom Field"):
+        rows = frappe.get_all(
+            source,
+            filters={"fieldtype": "Link", "options": ISN},
+            fields=["parent" if source == "DocField" else "dt", "fieldname"],
+            as_list=True,
+        )
+        found.update((dt, fieldname) for dt, fieldname in rows)
+    singles = set(frappe.get_all("DocType", filters={"issingle": 1}, pluck="name"))
+    return sorted((dt, f) for dt, f in found if dt not in singles)
+
+
+def _relink(primary: str, duplicates: list[str], link_fields: list[tuple[str, str]]) -> int:
+    placeholders = ", ".join(["%s"] * len(duplicates))
+    relinked = 0
+    for doctype, fieldname in link_fields:
+        count = frappe.db.sql(
+            f"SELECT COUNT(*) FROM `tab{doctype}` WHERE `{fieldname}` IN ({placeholders})", duplicates
+        )[0][0]
+        if count:
+            frappe.db.sql(
+                f"UPDATE `tab{doctype}` SET `{fieldname}` = %s WHERE `{fieldname}` IN ({placeholders})",
+                [primary, *duplicates],
+            )
+            relinked += count
+    frappe.db.sql(
+        f"""
+        UPDATE `tab{ISN}` SET duplicate_of = %s, status = 'Deprecated', modified = NOW()
+        WHERE name IN ({placeholders})
+        """,
+        [primary, *duplicates],
+    )
+    return relinked
+
+
+def merge_clusters(
+    clusters: list[dict[str, Any]], dry_run: bool = False, approved: Iterable[str] = ()
+) -> dict[str, Any]:
+    """
+    Merge each cluster's duplicates into its primary, one committed transaction per cluster.
+
+    References on every Link field to ISN are moved to the primary; duplicates are marked
+    ``duplicate_of`` + Deprecated. A failing cluster is rolled back, logged and skipped.
+    "near" clusters are only previewed unless their primary is listed in ``approved``.
+    """
+    started = time.perf_counter()
+    link_fields = [lf for lf in _isn_link_fields() if lf != (ISN, "duplicate_of")]
+    approved = set(approved or ())
+    merged = relinked = 0
+    failed: list[dict[str, Any]] = []
+    pending: list[str] = []
+    for cluster in clusters:
+        duplicates = [d for d in cluster.get("duplicates") or [] if d != cluster["primary"]]
+        if not duplicates:
+            continue
+        if cluster.get("method") != "exact" and cluster["primary"] not in approved:
+            pending.append(cluster["primary"])
+            continue
+        if dry_run:
+            merged += len(duplicates)
+            continue
+        try:
+            relinked += _relink(cluster["primary"], duplicates, link_fields)
+            frappe.db.commit()
+            serial_resolver.invalidate_all()
+            merged += len(duplicates)
+        except Exception as exc:
+            frappe.db.rollback()
+            frappe.log_error(frappe.get_traceback(), "serial_cleanup.merge_clusters")
+            failed.append({"primary": cluster["primary"], "error": str(exc)})
+    return {
+        "clusters": len(clusters),
+        "merged": merged,
+        "relinked": relinked,
+        "failed": failed,
+        "awaiting_approval": pending,
+        "dry_run": bool(dry_run),
+        "link_fields": [f"{dt}.{f}" for dt, f in link_fields],
+        **_throughput(merged, started),
+    }
+
+
+# --------------------------
+# Whitelisted entry points
+# --------------------------
+
+
+def duplicate_clusters(near: int = 1, limit: int = 200) -> list[dict[str, Any]]:
+    """Preview duplicate clusters (managers only)."""
+    frappe.only_for(CLEANUP_ROLES)
+    return find_duplicate_clusters(near=near, limit=min(int(limit), 5000))
+
+
+def run_cleanup(
+    near: bool = True,
+    merge: bool = True,
+    chunk_size: int = DEFAULT_CHUNK_SIZE,
+    approved: Iterable[str] = (),
+) -> dict[str, Any]:
+    """Background job: finish the backfill, then cluster and merge; result is logged."""
+    result: dict[str, Any] = {"backfill": backfill_normalized_serials(chunk_size=int(chunk_size))}
+    clusters = find_duplicate_clusters(near=near)
+    result["merge"] = merge_clusters(clusters, dry_run=not merge, approved=approved)
+    frappe.logger("repair_portal.serials").info({"op": "serial_cleanup", **result})
+    return result
+
+
+def start_cleanup(near: int = 1, merge: int = 0, approved=None) -> dict[str, Any]:
+    """
+    Queue :func:`run_cleanup` on the long queue (deduplicated). ``approved`` lists the
+    primaries of previewed "near" clusters that may be merged; exact clusters need none.
+    """
+    frappe.only_for(CLEANUP_ROLES)
+    if isinstance(approved, str):
+        approved = frappe.parse_json(approved)
+    frappe.enqueue(
+        "repair_portal.utils.serial_cleanup.run_cleanup",
+        queue="long",
+        timeout=4 * 60 * 60,
+        job_id="repair_portal::serial_cleanup",
+        deduplicate=True,
+        near=bool(int(near)),
+        merge=bool(int(merge)),
+        approved=list(approved or []),
+    )
+    return {"queued": True}
+
+
+if frappe is not None:
+    duplicate_clusters = frappe.whitelist()(duplicate_clusters)
+    start_cleanup = frappe.whitelist()(start_cleanup)
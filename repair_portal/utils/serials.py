@@ -194,19 +194,25 @@ def ensure_from_document(
 
 def candidates(serial_input: str, limit: int = 20) -> list[dict[str, Any]]:
     """
-    Return possible matches for a typed serial (normalized).
+    Return possible matches for a typed serial (normalized), including near matches that
+    differ only in confusable characters (O/Q/0, I/L/1). Exact matches sort first.
     """
     if not serial_input:
         return []
     norm = normalize_serial(serial_input)
     if not norm:
         return []
+    from repair_portal.utils.serial_cleanup import confusable_variants
+
     rows = frappe.get_all(
         "Instrument Serial Number",
-        filters={"normalized_serial": norm},
-        fields=["name", "instrument", "verification_status", "status"],
+        filters={"normalized_serial": ["in", confusable_variants(norm)]},
+        fields=["name", "instrument", "verification_status", "status", "normalized_serial"],
         limit=limit,
     )
+    for r in rows:
+        r["match"] = "exact" if r.get("normalized_serial") == norm else "near"
+    rows.sort(key=lambda r: r["match"] != "exact")
     return rows
 
 
@@ -240,34 +246,33 @@ def merge_serials(
         dup.save(ignore_permissions=True)
 
     if _instrument_has_field(relink_instrument_field):
-        inst_names = frappe.get_all(
-            "Instrument",
-            filters={relink_instrument_field: duplicate},
-            pluck="name",
+        # Single UPDATE for all matching Instruments
+        frappe.db.set_value(
+            "Instrument", {relink_instrument_field: duplicate}, relink_instrument_field, primary
         )
-        for inst_name in inst_names or []:
-            frappe.db.set_value("Instrument", inst_name, relink_instrument_field, primary)
 
     return primary
 
 
 def backfill_normalized_serial(batch_size: int = 500) -> int:
     """
-    One-time utility to fill normalized_serial for legacy rows.
-    Returns number of rows updated.
+    One-time utility to fill normalized_serial for legacy rows (one UPDATE per batch).
+    Returns number of rows updated. For whole-table, resumable runs use
+    repair_portal.utils.serial_cleanup.backfill_normalized_serials.
     """
+    from repair_portal.utils.serial_cleanup import case_update_sql
+
     rows = frappe.get_all(
         "Instrument Serial Number",
         filters={"normalized_serial": ["in", [None, ""]]},
         fields=["name", "serial"],
         limit=batch_size,
     )
-    count = 0
-    for r in rows:
-        norm = normalize_serial(r.get("serial"))
-        frappe.db.set_value("Instrument Serial Number", r["name"], "normalized_serial", norm)
-        count += 1
-    return count
+    pairs = [(r["name"], normalize_serial(r.get("serial"))) for r in rows]
+    if pairs:
+        sql, values = case_update_sql("tabInstrument Serial Number", "name", "normalized_serial", pairs)
+        frappe.db.sql(sql, values)
+    return len(pairs)
 
 
 def bind_erpnext_serial_no(*, isn_name: str, erp_serial_no: str) -> str:
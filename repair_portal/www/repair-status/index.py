@@ -9,6 +9,7 @@ from frappe import _
 from frappe.utils import format_datetime, get_datetime
 from werkzeug.exceptions import NotFound
 
+from repair_portal.repair.services import mail_in as mail_in_service
 from repair_portal.repair_portal.utils import token as token_utils
 
 
@@ -17,9 +18,26 @@ def get_context(context: Dict[str, Any]) -> Dict[str, Any]:
     if not token:
         raise NotFound()
     hashed = token_utils.hash_token(token, "repair-request")
+    submission = mail_in_service.status_for_token(hashed)
     request_name = frappe.db.get_value("Repair Request", {"portal_token": hashed}, "name")
     if not request_name:
-        raise NotFound()
+        if not submission:
+            raise NotFound()
+        # Mail-in submission still being processed in the background
+        context.update(
+            {
+                "no_cache": 1,
+                "show_sidebar": False,
+                "title": _("Repair Status"),
+                "portal_token": token,
+                "submission": submission,
+                "repair_request": None,
+                "mail_in_request": None,
+                "repair_orders": [],
+                "timeline": _submission_timeline(submission),
+            }
+        )
+        return context
     repair_request = frappe.get_doc("Repair Request", request_name)
     mail_in_name = frappe.db.get_value("Mail In Repair Request", {"repair_request": request_name}, "name")
     mail_in = frappe.get_doc("Mail In Repair Request", mail_in_name) if mail_in_name else None
@@ -36,6 +54,7 @@ def get_context(context: Dict[str, Any]) -> Dict[str, Any]:
             "show_sidebar": False,
             "title": _("Repair Status"),
             "portal_token": token,
+            "submission": submission,
             "repair_request": repair_request,
             "mail_in_request": mail_in,
             "repair_orders": orders,
@@ -45,6 +64,27 @@ def get_context(context: Dict[str, Any]) -> Dict[str, Any]:
     return context
 
 
+def _submission_timeline(submission: Dict[str, Any]) -> List[Dict[str, Any]]:
+    events = [
+        {
+            "timestamp": submission.creation,
+            "display_ts": format_datetime(submission.creation),
+            "title": _("Mail-in request received"),
+            "body": _("We are setting up your repair request."),
+        }
+    ]
+    if submission.status == "Failed":
+        events.append(
+            {
+                "timestamp": submission.modified,
+                "display_ts": format_datetime(submission.modified),
+                "title": _("We could not finish setting up your request"),
+                "body": _("Our team has been notified and will contact you."),
+            }
+        )
+    return events
+
+
 def _build_timeline(repair_request, mail_in, orders: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
     events: List[Dict[str, Any]] = []
     events.append(